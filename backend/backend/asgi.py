@@ -5,6 +5,8 @@ It exposes the ASGI callable as a module-level variable named ``application``.
 
 For more information on this file, see
 https://docs.djangoproject.com/en/4.2/howto/deployment/asgi/
+
+Run with an ASGI server, e.g. ``uvicorn backend.asgi:application``.
 """
 
 import os
@@ -12,5 +14,7 @@ import os
 from django.core.asgi import get_asgi_application
 
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'backend.settings')
+# Serve the grading endpoints with their async views under ASGI
+os.environ.setdefault('GRADING_ASYNC_VIEWS', '1')
 
 application = get_asgi_application()
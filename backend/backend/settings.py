@@ -10,7 +10,9 @@ For the full list of settings and their values, see
 https://docs.djangoproject.com/en/4.2/ref/settings/
 """
 
+import os
 from pathlib import Path
+from corsheaders.defaults import default_headers
 
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
 BASE_DIR = Path(__file__).resolve().parent.parent
@@ -42,10 +44,12 @@ INSTALLED_APPS = [
     'book',
     'assistant',
     'peter',
+    'grading',
 ]
 
 MIDDLEWARE = [
     'django.middleware.security.SecurityMiddleware',
+    'grading.screening.RequestSizeLimitMiddleware',
     'corsheaders.middleware.CorsMiddleware',  # Must be before CommonMiddleware
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
@@ -115,6 +119,9 @@ CORS_ALLOWED_ORIGINS = [
 
 CORS_ALLOW_CREDENTIALS = True
 
+# Grading clients may send an Idempotency-Key header (grading/idempotency.py)
+CORS_ALLOW_HEADERS = (*default_headers, 'idempotency-key')
+
 # REST Framework Settings
 REST_FRAMEWORK = {
     'DEFAULT_PERMISSION_CLASSES': [
@@ -147,3 +154,171 @@ STATIC_URL = 'static/'
 # https://docs.djangoproject.com/en/4.2/ref/settings/#default-auto-field
 
 DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
+
+
+# Grading
+# backend/asgi.py switches the check-question endpoints to their async views,
+# which await the shared OpenRouter client instead of holding a worker thread.
+
+GRADING_ASYNC_VIEWS = os.getenv('GRADING_ASYNC_VIEWS', '0') == '1'
+
+# Bump whenever a grading prompt changes so cached grades are not reused
+GRADING_PROMPT_VERSION = '2'
+
+# Grade cache: in-process LRU with TTL, plus an optional shared tier on a
+# Django cache alias from CACHES (e.g. a Redis cache used by all workers)
+GRADING_CACHE_ENABLED = os.getenv('GRADING_CACHE_ENABLED', '1') == '1'
+GRADING_CACHE_MAX_ENTRIES = int(os.getenv('GRADING_CACHE_MAX_ENTRIES', '10000'))
+GRADING_CACHE_TTL = int(os.getenv('GRADING_CACHE_TTL', str(24 * 60 * 60)))
+GRADING_CACHE_ALIAS = os.getenv('GRADING_CACHE_ALIAS') or None
+
+# Grade title/author/genre answers locally when they match a known answer form
+GRADING_FAST_PATH = os.getenv('GRADING_FAST_PATH', '1') == '1'
+
+# Coalesce identical in-flight grades onto one OpenRouter call. Setting
+# GRADING_SINGLE_FLIGHT_DIR (a local directory) extends this across the
+# worker processes of one host through file locks.
+GRADING_SINGLE_FLIGHT = os.getenv('GRADING_SINGLE_FLIGHT', '1') == '1'
+GRADING_SINGLE_FLIGHT_DIR = os.getenv('GRADING_SINGLE_FLIGHT_DIR') or None
+
+# Questions graded per OpenRouter call by the whole-worksheet endpoint;
+# chunks of one worksheet are sent in parallel
+GRADING_BATCH_CHUNK_SIZE = int(os.getenv('GRADING_BATCH_CHUNK_SIZE', '5'))
+
+# Circuit breaker around each LLM backend: opens when at least ERROR_RATE of
+# the backend's calls in the last WINDOW seconds failed (min. MIN_CALLS calls;
+# calls slower than SLOW_CALL seconds count as failures), keeps the router off
+# that backend for OPEN_SECONDS (the fallback graders answer when no backend
+# of a route is left), then lets a probe through
+GRADING_BREAKER_ENABLED = os.getenv('GRADING_BREAKER_ENABLED', '1') == '1'
+GRADING_BREAKER_ERROR_RATE = float(os.getenv('GRADING_BREAKER_ERROR_RATE', '0.5'))
+GRADING_BREAKER_MIN_CALLS = int(os.getenv('GRADING_BREAKER_MIN_CALLS', '10'))
+GRADING_BREAKER_WINDOW = int(os.getenv('GRADING_BREAKER_WINDOW', '30'))
+GRADING_BREAKER_OPEN_SECONDS = int(os.getenv('GRADING_BREAKER_OPEN_SECONDS', '30'))
+GRADING_BREAKER_SLOW_CALL = float(os.getenv('GRADING_BREAKER_SLOW_CALL', '10'))
+
+# Per-question upstream timeouts follow 1.5x the observed p95 latency,
+# between GRADING_TIMEOUT_MIN seconds and the 15s default
+GRADING_ADAPTIVE_TIMEOUTS = os.getenv('GRADING_ADAPTIVE_TIMEOUTS', '1') == '1'
+GRADING_TIMEOUT_MIN = float(os.getenv('GRADING_TIMEOUT_MIN', '3'))
+
+# Hedged requests: when a grade has not come back by the GRADING_HEDGE_PERCENTILE
+# latency of its question, send a duplicate (to GRADING_HEDGE_MODEL if set) and
+# use whichever valid reply arrives first
+GRADING_HEDGING = os.getenv('GRADING_HEDGING', '0') == '1'
+GRADING_HEDGE_PERCENTILE = float(os.getenv('GRADING_HEDGE_PERCENTILE', '95'))
+GRADING_HEDGE_MODEL = os.getenv('GRADING_HEDGE_MODEL') or None
+
+# Compact output: the model replies with a feedback code and matched rubric
+# items only, and the message is filled in server-side from grading/templates.py
+GRADING_COMPACT_OUTPUT = os.getenv('GRADING_COMPACT_OUTPUT', '0') == '1'
+
+# Send each question's JSON schema as response_format (structured output).
+# Replies are validated and near misses repaired locally either way.
+GRADING_STRUCTURED_OUTPUT = os.getenv('GRADING_STRUCTURED_OUTPUT', '1') == '1'
+
+# Screen answers before the LLM (grading/screening.py): answers over
+# SCREEN_MAX_CHARS characters, gibberish and answers about another book get
+# guidance at once, and API request bodies over MAX_BODY_BYTES get a 413
+GRADING_SCREENING = os.getenv('GRADING_SCREENING', '1') == '1'
+GRADING_SCREEN_MAX_CHARS = int(os.getenv('GRADING_SCREEN_MAX_CHARS', '1000'))
+GRADING_MAX_BODY_BYTES = int(os.getenv('GRADING_MAX_BODY_BYTES', str(64 * 1024)))
+
+# Replace sound-alike story words in voice transcripts ("Goldie Locks",
+# "porage") before caching and local grading (grading/phonetic.py)
+GRADING_PHONETIC = os.getenv('GRADING_PHONETIC', '1') == '1'
+
+# Grade the open Peter questions (Q9, Q10, Q11, Q14) locally when an answer
+# clearly matches their reference events and morals (grading/similarity.py)
+GRADING_SIMILARITY = os.getenv('GRADING_SIMILARITY', '0') == '1'
+
+# Answer classifier (grading/classifier.py): LLM grades are appended to
+# GRADING_GRADE_LOG, `manage.py train_grade_classifier` trains on that log and
+# writes GRADING_CLASSIFIER_PATH, and answers the model is at least THRESHOLD
+# sure about are graded without an LLM call
+GRADING_GRADE_LOG = os.getenv('GRADING_GRADE_LOG') or None
+GRADING_CLASSIFIER_PATH = os.getenv('GRADING_CLASSIFIER_PATH') or None
+GRADING_CLASSIFIER_THRESHOLD = float(os.getenv('GRADING_CLASSIFIER_THRESHOLD', '0.9'))
+
+# Shadow evaluation (grading/shadow.py): this share of answers skips the
+# local graders and goes to the LLM; the fallbacks and the local graders then
+# grade it in the background, and their agreement with the LLM grade is
+# counted per question and appended to GRADING_SHADOW_LOG for
+# `manage.py grading_shadow_report`. At most QUEUE comparisons wait for the
+# WORKERS threads; further samples are dropped.
+GRADING_SHADOW_SAMPLE = float(os.getenv('GRADING_SHADOW_SAMPLE', '0'))
+GRADING_SHADOW_LOG = os.getenv('GRADING_SHADOW_LOG') or None
+GRADING_SHADOW_WORKERS = int(os.getenv('GRADING_SHADOW_WORKERS', '1'))
+GRADING_SHADOW_QUEUE = int(os.getenv('GRADING_SHADOW_QUEUE', '100'))
+
+# Fill misspelled_words with the local spell checker (grading/spelling.py)
+# and drop the spelling task from the prompts
+GRADING_LOCAL_SPELLING = os.getenv('GRADING_LOCAL_SPELLING', '1') == '1'
+
+# Classroom endpoint (grading/classroom.py): at most MAX_ANSWERS students per
+# request, and at most CONCURRENCY unique answers graded at once
+GRADING_CLASSROOM_MAX_ANSWERS = int(os.getenv('GRADING_CLASSROOM_MAX_ANSWERS', '200'))
+GRADING_CLASSROOM_CONCURRENCY = int(os.getenv('GRADING_CLASSROOM_CONCURRENCY', '4'))
+
+# Duplicate-submit suppression (grading/idempotency.py): repeats of a request
+# share its response, for TTL seconds under an Idempotency-Key header and for
+# WINDOW seconds under a hash of client and body. Repeats wait at most WAIT
+# seconds for the first request to finish.
+GRADING_IDEMPOTENCY = os.getenv('GRADING_IDEMPOTENCY', '1') == '1'
+GRADING_IDEMPOTENCY_TTL = int(os.getenv('GRADING_IDEMPOTENCY_TTL', '300'))
+GRADING_IDEMPOTENCY_WINDOW = int(os.getenv('GRADING_IDEMPOTENCY_WINDOW', '5'))
+GRADING_IDEMPOTENCY_WAIT = int(os.getenv('GRADING_IDEMPOTENCY_WAIT', '30'))
+
+# Pre-grading of drafts (grading/pregrade.py): WORKERS background threads
+# grade the latest draft of each answer box into the grade cache, at most
+# QUEUE drafts waiting, and only while the upstream limiter is less than
+# MAX_LOAD busy. Drafts under MIN_WORDS words are ignored.
+GRADING_PREGRADE = os.getenv('GRADING_PREGRADE', '1') == '1'
+GRADING_PREGRADE_WORKERS = int(os.getenv('GRADING_PREGRADE_WORKERS', '2'))
+GRADING_PREGRADE_QUEUE = int(os.getenv('GRADING_PREGRADE_QUEUE', '50'))
+GRADING_PREGRADE_MAX_LOAD = float(os.getenv('GRADING_PREGRADE_MAX_LOAD', '0.5'))
+GRADING_PREGRADE_MIN_WORDS = int(os.getenv('GRADING_PREGRADE_MIN_WORDS', '3'))
+
+# Upstream limiter: at most CONCURRENCY OpenRouter calls at once, started at
+# no more than RATE per second (0 = no rate limit; BURST tokens at most).
+# Up to QUEUE callers wait for QUEUE_TIMEOUT seconds, beyond that requests get
+# a 503 with Retry-After. GRADING_UPSTREAM_LIMIT_DIR (a local directory) shares
+# the slots and tokens between the worker processes of a host.
+GRADING_UPSTREAM_LIMIT = os.getenv('GRADING_UPSTREAM_LIMIT', '1') == '1'
+GRADING_UPSTREAM_CONCURRENCY = int(os.getenv('GRADING_UPSTREAM_CONCURRENCY', '20'))
+GRADING_UPSTREAM_RATE = float(os.getenv('GRADING_UPSTREAM_RATE', '0'))
+GRADING_UPSTREAM_BURST = float(os.getenv('GRADING_UPSTREAM_BURST', '0')) or None
+GRADING_UPSTREAM_QUEUE = int(os.getenv('GRADING_UPSTREAM_QUEUE', '100'))
+GRADING_UPSTREAM_QUEUE_TIMEOUT = float(os.getenv('GRADING_UPSTREAM_QUEUE_TIMEOUT', '10'))
+GRADING_UPSTREAM_LIMIT_DIR = os.getenv('GRADING_UPSTREAM_LIMIT_DIR') or None
+
+# Background grading jobs (grading/jobs.py, run by `manage.py grading_worker`):
+# a running job is retried once it is STALE_AFTER seconds old, at most
+# MAX_ATTEMPTS times; finished jobs are kept for RESULT_TTL seconds. A job
+# that hit upstream trouble waits RETRY_BASE seconds before its second try,
+# doubling per attempt up to RETRY_MAX.
+GRADING_JOB_STALE_AFTER = int(os.getenv('GRADING_JOB_STALE_AFTER', '120'))
+GRADING_JOB_MAX_ATTEMPTS = int(os.getenv('GRADING_JOB_MAX_ATTEMPTS', '3'))
+GRADING_JOB_RESULT_TTL = int(os.getenv('GRADING_JOB_RESULT_TTL', str(24 * 60 * 60)))
+GRADING_JOB_LONG_POLL_MAX = int(os.getenv('GRADING_JOB_LONG_POLL_MAX', '30'))
+GRADING_JOB_RETRY_BASE = int(os.getenv('GRADING_JOB_RETRY_BASE', '5'))
+GRADING_JOB_RETRY_MAX = int(os.getenv('GRADING_JOB_RETRY_MAX', '120'))
+
+# LLM backends and per-question routes (grading/router.py). "openrouter" goes
+# through the OpenRouter key pool; "local" is any OpenAI-compatible chat
+# completions endpoint, e.g. llama.cpp's http://127.0.0.1:8080/v1/chat/completions.
+# GRADING_ROUTES lists backends per question, in failover order:
+#   GRADING_ROUTES="goldilocks Q3=local,openrouter; peter Q1=local,openrouter"
+GRADING_LLM_BACKENDS = {
+    'openrouter': {'type': 'openrouter'},
+    'local': {
+        'type': 'openai',
+        'url': os.getenv('GRADING_LOCAL_LLM_URL') or None,
+        'model': os.getenv('GRADING_LOCAL_LLM_MODEL') or None,
+        'api_key': os.getenv('GRADING_LOCAL_LLM_KEY') or None,
+    },
+}
+GRADING_ROUTES = os.getenv('GRADING_ROUTES', '')
+GRADING_DEFAULT_ROUTE = os.getenv('GRADING_DEFAULT_ROUTE', 'openrouter')
+GRADING_ROUTER_COOLDOWN = int(os.getenv('GRADING_ROUTER_COOLDOWN', '30'))
+GRADING_ROUTER_MAX_LATENCY = float(os.getenv('GRADING_ROUTER_MAX_LATENCY', '0')) or None
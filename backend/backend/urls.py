@@ -22,4 +22,5 @@ urlpatterns = [
     path('', include('book.urls')),  # Include book app URLs
     path('voice_assistant/', include('assistant.urls')),
     path('', include('peter.urls')),  # Include peter app URLs
+    path('', include('grading.urls')),  # Grading pipeline stats and batch endpoints
 ]
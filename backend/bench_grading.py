@@ -0,0 +1,168 @@
+#!/usr/bin/env python3
+"""
+Benchmark the grading endpoints under a WSGI-style worker pool and under ASGI.
+
+A stub OpenRouter server answers every completion after a fixed delay, so the
+numbers only reflect how many grading calls one process can keep in flight.
+Every request sends a different answer, and the shortcuts that would answer
+without the upstream (fast path, screening, cache, single-flight) are turned
+off, as is the upstream limiter, so each request makes one upstream call.
+
+    python bench_grading.py --requests 300 --workers 4 --latency 0.5
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+# Add the current directory to Python path
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+STUB_REPLY = json.dumps({
+    'choices': [{'message': {'content': json.dumps({
+        'isCorrect': True,
+        'message': 'Excellent! You got the complete title right!',
+        'feedback_type': 'excellent',
+        'show_answer': False,
+        'correct_answer': 'The Tale of Peter Rabbit',
+        'misspelled_words': [],
+    })}}]
+}).encode()
+
+
+class StubUpstream:
+    """Minimal keep-alive HTTP server that replies after `latency` seconds"""
+
+    def __init__(self, latency):
+        self.latency = latency
+        self.in_flight = 0
+        self.peak = 0
+        self.port = None
+        self._ready = threading.Event()
+
+    def start(self):
+        threading.Thread(target=asyncio.run, args=(self._serve(),), daemon=True).start()
+        self._ready.wait()
+
+    def reset(self):
+        self.in_flight = 0
+        self.peak = 0
+
+    async def _serve(self):
+        server = await asyncio.start_server(self._handle, '127.0.0.1', 0, backlog=2048)
+        self.port = server.sockets[0].getsockname()[1]
+        self._ready.set()
+        async with server:
+            await server.serve_forever()
+
+    async def _handle(self, reader, writer):
+        try:
+            while True:
+                head = await reader.readuntil(b'\r\n\r\n')
+                length = 0
+                for line in head.split(b'\r\n'):
+                    if line.lower().startswith(b'content-length:'):
+                        length = int(line.split(b':')[1])
+                await reader.readexactly(length)
+
+                self.in_flight += 1
+                self.peak = max(self.peak, self.in_flight)
+                await asyncio.sleep(self.latency)
+                self.in_flight -= 1
+
+                writer.write(b'HTTP/1.1 200 OK\r\nContent-Type: application/json\r\n'
+                             b'Content-Length: ' + str(len(STUB_REPLY)).encode() + b'\r\n\r\n' + STUB_REPLY)
+                await writer.drain()
+        except (asyncio.IncompleteReadError, ConnectionError):
+            pass
+        finally:
+            writer.close()
+
+
+# Environment for the run: nothing may answer without calling the stub
+BENCH_SETTINGS = {
+    'GRADING_FAST_PATH': '0',
+    'GRADING_SCREENING': '0',
+    'GRADING_CACHE_ENABLED': '0',
+    'GRADING_SINGLE_FLIGHT': '0',
+    'GRADING_UPSTREAM_LIMIT': '0',
+    'GRADING_SIMILARITY': '0',
+}
+
+
+def bench_answer(i):
+    """A distinct answer per request, so no two requests can share a grade"""
+    return f'The Tale of Peter Rabbit, answer {i}'
+
+
+def run_wsgi(view, factory, total, workers):
+    """Each worker thread handles one request at a time, like a sync gunicorn worker"""
+    def one(i):
+        request = factory.post('/api/check-peter-question1/', data={'answer': bench_answer(i)},
+                               content_type='application/json')
+        return view(request).status_code
+
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        return list(pool.map(one, range(total)))
+
+
+async def run_asgi(view, factory, total):
+    """All requests share one event loop, like a single uvicorn worker"""
+    async def one(i):
+        request = factory.post('/api/check-peter-question1/', data={'answer': bench_answer(i)},
+                               content_type='application/json')
+        response = await view(request)
+        return response.status_code
+
+    return await asyncio.gather(*(one(i) for i in range(total)))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--requests', type=int, default=300, help='grading requests per run')
+    parser.add_argument('--workers', type=int, default=4, help='sync workers in the WSGI run')
+    parser.add_argument('--latency', type=float, default=0.5, help='stub upstream latency in seconds')
+    args = parser.parse_args()
+
+    stub = StubUpstream(args.latency)
+    stub.start()
+
+    os.environ['OPENROUTER_URL'] = f'http://127.0.0.1:{stub.port}/api/v1/chat/completions'
+    os.environ['OPENROUTER_API_KEY2'] = 'bench'
+    os.environ.update(BENCH_SETTINGS)
+    os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'backend.settings')
+
+    import django
+    django.setup()
+
+    from django.test import AsyncRequestFactory, RequestFactory
+    from grading.pipeline import async_view
+    from peter.views import check_question1_answer
+
+    print(f"{args.requests} requests, stub upstream latency {args.latency * 1000:.0f}ms\n")
+    print(f"{'mode':<24}{'wall time':>12}{'req/s':>10}{'peak in flight':>16}{'errors':>8}")
+
+    runs = [
+        (f'WSGI ({args.workers} workers)',
+         lambda: run_wsgi(check_question1_answer, RequestFactory(), args.requests, args.workers)),
+        ('ASGI (1 event loop)',
+         lambda: asyncio.run(run_asgi(async_view(check_question1_answer), AsyncRequestFactory(), args.requests))),
+    ]
+    for name, run in runs:
+        stub.reset()
+        start = time.perf_counter()
+        statuses = run()
+        elapsed = time.perf_counter() - start
+        errors = sum(1 for status in statuses if status != 200)
+        print(f"{name:<24}{elapsed:>11.2f}s{args.requests / elapsed:>10.1f}{stub.peak:>16}{errors:>8}")
+        if not stub.peak:
+            print('  no request reached the stub upstream, so this run measured nothing')
+
+
+if __name__ == "__main__":
+    main()
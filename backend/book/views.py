@@ -3,9 +3,9 @@ from django.http import JsonResponse
 from django.views.decorators.csrf import csrf_exempt
 from django.views.decorators.http import require_http_methods
 import json
-import os
-import requests
 from dotenv import load_dotenv
+from grading.pipeline import grade
+from grading.prompts import build_payload
 import json
 
 load_dotenv()
@@ -62,23 +62,7 @@ def check_question1_answer(request):
         return JsonResponse({'error': str(e)}, status=500)
 
 
-def analyze_title_answer(user_answer):
-    """
-    Use AI to analyze the title answer specifically
-    """
-    api_key = os.getenv('OPENROUTER_API_KEY2')
-    if not api_key:
-        return create_fallback_response(user_answer)
-
-    url = "https://openrouter.ai/api/v1/chat/completions"
-    headers = {
-        "Authorization": f"Bearer {api_key}",
-        "Content-Type": "application/json",
-        "HTTP-Referer": "https://your-app-domain.com",
-        "X-Title": "Story Title Checker"
-    }
-
-    prompt = f"""You are a helpful reading teacher checking if a student correctly identified the story title. Your task is twofold:
+TITLE_PROMPT = """You are a helpful reading teacher checking if a student correctly identified the story title. Your task is twofold:
 1. Evaluate the correctness of the student's answer about the story "Goldilocks and the Three Bears".
 2. Identify any misspelled English words in their answer.
 
@@ -87,14 +71,14 @@ The correct story title is: "Goldilocks and the Three Bears"
 IMPORTANT: Your entire response MUST be a single, valid JSON object and nothing else.
 
 The required JSON format is:
-{{
+{
     "isCorrect": true/false,
     "message": "Your feedback message here",
     "feedback_type": "excellent", "good", "partial", or "incorrect",
     "show_answer": true/false,
     "correct_answer": "Goldilocks and the Three Bears",
     "misspelled_words": ["list", "of", "misspelled", "words"]
-}}
+}
 
 Note on "misspelled_words":
 - This must be a list of strings.
@@ -109,41 +93,20 @@ Guidelines for the TITLE question:
 - If completely wrong, mark as incorrect
 - Always be encouraging and specific in your feedback
 - If isCorrect is false, set show_answer to true 
-- If isCorrect is true, set show_answer to false 
-
-Student's answer: "{user_answer}\""""
-
-    payload = {
-        "model": "openai/gpt-4o-mini",
-        "messages": [
-            {"role": "system", "content": prompt},
-            {"role": "user", "content": f'Please analyze this title answer: "{user_answer}"'}
-        ],
-        "temperature": 0.3,
-        "max_tokens": 200
-    }
+- If isCorrect is true, set show_answer to false"""
 
-    try:
-        response = requests.post(url, headers=headers, json=payload, timeout=15)
-        if response.status_code == 200:
-            result_raw = response.json()['choices'][0]['message']['content'].strip()
-            
-            try:
-                parsed_result = json.loads(result_raw)
-                if 'result' in parsed_result and 'message' not in parsed_result:
-                    parsed_result['message'] = parsed_result['result']
-                return JsonResponse(parsed_result)
-            except json.JSONDecodeError:
-                return create_fallback_response(user_answer)
-        
-        return JsonResponse({
-            'error': f'AI service temporarily unavailable. Please try again.'
-        }, status=500)
 
-    except requests.RequestException as e:
-        return JsonResponse({
-            'error': 'Unable to check answer right now. Please try again.'
-        }, status=500)
+def analyze_title_answer(user_answer):
+    """
+    Use AI to analyze the title answer specifically
+    """
+    payload = build_payload(TITLE_PROMPT,
+                            f'Please analyze this title answer: "{user_answer}"',
+                            max_tokens=200)
+
+    return grade('goldilocks', 1, user_answer, payload,
+                 title="Story Title Checker",
+                 fallback=create_fallback_response)
 
 
 def create_fallback_response(user_answer):
@@ -253,26 +216,7 @@ def check_question2_answer(request):
         return JsonResponse({'error': 'Internal server error.'}, status=500)
 
 
-def analyze_author_answer(user_answer):
-    """
-    Use AI to analyze the author answer specifically
-    """
-    api_key = os.getenv('OPENROUTER_API_KEY2')
-    logger.debug(f"API key exists: {bool(api_key)}")
-    
-    if not api_key:
-        logger.warning("OpenRouter API key not found, using fallback")
-        return create_author_fallback_response(user_answer)
-
-    url = "https://openrouter.ai/api/v1/chat/completions"
-    headers = {
-        "Authorization": f"Bearer {api_key}",
-        "Content-Type": "application/json",
-        "HTTP-Referer": "https://your-app-domain.com",
-        "X-Title": "Story Author Checker"
-    }
-
-    prompt = f"""You are a helpful reading teacher checking if a student correctly identified the author of "Goldilocks and the Three Bears". Your task is twofold:
+AUTHOR_PROMPT = """You are a helpful reading teacher checking if a student correctly identified the author of "Goldilocks and the Three Bears". Your task is twofold:
 1. Evaluate the correctness of the student's answer about the story "Goldilocks and the Three Bears".
 2. Identify any misspelled English words in their answer.
 
@@ -288,14 +232,14 @@ CORRECT ANSWERS include (any of these should be marked as correct):
 - "No specific author" / "No single author"
 
 IMPORTANT: Always respond with valid JSON in this exact format:
-{{
+{
     "isCorrect": true/false,
     "message": "Your feedback message here",
     "feedback_type": "excellent", "good", "partial", or "incorrect",
     "show_answer": true/false,
     "correct_answer": "Traditional folk tale (no single author)"
     "misspelled_words": ["list", "of", "misspelled", "words"]
-}}
+}
 
 Note on "misspelled_words":
 - This must be a list of strings.
@@ -310,50 +254,20 @@ Guidelines for the AUTHOR question:
 - If they show understanding that it's not a single author, mark as correct
 - Always be encouraging and educational
 - If isCorrect is false, set show_answer to true
-- If isCorrect is true, set show_answer to false
-
-Student's answer: "{user_answer}\""""
-
-    payload = {
-        "model": "openai/gpt-4o-mini",
-        "messages": [
-            {"role": "system", "content": prompt},
-            {"role": "user", "content": f'Please analyze this author answer: "{user_answer}"'}
-        ],
-        "temperature": 0.3,
-        "max_tokens": 250
-    }
+- If isCorrect is true, set show_answer to false"""
 
-    try:
-        response = requests.post(url, headers=headers, json=payload, timeout=15)
-        logger.debug(f"OpenRouter response status: {response.status_code}")
-        
-        if response.status_code == 200:
-            result_raw = response.json()['choices'][0]['message']['content'].strip()
-            logger.debug(f"OpenRouter raw response: {result_raw}")
-            
-            try:
-                # Try to parse JSON response
-                parsed_result = json.loads(result_raw)
-                # Ensure the response has the correct format
-                if 'result' in parsed_result and 'message' not in parsed_result:
-                    parsed_result['message'] = parsed_result['result']
-                return JsonResponse(parsed_result)
-            except json.JSONDecodeError as e:
-                logger.warning(f"AI JSON decode error: {e}, using fallback")
-                # Fallback if AI doesn't return proper JSON
-                return create_author_fallback_response(user_answer)
-        
-        logger.error(f"OpenRouter API error: {response.status_code}")
-        return JsonResponse({
-            'error': f'AI service temporarily unavailable. Please try again.'
-        }, status=500)
 
-    except requests.RequestException as e:
-        logger.error(f"Request exception: {e}")
-        return JsonResponse({
-            'error': 'Unable to check answer right now. Please try again.'
-        }, status=500)
+def analyze_author_answer(user_answer):
+    """
+    Use AI to analyze the author answer specifically
+    """
+    payload = build_payload(AUTHOR_PROMPT,
+                            f'Please analyze this author answer: "{user_answer}"',
+                            max_tokens=250)
+
+    return grade('goldilocks', 2, user_answer, payload,
+                 title="Story Author Checker",
+                 fallback=create_author_fallback_response)
 
 
 def create_author_fallback_response(user_answer):
@@ -419,21 +333,7 @@ def create_author_fallback_response(user_answer):
         
         
 
-def analyze_genre_answer(user_answer):
-    """
-    Use AI to analyze the genre answer specifically
-    """
-    api_key = os.getenv('OPENROUTER_API_KEY2')
-    if not api_key:
-        return JsonResponse({'error': 'API Key not configured.'}, status=500)
-
-    url = "https://openrouter.ai/api/v1/chat/completions"
-    headers = {
-        "Authorization": f"Bearer {api_key}",
-        "Content-Type": "application/json",
-    }
-
-    prompt = f"""You are a helpful reading teacher checking if a student correctly identified the genre of "Goldilocks and the Three Bears". Your task is twofold:
+GENRE_PROMPT = """You are a helpful reading teacher checking if a student correctly identified the genre of "Goldilocks and the Three Bears". Your task is twofold:
 1. Evaluate the correctness of the student's answer about the story "Goldilocks and the Three Bears".
 2. Identify any misspelled English words in their answer.
 
@@ -441,47 +341,33 @@ The correct broad genre is "Fiction". Other related correct answers include "fai
 
 IMPORTANT: The entire response must be a single, valid JSON object. Do not include any text outside of the JSON structure.
 Example valid response:
-{{
+{
     "isCorrect": true,
     "message": "Excellent! 'Fiction' is the perfect genre because the story is imaginary and features talking animals.",
     "feedback_type": "excellent",
     "show_answer": false,
     "correct_answer": "Fiction"
-}}
+}
 
 
 Guidelines for the GENRE question:
 - If the answer is "Fiction" or a very close synonym (like "fairy tale", "folk tale", "imaginary"), mark as correct and explain WHY (it's a made-up story with talking animals).
 - If the answer is "Non-Fiction", mark as incorrect and explain the difference.
 - If the answer is a sub-genre like "Comedy", "Adventure", or "Drama", acknowledge their good thinking but explain that the broader category is "Fiction". Mark as "partial" or "good" but not fully correct.
-- Always be encouraging and educational. If isCorrect is false, set show_answer to true.
+- Always be encouraging and educational. If isCorrect is false, set show_answer to true."""
 
-Student's answer: "{user_answer}\""""
 
-    payload = {
-        "model": "openai/gpt-4o-mini",
-        "messages": [{"role": "system", "content": prompt}],
-        "temperature": 0.3,
-        "max_tokens": 300,
-        "response_format": {"type": "json_object"}
-    }
+def analyze_genre_answer(user_answer):
+    """
+    Use AI to analyze the genre answer specifically
+    """
+    payload = build_payload(GENRE_PROMPT,
+                            f'Please analyze this genre answer: "{user_answer}"',
+                            max_tokens=300,
+                            response_format={"type": "json_object"})
 
-    try:
-        response = requests.post(url, headers=headers, json=payload, timeout=15)
-        if response.status_code == 200:
-            # THIS IS THE CORRECTED LOGIC
-            # 1. Get the JSON string from the AI's response.
-            ai_response_string = response.json()['choices'][0]['message']['content']
-            
-            # 2. Parse that string into a Python dictionary.
-            data = json.loads(ai_response_string)
-            
-            # 3. Now, safely pass the dictionary to JsonResponse.
-            return JsonResponse(data)
-            
-        return JsonResponse({'error': 'AI service temporarily unavailable.'}, status=503)
-    except requests.RequestException:
-        return JsonResponse({'error': 'Unable to check answer right now.'}, status=500)
+    return grade('goldilocks', 3, user_answer, payload,
+                 fallback=check_genre_manually)
 
 
 @csrf_exempt
@@ -579,23 +465,7 @@ def check_question4_answer(request):
         return JsonResponse({'error': str(e)}, status=500)
 
 
-def analyze_characters_answer(user_answer):
-    """
-    Use AI to analyze the characters answer specifically
-    """
-    api_key = os.getenv('OPENROUTER_API_KEY2')
-    if not api_key:
-        return create_characters_fallback_response(user_answer)
-
-    url = "https://openrouter.ai/api/v1/chat/completions"
-    headers = {
-        "Authorization": f"Bearer {api_key}",
-        "Content-Type": "application/json",
-        "HTTP-Referer": "https://your-app-domain.com",
-        "X-Title": "Story Characters Checker"
-    }
-
-    prompt = f"""You are a helpful reading teacher checking if a student correctly identified the main characters in "Goldilocks and the Three Bears". Your task is twofold:
+CHARACTERS_PROMPT = """You are a helpful reading teacher checking if a student correctly identified the main characters in "Goldilocks and the Three Bears". Your task is twofold:
 1. Evaluate the correctness of the student's answer about the story "Goldilocks and the Three Bears".
 2. Identify any misspelled English words in their answer.
 
@@ -606,14 +476,14 @@ The main characters are:
 4. Baby Bear / Little Bear / Small Bear / Wee Bear (the baby)
 
 IMPORTANT: Always respond with valid JSON in this exact format:
-{{
+{
     "isCorrect": true/false,
     "message": "Your feedback message here",
     "feedback_type": "excellent", "good", "partial", or "needs_improvement",
     "show_answer": true/false,
     "correct_answer": "Goldilocks, Papa Bear, Mama Bear, and Baby Bear"
     "misspelled_words": ["list", "of", "misspelled", "words"]
-}}
+}
 
 Note on "misspelled_words":
 - This must be a list of strings.
@@ -628,49 +498,21 @@ Guidelines for the CHARACTERS question:
 - Accept various name forms: "Papa/Father/Big/Great Big Bear" etc.
 - Be encouraging even if they missed some characters
 - If isCorrect is false (partial/needs_improvement), set show_answer to true
-- If isCorrect is true (excellent/good), set show_answer to false
-
-Student's answer: "{user_answer}\""""
-
-    payload = {
-        "model": "openai/gpt-4o-mini",
-        "messages": [
-            {"role": "system", "content": prompt},
-            {"role": "user", "content": f'Please analyze this characters answer: "{user_answer}"'}
-        ],
-        "temperature": 0.3,
-        "max_tokens": 300
-    }
+- If isCorrect is true (excellent/good), set show_answer to false"""
 
-    try:
-        response = requests.post(url, headers=headers, json=payload, timeout=15)
-        if response.status_code == 200:
-            result_raw = response.json()['choices'][0]['message']['content'].strip()
-            
-            try:
-                # Try to parse JSON response
-                parsed_result = json.loads(result_raw)
-                # Ensure the response has the correct format
-                if 'result' in parsed_result and 'message' not in parsed_result:
-                    parsed_result['message'] = parsed_result['result']
-                
-                # Set isCorrect based on feedback_type
-                feedback_type = parsed_result.get('feedback_type', 'needs_improvement')
-                parsed_result['isCorrect'] = feedback_type in ['excellent', 'good']
-                    
-                return JsonResponse(parsed_result)
-            except json.JSONDecodeError:
-                # Fallback if AI doesn't return proper JSON
-                return create_characters_fallback_response(user_answer)
-        
-        return JsonResponse({
-            'error': f'AI service temporarily unavailable. Please try again.'
-        }, status=500)
 
-    except requests.RequestException as e:
-        return JsonResponse({
-            'error': 'Unable to check answer right now. Please try again.'
-        }, status=500)
+def analyze_characters_answer(user_answer):
+    """
+    Use AI to analyze the characters answer specifically
+    """
+    payload = build_payload(CHARACTERS_PROMPT,
+                            f'Please analyze this characters answer: "{user_answer}"',
+                            max_tokens=300)
+
+    return grade('goldilocks', 4, user_answer, payload,
+                 title="Story Characters Checker",
+                 fallback=create_characters_fallback_response,
+                 correct_types=['excellent', 'good'])
 
 
 def create_characters_fallback_response(user_answer):
@@ -771,23 +613,7 @@ def check_question5_answer(request):
         return JsonResponse({'error': str(e)}, status=500)
 
 
-def analyze_setting_answer(user_answer):
-    """
-    Use AI to analyze the setting answer specifically
-    """
-    api_key = os.getenv('OPENROUTER_API_KEY2')
-    if not api_key:
-        return create_setting_fallback_response(user_answer)
-
-    url = "https://openrouter.ai/api/v1/chat/completions"
-    headers = {
-        "Authorization": f"Bearer {api_key}",
-        "Content-Type": "application/json",
-        "HTTP-Referer": "https://your-app-domain.com",
-        "X-Title": "Story Setting Checker"
-    }
-
-    prompt = f"""You are a helpful reading teacher checking if a student correctly identified where "Goldilocks and the Three Bears" takes place. Your task is twofold:
+SETTING_PROMPT = """You are a helpful reading teacher checking if a student correctly identified where "Goldilocks and the Three Bears" takes place. Your task is twofold:
 1. Evaluate the correctness of the student's answer about the story "Goldilocks and the Three Bears".
 2. Identify any misspelled English words in their answer.
 
@@ -802,14 +628,14 @@ CORRECT ANSWERS include any combination of:
 - "A house in the forest" / "Cottage in the woods"
 
 IMPORTANT: Always respond with valid JSON in this exact format:
-{{
+{
     "isCorrect": true/false,
     "message": "Your feedback message here",
     "feedback_type": "excellent", "good", "partial", or "needs_improvement",
     "show_answer": true/false,
     "correct_answer": "In the woods and at the bears' house"
     "misspelled_words": ["list", "of", "misspelled", "words"]
-}}
+}
 
 Note on "misspelled_words":
 - This must be a list of strings.
@@ -823,49 +649,21 @@ Guidelines for the SETTING question:
 - If they give completely wrong locations, mark as "needs_improvement"
 - Be encouraging and explain what settings they got right
 - If isCorrect is false (partial/needs_improvement), set show_answer to true
-- If isCorrect is true (excellent/good), set show_answer to false
-
-Student's answer: "{user_answer}\""""
-
-    payload = {
-        "model": "openai/gpt-4o-mini",
-        "messages": [
-            {"role": "system", "content": prompt},
-            {"role": "user", "content": f'Please analyze this setting answer: "{user_answer}"'}
-        ],
-        "temperature": 0.3,
-        "max_tokens": 300
-    }
+- If isCorrect is true (excellent/good), set show_answer to false"""
 
-    try:
-        response = requests.post(url, headers=headers, json=payload, timeout=15)
-        if response.status_code == 200:
-            result_raw = response.json()['choices'][0]['message']['content'].strip()
-            
-            try:
-                # Try to parse JSON response
-                parsed_result = json.loads(result_raw)
-                # Ensure the response has the correct format
-                if 'result' in parsed_result and 'message' not in parsed_result:
-                    parsed_result['message'] = parsed_result['result']
-                
-                # Set isCorrect based on feedback_type
-                feedback_type = parsed_result.get('feedback_type', 'needs_improvement')
-                parsed_result['isCorrect'] = feedback_type in ['excellent', 'good']
-                    
-                return JsonResponse(parsed_result)
-            except json.JSONDecodeError:
-                # Fallback if AI doesn't return proper JSON
-                return create_setting_fallback_response(user_answer)
-        
-        return JsonResponse({
-            'error': f'AI service temporarily unavailable. Please try again.'
-        }, status=500)
 
-    except requests.RequestException as e:
-        return JsonResponse({
-            'error': 'Unable to check answer right now. Please try again.'
-        }, status=500)
+def analyze_setting_answer(user_answer):
+    """
+    Use AI to analyze the setting answer specifically
+    """
+    payload = build_payload(SETTING_PROMPT,
+                            f'Please analyze this setting answer: "{user_answer}"',
+                            max_tokens=300)
+
+    return grade('goldilocks', 5, user_answer, payload,
+                 title="Story Setting Checker",
+                 fallback=create_setting_fallback_response,
+                 correct_types=['excellent', 'good'])
 
 
 def create_setting_fallback_response(user_answer):
@@ -971,37 +769,7 @@ def check_question6_answer(request):
         return JsonResponse({'error': str(e)}, status=500)
 
 
-def analyze_story_events_answer(user_input):
-    """
-    Use AI to analyze the story events answers.
-    This function now accepts either a single string (from voice) or a list of strings (from text).
-    """
-    api_key = os.getenv('OPENROUTER_API_KEY2')
-    if not api_key:
-        return create_story_events_fallback_response(user_input)
-
-    url = "https://openrouter.ai/api/v1/chat/completions"
-    headers = {
-        "Authorization": f"Bearer {api_key}",
-        "Content-Type": "application/json"
-        # Add other headers like Referer and Title if required
-    }
-
-    # --- MODIFICATION START ---
-    
-    # Adapt the prompt's introduction and the student's answer format based on the input type.
-    if isinstance(user_input, list):
-        answers_text = "\n".join([f"{i+1}. {answer}" for i, answer in enumerate(user_input)])
-        prompt_intro = "Student's 3 answers:"
-    elif isinstance(user_input, str):
-        answers_text = user_input
-        prompt_intro = "Student's spoken answer (a single sentence):"
-    else:
-        # Safeguard for unexpected data types.
-        return JsonResponse({'error': 'Invalid input type for analysis.'}, status=500)
-
-    # The AI prompt is updated to handle both cases.
-    prompt = f"""You are a helpful reading teacher checking if a student correctly identified important events from "Goldilocks and the Three Bears". Your task is twofold:
+STORY_EVENTS_PROMPT = """You are a helpful reading teacher checking if a student correctly identified important events from "Goldilocks and the Three Bears". Your task is twofold:
 1. Evaluate the correctness of the student's answer about the story "Goldilocks and the Three Bears".
 2. Identify any misspelled English words in their answer.
 
@@ -1016,14 +784,14 @@ The main story events include:
 8. Goldilocks wakes up, sees bears, and runs away
 
 IMPORTANT: Always respond with valid JSON in this exact format:
-{{
+{
     "isCorrect": true/false,
     "message": "Your feedback message here",
     "feedback_type": "excellent", "good", "partial", or "needs_improvement", 
     "show_answer": true/false,
     "correct_answer": "1. Goldilocks enters the bears' house\\n2. She tries their porridge, chairs, and beds\\n3. The bears find her and she runs away",
     "misspelled_words": ["list", "of", "misspelled", "words"]
-}}
+}
 
 Note on "misspelled_words":
 - This must be a list of strings.
@@ -1038,44 +806,38 @@ Guidelines for the STORY EVENTS question:
 - If they miss all major events or give vague answers, mark as "needs_improvement"
 - Be encouraging and specific about what they got right.
 - If feedback_type is "partial" or "needs_improvement", set show_answer to true.
-- If feedback_type is "excellent" or "good", set show_answer to false.
+- If feedback_type is "excellent" or "good", set show_answer to false."""
+
+
+def analyze_story_events_answer(user_input):
+    """
+    Use AI to analyze the story events answers.
+    This function now accepts either a single string (from voice) or a list of strings (from text).
+    """
 
-{prompt_intro}
-{answers_text}"""
+    # --- MODIFICATION START ---
     
-    # --- MODIFICATION END ---
+    # Adapt the prompt's introduction and the student's answer format based on the input type.
+    if isinstance(user_input, list):
+        answers_text = "\n".join([f"{i+1}. {answer}" for i, answer in enumerate(user_input)])
+        prompt_intro = "Student's 3 answers:"
+    elif isinstance(user_input, str):
+        answers_text = user_input
+        prompt_intro = "Student's spoken answer (a single sentence):"
+    else:
+        # Safeguard for unexpected data types.
+        return JsonResponse({'error': 'Invalid input type for analysis.'}, status=500)
 
-    payload = {
-        "model": "openai/gpt-4o-mini",
-        "messages": [
-            {"role": "system", "content": prompt},
-            {"role": "user", "content": f'Please analyze this answer: {answers_text}'}
-        ],
-        "temperature": 0.3,
-        "max_tokens": 400
-    }
+    # --- MODIFICATION END ---
 
-    try:
-        response = requests.post(url, headers=headers, json=payload, timeout=15)
-        if response.status_code == 200:
-            result_raw = response.json()['choices'][0]['message']['content'].strip()
-            
-            try:
-                parsed_result = json.loads(result_raw)
-                feedback_type = parsed_result.get('feedback_type', 'needs_improvement')
-                parsed_result['isCorrect'] = feedback_type in ['excellent', 'good']
-                return JsonResponse(parsed_result)
-            except json.JSONDecodeError:
-                return create_story_events_fallback_response(user_input)
-        
-        return JsonResponse({
-            'error': 'AI service temporarily unavailable. Please try again.'
-        }, status=503)
+    # The answer (and how it was given) goes in the user message so the prompt stays static
+    payload = build_payload(STORY_EVENTS_PROMPT,
+                            f'Please analyze this answer.\n{prompt_intro}\n{answers_text}',
+                            max_tokens=400)
 
-    except requests.RequestException:
-        return JsonResponse({
-            'error': 'Unable to check answer right now. Please try again.'
-        }, status=500)
+    return grade('goldilocks', 6, user_input, payload,
+                 fallback=create_story_events_fallback_response,
+                 correct_types=['excellent', 'good'])
 
 # You would also need a fallback function, but the main logic is above.
 def create_story_events_fallback_response(user_input):
@@ -1187,23 +949,7 @@ def check_goldilocks_favourite_character_answer(request):
         return JsonResponse({'error': str(e)}, status=500)
 
 
-def analyze_goldilocks_favourite_character_answer(user_answer):
-    """
-    Use AI to analyze the favourite character answer from Goldilocks story
-    """
-    api_key = os.getenv('OPENROUTER_API_KEY2')
-    if not api_key:
-        return create_goldilocks_favourite_character_fallback_response(user_answer)
-
-    url = "https://openrouter.ai/api/v1/chat/completions"
-    headers = {
-        "Authorization": f"Bearer {api_key}",
-        "Content-Type": "application/json",
-        "HTTP-Referer": "https://your-app-domain.com",
-        "X-Title": "Goldilocks Favourite Character Checker"
-    }
-
-    prompt = f"""You are a helpful reading teacher checking if a student wrote thoughtfully about their favourite character from "Goldilocks and the Three Bears". Your task is twofold:
+GOLDILOCKS_FAVOURITE_CHARACTER_PROMPT = """You are a helpful reading teacher checking if a student wrote thoughtfully about their favourite character from "Goldilocks and the Three Bears". Your task is twofold:
 1. Evaluate the correctness of the student's answer about the story "Goldilocks and the Three Bears".
 2. Identify any misspelled English words in their answer.
 
@@ -1214,13 +960,13 @@ The main characters in the Goldilocks story are:
 - Baby Bear / Little Bear / Small Bear / Wee Bear (the baby bear)
 
 IMPORTANT: Always respond with valid JSON in this exact format:
-{{
+{
     "isCorrect": true/false,
     "message": "Your encouraging feedback message here",
     "feedback_type": "excellent", "good", "partial", or "needs_improvement",
     "show_answer": false
     "misspelled_words": ["list", "of", "misspelled", "words"]
-}}
+}
 
 Note on "misspelled_words":
 - This must be a list of strings.
@@ -1237,49 +983,21 @@ Guidelines for "My Favourite Character" question:
 - Always be encouraging and positive about their choice
 - Focus on whether they explained WHY they like the character
 - For favourite character questions, never show the "correct answer" since it's subjective
-- Always set show_answer to false
-
-Student's answer: "{user_answer}\""""
-
-    payload = {
-        "model": "openai/gpt-4o-mini",
-        "messages": [
-            {"role": "system", "content": prompt},
-            {"role": "user", "content": f'Please analyze this favourite character answer: "{user_answer}"'}
-        ],
-        "temperature": 0.3,
-        "max_tokens": 250
-    }
+- Always set show_answer to false"""
 
-    try:
-        response = requests.post(url, headers=headers, json=payload, timeout=15)
-        if response.status_code == 200:
-            result_raw = response.json()['choices'][0]['message']['content'].strip()
-            
-            try:
-                # Try to parse JSON response
-                parsed_result = json.loads(result_raw)
-                # Ensure the response has the correct format
-                if 'result' in parsed_result and 'message' not in parsed_result:
-                    parsed_result['message'] = parsed_result['result']
-                
-                # Set isCorrect based on feedback_type
-                feedback_type = parsed_result.get('feedback_type', 'needs_improvement')
-                parsed_result['isCorrect'] = feedback_type in ['excellent', 'good', 'partial']
-                
-                return JsonResponse(parsed_result)
-            except json.JSONDecodeError:
-                # Fallback if AI doesn't return proper JSON
-                return create_goldilocks_favourite_character_fallback_response(user_answer)
-        
-        return JsonResponse({
-            'error': f'AI service temporarily unavailable. Please try again.'
-        }, status=500)
 
-    except requests.RequestException as e:
-        return JsonResponse({
-            'error': 'Unable to check answer right now. Please try again.'
-        }, status=500)
+def analyze_goldilocks_favourite_character_answer(user_answer):
+    """
+    Use AI to analyze the favourite character answer from Goldilocks story
+    """
+    payload = build_payload(GOLDILOCKS_FAVOURITE_CHARACTER_PROMPT,
+                            f'Please analyze this favourite character answer: "{user_answer}"',
+                            max_tokens=250)
+
+    return grade('goldilocks', 7, user_answer, payload,
+                 title="Goldilocks Favourite Character Checker",
+                 fallback=create_goldilocks_favourite_character_fallback_response,
+                 correct_types=['excellent', 'good', 'partial'])
 
 
 def create_goldilocks_favourite_character_fallback_response(user_answer):
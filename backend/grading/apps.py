@@ -0,0 +1,13 @@
+from django.apps import AppConfig
+
+
+class GradingConfig(AppConfig):
+    default_auto_field = 'django.db.models.BigAutoField'
+    name = 'grading'
+
+    def ready(self):
+        from . import client
+
+        # Optional: pre-open OpenRouter connections (OPENROUTER_WARMUP_CONNECTIONS)
+        if client.WARMUP_CONNECTIONS > 0:
+            client.warmup()
@@ -0,0 +1,400 @@
+"""
+Whole-worksheet grading.
+
+Each question's answer goes through its normal check view with grade() in
+collect mode: validation and fast-path results come straight back, and answers
+that need the LLM are returned as PendingGrade objects. Those are graded
+together in a few chunked OpenRouter calls whose reply holds one JSON grade per
+question, in the same shape the single-question endpoints return.
+"""
+import asyncio
+import json
+import logging
+import re
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+import httpx
+import requests
+from django.conf import settings
+from django.http import HttpRequest, JsonResponse
+from django.utils.module_loading import import_string
+
+from . import hedging
+from .cache import grade_cache
+from .classifier import grade_log
+from .limiter import UpstreamBusy, busy_response
+from .prompts import usage_stats
+from .router import router
+from .schema import extract_json, structured_output_enabled
+from .shadow import shadow
+from .similarity import graded_together
+from .spelling import local_spelling_enabled, strip_spelling_task
+from .pipeline import (
+    PendingGrade, _async_mode, _collect_mode, agrade, cache_enabled,
+    finalize_result, grade, handle_response, spelled_for,
+)
+
+logger = logging.getLogger(__name__)
+
+# Check view for each question of each story's worksheet
+WORKSHEETS = {
+    'goldilocks': {
+        1: 'book.views.check_question1_answer',
+        2: 'book.views.check_question2_answer',
+        3: 'book.views.check_question3_answer',
+        4: 'book.views.check_question4_answer',
+        5: 'book.views.check_question5_answer',
+        6: 'book.views.check_question6_answer',
+        7: 'book.views.check_goldilocks_favourite_character_answer',
+    },
+    'peter': {n: f'peter.views.check_question{n}_answer' for n in range(1, 15)},
+}
+
+# Every question prompt repeats this note; the combined prompt states it once
+_MISSPELLED_NOTE = re.compile(r'Note on "misspelled_words":\n(?:- .*\n)+')
+
+BATCH_INSTRUCTIONS = """You are a helpful reading teacher grading several questions from one worksheet at once.
+Each question below has its own grading instructions followed by the student's answer.
+Grade every question independently, exactly as its own instructions say.
+
+IMPORTANT: Your entire response MUST be a single, valid JSON object and nothing else, of the form:
+{"results": {"<question id>": <the JSON object that question's instructions ask for>}}
+Include every question id listed.
+
+Note on "misspelled_words":
+- This must be a list of strings.
+- Only include words that are clearly misspelled. Do not include proper nouns.
+- If there are no spelling mistakes, return an empty list: []."""
+
+
+def batch_instructions():
+    return strip_spelling_task(BATCH_INSTRUCTIONS) if local_spelling_enabled() else BATCH_INSTRUCTIONS
+
+
+class BatchStats:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.worksheets = 0
+        self.questions = 0
+        self.batched = 0
+        self.llm_calls = 0
+        self.regraded = 0
+
+    def add(self, **counts):
+        with self._lock:
+            for name, count in counts.items():
+                setattr(self, name, getattr(self, name) + count)
+
+    def stats(self):
+        with self._lock:
+            return {
+                'worksheets': self.worksheets,
+                'questions': self.questions,
+                'batched': self.batched,
+                'llm_calls': self.llm_calls,
+                'regraded': self.regraded,
+            }
+
+
+batch_stats = BatchStats()
+
+
+def chunk_size():
+    return max(1, getattr(settings, 'GRADING_BATCH_CHUNK_SIZE', 5))
+
+
+def _question_request(request, body):
+    """
+    Request for one question's check view carrying that question's usual JSON body
+    """
+    question_request = HttpRequest()
+    question_request.method = 'POST'
+    question_request.path = request.path
+    question_request.META = request.META
+    question_request._body = json.dumps(body).encode('utf-8')
+    return question_request
+
+
+def collect_worksheet(request, story, answers):
+    """
+    Run each question's check view in collect mode.
+
+    Returns (responses, pending): finished JsonResponses and PendingGrades, by question id.
+    """
+    responses, pending, bodies = {}, {}, {}
+    views = WORKSHEETS[story]
+    for question_id, body in answers.items():
+        try:
+            view = import_string(views[int(question_id)])
+        except (KeyError, ValueError):
+            responses[str(question_id)] = JsonResponse({'error': 'Unknown question.'}, status=400)
+            continue
+        if isinstance(body, (str, list)):
+            body = {'answers' if isinstance(body, list) else 'answer': body}
+        bodies[question_id] = (int(question_id), view, body)
+
+    answered = {question: [body.get('answers') if 'answers' in body else body.get('answer', '')]
+                for question, _, body in bodies.values() if isinstance(body, dict)}
+    with graded_together(story, answered):
+        for question_id, (_, view, body) in bodies.items():
+            token = _collect_mode.set(True)
+            try:
+                result = view(_question_request(request, body))
+            finally:
+                _collect_mode.reset(token)
+            if isinstance(result, PendingGrade):
+                pending[str(question_id)] = result
+            else:
+                responses[str(question_id)] = result
+    return responses, pending
+
+
+def build_batch_payload(chunk):
+    """
+    One OpenRouter payload grading every PendingGrade in chunk ({question id: PendingGrade})
+    """
+    sections = []
+    for question_id, item in chunk.items():
+        messages = item.payload['messages']
+        instructions = _MISSPELLED_NOTE.sub('', messages[0]['content']).strip()
+        answer = messages[-1]['content']
+        sections.append(f"### Question {question_id}\n{instructions}\n\n{answer}")
+
+    first = next(iter(chunk.values())).payload
+    payload = {
+        "model": first['model'],
+        "messages": [
+            {"role": "system", "content": batch_instructions()},
+            {"role": "user", "content": "\n\n".join(sections)},
+        ],
+        "temperature": min(item.payload.get('temperature', 0.3) for item in chunk.values()),
+        "max_tokens": sum(item.payload.get('max_tokens', 300) for item in chunk.values()),
+    }
+    if structured_output_enabled():
+        payload["response_format"] = batch_response_format(chunk)
+    return payload
+
+
+def batch_response_format(chunk):
+    """
+    Structured output for a combined reply: each question id holds that question's schema
+    """
+    return {
+        "type": "json_schema",
+        "json_schema": {
+            "name": "worksheet_grades",
+            "strict": True,
+            "schema": {
+                "type": "object",
+                "properties": {
+                    "results": {
+                        "type": "object",
+                        "properties": {question_id: item.schema.json_schema() for question_id, item in chunk.items()},
+                        "required": list(chunk),
+                        "additionalProperties": False,
+                    },
+                },
+                "required": ["results"],
+                "additionalProperties": False,
+            },
+        },
+    }
+
+
+def parse_batch_reply(label, response, chunk):
+    """
+    Per-question results from a combined reply; questions missing from it are left out
+    """
+    try:
+        body = response.json()
+        usage_stats.record(label, body)
+        content = body['choices'][0]['message']['content'].strip()
+        results = extract_json(content)['results']
+    except (ValueError, KeyError, IndexError, TypeError) as e:
+        logger.warning(f"Could not parse worksheet reply: {e}")
+        return {}
+    if not isinstance(results, dict):
+        return {}
+    parsed = {}
+    for question_id, item in chunk.items():
+        if not isinstance(results.get(question_id), dict):
+            continue
+        try:
+            result = item.schema.validate(results[question_id])
+            parsed[question_id] = finalize_result(result, item.correct_types, item.schema, item.user_answer)
+        except ValueError as e:
+            logger.warning(f"Unusable worksheet result for {item.label}: {e}")
+            continue
+        grade_log.record(item.schema, item.user_answer, parsed[question_id])
+        if item.shadowed:
+            shadow.observe(item.schema, item.user_answer, item.fallback, item.correct_types, parsed[question_id])
+    return parsed
+
+
+def split_chunks(pending):
+    """
+    Group pending grades by model, then into chunks of GRADING_BATCH_CHUNK_SIZE
+    """
+    by_model = {}
+    for question_id, item in pending.items():
+        by_model.setdefault(item.payload['model'], []).append((question_id, item))
+    size = chunk_size()
+    return [
+        dict(items[start:start + size])
+        for items in by_model.values()
+        for start in range(0, len(items), size)
+    ]
+
+
+def _error_responses(chunk, message):
+    return {
+        question_id: JsonResponse({'error': message}, status=500)
+        for question_id in chunk
+    }
+
+
+def grade_chunk(chunk):
+    """
+    Grade one chunk with a single upstream call; returns {question id: JsonResponse}
+    """
+    label = f"{next(iter(chunk.values())).story} worksheet"
+    if not router.available(label):
+        logger.warning(f"No LLM backend available, using fallbacks for {label}")
+        return {question_id: item.fallback(item.user_answer) for question_id, item in chunk.items()}
+
+    batch_stats.add(llm_calls=1, batched=len(chunk))
+    try:
+        response = hedging.post(label, build_batch_payload(chunk), title="Worksheet Checker")
+    except requests.RequestException as e:
+        logger.error(f"Request exception grading worksheet: {e}")
+        return _error_responses(chunk, 'Unable to connect to AI service. Please try again.')
+    except UpstreamBusy as e:
+        logger.warning(f"Upstream queue full, turning away {label}")
+        return {question_id: busy_response(e) for question_id in chunk}
+
+    if response.status_code != 200:
+        return {question_id: handle_response(item.label, response, item.user_answer,
+                                              item.fallback, item.correct_types)[0]
+                for question_id, item in chunk.items()}
+
+    results = parse_batch_reply(label, response, chunk)
+    responses = {}
+    for question_id, item in chunk.items():
+        result = results.get(question_id)
+        if result is None:
+            # The combined reply left this question out; grade it on its own
+            batch_stats.add(regraded=1)
+            responses[question_id] = grade(item.story, item.question, item.user_answer, item.payload,
+                                           title=item.title, fallback=item.fallback,
+                                           correct_types=item.correct_types)
+            continue
+        if cache_enabled():
+            grade_cache.set(item.key, result)
+        responses[question_id] = JsonResponse(result)
+    return responses
+
+
+async def agrade_chunk(chunk):
+    """
+    Async twin of grade_chunk()
+    """
+    label = f"{next(iter(chunk.values())).story} worksheet"
+    if not router.available(label):
+        logger.warning(f"No LLM backend available, using fallbacks for {label}")
+        return {question_id: item.fallback(item.user_answer) for question_id, item in chunk.items()}
+
+    batch_stats.add(llm_calls=1, batched=len(chunk))
+    try:
+        response = await hedging.apost(label, build_batch_payload(chunk), title="Worksheet Checker")
+    except httpx.HTTPError as e:
+        logger.error(f"Request exception grading worksheet: {e}")
+        return _error_responses(chunk, 'Unable to connect to AI service. Please try again.')
+    except UpstreamBusy as e:
+        logger.warning(f"Upstream queue full, turning away {label}")
+        return {question_id: busy_response(e) for question_id in chunk}
+
+    if response.status_code != 200:
+        return {question_id: handle_response(item.label, response, item.user_answer,
+                                              item.fallback, item.correct_types)[0]
+                for question_id, item in chunk.items()}
+
+    results = parse_batch_reply(label, response, chunk)
+    responses = {}
+    for question_id, item in chunk.items():
+        result = results.get(question_id)
+        if result is None:
+            batch_stats.add(regraded=1)
+            responses[question_id] = await agrade(item.story, item.question, item.user_answer, item.payload,
+                                                  title=item.title, fallback=item.fallback,
+                                                  correct_types=item.correct_types)
+            continue
+        if cache_enabled():
+            await grade_cache.aset(item.key, result)
+        responses[question_id] = JsonResponse(result)
+    return responses
+
+
+def worksheet_response(story, responses):
+    ordered = sorted(responses.items(), key=lambda pair: int(pair[0]) if pair[0].isdigit() else float('inf'))
+    return JsonResponse({
+        'story': story,
+        'results': {question_id: json.loads(response.content) for question_id, response in ordered},
+        'status': {question_id: response.status_code for question_id, response in ordered},
+    })
+
+
+def _resolve_without_llm(pending, cached):
+    """
+    Answer pending grades from the cache, or their fallbacks when there is no API key
+    """
+    responses = {}
+    for question_id, item in list(pending.items()):
+        if cached.get(question_id) is not None:
+            if item.shadowed:
+                shadow.observe(item.schema, item.user_answer, item.fallback, item.correct_types, cached[question_id])
+            responses[question_id] = JsonResponse(spelled_for(cached[question_id], item.story, item.user_answer))
+            del pending[question_id]
+        elif not router.available(item.label):
+            logger.warning(f"No LLM backend available, using fallback for {item.label}")
+            responses[question_id] = item.fallback(item.user_answer)
+            del pending[question_id]
+    return responses
+
+
+def grade_worksheet(story, responses, pending):
+    """
+    Finish a collected worksheet and return its JsonResponse.
+
+    Inside an async view this returns an awaitable, like grade().
+    """
+    if _async_mode.get():
+        return agrade_worksheet(story, responses, pending)
+
+    batch_stats.add(worksheets=1, questions=len(responses) + len(pending))
+    cached = {question_id: grade_cache.get(item.key) for question_id, item in pending.items()} \
+        if cache_enabled() else {}
+    responses.update(_resolve_without_llm(pending, cached))
+
+    chunks = split_chunks(pending)
+    if len(chunks) == 1:
+        responses.update(grade_chunk(chunks[0]))
+    elif chunks:
+        with ThreadPoolExecutor(max_workers=len(chunks)) as executor:
+            for chunk_responses in executor.map(grade_chunk, chunks):
+                responses.update(chunk_responses)
+    return worksheet_response(story, responses)
+
+
+async def agrade_worksheet(story, responses, pending):
+    """
+    Async twin of grade_worksheet(); chunks are graded concurrently on the event loop
+    """
+    batch_stats.add(worksheets=1, questions=len(responses) + len(pending))
+    cached = {question_id: await grade_cache.aget(item.key) for question_id, item in pending.items()} \
+        if cache_enabled() else {}
+    responses.update(_resolve_without_llm(pending, cached))
+
+    for chunk_responses in await asyncio.gather(*(agrade_chunk(chunk) for chunk in split_chunks(pending))):
+        responses.update(chunk_responses)
+    return worksheet_response(story, responses)
@@ -0,0 +1,232 @@
+"""
+Circuit breakers and adaptive timeouts for the LLM backends.
+
+Each backend of the model router (router.py) has its own breaker, and every
+call the router makes to a backend is recorded on it with its outcome and
+latency. When too many recent calls fail (errors, 429/5xx replies, or calls
+slower than GRADING_BREAKER_SLOW_CALL), the breaker opens and the router skips
+that backend; with every backend of a route open, answers go straight to each
+question's fallback grader. After GRADING_BREAKER_OPEN_SECONDS it half-opens
+and lets a probe request through; a successful probe closes it again.
+
+Timeouts follow the observed p95 latency of each question instead of the
+fixed REQUEST_TIMEOUT, so a slowdown is cut off before it ties up workers.
+"""
+import contextlib
+import logging
+import math
+import threading
+import time
+from collections import deque
+
+from django.conf import settings
+
+from . import client
+
+logger = logging.getLogger(__name__)
+
+CLOSED = 'closed'
+OPEN = 'open'
+HALF_OPEN = 'half_open'
+
+# Adaptive timeout = p95 latency of the question x this, within [min, REQUEST_TIMEOUT]
+TIMEOUT_MULTIPLIER = 1.5
+
+# Latency samples needed before a question's timeout adapts
+MIN_TIMEOUT_SAMPLES = 20
+
+
+def percentile(values, p):
+    """
+    Nearest-rank percentile of a sequence of numbers (None when empty)
+    """
+    if not values:
+        return None
+    ordered = sorted(values)
+    rank = max(1, math.ceil(p / 100 * len(ordered)))
+    return ordered[rank - 1]
+
+
+class _Call:
+    def __init__(self):
+        self.status_code = None
+
+
+class CircuitBreaker:
+    """
+    Breaker for one upstream, with per-question latency tracking
+    """
+
+    def __init__(self, name='upstream', error_rate=0.5, min_calls=10, window=30, open_seconds=30,
+                 slow_call=10.0, half_open_probes=1, latency_samples=200):
+        self.name = name
+        self.error_rate = error_rate
+        self.min_calls = min_calls
+        self.window = window
+        self.open_seconds = open_seconds
+        self.slow_call = slow_call
+        self.half_open_probes = half_open_probes
+        self._lock = threading.Lock()
+        self._outcomes = deque()  # (finished_at, ok, latency) within the window
+        self._latencies = {}  # label -> recent successful latencies
+        self._latency_samples = latency_samples
+        self.state = CLOSED
+        self._opened_at = None
+        self._probes = 0
+        self.short_circuited = 0
+        self.trips = 0
+
+    def _prune(self, now):
+        while self._outcomes and self._outcomes[0][0] < now - self.window:
+            self._outcomes.popleft()
+
+    def allow(self):
+        """
+        Whether a call may go upstream now; False means use the fallback
+        """
+        with self._lock:
+            if self.state == OPEN:
+                if time.monotonic() - self._opened_at < self.open_seconds:
+                    self.short_circuited += 1
+                    return False
+                self.state = HALF_OPEN
+                self._probes = 0
+                logger.info(f"{self.name} circuit half-open, sending a probe")
+            if self.state == HALF_OPEN:
+                if self._probes >= self.half_open_probes:
+                    self.short_circuited += 1
+                    return False
+                self._probes += 1
+            return True
+
+    def ready(self):
+        """
+        Whether allow() would let a call through now, without taking a probe
+        """
+        with self._lock:
+            if self.state == OPEN:
+                return time.monotonic() - self._opened_at >= self.open_seconds
+            if self.state == HALF_OPEN:
+                return self._probes < self.half_open_probes
+            return True
+
+    def record(self, label, ok, latency):
+        with self._lock:
+            now = time.monotonic()
+            if ok and latency > self.slow_call:
+                ok = False
+            if ok:
+                samples = self._latencies.setdefault(label, deque(maxlen=self._latency_samples))
+                samples.append(latency)
+
+            if self.state == HALF_OPEN:
+                self._probes = max(0, self._probes - 1)
+                if ok:
+                    self.state = CLOSED
+                    self._outcomes.clear()
+                    logger.info(f"{self.name} circuit closed after a successful probe")
+                else:
+                    self._trip(now)
+                return
+
+            self._outcomes.append((now, ok, latency))
+            self._prune(now)
+            failures = sum(1 for _, succeeded, _ in self._outcomes if not succeeded)
+            if (self.state == CLOSED and len(self._outcomes) >= self.min_calls
+                    and failures / len(self._outcomes) >= self.error_rate):
+                self._trip(now)
+
+    def _trip(self, now):
+        self.state = OPEN
+        self._opened_at = now
+        self.trips += 1
+        logger.warning(f"{self.name} circuit opened for {self.open_seconds}s")
+
+    def release(self):
+        """
+        Give back a half-open probe taken by allow() for a call that never went upstream
+        (cancelled, or turned away by the upstream limiter); it says nothing about the upstream
+        """
+        with self._lock:
+            if self.state == HALF_OPEN:
+                self._probes = max(0, self._probes - 1)
+
+    @contextlib.contextmanager
+    def call(self, label):
+        """
+        Time an upstream call and record its outcome.
+
+        Set `call.status_code` from the response; exceptions count as failures.
+        """
+        started = time.monotonic()
+        call = _Call()
+        try:
+            yield call
+        except Exception:
+            self.record(label, False, time.monotonic() - started)
+            raise
+        except BaseException:
+            self.release()
+            raise
+        ok = call.status_code is not None and call.status_code != 429 and call.status_code < 500
+        self.record(label, ok, time.monotonic() - started)
+
+    def latency_percentile(self, label, p):
+        """
+        p-th percentile of a question's recent latency, or None until enough samples exist
+        """
+        with self._lock:
+            samples = list(self._latencies.get(label, ()))
+        if len(samples) < MIN_TIMEOUT_SAMPLES:
+            return None
+        return percentile(samples, p)
+
+    def timeout_for(self, label):
+        """
+        Upstream timeout for a question, adapted to its recent p95 latency
+        """
+        if not getattr(settings, 'GRADING_ADAPTIVE_TIMEOUTS', True):
+            return client.REQUEST_TIMEOUT
+        p95 = self.latency_percentile(label, 95)
+        if p95 is None:
+            return client.REQUEST_TIMEOUT
+        minimum = getattr(settings, 'GRADING_TIMEOUT_MIN', 3)
+        return round(min(client.REQUEST_TIMEOUT, max(minimum, p95 * TIMEOUT_MULTIPLIER)), 2)
+
+    def stats(self):
+        with self._lock:
+            self._prune(time.monotonic())
+            calls = len(self._outcomes)
+            failures = sum(1 for _, ok, _ in self._outcomes if not ok)
+            latencies = [latency for _, _, latency in self._outcomes]
+            questions = {label: list(samples) for label, samples in self._latencies.items()}
+            result = {
+                'state': self.state,
+                'calls_in_window': calls,
+                'error_rate': round(failures / calls, 4) if calls else 0.0,
+                'p50': percentile(latencies, 50),
+                'p95': percentile(latencies, 95),
+                'p99': percentile(latencies, 99),
+                'trips': self.trips,
+                'short_circuited': self.short_circuited,
+            }
+        result['questions'] = {
+            label: {'p95': percentile(samples, 95), 'timeout': self.timeout_for(label)}
+            for label, samples in questions.items()
+        }
+        return result
+
+
+def breaker_enabled():
+    return getattr(settings, 'GRADING_BREAKER_ENABLED', True)
+
+
+def build_breaker(name):
+    return CircuitBreaker(
+        name,
+        error_rate=getattr(settings, 'GRADING_BREAKER_ERROR_RATE', 0.5),
+        min_calls=getattr(settings, 'GRADING_BREAKER_MIN_CALLS', 10),
+        window=getattr(settings, 'GRADING_BREAKER_WINDOW', 30),
+        open_seconds=getattr(settings, 'GRADING_BREAKER_OPEN_SECONDS', 30),
+        slow_call=getattr(settings, 'GRADING_BREAKER_SLOW_CALL', 10.0),
+    )
@@ -0,0 +1,171 @@
+"""
+Grade result cache.
+
+The first tier is an in-process LRU with a TTL. When GRADING_CACHE_ALIAS names
+a Django cache (e.g. Redis or memcached), it is used as a shared second tier
+so workers can reuse each other's grades. Lookups for drafts being
+pre-graded are counted separately, under "pregrade" in stats().
+"""
+import hashlib
+import logging
+import threading
+import time
+from collections import OrderedDict
+
+from django.conf import settings
+from django.core.cache import caches
+
+from .normalize import normalize_answer
+from .phonetic import normalize_spoken
+from .traffic import is_pregrade
+
+logger = logging.getLogger(__name__)
+
+
+def make_key(story, question, user_answer, version=None):
+    """
+    Cache key for a graded answer: story, question id, prompt version and normalized answer.
+    Sound-alike story words are normalized first, so voice answers share keys with typed ones.
+    """
+    if version is None:
+        version = getattr(settings, 'GRADING_PROMPT_VERSION', '1')
+    answer = normalize_answer(normalize_spoken(story, user_answer))
+    digest = hashlib.sha1(answer.encode('utf-8')).hexdigest()
+    return f"grade:{story}:{question}:{version}:{digest}"
+
+
+class GradeCache:
+    """
+    Thread-safe LRU + TTL cache of grading results (plain dicts)
+    """
+
+    def __init__(self, max_entries=10000, ttl=86400, shared_alias=None):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.shared_alias = shared_alias
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.shared_hits = 0
+        self.misses = 0
+        # Lookups made while pre-grading drafts, kept out of the counts above
+        self.pregrade = {'hits': 0, 'shared_hits': 0, 'misses': 0}
+        self.evictions = 0
+        self.expirations = 0
+
+    @property
+    def shared(self):
+        return caches[self.shared_alias] if self.shared_alias else None
+
+    def _get_local(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            expires_at, value = entry
+            if expires_at < time.monotonic():
+                del self._entries[key]
+                self.expirations += 1
+                return None
+            self._entries.move_to_end(key)
+            self._count_lookup('hits')
+            return value
+
+    def _set_local(self, key, value):
+        with self._lock:
+            self._entries[key] = (time.monotonic() + self.ttl, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def _count_lookup(self, outcome):
+        # Called with self._lock held
+        if is_pregrade():
+            self.pregrade[outcome] += 1
+        else:
+            setattr(self, outcome, getattr(self, outcome) + 1)
+
+    def _record_shared(self, key, value):
+        with self._lock:
+            if value is None:
+                self._count_lookup('misses')
+                return
+            self._count_lookup('shared_hits')
+        self._set_local(key, value)
+
+    def get(self, key):
+        value = self._get_local(key)
+        if value is not None:
+            return dict(value)
+        if self.shared is None:
+            with self._lock:
+                self._count_lookup('misses')
+            return None
+        try:
+            value = self.shared.get(key)
+        except Exception as e:
+            logger.warning(f"Shared grade cache unavailable: {e}")
+            value = None
+        self._record_shared(key, value)
+        return dict(value) if value is not None else None
+
+    async def aget(self, key):
+        value = self._get_local(key)
+        if value is not None:
+            return dict(value)
+        if self.shared is None:
+            with self._lock:
+                self._count_lookup('misses')
+            return None
+        try:
+            value = await self.shared.aget(key)
+        except Exception as e:
+            logger.warning(f"Shared grade cache unavailable: {e}")
+            value = None
+        self._record_shared(key, value)
+        return dict(value) if value is not None else None
+
+    def set(self, key, value):
+        self._set_local(key, dict(value))
+        if self.shared is not None:
+            try:
+                self.shared.set(key, value, self.ttl)
+            except Exception as e:
+                logger.warning(f"Shared grade cache unavailable: {e}")
+
+    async def aset(self, key, value):
+        self._set_local(key, dict(value))
+        if self.shared is not None:
+            try:
+                await self.shared.aset(key, value, self.ttl)
+            except Exception as e:
+                logger.warning(f"Shared grade cache unavailable: {e}")
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.shared_hits + self.misses
+            return {
+                'size': len(self._entries),
+                'max_entries': self.max_entries,
+                'ttl': self.ttl,
+                'shared_tier': self.shared_alias,
+                'hits': self.hits,
+                'shared_hits': self.shared_hits,
+                'misses': self.misses,
+                'hit_ratio': round((self.hits + self.shared_hits) / lookups, 4) if lookups else 0.0,
+                'evictions': self.evictions,
+                'expirations': self.expirations,
+                'pregrade': dict(self.pregrade),
+            }
+
+
+grade_cache = GradeCache(
+    max_entries=getattr(settings, 'GRADING_CACHE_MAX_ENTRIES', 10000),
+    ttl=getattr(settings, 'GRADING_CACHE_TTL', 86400),
+    shared_alias=getattr(settings, 'GRADING_CACHE_ALIAS', None),
+)
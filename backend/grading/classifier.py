@@ -0,0 +1,298 @@
+"""
+Answer classifier trained from logged LLM grades.
+
+With GRADING_GRADE_LOG set, every grade the LLM returns is appended to that
+JSON-lines file. `manage.py train_grade_classifier` fits one small linear
+model per question on the log (word 1-2 grams and character 3-grams, softmax
+regression in pure Python) that predicts the feedback type, and writes the
+questions that reach --min-agreement on held-out answers to
+GRADING_CLASSIFIER_PATH.
+
+grade_locally() asks the classifier after the fast path. An answer it is at
+least GRADING_CLASSIFIER_THRESHOLD sure about is answered with the question's
+compact template message (templates.py), without an LLM call; anything else
+goes on to the LLM as before.
+"""
+import json
+import logging
+import math
+import os
+import random
+import threading
+import time
+import zlib
+
+from django.conf import settings
+
+from .normalize import normalize_answer
+from .spelling import misspelled_words
+from .templates import COMPACT_TEMPLATES
+
+logger = logging.getLogger(__name__)
+
+# Share of the answers held out to measure coverage and agreement
+HOLDOUT = 0.2
+
+# Features seen in fewer training answers than this are dropped
+MIN_FEATURE_COUNT = 2
+
+
+def features(answer):
+    """
+    Sparse binary features of an answer: words, word pairs and character 3-grams
+    """
+    words = normalize_answer(answer).split()
+    found = {f"w:{word}" for word in words}
+    found.update(f"b:{first} {second}" for first, second in zip(words, words[1:]))
+    for word in words:
+        padded = f"<{word}>"
+        found.update(f"c:{padded[i:i + 3]}" for i in range(len(padded) - 2))
+    return found
+
+
+def _softmax(scores):
+    top = max(scores)
+    exps = [math.exp(score - top) for score in scores]
+    total = sum(exps)
+    return [value / total for value in exps]
+
+
+class LinearModel:
+    """
+    Softmax regression over sparse binary features
+    """
+
+    def __init__(self, classes, weights=None, bias=None):
+        self.classes = list(classes)
+        self.weights = weights or {}
+        self.bias = bias or [0.0] * len(self.classes)
+
+    def probabilities(self, found):
+        scores = list(self.bias)
+        # Binary features, scaled so long answers don't get overconfident
+        scale = 1 / math.sqrt(len(found)) if found else 0.0
+        for feature in found:
+            row = self.weights.get(feature)
+            if row is not None:
+                for i, weight in enumerate(row):
+                    scores[i] += weight * scale
+        return _softmax(scores)
+
+    def predict(self, answer):
+        """
+        (feedback_type, confidence) for an answer
+        """
+        probabilities = self.probabilities(features(answer))
+        best = max(range(len(self.classes)), key=probabilities.__getitem__)
+        return self.classes[best], probabilities[best]
+
+    @classmethod
+    def train(cls, examples, epochs=20, learning_rate=0.5, l2=1e-4, seed=0):
+        """
+        Fit on [(answer, feedback_type), ...] with stochastic gradient descent
+        """
+        classes = sorted({label for _, label in examples})
+        counts = {}
+        encoded = []
+        for answer, label in examples:
+            found = features(answer)
+            for feature in found:
+                counts[feature] = counts.get(feature, 0) + 1
+            encoded.append((found, classes.index(label)))
+        kept = {feature for feature, count in counts.items() if count >= MIN_FEATURE_COUNT}
+        encoded = [(found & kept, label) for found, label in encoded]
+
+        model = cls(classes, {feature: [0.0] * len(classes) for feature in kept})
+        order = list(range(len(encoded)))
+        rng = random.Random(seed)
+        for epoch in range(epochs):
+            rng.shuffle(order)
+            rate = learning_rate / (1 + epoch)
+            for index in order:
+                found, label = encoded[index]
+                probabilities = model.probabilities(found)
+                scale = 1 / math.sqrt(len(found)) if found else 0.0
+                for i, probability in enumerate(probabilities):
+                    gradient = probability - (1.0 if i == label else 0.0)
+                    model.bias[i] -= rate * gradient
+                    for feature in found:
+                        row = model.weights[feature]
+                        row[i] -= rate * (gradient * scale + l2 * row[i])
+        # Rounded weights keep the saved model small
+        model.weights = {feature: [round(weight, 5) for weight in row] for feature, row in model.weights.items()
+                         if any(abs(weight) >= 1e-4 for weight in row)}
+        model.bias = [round(weight, 5) for weight in model.bias]
+        return model
+
+    def to_dict(self):
+        return {'classes': self.classes, 'bias': self.bias, 'weights': self.weights}
+
+    @classmethod
+    def from_dict(cls, data):
+        return cls(data['classes'], data['weights'], data['bias'])
+
+
+def read_log(path, version=None):
+    """
+    {(story, question): [(answer, feedback_type), ...]} from a grade log, for one prompt version
+    """
+    examples = {}
+    with open(path, encoding='utf-8') as f:
+        for line in f:
+            try:
+                entry = json.loads(line)
+            except ValueError:
+                continue
+            if version is not None and entry.get('version') != version:
+                continue
+            key = (entry.get('story'), entry.get('question'))
+            if key in COMPACT_TEMPLATES and entry.get('answer') and entry.get('feedback_type'):
+                examples.setdefault(key, []).append((entry['answer'], entry['feedback_type']))
+    return examples
+
+
+def _held_out(answer):
+    # Split on the normalized answer, so repeats of one answer stay on one side
+    return zlib.crc32(normalize_answer(answer).encode('utf-8')) % 100 < HOLDOUT * 100
+
+
+def evaluate(model, examples, threshold):
+    """
+    (coverage, agreement): the share of examples answered at threshold, and how many of those match the LLM
+    """
+    answered = agreed = 0
+    for answer, label in examples:
+        predicted, confidence = model.predict(answer)
+        if confidence >= threshold:
+            answered += 1
+            agreed += predicted == label
+    coverage = answered / len(examples) if examples else 0.0
+    agreement = agreed / answered if answered else None
+    return coverage, agreement
+
+
+def train_question(examples, threshold, **options):
+    """
+    Held-out report for one question's examples and the model trained on all of them
+    """
+    train = [example for example in examples if not _held_out(example[0])]
+    test = [example for example in examples if _held_out(example[0])]
+    report = {'examples': len(examples), 'held_out': len(test), 'coverage': 0.0, 'agreement': None}
+    if len({label for _, label in train}) < 2 or not test:
+        return report, None
+    coverage, agreement = evaluate(LinearModel.train(train, **options), test, threshold)
+    report.update(coverage=round(coverage, 4), agreement=None if agreement is None else round(agreement, 4))
+    return report, LinearModel.train(examples, **options)
+
+
+class GradeLog:
+    """
+    Appends LLM grades to a JSON-lines file for training
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+
+    def record(self, schema, user_answer, result):
+        path = getattr(settings, 'GRADING_GRADE_LOG', None)
+        if not path or schema is None or schema.story is None or not result.get('feedback_type'):
+            return
+        entry = json.dumps({
+            'story': schema.story,
+            'question': schema.question,
+            'version': getattr(settings, 'GRADING_PROMPT_VERSION', '1'),
+            'answer': user_answer,
+            'feedback_type': result['feedback_type'],
+            'time': round(time.time()),
+        })
+        try:
+            with self._lock, open(path, 'a', encoding='utf-8') as f:
+                f.write(entry + '\n')
+        except OSError as e:
+            logger.warning(f"Could not write grade log {path}: {e}")
+
+
+grade_log = GradeLog()
+
+
+class AnswerClassifier:
+    """
+    Serves the trained models, reloading them when the model file changes
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._loaded = (None, None)
+        self._models = {}
+        self._counts = {}
+
+    def _current_models(self):
+        path = getattr(settings, 'GRADING_CLASSIFIER_PATH', None)
+        if not path:
+            return {}
+        try:
+            mtime = os.stat(path).st_mtime
+        except OSError:
+            return {}
+        if self._loaded != (path, mtime):
+            with self._lock:
+                if self._loaded != (path, mtime):
+                    self._models = self._load(path)
+                    self._loaded = (path, mtime)
+        return self._models
+
+    @staticmethod
+    def _load(path):
+        try:
+            with open(path, encoding='utf-8') as f:
+                data = json.load(f)
+        except (OSError, ValueError) as e:
+            logger.error(f"Could not load answer classifier {path}: {e}")
+            return {}
+        if data.get('version') != getattr(settings, 'GRADING_PROMPT_VERSION', '1'):
+            logger.warning(f"Answer classifier {path} was trained for other prompts, not using it")
+            return {}
+        models = {}
+        for label, entry in data.get('questions', {}).items():
+            story, _, question = label.rpartition(' Q')
+            models[(story, int(question))] = LinearModel.from_dict(entry['model'])
+        logger.info(f"Loaded answer classifier for {len(models)} questions from {path}")
+        return models
+
+    def _count(self, story, question, outcome):
+        with self._lock:
+            counts = self._counts.setdefault(f"{story} Q{question}", {'answered': 0, 'escalated': 0})
+            counts[outcome] += 1
+
+    def grade(self, story, question, user_answer, correct_types=None, count=True):
+        """
+        Return a response dict when the model is confident about the answer, or None to escalate
+        """
+        model = self._current_models().get((story, question))
+        if model is None or not normalize_answer(user_answer):
+            return None
+        feedback_type, confidence = model.predict(user_answer)
+        template = COMPACT_TEMPLATES[(story, question)]
+        threshold = getattr(settings, 'GRADING_CLASSIFIER_THRESHOLD', 0.9)
+        if (confidence < threshold or feedback_type not in template.feedback_types
+                or template.message(feedback_type, set()) is None):
+            # Not sure, or no message of that type fits without knowing which rubric items matched
+            if count:
+                self._count(story, question, 'escalated')
+            return None
+        if count:
+            self._count(story, question, 'answered')
+        result = template.expand({'f': feedback_type, 'm': []}, correct_types)
+        del result['matched']
+        result['misspelled_words'] = misspelled_words(user_answer, story)
+        logger.debug(f"Classifier graded {story} Q{question} as {feedback_type} ({confidence:.2f})")
+        return result
+
+    def stats(self):
+        models = self._current_models()
+        with self._lock:
+            questions = {label: dict(counts) for label, counts in self._counts.items()}
+        return {'questions_served': len(models), 'questions': questions}
+
+
+answer_classifier = AnswerClassifier()
@@ -0,0 +1,228 @@
+"""
+Grading a whole class's answers to one question.
+
+The answers are grouped by their grade cache key (make_key), so answers that
+differ only in case, punctuation, filler words or sound-alike story words
+are graded once. Each unique answer goes through the question's usual check
+view, at most GRADING_CLASSROOM_CONCURRENCY at a time, and its result is
+fanned back out to every student who gave it, with misspelled_words worked
+out again for students whose wording differed. For questions the reference
+similarity grader knows, the unique answers are matched against the
+references together, in one matrix product (similarity.graded_together).
+
+The unique answers are also clustered by the content words they share
+(similarity.terms), so the teacher sees the spread of the class at a glance.
+
+Inside an async view the unique answers are graded concurrently on the event
+loop instead of in a thread pool, so a large class does not hold up the
+server's other sync views.
+"""
+import asyncio
+import contextvars
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.http import JsonResponse
+from django.utils.module_loading import import_string
+
+from .batch import WORKSHEETS
+from .cache import make_key
+from .jobs import job_request, response_data
+from .pipeline import _async_mode, async_view, spelled_for
+from .similarity import graded_together, terms
+
+logger = logging.getLogger(__name__)
+
+# Share of content words two answers must have in common to be in one cluster
+CLUSTER_SIMILARITY = 0.5
+
+
+def student_body(answer):
+    """
+    The check view body for one student's answer (a string or list is accepted as shorthand)
+    """
+    if isinstance(answer, (str, list)):
+        return {'answers' if isinstance(answer, list) else 'answer': answer}
+    return answer if isinstance(answer, dict) else None
+
+
+def _answer(body):
+    return body.get('answers') if 'answers' in body else body.get('answer', '')
+
+
+def _text(answer):
+    return ' '.join(str(part) for part in answer) if isinstance(answer, (list, tuple)) else str(answer)
+
+
+def group_answers(story, question, bodies):
+    """
+    {cache key: [student, ...]} in the order the answers were given
+    """
+    groups = {}
+    for student, body in bodies.items():
+        groups.setdefault(make_key(story, question, _answer(body)), []).append(student)
+    return groups
+
+
+def _jaccard(first, second):
+    if not first and not second:
+        return 1.0
+    return len(first & second) / len(first | second)
+
+
+def cluster_answers(groups, bodies):
+    """
+    Clusters of the unique answers, largest first: [(representative student, [student, ...]), ...]
+    """
+    clusters = []
+    for students in sorted(groups.values(), key=len, reverse=True):
+        found = terms(_text(_answer(bodies[students[0]])))
+        for cluster in clusters:
+            if _jaccard(found, cluster['terms']) >= CLUSTER_SIMILARITY:
+                cluster['students'].extend(students)
+                break
+        else:
+            clusters.append({'terms': found, 'representative': students[0], 'students': list(students)})
+    clusters.sort(key=lambda cluster: len(cluster['students']), reverse=True)
+    return [(cluster['representative'], cluster['students']) for cluster in clusters]
+
+
+class ClassroomStats:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.requests = 0
+        self.answers = 0
+        self.graded = 0
+
+    def add(self, answers, graded):
+        with self._lock:
+            self.requests += 1
+            self.answers += answers
+            self.graded += graded
+
+    def stats(self):
+        with self._lock:
+            return {
+                'requests': self.requests,
+                'answers': self.answers,
+                'graded': self.graded,
+                'duplicates_saved': self.answers - self.graded,
+            }
+
+
+classroom_stats = ClassroomStats()
+
+
+def concurrency():
+    return max(1, getattr(settings, 'GRADING_CLASSROOM_CONCURRENCY', 4))
+
+
+def max_answers():
+    return getattr(settings, 'GRADING_CLASSROOM_MAX_ANSWERS', 200)
+
+
+def _student_result(story, result, body, representative_body):
+    if 'misspelled_words' not in result:
+        return result
+    answer = _answer(body)
+    if answer == _answer(representative_body):
+        return result
+    return spelled_for(result, story, answer)
+
+
+def _failed(story, question, e):
+    logger.error(f"Classroom grading failed for {story} Q{question}: {e}", exc_info=True)
+    return {'error': 'Unexpected error occurred. Please try again.'}, 500
+
+
+def grade_classroom(request, story, question, bodies):
+    """
+    Grade every student's answer body ({student: body}) and return the class JsonResponse.
+
+    Inside an async view this returns an awaitable, like grade().
+    """
+    if _async_mode.get():
+        return agrade_classroom(request, story, question, bodies)
+
+    view = import_string(WORKSHEETS[story][question])
+    groups = group_answers(story, question, bodies)
+    representatives = {key: students[0] for key, students in groups.items()}
+
+    def grade_one(key):
+        try:
+            return key, response_data(view(job_request(bodies[representatives[key]], request.META)))
+        except Exception as e:
+            return key, _failed(story, question, e)
+
+    # The similarity grader matches every unique answer in one product; the views look their match up
+    unique_answers = [_answer(bodies[student]) for student in representatives.values()]
+    with graded_together(story, {question: unique_answers}), \
+            ThreadPoolExecutor(max_workers=min(concurrency(), len(groups))) as executor:
+        futures = [executor.submit(contextvars.copy_context().run, grade_one, key) for key in groups]
+        graded = dict(future.result() for future in futures)
+    return classroom_response(story, question, bodies, groups, graded)
+
+
+async def agrade_classroom(request, story, question, bodies):
+    """
+    Async twin of grade_classroom(); each unique answer goes through the view's async twin
+    """
+    view = async_view(import_string(WORKSHEETS[story][question]))
+    groups = group_answers(story, question, bodies)
+    representatives = {key: students[0] for key, students in groups.items()}
+    slots = asyncio.Semaphore(concurrency())
+
+    async def grade_one(key):
+        async with slots:
+            try:
+                return key, response_data(await view(job_request(bodies[representatives[key]], request.META)))
+            except Exception as e:
+                return key, _failed(story, question, e)
+
+    unique_answers = [_answer(bodies[student]) for student in representatives.values()]
+    with graded_together(story, {question: unique_answers}):
+        graded = dict(await asyncio.gather(*(grade_one(key) for key in groups)))
+    return classroom_response(story, question, bodies, groups, graded)
+
+
+def classroom_response(story, question, bodies, groups, graded):
+    """
+    The class JsonResponse from each group's (result, status code), fanned out to its students
+    """
+    representatives = {key: students[0] for key, students in groups.items()}
+    classroom_stats.add(len(bodies), len(groups))
+    logger.debug(f"Graded {len(bodies)} answers to {story} Q{question} with {len(groups)} check calls")
+
+    group_of = {student: key for key, students in groups.items() for student in students}
+    results, status = {}, {}
+    for student, body in bodies.items():
+        key = group_of[student]
+        result, status_code = graded[key]
+        if status_code == 200:
+            result = _student_result(story, result, body, bodies[representatives[key]])
+        results[student] = result
+        status[student] = status_code
+
+    clusters = []
+    for representative, students in cluster_answers(groups, bodies):
+        feedback_types = {}
+        for student in students:
+            feedback_type = results[student].get('feedback_type', 'error')
+            feedback_types[feedback_type] = feedback_types.get(feedback_type, 0) + 1
+        clusters.append({
+            'answer': _answer(bodies[representative]),
+            'size': len(students),
+            'students': students,
+            'feedback_types': feedback_types,
+        })
+
+    return JsonResponse({
+        'story': story,
+        'question': question,
+        'unique_answers': len(groups),
+        'results': results,
+        'status': status,
+        'clusters': clusters,
+    })
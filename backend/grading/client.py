@@ -0,0 +1,202 @@
+"""
+OpenRouter client shared by the book and peter grading views.
+
+The sync helpers are used by the regular WSGI views; the async helpers are
+awaited by the async views served through backend/asgi.py. Every call is
+made with a key from the API key pool (see keys.py).
+"""
+import asyncio
+import contextlib
+import logging
+import os
+import threading
+import weakref
+from urllib.parse import urlsplit
+
+import httpx
+import requests
+from dotenv import load_dotenv
+from requests.adapters import HTTPAdapter
+
+from .keys import configured_keys, key_pool
+
+load_dotenv()
+logger = logging.getLogger(__name__)
+
+OPENROUTER_URL = os.getenv('OPENROUTER_URL', 'https://openrouter.ai/api/v1/chat/completions')
+REQUEST_TIMEOUT = 15
+
+# Keep-alive connections kept open to OpenRouter by the process-wide session
+POOL_SIZE = int(os.getenv('OPENROUTER_POOL_SIZE', '20'))
+
+# Connections to pre-open when the app starts (0 disables the warmup)
+WARMUP_CONNECTIONS = int(os.getenv('OPENROUTER_WARMUP_CONNECTIONS', '0'))
+
+# Upper bound on simultaneous connections held by one event loop's client
+ASYNC_MAX_CONNECTIONS = int(os.getenv('OPENROUTER_ASYNC_MAX_CONNECTIONS', '500'))
+
+# One AsyncClient per running event loop; httpx clients can't be shared across loops
+_async_clients = weakref.WeakKeyDictionary()
+
+_session = None
+_session_lock = threading.Lock()
+
+
+def get_api_key():
+    """
+    The first configured OpenRouter key, or None when there are none
+    """
+    keys = configured_keys()
+    return keys[0] if keys else None
+
+
+def build_headers(title=None, api_key=None):
+    """
+    Headers for an OpenRouter chat completion request
+    """
+    headers = {
+        "Authorization": f"Bearer {api_key or get_api_key()}",
+        "Content-Type": "application/json",
+        "HTTP-Referer": "https://your-app-domain.com",
+    }
+    if title:
+        headers["X-Title"] = title
+    return headers
+
+
+def get_session():
+    """
+    Return the process-wide requests.Session.
+
+    Its connection pool keeps TCP+TLS connections to OpenRouter alive between
+    grades, so only the first call on each connection pays for the DNS lookup
+    and the TLS handshake.
+    """
+    global _session
+    if _session is None:
+        with _session_lock:
+            if _session is None:
+                session = requests.Session()
+                adapter = HTTPAdapter(pool_connections=1, pool_maxsize=POOL_SIZE, pool_block=False)
+                session.mount('https://', adapter)
+                session.mount('http://', adapter)
+                _session = session
+    return _session
+
+
+def post(payload, title=None, timeout=REQUEST_TIMEOUT):
+    """
+    Blocking chat completion call. Raises requests.RequestException on network errors.
+    """
+    pool = key_pool()
+    key = pool.acquire()
+    response = None
+    try:
+        response = get_session().post(OPENROUTER_URL, headers=build_headers(title, key and key.key),
+                                      json=payload, timeout=timeout)
+        return response
+    finally:
+        pool.release(key, *_outcome(response))
+
+
+def post_stream(payload, title=None, timeout=REQUEST_TIMEOUT):
+    """
+    Streamed chat completion call; iterate the returned response's lines for SSE chunks
+    """
+    payload = dict(payload, stream=True)
+    pool = key_pool()
+    key = pool.acquire()
+    response = None
+    try:
+        response = get_session().post(OPENROUTER_URL, headers=build_headers(title, key and key.key),
+                                      json=payload, timeout=timeout, stream=True)
+        return response
+    finally:
+        # The key's budget is known once the headers are in
+        pool.release(key, *_outcome(response))
+
+
+def _outcome(response):
+    if response is None:
+        return None, None
+    return response.status_code, response.headers
+
+
+def warmup(connections=None):
+    """
+    Pre-open keep-alive connections to OpenRouter before the first answer arrives.
+
+    Each connection is opened from its own thread so the pool ends up holding
+    that many distinct sockets. Failures are logged and otherwise ignored.
+    """
+    connections = min(connections or WARMUP_CONNECTIONS, POOL_SIZE)
+    if connections <= 0:
+        return []
+
+    parts = urlsplit(OPENROUTER_URL)
+    origin = f"{parts.scheme}://{parts.netloc}/"
+    session = get_session()
+
+    def open_connection():
+        try:
+            session.head(origin, timeout=REQUEST_TIMEOUT)
+        except requests.RequestException as e:
+            logger.warning(f"OpenRouter connection warmup failed: {e}")
+
+    threads = [threading.Thread(target=open_connection, daemon=True) for _ in range(connections)]
+    for thread in threads:
+        thread.start()
+    logger.info(f"Warming up {connections} OpenRouter connection(s)")
+    return threads
+
+
+def get_async_client():
+    """
+    Return the shared AsyncClient for the running event loop
+    """
+    loop = asyncio.get_running_loop()
+    client = _async_clients.get(loop)
+    if client is None:
+        client = httpx.AsyncClient(
+            timeout=REQUEST_TIMEOUT,
+            limits=httpx.Limits(max_connections=ASYNC_MAX_CONNECTIONS,
+                                max_keepalive_connections=ASYNC_MAX_CONNECTIONS),
+        )
+        _async_clients[loop] = client
+    return client
+
+
+async def apost(payload, title=None, timeout=REQUEST_TIMEOUT):
+    """
+    Non-blocking chat completion call. Raises httpx.HTTPError on network errors.
+    """
+    client = get_async_client()
+    pool = key_pool()
+    key = pool.acquire()
+    response = None
+    try:
+        response = await client.post(OPENROUTER_URL, headers=build_headers(title, key and key.key),
+                                     json=payload, timeout=timeout)
+        return response
+    finally:
+        pool.release(key, *_outcome(response))
+
+
+@contextlib.asynccontextmanager
+async def apost_stream(payload, title=None, timeout=REQUEST_TIMEOUT):
+    """
+    Streamed chat completion call; use as `async with apost_stream(...) as response`
+    """
+    payload = dict(payload, stream=True)
+    pool = key_pool()
+    key = pool.acquire()
+    released = False
+    try:
+        async with get_async_client().stream('POST', OPENROUTER_URL, headers=build_headers(title, key and key.key),
+                                             json=payload, timeout=timeout) as response:
+            pool.release(key, *_outcome(response))
+            released = True
+            yield response
+    finally:
+        if not released:
+            pool.release(key)
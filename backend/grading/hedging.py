@@ -0,0 +1,204 @@
+"""
+Upstream calls with optional request hedging.
+
+post()/apost() send a grading payload to the question's LLM backend (see
+router.py), which records each attempt on that backend's circuit breaker. With
+GRADING_HEDGING on, a call that has not answered by the GRADING_HEDGE_PERCENTILE
+latency of its question on its first backend gets a duplicate request
+(to GRADING_HEDGE_MODEL when set). Whichever reply is valid JSON first wins.
+The async loser is cancelled. A blocking request cannot be cancelled, so a sync
+loser gives its upstream slot back as soon as the winner is in and its reply is
+discarded; a loser still waiting for a slot then never goes upstream.
+"""
+import asyncio
+import logging
+import threading
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+
+from django.conf import settings
+
+from .breaker import CLOSED
+from .limiter import aupstream_slot, upstream_slot
+from .router import router
+from .schema import extract_json
+
+logger = logging.getLogger(__name__)
+
+# Threads running sync primaries and hedges while hedging is on
+_executor = ThreadPoolExecutor(max_workers=int(getattr(settings, 'GRADING_HEDGE_THREADS', 32)),
+                               thread_name_prefix='grading-hedge')
+
+
+class HedgeStats:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.requests = 0
+        self.hedged = 0
+        self.hedge_wins = 0
+        self.primary_wins = 0
+
+    def add(self, **counts):
+        with self._lock:
+            for name, count in counts.items():
+                setattr(self, name, getattr(self, name) + count)
+
+    def stats(self):
+        with self._lock:
+            return {
+                'enabled': hedging_enabled(),
+                'requests': self.requests,
+                'hedged': self.hedged,
+                'hedge_rate': round(self.hedged / self.requests, 4) if self.requests else 0.0,
+                'hedge_wins': self.hedge_wins,
+                'primary_wins': self.primary_wins,
+                'hedge_win_rate': round(self.hedge_wins / self.hedged, 4) if self.hedged else 0.0,
+            }
+
+
+hedge_stats = HedgeStats()
+
+
+def hedging_enabled():
+    return getattr(settings, 'GRADING_HEDGING', False)
+
+
+def hedge_delay(label):
+    """
+    Seconds to wait before hedging a call for this question, or None to not hedge
+    """
+    if not hedging_enabled():
+        return None
+    backend = router.primary(label)
+    if backend is None or backend.breaker.state != CLOSED:
+        return None
+    return backend.breaker.latency_percentile(label, getattr(settings, 'GRADING_HEDGE_PERCENTILE', 95))
+
+
+def hedge_payload(payload):
+    model = getattr(settings, 'GRADING_HEDGE_MODEL', None)
+    return dict(payload, model=model) if model else payload
+
+
+def is_valid_reply(response):
+    """
+    True when the response is a 200 whose completion holds a JSON object
+    """
+    if response.status_code != 200:
+        return False
+    try:
+        extract_json(response.json()['choices'][0]['message']['content'])
+    except (ValueError, KeyError, IndexError, TypeError):
+        return False
+    return True
+
+
+class _Race:
+    """
+    Upstream slots held by the requests of one hedged call
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._slots = []
+        self.settled = False
+
+    def join(self, slot):
+        """
+        Register a request's slot; False when the call is already settled and it should not go upstream
+        """
+        with self._lock:
+            if self.settled:
+                return False
+            self._slots.append(slot)
+            return True
+
+    def settle(self):
+        """
+        The call has its reply: give back the slots of requests still in flight
+        """
+        with self._lock:
+            self.settled = True
+            slots, self._slots = self._slots, []
+        for slot in slots:
+            if slot is not None:
+                slot.release()
+
+
+def _attempt(label, payload, title, race=None):
+    with upstream_slot() as slot:
+        if race is not None and not race.join(slot):
+            return None
+        return router.post(label, payload, title=title)
+
+
+async def _aattempt(label, payload, title):
+    async with aupstream_slot():
+        return await router.apost(label, payload, title=title)
+
+
+def post(label, payload, title=None):
+    """
+    Blocking upstream call for a question. Raises requests.RequestException on network errors
+    and UpstreamBusy when no upstream slot frees up in time.
+    """
+    hedge_stats.add(requests=1)
+    delay = hedge_delay(label)
+    if delay is None:
+        return _attempt(label, payload, title)
+
+    race = _Race()
+    primary = _executor.submit(_attempt, label, payload, title, race)
+    done, _ = wait([primary], timeout=delay)
+    if done:
+        return primary.result()
+
+    logger.debug(f"Hedging {label} after {delay:.2f}s")
+    hedge_stats.add(hedged=1)
+    hedge = _executor.submit(_attempt, label, hedge_payload(payload), title, race)
+    pending = {primary, hedge}
+    while pending:
+        done, pending = wait(pending, return_when=FIRST_COMPLETED)
+        for future in done:
+            if future.exception() is None and is_valid_reply(future.result()):
+                race.settle()
+                hedge_stats.add(**{'hedge_wins' if future is hedge else 'primary_wins': 1})
+                return future.result()
+    # Neither reply was usable; surface the primary's outcome
+    hedge_stats.add(primary_wins=1)
+    return primary.result()
+
+
+async def apost(label, payload, title=None):
+    """
+    Non-blocking upstream call for a question. Raises httpx.HTTPError on network errors
+    and UpstreamBusy when no upstream slot frees up in time.
+    """
+    hedge_stats.add(requests=1)
+    delay = hedge_delay(label)
+    if delay is None:
+        return await _aattempt(label, payload, title)
+
+    tasks = [asyncio.ensure_future(_aattempt(label, payload, title))]
+    primary = tasks[0]
+    try:
+        done, _ = await asyncio.wait({primary}, timeout=delay)
+        if done:
+            return primary.result()
+
+        logger.debug(f"Hedging {label} after {delay:.2f}s")
+        hedge_stats.add(hedged=1)
+        hedge = asyncio.ensure_future(_aattempt(label, hedge_payload(payload), title))
+        tasks.append(hedge)
+        pending = set(tasks)
+        while pending:
+            done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+            for task in done:
+                if task.exception() is None and is_valid_reply(task.result()):
+                    hedge_stats.add(**{'hedge_wins' if task is hedge else 'primary_wins': 1})
+                    return task.result()
+        hedge_stats.add(primary_wins=1)
+        return primary.result()
+    finally:
+        for task in tasks:
+            if not task.done():
+                task.cancel()
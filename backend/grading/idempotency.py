@@ -0,0 +1,263 @@
+"""
+Duplicate-submit suppression for the grading endpoints.
+
+Children double-tap submit and the frontend retries slow requests, so the
+same answer often arrives two or three times. Every POST to a grading
+endpoint gets an idempotency key: the client's Idempotency-Key header, or
+failing that a hash of the client (address and user agent), the path and the
+body. A repeat that arrives while the first request is still being graded
+waits for it and gets a copy of its response; a repeat after it finished
+gets the stored response replayed, marked with an Idempotent-Replayed header.
+Stored responses are kept for GRADING_IDEMPOTENCY_TTL seconds under a header
+key, and only GRADING_IDEMPOTENCY_WINDOW seconds under a derived one.
+
+Reusing a header key for a different body is answered with 422. Server
+errors (5xx, 429) are not stored, so a retry after one grades again.
+Suppression works within one worker process.
+"""
+import asyncio
+import functools
+import hashlib
+import logging
+import threading
+import time
+from collections import OrderedDict
+
+from django.conf import settings
+from django.http import JsonResponse
+
+from .singleflight import copy_response
+
+logger = logging.getLogger(__name__)
+
+# Longest Idempotency-Key header accepted
+MAX_KEY_LENGTH = 255
+
+# Most stored responses kept; the oldest are dropped first
+MAX_ENTRIES = 10000
+
+
+class _Entry:
+    def __init__(self, fingerprint):
+        self.fingerprint = fingerprint
+        self.done = threading.Event()
+        self.response = None
+        self.expires_at = None
+        self._lock = threading.Lock()
+        # (loop, future) for each async repeat waiting on the leader
+        self._waiters = []
+
+    def set_done(self):
+        with self._lock:
+            self.done.set()
+            waiters, self._waiters = self._waiters, []
+        for loop, future in waiters:
+            try:
+                loop.call_soon_threadsafe(_wake, future)
+            except RuntimeError:
+                # That repeat's event loop has closed
+                pass
+
+    async def await_done(self, timeout):
+        """
+        Wait on the event loop, without holding a worker thread, for the leader to finish
+        """
+        loop = asyncio.get_running_loop()
+        waiter = (loop, loop.create_future())
+        with self._lock:
+            if self.done.is_set():
+                return
+            self._waiters.append(waiter)
+        try:
+            await asyncio.wait_for(waiter[1], timeout)
+        except asyncio.TimeoutError:
+            pass
+        finally:
+            with self._lock:
+                if waiter in self._waiters:
+                    self._waiters.remove(waiter)
+
+
+def _wake(future):
+    if not future.done():
+        future.set_result(None)
+
+
+class IdempotencyStore:
+    """
+    In-flight and recently finished grading requests by idempotency key
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._entries = OrderedDict()
+        self.leaders = 0
+        self.attached = 0
+        self.replayed = 0
+        self.conflicts = 0
+
+    def _prune(self, now):
+        # Entries move to the end when they finish, so expired ones gather at the front
+        stale = []
+        excess = len(self._entries) - MAX_ENTRIES
+        for key, entry in self._entries.items():
+            if entry.expires_at is None:
+                continue
+            if entry.expires_at >= now and excess <= 0:
+                break
+            stale.append(key)
+            excess -= 1
+        for key in stale:
+            del self._entries[key]
+
+    def begin(self, key, fingerprint):
+        """
+        ('lead', entry) for a new request, ('wait', entry) for a repeat of one in flight,
+        ('replay', entry) for a repeat of a finished one, or ('conflict', None)
+        """
+        now = time.monotonic()
+        with self._lock:
+            self._prune(now)
+            entry = self._entries.get(key)
+            if entry is not None and entry.expires_at is not None and entry.expires_at < now:
+                del self._entries[key]
+                entry = None
+            if entry is None:
+                entry = self._entries[key] = _Entry(fingerprint)
+                self.leaders += 1
+                return 'lead', entry
+            if entry.fingerprint != fingerprint:
+                self.conflicts += 1
+                return 'conflict', None
+            if entry.expires_at is None:
+                self.attached += 1
+                return 'wait', entry
+            self.replayed += 1
+            return 'replay', entry
+
+    def finish(self, key, entry, response, ttl):
+        """
+        Store the leader's response for repeats (or forget the key when it should not be replayed)
+        """
+        entry.response = response
+        with self._lock:
+            if storable(response):
+                entry.expires_at = time.monotonic() + ttl
+                self._entries.move_to_end(key)
+            elif self._entries.get(key) is entry:
+                del self._entries[key]
+        entry.set_done()
+
+    def stats(self):
+        with self._lock:
+            return {
+                'enabled': idempotency_enabled(),
+                'leaders': self.leaders,
+                'attached': self.attached,
+                'replayed': self.replayed,
+                'suppressed': self.attached + self.replayed,
+                'conflicts': self.conflicts,
+                'entries': len(self._entries),
+            }
+
+
+idempotency_store = IdempotencyStore()
+
+
+def idempotency_enabled():
+    return getattr(settings, 'GRADING_IDEMPOTENCY', True)
+
+
+def storable(response):
+    return (response is not None and not getattr(response, 'streaming', False)
+            and response.status_code < 500 and response.status_code != 429)
+
+
+def request_key(request):
+    """
+    (key, body fingerprint, ttl) for a grading request, or None when it can't be keyed
+    """
+    fingerprint = hashlib.sha1(request.body).hexdigest()
+    header = request.META.get('HTTP_IDEMPOTENCY_KEY', '').strip()
+    if header:
+        if len(header) > MAX_KEY_LENGTH:
+            return None
+        key = hashlib.sha1(f"{request.path}\n{header}".encode('utf-8')).hexdigest()
+        return f"key:{key}", fingerprint, getattr(settings, 'GRADING_IDEMPOTENCY_TTL', 300)
+    client = f"{request.META.get('REMOTE_ADDR', '')}\n{request.META.get('HTTP_USER_AGENT', '')}"
+    key = hashlib.sha1(f"{client}\n{request.path}\n{fingerprint}".encode('utf-8')).hexdigest()
+    return f"hash:{key}", fingerprint, getattr(settings, 'GRADING_IDEMPOTENCY_WINDOW', 5)
+
+
+def wait_timeout():
+    return getattr(settings, 'GRADING_IDEMPOTENCY_WAIT', 30)
+
+
+def conflict_response():
+    return JsonResponse({'error': 'This Idempotency-Key was already used for a different answer.'}, status=422)
+
+
+def replay(entry):
+    response = copy_response(entry.response)
+    response['Idempotent-Replayed'] = 'true'
+    return response
+
+
+def _begin(request):
+    if not idempotency_enabled() or request.method != 'POST':
+        return None, None, None
+    keyed = request_key(request)
+    if keyed is None:
+        return None, None, None
+    key, fingerprint, ttl = keyed
+    state, entry = idempotency_store.begin(key, fingerprint)
+    return (key, ttl), state, entry
+
+
+def _reusable(entry):
+    return entry.response is not None and not getattr(entry.response, 'streaming', False)
+
+
+def idempotent(view):
+    """
+    Wrap a sync or async grading view so repeats of a request share its response
+    """
+    if asyncio.iscoroutinefunction(view):
+        @functools.wraps(view)
+        async def async_wrapper(request, *args, **kwargs):
+            keyed, state, entry = _begin(request)
+            if state == 'conflict':
+                return conflict_response()
+            if state == 'wait':
+                await entry.await_done(wait_timeout())
+            if state in ('wait', 'replay'):
+                # A leader that failed or is taking too long leaves the repeat to grade itself
+                return replay(entry) if _reusable(entry) else await view(request, *args, **kwargs)
+            if state is None:
+                return await view(request, *args, **kwargs)
+            response = None
+            try:
+                response = await view(request, *args, **kwargs)
+                return response
+            finally:
+                idempotency_store.finish(keyed[0], entry, response, keyed[1])
+        return async_wrapper
+
+    @functools.wraps(view)
+    def wrapper(request, *args, **kwargs):
+        keyed, state, entry = _begin(request)
+        if state == 'conflict':
+            return conflict_response()
+        if state == 'wait':
+            entry.done.wait(wait_timeout())
+        if state in ('wait', 'replay'):
+            return replay(entry) if _reusable(entry) else view(request, *args, **kwargs)
+        if state is None:
+            return view(request, *args, **kwargs)
+        response = None
+        try:
+            response = view(request, *args, **kwargs)
+            return response
+        finally:
+            idempotency_store.finish(keyed[0], entry, response, keyed[1])
+    return wrapper
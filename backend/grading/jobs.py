@@ -0,0 +1,254 @@
+"""
+Background grading jobs for the slow, open-ended questions.
+
+POST /api/grading/jobs/ runs the question's check view in collect mode, as
+worksheet grading does. Answers settled without the LLM (validation, fast
+path, cache) come straight back; the rest are stored as GradingJob rows and
+the client gets a job id to poll, optionally long-polling with ?wait=<seconds>.
+
+`python manage.py grading_worker` drains the queue: each worker process claims
+the oldest queued job with a conditional UPDATE, grades it through the normal
+check view and stores the JSON response. Jobs whose worker died are picked up
+again after GRADING_JOB_STALE_AFTER seconds, up to GRADING_JOB_MAX_ATTEMPTS.
+Jobs that hit upstream trouble go back in the queue with exponential backoff
+(GRADING_JOB_RETRY_BASE seconds, doubling per attempt, at most
+GRADING_JOB_RETRY_MAX), so a short outage doesn't use up every attempt.
+"""
+import asyncio
+import json
+import logging
+import os
+import socket
+import time
+from datetime import timedelta
+
+from django.conf import settings
+from django.db.models import Count, F, Q
+from django.http import HttpRequest
+from django.utils import timezone
+from django.utils.module_loading import import_string
+
+from .batch import WORKSHEETS
+from .models import GradingJob
+from .pipeline import PendingGrade, _collect_mode
+
+logger = logging.getLogger(__name__)
+
+# Questions that can be graded as background jobs
+JOB_QUESTIONS = {
+    'goldilocks': (6,),
+    'peter': (11, 13),
+}
+
+# Worker sleep between queue checks while the queue is empty
+IDLE_INTERVAL = 0.5
+
+# How often the long-poll endpoint re-reads a job
+POLL_INTERVAL = 0.25
+
+# Check view statuses that put a job back in the queue while attempts remain
+RETRY_STATUSES = (500, 503)
+
+
+def job_request(body, meta=None):
+    """
+    POST request for a check view carrying the question's usual JSON body
+    """
+    request = HttpRequest()
+    request.method = 'POST'
+    request.META = dict(meta or {}, CONTENT_TYPE='application/json')
+    request._body = json.dumps(body).encode('utf-8')
+    return request
+
+
+def response_data(response):
+    return json.loads(response.content), response.status_code
+
+
+def submit(request, story, question, body):
+    """
+    Returns (job, None) when the answer was queued, or (None, response) when it was settled at once
+    """
+    view = import_string(WORKSHEETS[story][question])
+    token = _collect_mode.set(True)
+    try:
+        result = view(job_request(body, request.META))
+    finally:
+        _collect_mode.reset(token)
+    if not isinstance(result, PendingGrade):
+        return None, result
+    job = GradingJob.objects.create(story=story, question=question, body=body)
+    logger.debug(f"Queued {job}")
+    return job, None
+
+
+def job_payload(job):
+    payload = {'job_id': str(job.id), 'status': job.status}
+    if job.status in (GradingJob.DONE, GradingJob.FAILED):
+        payload['result'] = job.result
+        payload['status_code'] = job.status_code
+    return payload
+
+
+def stats():
+    counts = dict.fromkeys([status for status, _ in GradingJob.STATUS_CHOICES], 0)
+    for row in GradingJob.objects.values('status').annotate(count=Count('id')):
+        counts[row['status']] = row['count']
+    return counts
+
+
+def stale_after():
+    return getattr(settings, 'GRADING_JOB_STALE_AFTER', 120)
+
+
+def max_attempts():
+    return getattr(settings, 'GRADING_JOB_MAX_ATTEMPTS', 3)
+
+
+def retry_delay(attempts):
+    """
+    Seconds a job waits before its next attempt, after `attempts` tries
+    """
+    base = getattr(settings, 'GRADING_JOB_RETRY_BASE', 5)
+    return min(getattr(settings, 'GRADING_JOB_RETRY_MAX', 120), base * 2 ** max(0, attempts - 1))
+
+
+def parse_question(question):
+    """
+    A question number from a job body (an int or a string of digits), or None
+    """
+    if isinstance(question, bool):
+        return None
+    if isinstance(question, int):
+        return question
+    if isinstance(question, str) and question.strip().isdigit():
+        return int(question)
+    return None
+
+
+def claim(worker):
+    """
+    Take the oldest runnable job for this worker, or None when there is none
+    """
+    now = timezone.now()
+    stale = now - timedelta(seconds=stale_after())
+    runnable = GradingJob.objects.filter(
+        Q(status=GradingJob.QUEUED, run_after__isnull=True) | Q(status=GradingJob.QUEUED, run_after__lte=now)
+        | Q(status=GradingJob.RUNNING, started_at__lt=stale),
+        attempts__lt=max_attempts(),
+    )
+    for job in runnable.order_by('created_at')[:5]:
+        # Only one worker's UPDATE matches the row as it was read
+        claimed = GradingJob.objects.filter(
+            pk=job.pk, status=job.status, attempts=job.attempts,
+        ).update(
+            status=GradingJob.RUNNING, attempts=F('attempts') + 1, worker=worker, started_at=timezone.now(),
+        )
+        if claimed:
+            job.refresh_from_db()
+            return job
+    return None
+
+
+def run(job):
+    """
+    Grade a claimed job through its question's check view and store the result
+    """
+    view = import_string(WORKSHEETS[job.story][job.question])
+    try:
+        result, status_code = response_data(view(job_request(job.body)))
+    except Exception as e:
+        logger.error(f"Grading job {job.id} failed: {e}", exc_info=True)
+        result, status_code = {'error': 'Unexpected error occurred. Please try again.'}, 500
+    if status_code in RETRY_STATUSES and job.attempts < max_attempts():
+        # Upstream trouble or a full upstream queue: back in line, after a growing pause
+        delay = retry_delay(job.attempts)
+        job.status = GradingJob.QUEUED
+        job.run_after = timezone.now() + timedelta(seconds=delay)
+        job.save(update_fields=['status', 'run_after'])
+        logger.info(f"Retrying {job} in {delay}s")
+        return job
+    job.result = result
+    job.status_code = status_code
+    job.status = GradingJob.DONE if status_code < 500 else GradingJob.FAILED
+    job.finished_at = timezone.now()
+    job.save(update_fields=['result', 'status_code', 'status', 'finished_at'])
+    return job
+
+
+def fail_exhausted():
+    """
+    Mark jobs that went stale on their last attempt as failed
+    """
+    stale = timezone.now() - timedelta(seconds=stale_after())
+    return GradingJob.objects.filter(
+        status=GradingJob.RUNNING, started_at__lt=stale, attempts__gte=max_attempts(),
+    ).update(
+        status=GradingJob.FAILED, status_code=500, finished_at=timezone.now(),
+        result={'error': 'Grading took too long. Please try again.'},
+    )
+
+
+def purge_finished():
+    """
+    Delete finished jobs older than GRADING_JOB_RESULT_TTL seconds
+    """
+    cutoff = timezone.now() - timedelta(seconds=getattr(settings, 'GRADING_JOB_RESULT_TTL', 24 * 60 * 60))
+    deleted, _ = GradingJob.objects.filter(
+        status__in=[GradingJob.DONE, GradingJob.FAILED], finished_at__lt=cutoff,
+    ).delete()
+    return deleted
+
+
+def work(stop=None, max_jobs=None):
+    """
+    Worker loop: claim and grade jobs until stop() is true or max_jobs were graded
+    """
+    worker = f"{socket.gethostname()}:{os.getpid()}"
+    graded = 0
+    last_sweep = 0
+    logger.info(f"Grading worker {worker} started")
+    while not (stop and stop()) and (max_jobs is None or graded < max_jobs):
+        if time.monotonic() - last_sweep > stale_after():
+            fail_exhausted()
+            purge_finished()
+            last_sweep = time.monotonic()
+        job = claim(worker)
+        if job is None:
+            time.sleep(IDLE_INTERVAL)
+            continue
+        run(job)
+        graded += 1
+    return graded
+
+
+def wait_job(job_id, timeout):
+    """
+    The job, re-read until it finishes or timeout seconds pass; None when it doesn't exist
+    """
+    deadline = time.monotonic() + timeout
+    while True:
+        job = GradingJob.objects.filter(pk=job_id).first()
+        if job is None or job.status in (GradingJob.DONE, GradingJob.FAILED) or time.monotonic() >= deadline:
+            return job
+        time.sleep(POLL_INTERVAL)
+
+
+async def await_job(job_id, timeout):
+    """
+    Async twin of wait_job()
+    """
+    deadline = time.monotonic() + timeout
+    while True:
+        job = await GradingJob.objects.filter(pk=job_id).afirst()
+        if job is None or job.status in (GradingJob.DONE, GradingJob.FAILED) or time.monotonic() >= deadline:
+            return job
+        await asyncio.sleep(POLL_INTERVAL)
+
+
+def long_poll_timeout(request):
+    try:
+        wait = float(request.GET.get('wait', 0))
+    except ValueError:
+        wait = 0
+    return max(0.0, min(wait, getattr(settings, 'GRADING_JOB_LONG_POLL_MAX', 30)))
@@ -0,0 +1,187 @@
+"""
+Pool of OpenRouter API keys.
+
+Keys come from OPENROUTER_API_KEYS (comma-separated) plus the original
+OPENROUTER_API_KEY2. Each call takes the key with the most rate budget left,
+as last reported by the X-RateLimit-* response headers, less the calls it
+already has in flight. A key answered with 429 is benched until its reset time
+(or Retry-After) has passed. Per-key utilization is listed in stats().
+"""
+import logging
+import os
+import re
+import threading
+import time
+
+logger = logging.getLogger(__name__)
+
+# Bench time for a throttled key that sent no reset hint
+DEFAULT_BENCH_SECONDS = 10
+
+_DURATION = re.compile(r'(\d+(?:\.\d+)?)(ms|s|m|h)')
+_DURATION_UNITS = {'ms': 0.001, 's': 1, 'm': 60, 'h': 3600}
+
+
+def configured_keys():
+    keys = [key.strip() for key in os.getenv('OPENROUTER_API_KEYS', '').split(',')]
+    keys.append((os.getenv('OPENROUTER_API_KEY2') or '').strip())
+    return tuple(dict.fromkeys(key for key in keys if key))
+
+
+def _header(headers, *names):
+    for name in names:
+        value = headers.get(name)
+        if value is not None:
+            return value
+    return None
+
+
+def _number(value):
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return None
+
+
+def reset_seconds(value, now=None):
+    """
+    Seconds until a rate limit resets, from an epoch (s or ms), a delay, or a duration like "1m30s"
+    """
+    if value is None:
+        return None
+    now = time.time() if now is None else now
+    number = _number(value)
+    if number is not None:
+        if number > 1e12:
+            return max(0.0, number / 1000 - now)
+        if number > 1e9:
+            return max(0.0, number - now)
+        return max(0.0, number)
+    parts = _DURATION.findall(str(value))
+    if not parts:
+        return None
+    return sum(float(amount) * _DURATION_UNITS[unit] for amount, unit in parts)
+
+
+class KeyState:
+    def __init__(self, key):
+        self.key = key
+        self.limit = None
+        self.remaining = None
+        self.reset_at = None
+        self.benched_until = 0.0
+        self.in_flight = 0
+        self.calls = 0
+        self.throttled = 0
+        self.last_used = 0.0
+
+    @property
+    def name(self):
+        return f"...{self.key[-4:]}"
+
+    def budget(self, now):
+        """
+        Calls this key can still make in its window; None when unknown
+        """
+        if self.remaining is None or (self.reset_at is not None and now >= self.reset_at):
+            return self.limit
+        return self.remaining
+
+
+class KeyPool:
+    def __init__(self, keys):
+        self.keys = tuple(keys)
+        self._states = [KeyState(key) for key in self.keys]
+        self._lock = threading.Lock()
+
+    def __bool__(self):
+        return bool(self._states)
+
+    def acquire(self):
+        """
+        Pick the key with the most budget left and count a call on it; None when the pool is empty
+        """
+        if not self._states:
+            return None
+        now = time.time()
+        with self._lock:
+            available = [state for state in self._states if state.benched_until <= now]
+            if not available:
+                # Everything is throttled: use the key that comes back first
+                state = min(self._states, key=lambda state: state.benched_until)
+            else:
+                known = [budget for budget in (state.budget(now) for state in available) if budget is not None]
+                # Keys that never reported a budget rank with the best known one
+                unknown = max(known) if known else float('inf')
+                state = max(available, key=lambda state: self._score(state, now, unknown))
+            state.in_flight += 1
+            state.calls += 1
+            state.last_used = now
+            return state
+
+    @staticmethod
+    def _score(state, now, unknown):
+        budget = state.budget(now)
+        # Ties go to the least busy, then the least recently used key
+        return (unknown if budget is None else budget) - state.in_flight, -state.in_flight, -state.last_used
+
+    def release(self, state, status_code=None, headers=None):
+        """
+        Finish a call on a key, updating its budget from the response headers
+        """
+        if state is None:
+            return
+        now = time.time()
+        headers = headers or {}
+        limit = _number(_header(headers, 'X-RateLimit-Limit', 'x-ratelimit-limit-requests'))
+        remaining = _number(_header(headers, 'X-RateLimit-Remaining', 'x-ratelimit-remaining-requests'))
+        reset = reset_seconds(_header(headers, 'X-RateLimit-Reset', 'x-ratelimit-reset-requests'), now)
+        with self._lock:
+            state.in_flight -= 1
+            if limit is not None:
+                state.limit = limit
+            if remaining is not None:
+                state.remaining = remaining
+            if reset is not None:
+                state.reset_at = now + reset
+            if status_code == 429:
+                state.throttled += 1
+                bench = reset_seconds(headers.get('Retry-After'), now) or reset or DEFAULT_BENCH_SECONDS
+                state.benched_until = now + bench
+                state.remaining = 0
+                logger.warning(f"OpenRouter key {state.name} throttled, benched for {bench:.1f}s")
+
+    def stats(self):
+        now = time.time()
+        with self._lock:
+            keys = []
+            for state in self._states:
+                budget = state.budget(now)
+                keys.append({
+                    'key': state.name,
+                    'calls': state.calls,
+                    'in_flight': state.in_flight,
+                    'limit': state.limit,
+                    'remaining': budget,
+                    'utilization': round(1 - budget / state.limit, 4) if state.limit and budget is not None else None,
+                    'throttled': state.throttled,
+                    'benched_for': round(max(0.0, state.benched_until - now), 2),
+                })
+        return {'size': len(keys), 'keys': keys}
+
+
+_pool = None
+_pool_lock = threading.Lock()
+
+
+def key_pool():
+    """
+    The process-wide KeyPool, rebuilt when the configured keys change
+    """
+    global _pool
+    keys = configured_keys()
+    if _pool is None or _pool.keys != keys:
+        with _pool_lock:
+            if _pool is None or _pool.keys != keys:
+                _pool = KeyPool(keys)
+    return _pool
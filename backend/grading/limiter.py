@@ -0,0 +1,389 @@
+"""
+Concurrency and rate limit on upstream OpenRouter calls.
+
+Every grading call takes a slot from the UpstreamLimiter first: at most
+GRADING_UPSTREAM_CONCURRENCY calls run at once and, with GRADING_UPSTREAM_RATE
+set, calls start at no more than that many per second (a token bucket holding
+GRADING_UPSTREAM_BURST tokens). Callers that can't start wait in a bounded
+queue; when it is full, or the wait exceeds GRADING_UPSTREAM_QUEUE_TIMEOUT, the
+call is refused with UpstreamBusy, which the views turn into a fast 503 with
+Retry-After instead of piling more requests onto the provider.
+
+With GRADING_UPSTREAM_LIMIT_DIR set, slots and tokens are shared by all worker
+processes of the host through flock'd files; the wait queue stays per process.
+"""
+import asyncio
+import contextlib
+import json
+import math
+import os
+import threading
+import time
+from collections import deque
+
+from django.conf import settings
+from django.http import JsonResponse
+
+from .breaker import percentile
+
+try:
+    import fcntl
+except ImportError:  # Windows: limits stay per process
+    fcntl = None
+
+# How often waiters re-check slots held by other processes
+HOST_POLL_INTERVAL = 0.05
+
+# Wait times kept for the percentiles in stats()
+WAIT_SAMPLES = 1000
+
+BUSY_MESSAGE = 'The grading service is busy right now. Please try again in a moment.'
+
+
+class UpstreamBusy(Exception):
+    """
+    Raised when an upstream call can't get a slot; retry_after is in seconds
+    """
+
+    def __init__(self, retry_after):
+        super().__init__(f"Upstream busy, retry after {retry_after}s")
+        self.retry_after = retry_after
+
+
+def busy_payload(error):
+    return {'error': BUSY_MESSAGE, 'retry_after': error.retry_after}
+
+
+def busy_response(error):
+    response = JsonResponse(busy_payload(error), status=503)
+    response['Retry-After'] = str(error.retry_after)
+    return response
+
+
+class TokenBucket:
+    """
+    rate tokens per second, holding at most burst; state is (tokens, updated)
+    """
+
+    def __init__(self, rate, burst=None):
+        self.rate = rate
+        self.burst = max(1.0, burst or rate)
+
+    def take(self, state, now):
+        """
+        Returns (delay, state): delay is 0 when a token was taken, else seconds until one is due
+        """
+        tokens, updated = state
+        tokens = min(self.burst, tokens + (now - updated) * self.rate)
+        if tokens >= 1:
+            return 0, (tokens - 1, now)
+        return (1 - tokens) / self.rate, (tokens, now)
+
+
+class LocalSlots:
+    """
+    Slots and tokens for this process only
+    """
+
+    def __init__(self, concurrency, bucket=None):
+        self.concurrency = concurrency
+        self.bucket = bucket
+        self._lock = threading.Lock()
+        self._in_use = 0
+        self._tokens = (bucket.burst, time.monotonic()) if bucket else None
+
+    def try_acquire(self):
+        """
+        Returns (grant, delay): a grant to release later, or None and the seconds
+        to wait before retrying (None when only a release can help)
+        """
+        with self._lock:
+            if self._in_use >= self.concurrency:
+                return None, None
+            if self.bucket is not None:
+                delay, self._tokens = self.bucket.take(self._tokens, time.monotonic())
+                if delay:
+                    return None, delay
+            self._in_use += 1
+            return True, 0
+
+    def release(self, grant):
+        with self._lock:
+            self._in_use -= 1
+
+
+class HostSlots:
+    """
+    Slots and tokens shared by the worker processes of one host.
+
+    A slot is an exclusive flock on one of <dir>/slot-<n>.lock; the token
+    bucket lives in <dir>/bucket.json, updated under a flock on bucket.lock.
+    """
+
+    def __init__(self, directory, concurrency, bucket=None):
+        self.directory = directory
+        self.concurrency = concurrency
+        self.bucket = bucket
+        os.makedirs(directory, exist_ok=True)
+
+    def _take_slot(self):
+        for n in range(self.concurrency):
+            slot = open(os.path.join(self.directory, f'slot-{n}.lock'), 'a')
+            try:
+                fcntl.flock(slot, fcntl.LOCK_EX | fcntl.LOCK_NB)
+                return slot
+            except BlockingIOError:
+                slot.close()
+        return None
+
+    def _take_token(self):
+        now = time.time()
+        with open(os.path.join(self.directory, 'bucket.lock'), 'a') as lock:
+            fcntl.flock(lock, fcntl.LOCK_EX)
+            state_path = os.path.join(self.directory, 'bucket.json')
+            try:
+                with open(state_path) as f:
+                    state = tuple(json.load(f))
+            except (OSError, ValueError):
+                state = (self.bucket.burst, now)
+            delay, state = self.bucket.take(state, now)
+            with open(state_path, 'w') as f:
+                json.dump(state, f)
+            return delay
+
+    def try_acquire(self):
+        slot = self._take_slot()
+        if slot is None:
+            return None, HOST_POLL_INTERVAL
+        if self.bucket is not None:
+            delay = self._take_token()
+            if delay:
+                self.release(slot)
+                return None, delay
+        return slot, 0
+
+    def release(self, grant):
+        fcntl.flock(grant, fcntl.LOCK_UN)
+        grant.close()
+
+
+class HeldSlot:
+    """
+    A slot taken from an UpstreamLimiter. release() may be called early, from any thread;
+    only the first call gives the slot back.
+    """
+
+    def __init__(self, limiter, grant):
+        self._limiter = limiter
+        self._grant = grant
+        self._lock = threading.Lock()
+
+    def release(self):
+        with self._lock:
+            limiter, self._limiter = self._limiter, None
+        if limiter is not None:
+            limiter.release(self._grant)
+
+
+class UpstreamLimiter:
+    def __init__(self, slots, max_queue=100, queue_timeout=10):
+        self.slots = slots
+        self.max_queue = max_queue
+        self.queue_timeout = queue_timeout
+        self._lock = threading.Lock()
+        self._released = threading.Condition(self._lock)
+        self._async_waiters = set()
+        self._releases = 0
+        self._waits = deque(maxlen=WAIT_SAMPLES)
+        self.in_flight = 0
+        self.queue_depth = 0
+        self.peak_queue_depth = 0
+        self.admitted = 0
+        self.queued = 0
+        self.rejected = 0
+        self.timed_out = 0
+
+    def retry_after(self):
+        with self._lock:
+            waits = list(self._waits)
+        return max(1, math.ceil(percentile(waits, 95) or 1))
+
+    def _try_acquire(self, started, waited):
+        grant, delay = self.slots.try_acquire()
+        if grant is not None:
+            with self._lock:
+                self.in_flight += 1
+                self.admitted += 1
+                self._waits.append(time.monotonic() - started)
+                if waited:
+                    self.queued += 1
+        return grant, delay
+
+    def _enqueue(self):
+        with self._lock:
+            if self.queue_depth >= self.max_queue:
+                self.rejected += 1
+                full = True
+            else:
+                self.queue_depth += 1
+                self.peak_queue_depth = max(self.peak_queue_depth, self.queue_depth)
+                full = False
+        if full:
+            raise UpstreamBusy(self.retry_after())
+
+    def _dequeue(self):
+        with self._lock:
+            self.queue_depth -= 1
+
+    def _timed_out(self):
+        with self._lock:
+            self.timed_out += 1
+
+    def acquire(self):
+        """
+        Wait for a slot; returns a grant for release(). Raises UpstreamBusy.
+        """
+        started = time.monotonic()
+        deadline = started + self.queue_timeout
+        queued = False
+        try:
+            while True:
+                seen = self._releases
+                grant, delay = self._try_acquire(started, queued)
+                if grant is not None:
+                    return grant
+                if not queued:
+                    self._enqueue()
+                    queued = True
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    self._timed_out()
+                    raise UpstreamBusy(self.retry_after())
+                with self._released:
+                    # A release since the failed attempt means it is worth trying again at once
+                    if self._releases == seen:
+                        self._released.wait(remaining if delay is None else min(delay, remaining))
+        finally:
+            if queued:
+                self._dequeue()
+
+    async def aacquire(self):
+        """
+        Async twin of acquire()
+        """
+        started = time.monotonic()
+        deadline = started + self.queue_timeout
+        loop = asyncio.get_running_loop()
+        queued = False
+        try:
+            while True:
+                seen = self._releases
+                grant, delay = self._try_acquire(started, queued)
+                if grant is not None:
+                    return grant
+                if not queued:
+                    self._enqueue()
+                    queued = True
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    self._timed_out()
+                    raise UpstreamBusy(self.retry_after())
+                waiter = (loop, loop.create_future())
+                with self._lock:
+                    if self._releases != seen:
+                        continue
+                    self._async_waiters.add(waiter)
+                try:
+                    await asyncio.wait_for(waiter[1], remaining if delay is None else min(delay, remaining))
+                except asyncio.TimeoutError:
+                    pass
+                finally:
+                    with self._lock:
+                        self._async_waiters.discard(waiter)
+        finally:
+            if queued:
+                self._dequeue()
+
+    def release(self, grant):
+        self.slots.release(grant)
+        with self._released:
+            self.in_flight -= 1
+            self._releases += 1
+            self._released.notify()
+            waiters = list(self._async_waiters)
+        # Wake every async waiter; the ones that lose the race go back to waiting
+        for loop, future in waiters:
+            loop.call_soon_threadsafe(_wake, future)
+
+    @contextlib.contextmanager
+    def slot(self):
+        """
+        Hold a slot for the block; yields the HeldSlot so it can be given back sooner
+        """
+        held = HeldSlot(self, self.acquire())
+        try:
+            yield held
+        finally:
+            held.release()
+
+    @contextlib.asynccontextmanager
+    async def aslot(self):
+        grant = await self.aacquire()
+        try:
+            yield
+        finally:
+            self.release(grant)
+
+    def stats(self):
+        with self._lock:
+            waits = list(self._waits)
+            return {
+                'enabled': limiter_enabled(),
+                'host_wide': isinstance(self.slots, HostSlots),
+                'concurrency': self.slots.concurrency,
+                'in_flight': self.in_flight,
+                'queue_depth': self.queue_depth,
+                'peak_queue_depth': self.peak_queue_depth,
+                'admitted': self.admitted,
+                'queued': self.queued,
+                'rejected': self.rejected,
+                'timed_out': self.timed_out,
+                'wait_p50': percentile(waits, 50),
+                'wait_p95': percentile(waits, 95),
+            }
+
+
+def _wake(future):
+    if not future.done():
+        future.set_result(None)
+
+
+def limiter_enabled():
+    return getattr(settings, 'GRADING_UPSTREAM_LIMIT', True)
+
+
+def build_limiter():
+    rate = getattr(settings, 'GRADING_UPSTREAM_RATE', 0)
+    bucket = TokenBucket(rate, getattr(settings, 'GRADING_UPSTREAM_BURST', None)) if rate > 0 else None
+    concurrency = max(1, getattr(settings, 'GRADING_UPSTREAM_CONCURRENCY', 20))
+    directory = getattr(settings, 'GRADING_UPSTREAM_LIMIT_DIR', None)
+    if directory and fcntl is not None:
+        slots = HostSlots(directory, concurrency, bucket)
+    else:
+        slots = LocalSlots(concurrency, bucket)
+    return UpstreamLimiter(slots, getattr(settings, 'GRADING_UPSTREAM_QUEUE', 100),
+                           getattr(settings, 'GRADING_UPSTREAM_QUEUE_TIMEOUT', 10))
+
+
+limiter = build_limiter()
+
+
+def upstream_slot():
+    """
+    Context manager holding an upstream slot while limiting is on (it yields None when off)
+    """
+    return limiter.slot() if limiter_enabled() else contextlib.nullcontext()
+
+
+def aupstream_slot():
+    return limiter.aslot() if limiter_enabled() else contextlib.nullcontext()
@@ -0,0 +1,110 @@
+import json
+import os
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from grading.shadow import GRADERS
+
+
+def read_shadow_log(path, version=None):
+    """
+    {(story, question): [entry, ...]} from a shadow log, for one prompt version
+    """
+    entries = {}
+    with open(path, encoding='utf-8') as f:
+        for line in f:
+            try:
+                entry = json.loads(line)
+            except ValueError:
+                continue
+            if version is not None and entry.get('version') != version:
+                continue
+            entries.setdefault((entry.get('story'), entry.get('question')), []).append(entry)
+    return entries
+
+
+def summarize(entries, grader):
+    """
+    Samples, coverage, agreement, isCorrect agreement, p95 latency and confusion of one grader
+    """
+    samples = answered = agreed = correct_agreed = 0
+    latencies = []
+    confusion = {}
+    for entry in entries:
+        grade = entry.get('graders', {}).get(grader)
+        if grade is None:
+            continue
+        samples += 1
+        latencies.append(grade.get('ms', 0.0))
+        if grade.get('feedback_type') is None:
+            continue
+        answered += 1
+        llm = entry['llm']
+        agreed += grade['feedback_type'] == llm['feedback_type']
+        correct_agreed += grade.get('correct') == llm.get('correct')
+        row = confusion.setdefault(llm['feedback_type'], {})
+        row[grade['feedback_type']] = row.get(grade['feedback_type'], 0) + 1
+    latencies.sort()
+    return {
+        'samples': samples,
+        'coverage': answered / samples if samples else 0.0,
+        'agreement': agreed / answered if answered else None,
+        'correct_agreement': correct_agreed / answered if answered else None,
+        'p95_ms': latencies[min(len(latencies) - 1, int(0.95 * len(latencies)))] if latencies else None,
+        'confusion': confusion,
+    }
+
+
+class Command(BaseCommand):
+    help = 'Report how well the local graders agree with the LLM, from the shadow log'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--log', default=getattr(settings, 'GRADING_SHADOW_LOG', None),
+                            help='Shadow log to report on (default GRADING_SHADOW_LOG)')
+        parser.add_argument('--min-samples', type=int, default=50,
+                            help='Answers a grader must have given before it can be safe (default 50)')
+        parser.add_argument('--min-agreement', type=float, default=0.95,
+                            help='feedback_type agreement with the LLM needed to be safe (default 0.95)')
+        parser.add_argument('--confusion', action='store_true',
+                            help='Also print where each grader disagrees with the LLM')
+
+    def handle(self, *args, **options):
+        if not options['log'] or not os.path.exists(options['log']):
+            raise CommandError('No shadow log: set GRADING_SHADOW_LOG or pass --log')
+
+        entries = read_shadow_log(options['log'], getattr(settings, 'GRADING_PROMPT_VERSION', '1'))
+        self.stdout.write(f"{'question':<16}{'grader':<12}{'samples':>8}{'coverage':>10}{'agreement':>11}"
+                          f"{'isCorrect':>11}{'p95 ms':>9}  verdict")
+        safe = []
+        for (story, question), question_entries in sorted(entries.items(), key=lambda item: str(item[0])):
+            label = f"{story} Q{question}"
+            for grader in GRADERS:
+                report = summarize(question_entries, grader)
+                if not report['samples']:
+                    continue
+                answered = round(report['coverage'] * report['samples'])
+                if answered < options['min_samples']:
+                    verdict = 'too few'
+                elif report['agreement'] >= options['min_agreement']:
+                    verdict = 'safe'
+                    safe.append((label, grader, report['coverage']))
+                else:
+                    verdict = 'keep LLM'
+                agreement = '-' if report['agreement'] is None else f"{report['agreement']:.1%}"
+                correct = '-' if report['correct_agreement'] is None else f"{report['correct_agreement']:.1%}"
+                self.stdout.write(f"{label:<16}{grader:<12}{report['samples']:>8}{report['coverage']:>10.1%}"
+                                  f"{agreement:>11}{correct:>11}{report['p95_ms']:>9.2f}  {verdict}")
+                if options['confusion']:
+                    for llm_type, row in sorted(report['confusion'].items()):
+                        misses = {local: n for local, n in row.items() if local != llm_type}
+                        if misses:
+                            shown = ', '.join(f"{local} {n}" for local, n in sorted(misses.items()))
+                            self.stdout.write(f"{'':<28}LLM {llm_type}: {shown}")
+
+        if not safe:
+            self.stdout.write('No question is safe to move off the LLM yet')
+            return
+        self.stdout.write(self.style.SUCCESS('Safe to move off the LLM (the grader answers its coverage share):'))
+        for label, grader, coverage in safe:
+            self.stdout.write(f"  {label}: {grader} ({coverage:.1%} of answers)")
@@ -0,0 +1,46 @@
+import multiprocessing
+import signal
+
+from django.core.management.base import BaseCommand
+from django.db import connections
+
+from grading import jobs
+
+
+def _work(max_jobs):
+    stopping = []
+    signal.signal(signal.SIGTERM, lambda signum, frame: stopping.append(signum))
+    signal.signal(signal.SIGINT, lambda signum, frame: stopping.append(signum))
+    jobs.work(stop=lambda: bool(stopping), max_jobs=max_jobs)
+
+
+class Command(BaseCommand):
+    help = 'Run a pool of worker processes that grade queued background grading jobs'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--processes', type=int, default=2, help='Worker processes to run (default 2)')
+        parser.add_argument('--max-jobs', type=int, default=None,
+                            help='Exit each process after grading this many jobs')
+
+    def handle(self, *args, **options):
+        processes = max(1, options['processes'])
+        if processes == 1:
+            _work(options['max_jobs'])
+            return
+
+        # Children open their own database connections
+        connections.close_all()
+        context = multiprocessing.get_context('fork')
+        workers = [context.Process(target=_work, args=(options['max_jobs'],), daemon=False)
+                   for _ in range(processes)]
+        for worker in workers:
+            worker.start()
+        self.stdout.write(f"Started {processes} grading workers")
+        try:
+            for worker in workers:
+                worker.join()
+        except KeyboardInterrupt:
+            for worker in workers:
+                worker.terminate()
+            for worker in workers:
+                worker.join()
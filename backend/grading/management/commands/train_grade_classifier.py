@@ -0,0 +1,59 @@
+import json
+import os
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from grading.classifier import read_log, train_question
+
+
+class Command(BaseCommand):
+    help = 'Train the per-question answer classifier from the log of LLM grades'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--log', default=getattr(settings, 'GRADING_GRADE_LOG', None),
+                            help='Grade log to train on (default GRADING_GRADE_LOG)')
+        parser.add_argument('--output', default=getattr(settings, 'GRADING_CLASSIFIER_PATH', None),
+                            help='Where to write the models (default GRADING_CLASSIFIER_PATH)')
+        parser.add_argument('--threshold', type=float,
+                            default=getattr(settings, 'GRADING_CLASSIFIER_THRESHOLD', 0.9),
+                            help='Confidence needed to answer without the LLM')
+        parser.add_argument('--min-examples', type=int, default=50,
+                            help='Skip questions with fewer logged grades (default 50)')
+        parser.add_argument('--min-agreement', type=float, default=0.95,
+                            help='Only serve questions that agree with the LLM this often (default 0.95)')
+        parser.add_argument('--epochs', type=int, default=20)
+        parser.add_argument('--dry-run', action='store_true', help='Report without writing the models')
+
+    def handle(self, *args, **options):
+        if not options['log'] or not os.path.exists(options['log']):
+            raise CommandError('No grade log: set GRADING_GRADE_LOG or pass --log')
+        if not options['output'] and not options['dry_run']:
+            raise CommandError('No output: set GRADING_CLASSIFIER_PATH or pass --output')
+
+        version = getattr(settings, 'GRADING_PROMPT_VERSION', '1')
+        examples = read_log(options['log'], version)
+        questions = {}
+        self.stdout.write(f"{'question':<16}{'examples':>10}{'coverage':>10}{'agreement':>11}  served")
+        for (story, question), question_examples in sorted(examples.items()):
+            label = f"{story} Q{question}"
+            if len(question_examples) < options['min_examples']:
+                self.stdout.write(f"{label:<16}{len(question_examples):>10}{'':>10}{'':>11}  no (too few)")
+                continue
+            report, model = train_question(question_examples, options['threshold'], epochs=options['epochs'])
+            served = (model is not None and report['agreement'] is not None
+                      and report['agreement'] >= options['min_agreement'])
+            agreement = '-' if report['agreement'] is None else f"{report['agreement']:.1%}"
+            self.stdout.write(f"{label:<16}{report['examples']:>10}{report['coverage']:>10.1%}{agreement:>11}  "
+                              f"{'yes' if served else 'no'}")
+            if served:
+                questions[label] = dict(report, model=model.to_dict())
+
+        if options['dry_run']:
+            return
+        tmp = f"{options['output']}.tmp"
+        with open(tmp, 'w', encoding='utf-8') as f:
+            json.dump({'version': version, 'threshold': options['threshold'], 'questions': questions}, f)
+        # Serving processes pick the new file up by its mtime
+        os.replace(tmp, options['output'])
+        self.stdout.write(self.style.SUCCESS(f"Wrote models for {len(questions)} questions to {options['output']}"))
@@ -0,0 +1,40 @@
+"""
+Answer normalization used to build grading cache keys.
+
+Two answers that normalize to the same text are graded identically, so the
+rules here only remove differences the graders ignore anyway.
+"""
+import re
+
+# Filler words that show up in voice transcripts
+FILLER_WORDS = {'um', 'umm', 'uh', 'uhh', 'uhm', 'er', 'erm', 'hmm', 'mm', 'ah'}
+
+NUMBER_WORDS = {
+    '0': 'zero', '1': 'one', '2': 'two', '3': 'three', '4': 'four', '5': 'five',
+    '6': 'six', '7': 'seven', '8': 'eight', '9': 'nine', '10': 'ten',
+    '11': 'eleven', '12': 'twelve',
+}
+
+_PUNCTUATION = re.compile(r"[^\w\s']|_")
+_APOSTROPHES = re.compile(r"[‘’`]")
+
+
+def normalize_answer(answer):
+    """
+    Normalize a student answer (string or list of strings) for cache lookups.
+
+    Lowercases, strips punctuation, collapses whitespace, spells out small
+    numbers ("3" -> "three") and drops filler words ("um", "uh").
+    """
+    if isinstance(answer, (list, tuple)):
+        return ' | '.join(normalize_answer(part) for part in answer)
+
+    text = _APOSTROPHES.sub("'", str(answer).lower())
+    text = _PUNCTUATION.sub(' ', text)
+    words = []
+    for word in text.split():
+        word = word.strip("'")
+        if not word or word in FILLER_WORDS:
+            continue
+        words.append(NUMBER_WORDS.get(word, word))
+    return ' '.join(words)
@@ -0,0 +1,198 @@
+"""
+Phonetic normalization of voice-transcribed answers.
+
+Speech-to-text spells story names the way they sound: "Goldie Locks",
+"porage", "Mister Mac Gregor". Before an answer is cached or graded locally,
+words that are not in the dictionary (spelling.py), and pairs of words that
+together sound like one, are looked up by their Metaphone code in a lexicon
+of each story's words and replaced by the story word. A dictionary word is
+only changed as part of such a pair; the student's own spelling is still
+what misspelled_words reports on.
+"""
+import re
+from functools import lru_cache
+
+from django.conf import settings
+
+from .spelling import SPELLING_VOCABULARY, spell_index
+
+# Spoken forms the transcript spells out
+SPOKEN_FORMS = {'mister': 'Mr', 'missus': 'Mrs', 'missis': 'Mrs'}
+
+# Shortest Metaphone code looked up; shorter ones match too many words
+MIN_CODE_LENGTH = 3
+
+_WORD = re.compile(r"[A-Za-z]+(?:'[A-Za-z]+)?")
+_VOWELS = 'AEIOU'
+_FRONT = 'EIY'
+
+
+def metaphone(word):
+    """
+    Metaphone code of a word (Lawrence Philips' original rules)
+    """
+    word = ''.join(char for char in word.upper() if 'A' <= char <= 'Z')
+    if not word:
+        return ''
+    if word[:2] in ('KN', 'GN', 'PN', 'AE', 'WR'):
+        word = word[1:]
+    elif word[0] == 'X':
+        word = 'S' + word[1:]
+    elif word[:2] == 'WH':
+        word = 'W' + word[2:]
+
+    code = []
+    length = len(word)
+    for i, char in enumerate(word):
+        before = word[i - 1] if i else ''
+        after = word[i + 1] if i + 1 < length else ''
+        after2 = word[i + 2] if i + 2 < length else ''
+        if char == before and char != 'C':
+            continue
+        if char in _VOWELS:
+            if i == 0:
+                code.append(char)
+        elif char == 'B':
+            if not (before == 'M' and i == length - 1):
+                code.append('B')
+        elif char == 'C':
+            if after == 'I' and after2 == 'A':
+                code.append('X')
+            elif after == 'H':
+                code.append('K' if before == 'S' else 'X')
+            elif after in _FRONT:
+                if before != 'S':
+                    code.append('S')
+            else:
+                code.append('K')
+        elif char == 'D':
+            code.append('J' if after == 'G' and after2 in _FRONT else 'T')
+        elif char == 'G':
+            if after == 'H' and after2 and after2 not in _VOWELS:
+                continue
+            if after == 'N' and (i + 2 == length or word[i + 1:] == 'NED'):
+                continue
+            if before == 'D' and after in _FRONT:
+                continue
+            code.append('J' if after in _FRONT else 'K')
+        elif char == 'H':
+            if before in 'CSPTG':
+                continue
+            if before in _VOWELS and after not in _VOWELS:
+                continue
+            code.append('H')
+        elif char == 'K':
+            if before != 'C':
+                code.append('K')
+        elif char == 'P':
+            code.append('F' if after == 'H' else 'P')
+        elif char == 'Q':
+            code.append('K')
+        elif char == 'S':
+            if after == 'H' or (after == 'I' and after2 in 'OA'):
+                code.append('X')
+            else:
+                code.append('S')
+        elif char == 'T':
+            if after == 'I' and after2 in 'OA':
+                code.append('X')
+            elif after == 'H':
+                code.append('0')
+            elif not (after == 'C' and after2 == 'H'):
+                code.append('T')
+        elif char == 'V':
+            code.append('F')
+        elif char in 'WY':
+            if after in _VOWELS:
+                code.append(char)
+        elif char == 'X':
+            code.append('KS')
+        elif char == 'Z':
+            code.append('S')
+        else:
+            code.append(char)
+    return ''.join(code)
+
+
+@lru_cache(maxsize=None)
+def lexicon(story):
+    """
+    {Metaphone code: word} for the story's words; codes shared by two words are left out
+    """
+    codes = {}
+    for word in SPELLING_VOCABULARY.get(story, ()):
+        code = metaphone(word)
+        if len(code) >= MIN_CODE_LENGTH:
+            codes.setdefault(code, set()).add(word)
+    return {code: words.pop() for code, words in codes.items() if len(words) == 1}
+
+
+def _restore_case(word, original):
+    return word.capitalize() if original[:1].isupper() else word
+
+
+@lru_cache(maxsize=10000)
+def _normalize_text(story, text):
+    """
+    (normalized text, the non-dictionary words that were replaced)
+    """
+    index = spell_index()
+    codes = lexicon(story)
+    words = list(_WORD.finditer(text))
+    pieces = []
+    respelled = []
+    position = 0
+    i = 0
+    while i < len(words):
+        match = words[i]
+        word = match.group()
+        lower = word.lower()
+        replacement, end = None, match.end()
+        if lower in SPOKEN_FORMS:
+            replacement = SPOKEN_FORMS[lower]
+        else:
+            # Two words heard as one name ("Goldie Locks", "Mac Gregor")
+            if i + 1 < len(words) and text[match.end():words[i + 1].start()].isspace():
+                following = words[i + 1]
+                joined = codes.get(metaphone(lower + following.group().lower()))
+                if joined is not None and joined != lower:
+                    replacement, end = _restore_case(joined, word), following.end()
+                    i += 1
+            if replacement is None and lower not in index:
+                heard = codes.get(metaphone(lower))
+                if heard is not None:
+                    replacement = _restore_case(heard, word)
+                    respelled.append(word)
+        if replacement is not None:
+            pieces.append(text[position:match.start()])
+            pieces.append(replacement)
+            position = end
+        i += 1
+    pieces.append(text[position:])
+    return ''.join(pieces), tuple(respelled)
+
+
+def normalize_spoken(story, answer):
+    """
+    The answer (a string or list of strings) with sound-alike story words replaced
+    """
+    if not getattr(settings, 'GRADING_PHONETIC', True) or story not in SPELLING_VOCABULARY:
+        return answer
+    if isinstance(answer, (list, tuple)):
+        return [normalize_spoken(story, part) for part in answer]
+    if not isinstance(answer, str):
+        return answer
+    return _normalize_text(story, answer)[0]
+
+
+def respelled_words(story, answer):
+    """
+    Words of the answer that normalize_spoken() replaced because they aren't in the dictionary
+    """
+    if not getattr(settings, 'GRADING_PHONETIC', True) or story not in SPELLING_VOCABULARY:
+        return []
+    if isinstance(answer, (list, tuple)):
+        return [word for part in answer for word in respelled_words(story, part)]
+    if not isinstance(answer, str):
+        return []
+    return list(_normalize_text(story, answer)[1])
@@ -0,0 +1,370 @@
+"""
+Grading pipeline shared by the book and peter apps.
+
+Every analyze_* helper builds its OpenRouter payload and hands it to grade(),
+which makes the upstream call and turns the reply into the JsonResponse the
+frontend expects. Answers are graded locally when the fast path (closed
+questions), the reference similarity grader (similarity.py) or the
+classifier trained from logged grades (classifier.py) is confident, and the
+rest are screened (screening.py) before they go upstream. Successful LLM
+grades are cached by normalized answer, and identical answers that arrive
+together share a single upstream call; a grade reused for another wording
+gets misspelled_words worked out for that wording. While every LLM backend
+of a question is failing, their circuit breakers send answers to the fallbacks.
+Replies are checked against the question's schema and near misses repaired
+(see schema.py); with GRADING_COMPACT_OUTPUT on, the model replies with codes
+and the feedback message is filled in from the question's template.
+"""
+import contextvars
+import functools
+import inspect
+import json
+import logging
+import math
+
+import httpx
+import requests
+from django.conf import settings
+from django.http import JsonResponse
+
+from . import hedging
+from .cache import grade_cache, make_key
+from .classifier import answer_classifier, grade_log
+from .idempotency import idempotent
+from .limiter import UpstreamBusy, busy_response
+from .phonetic import normalize_spoken, respelled_words
+from .prompts import usage_stats
+from .router import router
+from .rules import fast_path
+from .singleflight import build_single_flight
+from .schema import reply_schema
+from .screening import screen
+from .shadow import shadow
+from .similarity import similarity_enabled, similarity_grader
+from .spelling import misspelled_words
+from .traffic import is_pregrade
+
+logger = logging.getLogger(__name__)
+
+# Set while an async view is running, so grade() hands back a coroutine
+_async_mode = contextvars.ContextVar('grading_async_mode', default=False)
+
+# Set while a worksheet is being collected, so grade() defers the LLM call
+_collect_mode = contextvars.ContextVar('grading_collect_mode', default=False)
+
+# Identical answers graded at the same moment share one OpenRouter call
+single_flight = build_single_flight(getattr(settings, 'GRADING_SINGLE_FLIGHT_DIR', None))
+
+
+def grade(story, question, user_answer, payload, title=None, fallback=None, correct_types=None):
+    """
+    Grade an answer with OpenRouter and return a JsonResponse.
+
+    Inside an async view this returns an awaitable instead, so each analyze_*
+    helper serves both the WSGI and the ASGI views.
+    """
+    schema = reply_schema(story, question)
+    payload = schema.payload(payload)
+
+    if _collect_mode.get():
+        shadowed = shadow.sample(schema)
+        local_result = None if shadowed else grade_locally(story, question, user_answer, fallback, correct_types)
+        if local_result is not None:
+            return JsonResponse(local_result)
+        screened = screen(story, question, user_answer)
+        if screened is not None:
+            return screened
+        return PendingGrade(story, question, user_answer, payload, title, fallback, correct_types, schema, shadowed)
+
+    if _async_mode.get():
+        return agrade(story, question, user_answer, payload, title, fallback, correct_types)
+
+    label = f"{story} Q{question}"
+    # Answers picked for shadow evaluation go to the LLM even when a local grader would take them
+    shadowed = shadow.sample(schema)
+    local_result = None if shadowed else grade_locally(story, question, user_answer, fallback, correct_types)
+    if local_result is not None:
+        return JsonResponse(local_result)
+
+    # Screening only sees what the local graders could not settle
+    screened = screen(story, question, user_answer)
+    if screened is not None:
+        return screened
+
+    key = make_key(story, question, user_answer)
+    if cache_enabled():
+        cached = grade_cache.get(key)
+        if cached is not None:
+            logger.debug(f"Grade cache hit for {label}")
+            if shadowed:
+                shadow.observe(schema, user_answer, fallback, correct_types, cached)
+            return JsonResponse(spelled_for(cached, story, user_answer))
+
+    def call_upstream():
+        if not router.available(label):
+            logger.warning(f"No LLM backend available, using fallback for {label}")
+            return fallback(user_answer)
+        try:
+            response = hedging.post(label, payload, title=title)
+        except requests.RequestException as e:
+            logger.error(f"Request exception grading {label}: {e}")
+            return JsonResponse({
+                'error': 'Unable to connect to AI service. Please try again.'
+            }, status=500)
+        except UpstreamBusy as e:
+            logger.warning(f"Upstream queue full, turning away {label}")
+            return busy_response(e)
+
+        json_response, result = handle_response(label, response, user_answer, fallback, correct_types, schema,
+                                                shadowed)
+        if cache_enabled() and result is not None:
+            grade_cache.set(key, result)
+        return json_response
+
+    if not single_flight_enabled():
+        return call_upstream()
+    return single_flight.do(key, call_upstream, shared=lambda response: spelled_response(response, story, user_answer))
+
+
+async def agrade(story, question, user_answer, payload, title=None, fallback=None, correct_types=None):
+    """
+    Async twin of grade() that awaits the shared httpx client
+    """
+    label = f"{story} Q{question}"
+    schema = reply_schema(story, question)
+    payload = schema.payload(payload)
+    shadowed = shadow.sample(schema)
+    local_result = None if shadowed else grade_locally(story, question, user_answer, fallback, correct_types)
+    if local_result is not None:
+        return JsonResponse(local_result)
+
+    screened = screen(story, question, user_answer)
+    if screened is not None:
+        return screened
+
+    key = make_key(story, question, user_answer)
+    if cache_enabled():
+        cached = await grade_cache.aget(key)
+        if cached is not None:
+            logger.debug(f"Grade cache hit for {label}")
+            if shadowed:
+                shadow.observe(schema, user_answer, fallback, correct_types, cached)
+            return JsonResponse(spelled_for(cached, story, user_answer))
+
+    async def call_upstream():
+        if not router.available(label):
+            logger.warning(f"No LLM backend available, using fallback for {label}")
+            return fallback(user_answer)
+        try:
+            response = await hedging.apost(label, payload, title=title)
+        except httpx.HTTPError as e:
+            logger.error(f"Request exception grading {label}: {e}")
+            return JsonResponse({
+                'error': 'Unable to connect to AI service. Please try again.'
+            }, status=500)
+        except UpstreamBusy as e:
+            logger.warning(f"Upstream queue full, turning away {label}")
+            return busy_response(e)
+
+        json_response, result = handle_response(label, response, user_answer, fallback, correct_types, schema,
+                                                shadowed)
+        if cache_enabled() and result is not None:
+            await grade_cache.aset(key, result)
+        return json_response
+
+    if not single_flight_enabled():
+        return await call_upstream()
+    return await single_flight.ado(key, call_upstream,
+                                   shared=lambda response: spelled_response(response, story, user_answer))
+
+
+def cache_enabled():
+    return getattr(settings, 'GRADING_CACHE_ENABLED', True)
+
+
+def single_flight_enabled():
+    return getattr(settings, 'GRADING_SINGLE_FLIGHT', True)
+
+
+def grade_locally(story, question, user_answer, fallback, correct_types=None):
+    """
+    Run the deterministic fast path, the reference similarity grader and the trained answer classifier
+    on the phonetically normalized answer; returns a result dict or None to escalate
+    """
+    heard = normalize_spoken(story, user_answer)
+    # Drafts being pre-graded stay out of the local graders' answered/escalated counts
+    count = not is_pregrade()
+    result = None
+    if getattr(settings, 'GRADING_FAST_PATH', True):
+        result = fast_path.grade(story, question, heard, fallback, count=count)
+    if result is None and similarity_enabled():
+        result = similarity_grader.grade(story, question, heard, correct_types, count=count)
+    if result is None:
+        result = answer_classifier.grade(story, question, heard, correct_types, count=count)
+    if result is not None and heard != user_answer:
+        # Spelling is judged on what the student actually wrote
+        result = spelled_for(result, story, user_answer)
+    return result
+
+
+def spelled_for(result, story, user_answer):
+    """
+    A copy of result with misspelled_words worked out from user_answer, for a grade that was made
+    for another wording of the answer (cache hits, coalesced calls, respelled answers)
+    """
+    misspelled = misspelled_words(user_answer, story)
+    misspelled += [word for word in respelled_words(story, user_answer) if word not in misspelled]
+    return dict(result, misspelled_words=misspelled)
+
+
+def spelled_response(response, story, user_answer):
+    """
+    spelled_for() applied to a successful JsonResponse that reports misspelled words
+    """
+    if response.status_code != 200:
+        return response
+    result = json.loads(response.content)
+    if not isinstance(result, dict) or 'misspelled_words' not in result:
+        return response
+    return JsonResponse(spelled_for(result, story, user_answer))
+
+
+class PendingGrade:
+    """
+    An answer that still needs the LLM, returned by grade() while a worksheet
+    is being collected for batch grading
+    """
+
+    def __init__(self, story, question, user_answer, payload, title=None, fallback=None, correct_types=None,
+                 schema=None, shadowed=False):
+        self.story = story
+        self.question = question
+        self.user_answer = user_answer
+        self.payload = payload
+        self.title = title
+        self.fallback = fallback
+        self.correct_types = correct_types
+        self.schema = schema
+        self.shadowed = shadowed
+
+    @property
+    def label(self):
+        return f"{self.story} Q{self.question}"
+
+    @property
+    def key(self):
+        return make_key(self.story, self.question, self.user_answer)
+
+
+def finalize_result(parsed_result, correct_types=None, schema=None, user_answer=None):
+    """
+    Bring a parsed LLM grade into the response shape the frontend expects.
+    Compact replies are expanded with the question's template; raises ValueError if one is unusable.
+    With local spelling, misspelled_words is filled in from user_answer.
+    """
+    if schema is not None and schema.template is not None:
+        parsed_result = schema.template.expand(parsed_result, correct_types)
+
+    if schema is not None and schema.local_spelling and user_answer is not None:
+        parsed_result['misspelled_words'] = misspelled_words(user_answer, schema.story)
+
+    if 'result' in parsed_result and 'message' not in parsed_result:
+        parsed_result['message'] = parsed_result['result']
+
+    # Set isCorrect based on feedback_type; an answer that counts as correct does not get the answer shown
+    if correct_types is not None:
+        feedback_type = parsed_result.get('feedback_type', 'needs_improvement')
+        parsed_result['isCorrect'] = feedback_type in correct_types
+        if parsed_result['isCorrect']:
+            parsed_result['show_answer'] = False
+    return parsed_result
+
+
+def handle_response(label, response, user_answer, fallback, correct_types=None, schema=None, shadowed=False):
+    """
+    Turn an OpenRouter HTTP response (requests or httpx) into a JsonResponse.
+
+    Returns (response, result) where result is the parsed grade when the LLM
+    answered properly, and None for fallbacks and errors. The grade of an
+    answer picked for shadow evaluation is handed to the shadow evaluator.
+    """
+    logger.debug(f"OpenRouter response status for {label}: {response.status_code}")
+    try:
+        if response.status_code == 200:
+            body = response.json()
+            usage_stats.record(label, body)
+            result_raw = body['choices'][0]['message']['content'].strip()
+            logger.debug(f"OpenRouter raw response: {result_raw}")
+
+            try:
+                parsed_result = schema.parse(result_raw) if schema is not None else json.loads(result_raw)
+                parsed_result = finalize_result(parsed_result, correct_types, schema, user_answer)
+            except ValueError as e:
+                logger.warning(f"AI JSON decode error for {label}: {e}, using fallback")
+                return fallback(user_answer), None
+            grade_log.record(schema, user_answer, parsed_result)
+            if shadowed:
+                shadow.observe(schema, user_answer, fallback, correct_types, parsed_result)
+
+            return JsonResponse(parsed_result), parsed_result
+        elif response.status_code == 429:
+            logger.warning(f"OpenRouter rate limited {label}")
+            return busy_response(UpstreamBusy(retry_after_header(response))), None
+        elif response.status_code == 401:
+            logger.error(f"OpenRouter API authentication failed: {response.text}")
+            return JsonResponse({
+                'error': 'API authentication failed. Please check your API key configuration.'
+            }, status=500), None
+        else:
+            logger.error(f"OpenRouter API error: {response.status_code} - {response.text}")
+            return JsonResponse({
+                'error': f'AI service error ({response.status_code}). Please try again.'
+            }, status=500), None
+    except Exception as e:
+        logger.error(f"Unexpected error grading {label}: {e}", exc_info=True)
+        return JsonResponse({
+            'error': 'Unexpected error occurred. Please try again.'
+        }, status=500), None
+
+
+def retry_after_header(response):
+    """
+    Seconds from an upstream Retry-After header, 1 when absent or not a number
+    """
+    try:
+        return max(1, math.ceil(float(response.headers.get('Retry-After', 1))))
+    except (TypeError, ValueError):
+        return 1
+
+
+def async_view(view):
+    """
+    Build an async twin of a sync grading view.
+
+    The view's own validation runs unchanged; when it reaches grade() the
+    OpenRouter call is awaited instead of blocking a worker thread.
+    """
+    @functools.wraps(view)
+    async def wrapper(request, *args, **kwargs):
+        token = _async_mode.set(True)
+        try:
+            response = view(request, *args, **kwargs)
+        finally:
+            _async_mode.reset(token)
+        if inspect.isawaitable(response):
+            response = await response
+        return response
+    # csrf_exempt() would wrap this in a sync function, so set its flag directly
+    wrapper.csrf_exempt = True
+    return wrapper
+
+
+def grading_view(view):
+    """
+    Pick the sync view or its async twin depending on GRADING_ASYNC_VIEWS;
+    either way repeats of a request share one response (idempotency.py)
+    """
+    wrapped = idempotent(async_view(view) if getattr(settings, 'GRADING_ASYNC_VIEWS', False) else view)
+    # Keep the original around for streaming_urlpatterns()
+    wrapped.grading_view = view
+    return wrapped
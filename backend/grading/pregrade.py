@@ -0,0 +1,158 @@
+"""
+Speculative grading of drafts while the student is still typing.
+
+The frontend posts the current draft (debounced) to /api/grading/pregrade/.
+The draft goes through the question's check view in collect mode first, which
+costs no LLM call: drafts that are graded locally, or already cached, need
+nothing more. The rest are queued for a small pool of background workers
+that run the check view for real, so the grade ends up in the grade cache
+(and, while it is being graded, in single-flight) under the draft's
+normalized key. A submit that matches the last draft is then answered from
+there instead of waiting for the LLM.
+
+Pre-grading is low priority. Only the latest draft of each student and
+question is graded; a queued draft that has been superseded is skipped
+(aborted), and so is any draft while the upstream limiter is more than
+GRADING_PREGRADE_MAX_LOAD busy. Drafts shorter than GRADING_PREGRADE_MIN_WORDS
+words are not worth a call. Slots are keyed by the draft_id the frontend
+generates for each answer box (or the student's session), never by address,
+so a class behind one NAT doesn't share a slot.
+
+All of it runs as pregrade traffic (traffic.py): screening, cache lookups and
+local grades of drafts are counted apart from real submits.
+"""
+import logging
+import queue
+import threading
+
+from django.conf import settings
+from django.utils.module_loading import import_string
+
+from .batch import WORKSHEETS
+from .cache import grade_cache
+from .jobs import job_request
+from .limiter import limiter, limiter_enabled
+from .normalize import normalize_answer
+from .pipeline import PendingGrade, _collect_mode, cache_enabled
+from .traffic import pregrading
+
+logger = logging.getLogger(__name__)
+
+# Most latest-draft slots remembered; the oldest are forgotten first
+MAX_SLOTS = 10000
+
+# Longest draft_id accepted
+MAX_DRAFT_ID_LENGTH = 128
+
+STATUSES = ('queued', 'cached', 'local', 'too_short', 'dropped', 'warmed', 'aborted', 'busy', 'failed')
+
+
+def min_words():
+    return getattr(settings, 'GRADING_PREGRADE_MIN_WORDS', 3)
+
+
+def max_load():
+    return getattr(settings, 'GRADING_PREGRADE_MAX_LOAD', 0.5)
+
+
+def pregrade_enabled():
+    return getattr(settings, 'GRADING_PREGRADE', True)
+
+
+def upstream_idle():
+    """
+    Whether the upstream limiter has room for low-priority calls
+    """
+    if not limiter_enabled():
+        return True
+    return limiter.queue_depth == 0 and limiter.in_flight < limiter.slots.concurrency * max_load()
+
+
+class Pregrader:
+    """
+    Warms the grade cache for the latest draft of each student and question
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._queue = None
+        self._latest = {}
+        self._counts = dict.fromkeys(STATUSES, 0)
+
+    def _count(self, status):
+        with self._lock:
+            self._counts[status] += 1
+        return status
+
+    def _start(self):
+        with self._lock:
+            if self._queue is None:
+                self._queue = queue.Queue(maxsize=getattr(settings, 'GRADING_PREGRADE_QUEUE', 50))
+                for i in range(getattr(settings, 'GRADING_PREGRADE_WORKERS', 2)):
+                    threading.Thread(target=self._work, name=f"grading-pregrade-{i}", daemon=True).start()
+        return self._queue
+
+    @pregrading()
+    def submit(self, request, story, question, body, draft_id):
+        """
+        Look at a draft and queue it when it needs the LLM; returns what happened to it
+        """
+        answer = body.get('answer', '')
+        if len(normalize_answer(answer).split()) < min_words():
+            return self._count('too_short')
+
+        view = import_string(WORKSHEETS[story][question])
+        token = _collect_mode.set(True)
+        try:
+            result = view(job_request(body, request.META))
+        finally:
+            _collect_mode.reset(token)
+        if not isinstance(result, PendingGrade):
+            return self._count('local')
+        if cache_enabled() and grade_cache.get(result.key) is not None:
+            return self._count('cached')
+
+        slot = (draft_id, story, question)
+        with self._lock:
+            self._latest.pop(slot, None)
+            self._latest[slot] = result.key
+            if len(self._latest) > MAX_SLOTS:
+                del self._latest[next(iter(self._latest))]
+        try:
+            self._start().put_nowait((slot, result.key, view, body, dict(request.META)))
+        except queue.Full:
+            return self._count('dropped')
+        return self._count('queued')
+
+    def _work(self):
+        while True:
+            slot, key, view, body, meta = self._queue.get()
+            try:
+                self._count(self._pregrade(slot, key, view, body, meta))
+            except Exception as e:
+                logger.error(f"Pre-grading failed for {slot[1]} Q{slot[2]}: {e}", exc_info=True)
+                self._count('failed')
+            finally:
+                self._queue.task_done()
+
+    @pregrading()
+    def _pregrade(self, slot, key, view, body, meta):
+        with self._lock:
+            if self._latest.get(slot) != key:
+                return 'aborted'
+        if cache_enabled() and grade_cache.get(key) is not None:
+            return 'cached'
+        if not upstream_idle():
+            return 'busy'
+        response = view(job_request(body, meta))
+        logger.debug(f"Pre-graded a {slot[1]} Q{slot[2]} draft: {response.status_code}")
+        return 'warmed' if response.status_code == 200 else 'failed'
+
+    def stats(self):
+        with self._lock:
+            counts = dict(self._counts)
+            depth = self._queue.qsize() if self._queue is not None else 0
+        return {'enabled': pregrade_enabled(), 'queue_depth': depth, **counts}
+
+
+pregrader = Pregrader()
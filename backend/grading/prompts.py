@@ -0,0 +1,71 @@
+"""
+Payload builder for the grading prompts.
+
+Each question's rubric, story facts and JSON format live in one static system
+prompt, and the student's answer only appears in the final user message. The
+system message is therefore byte-identical for every answer to a question,
+which lets the provider reuse its cached prefix. Cached-prefix token counts
+reported back in `usage` are logged and totalled per question.
+"""
+import logging
+import threading
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_MODEL = "openai/gpt-4o-mini"
+DEFAULT_TEMPERATURE = 0.3
+
+
+def build_payload(system_prompt, user_message, max_tokens, model=DEFAULT_MODEL,
+                  temperature=DEFAULT_TEMPERATURE, **options):
+    """
+    OpenRouter payload: the static system prompt first, the answer last
+    """
+    return {
+        "model": model,
+        "messages": [
+            {"role": "system", "content": system_prompt},
+            {"role": "user", "content": user_message},
+        ],
+        "temperature": temperature,
+        "max_tokens": max_tokens,
+        **options,
+    }
+
+
+class UsageStats:
+    """
+    Prompt, cached-prefix and completion token totals per question
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._totals = {}
+
+    def record(self, label, body):
+        usage = (body or {}).get('usage') or {}
+        if not usage:
+            return
+        prompt_tokens = usage.get('prompt_tokens') or 0
+        cached_tokens = (usage.get('prompt_tokens_details') or {}).get('cached_tokens') or 0
+        completion_tokens = usage.get('completion_tokens') or 0
+        logger.info(f"{label} usage: {prompt_tokens} prompt tokens ({cached_tokens} cached), "
+                    f"{completion_tokens} completion tokens")
+        with self._lock:
+            totals = self._totals.setdefault(label, {'calls': 0, 'prompt_tokens': 0, 'cached_tokens': 0,
+                                                     'completion_tokens': 0})
+            totals['calls'] += 1
+            totals['prompt_tokens'] += prompt_tokens
+            totals['cached_tokens'] += cached_tokens
+            totals['completion_tokens'] += completion_tokens
+
+    def stats(self):
+        with self._lock:
+            questions = {label: dict(totals) for label, totals in self._totals.items()}
+        for totals in questions.values():
+            prompt_tokens = totals['prompt_tokens']
+            totals['cached_ratio'] = round(totals['cached_tokens'] / prompt_tokens, 4) if prompt_tokens else 0.0
+        return questions
+
+
+usage_stats = UsageStats()
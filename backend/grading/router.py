@@ -0,0 +1,386 @@
+"""
+Model router: which LLM backend grades which question.
+
+GRADING_LLM_BACKENDS names the backends: OpenRouter (through client.py and
+its key pool) or any OpenAI-compatible chat completions server, such as a
+llama.cpp server on the same host. GRADING_ROUTES gives each question an
+ordered list of backends, e.g.
+
+    GRADING_ROUTES="goldilocks Q3=local,openrouter; peter Q1=local,openrouter"
+
+and every other call uses GRADING_DEFAULT_ROUTE. A call goes to the first
+healthy backend of its route and fails over to the next one on a network
+error, a timeout or an error status. A backend that failed, or whose p95
+latency is above GRADING_ROUTER_MAX_LATENCY, is tried last for
+GRADING_ROUTER_COOLDOWN seconds.
+
+Every backend has its own circuit breaker (breaker.py), which sees only the
+calls made to that backend. A backend whose breaker is open is left out of its
+routes until the breaker lets a probe through; a route with no backend left is
+not available, and answers go to their fallback graders.
+"""
+import contextlib
+import logging
+import threading
+import time
+from collections import deque
+
+import httpx
+import requests
+from django.conf import settings
+
+from . import client
+from .breaker import breaker_enabled, build_breaker, percentile
+
+logger = logging.getLogger(__name__)
+
+# Latencies kept per backend for its percentiles
+LATENCY_SAMPLES = 200
+
+# Statuses that are the request's own fault; another backend would refuse it too
+NO_FAILOVER_STATUSES = (400,)
+
+
+class Backend:
+    """
+    An OpenAI-compatible chat completions endpoint
+    """
+
+    def __init__(self, name, url=None, model=None, api_key=None):
+        self.name = name
+        self.url = url
+        self.model = model
+        self.api_key = api_key
+        self.breaker = build_breaker(name)
+        self._lock = threading.Lock()
+        self._latencies = deque(maxlen=LATENCY_SAMPLES)
+        self.calls = 0
+        self.failures = 0
+        self.failed_at = 0.0
+
+    def available(self):
+        return bool(self.url)
+
+    def ready(self):
+        """
+        Available, and not shut off by an open circuit breaker
+        """
+        return self.available() and (not breaker_enabled() or self.breaker.ready())
+
+    def admit(self):
+        """
+        Take the breaker's permission for one call (a half-open probe included)
+        """
+        return not breaker_enabled() or self.breaker.allow()
+
+    def prepare(self, payload):
+        return dict(payload, model=self.model) if self.model else payload
+
+    def headers(self, title=None):
+        headers = {"Content-Type": "application/json"}
+        if self.api_key:
+            headers["Authorization"] = f"Bearer {self.api_key}"
+        if title:
+            headers["X-Title"] = title
+        return headers
+
+    def post(self, payload, title=None, timeout=client.REQUEST_TIMEOUT):
+        return client.get_session().post(self.url, headers=self.headers(title), json=self.prepare(payload),
+                                         timeout=timeout)
+
+    def post_stream(self, payload, title=None, timeout=client.REQUEST_TIMEOUT):
+        return client.get_session().post(self.url, headers=self.headers(title),
+                                         json=dict(self.prepare(payload), stream=True), timeout=timeout, stream=True)
+
+    async def apost(self, payload, title=None, timeout=client.REQUEST_TIMEOUT):
+        return await client.get_async_client().post(self.url, headers=self.headers(title),
+                                                     json=self.prepare(payload), timeout=timeout)
+
+    def apost_stream(self, payload, title=None, timeout=client.REQUEST_TIMEOUT):
+        return client.get_async_client().stream('POST', self.url, headers=self.headers(title),
+                                                json=dict(self.prepare(payload), stream=True), timeout=timeout)
+
+    def record(self, ok, latency=None):
+        with self._lock:
+            self.calls += 1
+            if ok:
+                self._latencies.append(latency)
+            else:
+                self.failures += 1
+                self.failed_at = time.monotonic()
+
+    def healthy(self, cooldown, max_latency=None):
+        with self._lock:
+            if time.monotonic() - self.failed_at < cooldown:
+                return False
+            if max_latency:
+                p95 = percentile(list(self._latencies), 95)
+                return p95 is None or p95 <= max_latency
+            return True
+
+    def stats(self):
+        with self._lock:
+            latencies = list(self._latencies)
+            return {
+                'url': self.url,
+                'model': self.model,
+                'available': self.available(),
+                'calls': self.calls,
+                'failures': self.failures,
+                'p50': percentile(latencies, 50),
+                'p95': percentile(latencies, 95),
+            }
+
+
+class OpenRouterBackend(Backend):
+    """
+    OpenRouter through the shared client and its API key pool
+    """
+
+    def __init__(self, name, model=None, **kwargs):
+        super().__init__(name, url=client.OPENROUTER_URL, model=model)
+
+    def available(self):
+        return bool(client.get_api_key())
+
+    def post(self, payload, title=None, timeout=client.REQUEST_TIMEOUT):
+        return client.post(self.prepare(payload), title=title, timeout=timeout)
+
+    def post_stream(self, payload, title=None, timeout=client.REQUEST_TIMEOUT):
+        return client.post_stream(self.prepare(payload), title=title, timeout=timeout)
+
+    async def apost(self, payload, title=None, timeout=client.REQUEST_TIMEOUT):
+        return await client.apost(self.prepare(payload), title=title, timeout=timeout)
+
+    def apost_stream(self, payload, title=None, timeout=client.REQUEST_TIMEOUT):
+        return client.apost_stream(self.prepare(payload), title=title, timeout=timeout)
+
+
+BACKEND_TYPES = {
+    'openrouter': OpenRouterBackend,
+    'openai': Backend,
+}
+
+
+def parse_routes(routes):
+    """
+    {label: [backend, ...]} from "label=a,b; label=c" (a dict is returned as is)
+    """
+    if isinstance(routes, dict):
+        return routes
+    parsed = {}
+    for entry in (routes or '').split(';'):
+        label, _, names = entry.partition('=')
+        if label.strip() and names.strip():
+            parsed[label.strip()] = [name.strip() for name in names.split(',') if name.strip()]
+    return parsed
+
+
+def _fails_over(response):
+    return response.status_code != 200 and response.status_code not in NO_FAILOVER_STATUSES
+
+
+class ModelRouter:
+    def __init__(self, backends, routes, default_route, cooldown=30, max_latency=None):
+        self.backends = backends
+        self.routes = routes
+        self.default_route = default_route
+        self.cooldown = cooldown
+        self.max_latency = max_latency
+        self._lock = threading.Lock()
+        self.failovers = 0
+
+    def candidates(self, label):
+        """
+        The route's available backends whose breaker is not open, healthy ones first
+        """
+        names = self.routes.get(label) or self.default_route
+        route = [self.backends[name] for name in names if name in self.backends]
+        route = [backend for backend in route if backend.ready()]
+        healthy = [backend for backend in route if backend.healthy(self.cooldown, self.max_latency)]
+        return healthy + [backend for backend in route if backend not in healthy]
+
+    def available(self, label):
+        return bool(self.candidates(label))
+
+    def primary(self, label):
+        """
+        The backend a call for this question goes to first, or None
+        """
+        candidates = self.candidates(label)
+        return candidates[0] if candidates else None
+
+    def _failed_over(self, label, backend, reason):
+        with self._lock:
+            self.failovers += 1
+        logger.warning(f"LLM backend {backend.name} failed for {label} ({reason}), failing over")
+
+    def post(self, label, payload, title=None, timeout=None):
+        """
+        Blocking call on the route's backends in turn, each timed out after its own adaptive
+        timeout unless one is given. Raises requests.RequestException when all fail.
+        """
+        candidates = self.candidates(label)
+        error = None
+        for index, backend in enumerate(candidates):
+            last = index == len(candidates) - 1
+            if not backend.admit():
+                continue
+            started = time.monotonic()
+            try:
+                with backend.breaker.call(label) as call:
+                    response = backend.post(payload, title=title,
+                                            timeout=timeout or backend.breaker.timeout_for(label))
+                    call.status_code = response.status_code
+            except requests.RequestException as e:
+                backend.record(False)
+                error = e
+                if not last:
+                    self._failed_over(label, backend, e)
+                continue
+            if _fails_over(response):
+                backend.record(False)
+                if not last:
+                    self._failed_over(label, backend, f"status {response.status_code}")
+                    continue
+            else:
+                backend.record(True, time.monotonic() - started)
+            return response
+        raise error or requests.ConnectionError(f"No LLM backend available for {label}")
+
+    async def apost(self, label, payload, title=None, timeout=None):
+        """
+        Non-blocking twin of post(). Raises httpx.HTTPError when all backends fail.
+        """
+        candidates = self.candidates(label)
+        error = None
+        for index, backend in enumerate(candidates):
+            last = index == len(candidates) - 1
+            if not backend.admit():
+                continue
+            started = time.monotonic()
+            try:
+                with backend.breaker.call(label) as call:
+                    response = await backend.apost(payload, title=title,
+                                                   timeout=timeout or backend.breaker.timeout_for(label))
+                    call.status_code = response.status_code
+            except httpx.HTTPError as e:
+                backend.record(False)
+                error = e
+                if not last:
+                    self._failed_over(label, backend, e)
+                continue
+            if _fails_over(response):
+                backend.record(False)
+                if not last:
+                    self._failed_over(label, backend, f"status {response.status_code}")
+                    continue
+            else:
+                backend.record(True, time.monotonic() - started)
+            return response
+        raise error or httpx.ConnectError(f"No LLM backend available for {label}")
+
+    def post_stream(self, label, payload, title=None, timeout=None):
+        """
+        Streamed call; fails over until a backend answers the request with 200.
+        The breakers time the response headers, apart from full-completion latencies.
+        """
+        candidates = self.candidates(label)
+        key = f"{label} stream"
+        error = None
+        for index, backend in enumerate(candidates):
+            last = index == len(candidates) - 1
+            if not backend.admit():
+                continue
+            started = time.monotonic()
+            try:
+                with backend.breaker.call(key) as call:
+                    response = backend.post_stream(payload, title=title,
+                                                   timeout=timeout or backend.breaker.timeout_for(key))
+                    call.status_code = response.status_code
+            except requests.RequestException as e:
+                backend.record(False)
+                error = e
+                if not last:
+                    self._failed_over(label, backend, e)
+                continue
+            if _fails_over(response):
+                backend.record(False)
+                if not last:
+                    response.close()
+                    self._failed_over(label, backend, f"status {response.status_code}")
+                    continue
+            else:
+                backend.record(True, time.monotonic() - started)
+            return response
+        raise error or requests.ConnectionError(f"No LLM backend available for {label}")
+
+    @contextlib.asynccontextmanager
+    async def apost_stream(self, label, payload, title=None, timeout=None):
+        """
+        Async twin of post_stream(); use as `async with router.apost_stream(...) as response`
+        """
+        candidates = self.candidates(label)
+        key = f"{label} stream"
+        error = None
+        for index, backend in enumerate(candidates):
+            last = index == len(candidates) - 1
+            if not backend.admit():
+                continue
+            started = time.monotonic()
+            stack = contextlib.AsyncExitStack()
+            try:
+                with backend.breaker.call(key) as call:
+                    response = await stack.enter_async_context(backend.apost_stream(
+                        payload, title=title, timeout=timeout or backend.breaker.timeout_for(key)))
+                    call.status_code = response.status_code
+            except httpx.HTTPError as e:
+                await stack.aclose()
+                backend.record(False)
+                error = e
+                if not last:
+                    self._failed_over(label, backend, e)
+                continue
+            if _fails_over(response):
+                backend.record(False)
+                if not last:
+                    await stack.aclose()
+                    self._failed_over(label, backend, f"status {response.status_code}")
+                    continue
+            else:
+                backend.record(True, time.monotonic() - started)
+            async with stack:
+                yield response
+            return
+        raise error or httpx.ConnectError(f"No LLM backend available for {label}")
+
+    def stats(self):
+        with self._lock:
+            failovers = self.failovers
+        return {
+            'routes': self.routes,
+            'default_route': self.default_route,
+            'failovers': failovers,
+            'backends': {name: backend.stats() for name, backend in self.backends.items()},
+        }
+
+    def breaker_stats(self):
+        return {name: backend.breaker.stats() for name, backend in self.backends.items()}
+
+
+def build_router():
+    backends = {}
+    for name, options in getattr(settings, 'GRADING_LLM_BACKENDS', {'openrouter': {'type': 'openrouter'}}).items():
+        options = dict(options)
+        backend_type = BACKEND_TYPES[options.pop('type', 'openai')]
+        backends[name] = backend_type(name, **options)
+    return ModelRouter(
+        backends,
+        parse_routes(getattr(settings, 'GRADING_ROUTES', {})),
+        parse_routes(f"default={getattr(settings, 'GRADING_DEFAULT_ROUTE', 'openrouter')}")['default'],
+        cooldown=getattr(settings, 'GRADING_ROUTER_COOLDOWN', 30),
+        max_latency=getattr(settings, 'GRADING_ROUTER_MAX_LATENCY', None),
+    )
+
+
+router = build_router()
@@ -0,0 +1,238 @@
+"""
+Deterministic fast path for closed-answer questions (title, author, genre).
+
+Each answer is normalized, small misspellings are corrected against the
+story's vocabulary ("Goldilox" -> "goldilocks", "Poter" -> "potter"), and the
+result is looked up in a table of known answer forms. A known form is graded
+locally by the question's existing fallback grader; anything else is left for
+the LLM.
+"""
+import json
+import logging
+import threading
+
+from .normalize import normalize_answer
+
+logger = logging.getLogger(__name__)
+
+# Words that never change the grade of a closed answer
+IGNORED_WORDS = {'the', 'a', 'an', 'and', 'of', 'by', 'is', 'it', 'its', 'was', 'written', 'i', 'think'}
+
+# Known answer forms per (story, question): normalized content words -> the
+# canonical answer handed to the question's fallback grader
+CLOSED_ANSWERS = {
+    ('goldilocks', 1): {
+        'goldilocks three bears': 'Goldilocks and the Three Bears',
+        'goldilocks bears': 'Goldilocks and the Bears',
+        'goldilocks': 'Goldilocks',
+        'three bears': 'The Three Bears',
+    },
+    ('goldilocks', 2): {
+        'unknown': 'Unknown',
+        'unknown author': 'Unknown author',
+        'anonymous': 'Anonymous',
+        'traditional': 'Traditional',
+        'traditional story': 'Traditional story',
+        'traditional folk tale': 'Traditional folk tale',
+        'traditional tale': 'Traditional tale',
+        'folk tale': 'Folk tale',
+        'fairy tale': 'Fairy tale',
+        'oral tradition': 'Oral tradition',
+        'no author': 'No author',
+        'robert southey': 'Robert Southey',
+        'southey': 'Southey',
+        'dr seuss': 'Dr. Seuss',
+        'roald dahl': 'Roald Dahl',
+        'j k rowling': 'J.K. Rowling',
+        'jk rowling': 'J.K. Rowling',
+        'disney': 'Disney',
+        'brothers grimm': 'Brothers Grimm',
+        'hans christian andersen': 'Hans Christian Andersen',
+    },
+    ('goldilocks', 3): {
+        'fiction': 'Fiction',
+        'non fiction': 'Non-Fiction',
+        'nonfiction': 'Non-Fiction',
+    },
+    ('peter', 1): {
+        'tale peter rabbit': 'The Tale of Peter Rabbit',
+        'peter rabbit': 'Peter Rabbit',
+        'peter': 'Peter',
+    },
+    ('peter', 2): {
+        'beatrix potter': 'Beatrix Potter',
+        'beatrix': 'Beatrix',
+        'potter': 'Potter',
+        'dr seuss': 'Dr. Seuss',
+        'roald dahl': 'Roald Dahl',
+        'j k rowling': 'J.K. Rowling',
+        'jk rowling': 'J.K. Rowling',
+        'disney': 'Disney',
+        'brothers grimm': 'Brothers Grimm',
+        'hans christian andersen': 'Hans Christian Andersen',
+        'unknown': 'Unknown',
+        'anonymous': 'Anonymous',
+        "don't know": "I don't know",
+        'not sure': 'Not sure',
+    },
+    ('peter', 3): {
+        'fiction': 'Fiction',
+        "children's fiction": "Children's fiction",
+        'fairy tale': 'Fairy tale',
+        'non fiction': 'Non-fiction',
+        'nonfiction': 'Non-fiction',
+    },
+}
+
+# Other words from each story. Answers using them exactly are never
+# "corrected", so "Peter" is not turned into "potter".
+STORY_VOCABULARY = {
+    'goldilocks': {
+        'goldilocks', 'three', 'bears', 'bear', 'papa', 'mama', 'baby', 'porridge',
+        'traditional', 'folk', 'tale', 'fairy', 'unknown', 'anonymous', 'author',
+        'oral', 'tradition', 'robert', 'southey', 'fiction', 'nonfiction', 'story',
+    },
+    'peter': {
+        'peter', 'rabbit', 'tale', 'beatrix', 'potter', 'mcgregor',
+        'fiction', 'nonfiction', 'fairy', 'children', 'story', 'flopsy', 'mopsy',
+        'cottontail', 'garden',
+    },
+}
+
+
+def edit_distance(a, b, limit):
+    """
+    Damerau-Levenshtein (optimal string alignment) distance, or limit + 1 once it is exceeded
+    """
+    if abs(len(a) - len(b)) > limit:
+        return limit + 1
+    previous2 = None
+    previous = list(range(len(b) + 1))
+    for i in range(1, len(a) + 1):
+        current = [i] + [0] * len(b)
+        for j in range(1, len(b) + 1):
+            cost = 0 if a[i - 1] == b[j - 1] else 1
+            current[j] = min(previous[j] + 1, current[j - 1] + 1, previous[j - 1] + cost)
+            if i > 1 and j > 1 and a[i - 1] == b[j - 2] and a[i - 2] == b[j - 1]:
+                current[j] = min(current[j], previous2[j - 2] + 1)
+        if min(current) > limit:
+            return limit + 1
+        previous2, previous = previous, current
+    return previous[-1]
+
+
+def allowed_distance(word):
+    # Short words must match exactly; longer names tolerate more slips
+    if len(word) <= 3:
+        return 0
+    return max(1, len(word) // 3)
+
+
+def correct_word(word, vocabulary):
+    """
+    Return the single closest vocabulary word within the allowed distance, or None
+    """
+    if word in vocabulary:
+        return word
+    best, best_distance, tied = None, None, False
+    for candidate in vocabulary:
+        limit = allowed_distance(candidate)
+        distance = edit_distance(word, candidate, limit)
+        if distance > limit:
+            continue
+        if best_distance is None or distance < best_distance:
+            best, best_distance, tied = candidate, distance, False
+        elif distance == best_distance:
+            tied = True
+    return None if tied else best
+
+
+class FastPathGrader:
+    """
+    Grades known closed answers locally and counts how often it could
+    """
+
+    def __init__(self, closed_answers, vocabulary):
+        self.closed_answers = closed_answers
+        self.vocabulary = vocabulary
+        self._words = {}
+        self._graded = {}
+        self._corrections = {}
+        self._lock = threading.Lock()
+        self.answered = 0
+        self.escalated = 0
+
+    def _form_words(self, story, question):
+        words = self._words.get((story, question))
+        if words is None:
+            words = {word for form in self.closed_answers[(story, question)] for word in form.split()}
+            self._words[(story, question)] = words
+        return words
+
+    def _correct(self, story, question, word, form_words):
+        key = (story, question, word)
+        corrected = self._corrections.get(key)
+        if corrected is None:
+            corrected = correct_word(word, form_words) or word
+            if len(self._corrections) >= 50000:
+                self._corrections.clear()
+            self._corrections[key] = corrected
+        return corrected
+
+    def handles(self, story, question):
+        return (story, question) in self.closed_answers
+
+    def grade(self, story, question, user_answer, fallback, count=True):
+        """
+        Return a response dict for a confidently graded answer, or None to escalate.
+        count=False leaves the answered/escalated counters alone (shadow runs).
+        """
+        forms = self.closed_answers.get((story, question))
+        if not forms or fallback is None or not isinstance(user_answer, str):
+            return None
+
+        known_words = self.vocabulary.get(story, set())
+        form_words = self._form_words(story, question)
+        original_words = user_answer.split()
+        content, misspelled = [], []
+        for word in normalize_answer(user_answer).split():
+            if word in IGNORED_WORDS:
+                continue
+            corrected = word if word in known_words else self._correct(story, question, word, form_words)
+            if corrected != word:
+                misspelled.extend(w.strip('.,!?;:"') for w in original_words
+                                  if normalize_answer(w) == word)
+            content.append(corrected)
+
+        canonical = forms.get(' '.join(content))
+        if canonical is None:
+            if count:
+                with self._lock:
+                    self.escalated += 1
+            return None
+
+        # The fallback graders are deterministic, so grade each canonical answer once
+        graded = self._graded.get((story, question, canonical))
+        if graded is None:
+            graded = json.loads(fallback(canonical).content)
+            if graded.get('feedback_type') == 'error':
+                return None
+            self._graded[(story, question, canonical)] = graded
+        result = dict(graded, misspelled_words=misspelled)
+        if count:
+            with self._lock:
+                self.answered += 1
+        logger.debug(f"Fast path graded {story} Q{question}: {user_answer!r} as {canonical!r}")
+        return result
+
+    def stats(self):
+        with self._lock:
+            seen = self.answered + self.escalated
+            return {
+                'answered': self.answered,
+                'escalated': self.escalated,
+                'coverage': round(self.answered / seen, 4) if seen else 0.0,
+            }
+
+
+fast_path = FastPathGrader(CLOSED_ANSWERS, STORY_VOCABULARY)
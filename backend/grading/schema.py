@@ -0,0 +1,266 @@
+"""
+Structured output and reply validation for the grading prompts.
+
+Each question has a ReplySchema: with GRADING_STRUCTURED_OUTPUT on, its JSON
+schema is sent as the payload's response_format, and every reply goes through
+its validator, which repairs near misses locally (text around the JSON object,
+"result" for "message", missing or stringly-typed fields) rather than throwing
+the round trip away. Replies that can't be repaired are counted per question.
+With GRADING_LOCAL_SPELLING on, the spelling task is left out of the prompt and
+the schema, and misspelled_words is filled in by spelling.py.
+"""
+import json
+import re
+import threading
+from functools import lru_cache
+
+from django.conf import settings
+
+from .spelling import local_spelling_enabled, strip_spelling_task
+from .templates import compact_template
+
+# Feedback types each question's prompt allows
+INCORRECT_SCALE = ('excellent', 'good', 'partial', 'incorrect')
+IMPROVEMENT_SCALE = ('excellent', 'good', 'partial', 'needs_improvement')
+
+FEEDBACK_TYPES = {
+    ('goldilocks', 1): INCORRECT_SCALE,
+    ('goldilocks', 2): INCORRECT_SCALE,
+    ('goldilocks', 3): INCORRECT_SCALE,
+    ('goldilocks', 4): IMPROVEMENT_SCALE,
+    ('goldilocks', 5): IMPROVEMENT_SCALE,
+    ('goldilocks', 6): IMPROVEMENT_SCALE,
+    ('goldilocks', 7): IMPROVEMENT_SCALE,
+    ('peter', 1): INCORRECT_SCALE,
+    ('peter', 2): INCORRECT_SCALE,
+    ('peter', 3): INCORRECT_SCALE,
+    ('peter', 4): INCORRECT_SCALE,
+    ('peter', 5): IMPROVEMENT_SCALE,
+    ('peter', 6): INCORRECT_SCALE,
+    ('peter', 7): IMPROVEMENT_SCALE,
+    ('peter', 8): INCORRECT_SCALE,
+    ('peter', 9): INCORRECT_SCALE,
+    ('peter', 10): INCORRECT_SCALE,
+    ('peter', 11): INCORRECT_SCALE,
+    ('peter', 12): IMPROVEMENT_SCALE,
+    ('peter', 13): IMPROVEMENT_SCALE,
+    ('peter', 14): IMPROVEMENT_SCALE,
+}
+
+# Spellings of feedback types seen in near-miss replies
+FEEDBACK_ALIASES = {
+    'correct': 'excellent',
+    'great': 'excellent',
+    'partially_correct': 'partial',
+    'wrong': 'incorrect',
+    'needs_work': 'needs_improvement',
+    'improvement': 'needs_improvement',
+}
+
+_FENCE = re.compile(r'^```(?:json)?\s*|\s*```$')
+_WORD_SEPARATORS = re.compile(r'[,;\s]+')
+_decoder = json.JSONDecoder()
+
+
+def structured_output_enabled():
+    return getattr(settings, 'GRADING_STRUCTURED_OUTPUT', True)
+
+
+def _extract(text):
+    """
+    (object, clean): the first JSON object in text, and whether text was nothing but that object
+    """
+    stripped = text.strip()
+    unfenced = _FENCE.sub('', stripped)
+    start = unfenced.find('{')
+    if start < 0:
+        raise ValueError("No JSON object in reply")
+    value, end = _decoder.raw_decode(unfenced, start)
+    if not isinstance(value, dict):
+        raise ValueError("Reply is not a JSON object")
+    return value, unfenced == stripped and start == 0 and end == len(unfenced)
+
+
+def extract_json(text):
+    """
+    The first JSON object in text, ignoring code fences and any text around it.
+    Raises ValueError when there is none.
+    """
+    return _extract(text)[0]
+
+
+def _bool(value):
+    if isinstance(value, bool):
+        return value
+    if isinstance(value, str) and value.strip().lower() in ('true', 'false', 'yes', 'no'):
+        return value.strip().lower() in ('true', 'yes')
+    return None
+
+
+def _words(value):
+    if isinstance(value, str):
+        return [word for word in _WORD_SEPARATORS.split(value) if word]
+    if isinstance(value, list):
+        return [word for word in value if isinstance(word, str) and word]
+    return []
+
+
+def _feedback_type(value, allowed):
+    if not isinstance(value, str):
+        raise ValueError("Missing feedback type")
+    feedback_type = re.sub(r'[\s-]+', '_', value.strip().lower())
+    feedback_type = FEEDBACK_ALIASES.get(feedback_type, feedback_type)
+    if feedback_type not in allowed:
+        raise ValueError(f"Unknown feedback type {value!r}")
+    return feedback_type
+
+
+class ParseStats:
+    """
+    Replies, locally repaired replies and unusable replies per question
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._counts = {}
+
+    def add(self, label, outcome):
+        with self._lock:
+            counts = self._counts.setdefault(label, {'replies': 0, 'repaired': 0, 'failed': 0})
+            counts['replies'] += 1
+            if outcome != 'valid':
+                counts[outcome] += 1
+
+    def stats(self):
+        with self._lock:
+            questions = {label: dict(counts) for label, counts in self._counts.items()}
+        for counts in questions.values():
+            counts['parse_failure_rate'] = round(counts['failed'] / counts['replies'], 4)
+        return {'enabled': structured_output_enabled(), 'questions': questions}
+
+
+parse_stats = ParseStats()
+
+
+class ReplySchema:
+    """
+    Expected reply of one question: the full grade, or compact codes when the
+    question has a CompactTemplate
+    """
+
+    def __init__(self, label, feedback_types, template=None, story=None, question=None, local_spelling=False):
+        self.label = label
+        self.feedback_types = feedback_types
+        self.template = template
+        self.story = story
+        self.question = question
+        self.local_spelling = local_spelling
+
+    def json_schema(self):
+        words = {'type': 'array', 'items': {'type': 'string'}}
+        if self.template is not None:
+            properties = {
+                'f': {'type': 'string', 'enum': self.template.feedback_types},
+                'm': {'type': 'array', 'items': {'type': 'string', 'enum': list(self.template.items)}},
+            }
+            if not self.local_spelling:
+                properties['s'] = words
+        else:
+            properties = {
+                # Verdict first, as streaming.STREAM_KEY_ORDER asks
+                'feedback_type': {'type': 'string', 'enum': list(self.feedback_types)},
+                'isCorrect': {'type': 'boolean'},
+                'show_answer': {'type': 'boolean'},
+                'message': {'type': 'string'},
+                'correct_answer': {'type': ['string', 'null']},
+            }
+            if not self.local_spelling:
+                properties['misspelled_words'] = words
+        return {
+            'type': 'object',
+            'properties': properties,
+            'required': list(properties),
+            'additionalProperties': False,
+        }
+
+    def response_format(self):
+        name = re.sub(r'\W+', '_', self.label.lower())
+        return {
+            'type': 'json_schema',
+            'json_schema': {'name': f"{name}_grade", 'strict': True, 'schema': self.json_schema()},
+        }
+
+    def payload(self, payload):
+        """
+        The question's payload with local spelling, compact output and structured output applied, as enabled
+        """
+        if self.local_spelling:
+            messages = [dict(message) for message in payload['messages']]
+            messages[0]['content'] = strip_spelling_task(messages[0]['content'])
+            payload = dict(payload, messages=messages)
+        if self.template is not None:
+            payload = self.template.payload(payload, spelling=not self.local_spelling)
+        if structured_output_enabled():
+            payload = dict(payload, response_format=self.response_format())
+        return payload
+
+    def normalize(self, reply):
+        """
+        Repair a decoded reply into the expected shape; returns (reply, repaired).
+        Raises ValueError when that isn't possible.
+        """
+        reply = dict(reply)
+        before = dict(reply)
+        if self.template is not None:
+            reply['f'] = _feedback_type(reply.pop('f', reply.pop('feedback_type', None)),
+                                        self.template.feedback_types)
+            reply['m'] = _words(reply.get('m'))
+            reply['s'] = _words(reply.get('s', reply.pop('misspelled_words', None)))
+            return reply, reply != before
+
+        if not reply.get('message') and isinstance(reply.get('result'), str):
+            reply['message'] = reply.pop('result')
+        if not isinstance(reply.get('message'), str) or not reply['message'].strip():
+            raise ValueError("Missing feedback message")
+        reply['feedback_type'] = _feedback_type(reply.get('feedback_type'), self.feedback_types)
+        is_correct = _bool(reply.get('isCorrect'))
+        reply['isCorrect'] = reply['feedback_type'] in ('excellent', 'good') if is_correct is None else is_correct
+        show_answer = _bool(reply.get('show_answer'))
+        reply['show_answer'] = not reply['isCorrect'] if show_answer is None else show_answer
+        reply['misspelled_words'] = _words(reply.get('misspelled_words'))
+        if reply.get('correct_answer') is None:
+            reply.pop('correct_answer', None)
+        return reply, reply != before
+
+    def validate(self, reply, clean=True):
+        """
+        normalize() plus the per-question parse counters
+        """
+        try:
+            reply, repaired = self.normalize(reply)
+        except ValueError:
+            parse_stats.add(self.label, 'failed')
+            raise
+        parse_stats.add(self.label, 'valid' if clean and not repaired else 'repaired')
+        return reply
+
+    def parse(self, text):
+        """
+        Decode and validate a reply's text; raises ValueError when it is unusable
+        """
+        try:
+            reply, clean = _extract(text)
+        except ValueError:
+            parse_stats.add(self.label, 'failed')
+            raise
+        return self.validate(reply, clean)
+
+
+@lru_cache(maxsize=None)
+def _reply_schema(story, question, template, local_spelling):
+    return ReplySchema(f"{story} Q{question}", FEEDBACK_TYPES.get((story, question), IMPROVEMENT_SCALE), template,
+                       story, question, local_spelling)
+
+
+def reply_schema(story, question):
+    return _reply_schema(story, question, compact_template(story, question), local_spelling_enabled())
@@ -0,0 +1,263 @@
+"""
+Screening of answers before they reach the LLM.
+
+grade() runs every answer the local graders could not settle through
+screen(). Answers that are far too long, that look like keyboard mashing or
+that talk about another book get the matching guidance response at once.
+Each one is counted as a saved LLM call.
+
+Mashing is told apart by the shape of the words, not by whether they are in
+the dictionary, so rare but real words ("Folklore", "Trespassing") are never
+screened out. A word that is not in the word list is mashed when it has no vowel,
+runs along a keyboard row ("asdf", "poiuy"), repeats a short pattern
+("sdfsdf", "kdkdk"), piles up consonants, or has letter pairs that hardly
+occur in English ("dfkj"). An answer is gibberish when most of its words are
+mashed, or when a longer one has very low character entropy.
+
+Oversized request bodies are turned away earlier, by
+RequestSizeLimitMiddleware.
+"""
+import logging
+import math
+import re
+import threading
+from collections import Counter
+from functools import lru_cache
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.http import JsonResponse
+
+from .phonetic import normalize_spoken
+from .spelling import SPELLING_VOCABULARY, spell_index
+from .traffic import is_pregrade
+
+logger = logging.getLogger(__name__)
+
+# An answer is gibberish when more than this share of its words are mashed
+MAX_MASHED_RATIO = 0.5
+
+# Keyboard rows; this many keys in a row along one of them is mashing ("asdf")
+KEYBOARD_ROWS = ('qwertyuiop', 'asdfghjkl', 'zxcvbnm')
+MIN_KEYBOARD_RUN = 4
+
+# Consonants in a row that don't occur in English words
+MIN_CONSONANT_RUN = 5
+
+# Letter pairs found in fewer common words than this are rare; a word with
+# MIN_RARE_PAIRS of them is mashing
+RARE_PAIR_WORDS = 3
+MIN_RARE_PAIRS = 2
+
+# Bits per letter below which a longer answer is repetition ("aaaaaaaaaaaa", "lololololol")
+MIN_ENTROPY = 2.0
+MIN_ENTROPY_LETTERS = 12
+
+# Names that place an answer in one book
+STORY_NAMES = {
+    'goldilocks': {'goldilocks', 'southey', 'porridge'},
+    'peter': {'peter', 'mcgregor', "mcgregor's", 'beatrix', 'potter', 'flopsy', 'mopsy', 'cottontail'},
+}
+OTHER_BOOK_NAMES = {
+    'cinderella', 'rapunzel', 'pinocchio', 'hansel', 'gretel', 'rumpelstiltskin', 'shrek', 'elsa', 'harry',
+    'hermione', 'gruffalo', 'matilda', 'paddington', 'pooh',
+}
+
+_WORD = re.compile(r"[A-Za-z]+(?:'[A-Za-z]+)?")
+
+MESSAGES = {
+    'too_long': "That's a very long answer! Please answer the question in a few sentences.",
+    'gibberish': "Hmm, I couldn't understand that answer. Please try writing it again using real words.",
+    'off_topic': "That sounds like a different story! Think about {book} and try again.",
+}
+BOOK_TITLES = {'goldilocks': '"Goldilocks and the Three Bears"', 'peter': '"The Tale of Peter Rabbit"'}
+
+
+def entropy(text):
+    """
+    Shannon entropy of the letters of text, in bits per letter
+    """
+    letters = [char for char in text.lower() if char.isalpha()]
+    if not letters:
+        return 0.0
+    total = len(letters)
+    return -sum(count / total * math.log2(count / total) for count in Counter(letters).values())
+
+
+_VOWELS = set('aeiouy')
+_KEY_POSITIONS = {key: (row, column) for row, keys in enumerate(KEYBOARD_ROWS) for column, key in enumerate(keys)}
+
+
+@lru_cache(maxsize=None)
+def letter_pairs():
+    """
+    How many of the common words each letter pair occurs in
+    """
+    pairs = Counter()
+    for word in spell_index().counts:
+        pairs.update({word[i:i + 2] for i in range(len(word) - 1)})
+    return pairs
+
+
+def keyboard_run(word):
+    """
+    Longest run of neighbouring keys of one keyboard row in word
+    """
+    longest = run = 1
+    for previous, char in zip(word, word[1:]):
+        a, b = _KEY_POSITIONS.get(previous), _KEY_POSITIONS.get(char)
+        run = run + 1 if a and b and a[0] == b[0] and abs(a[1] - b[1]) == 1 else 1
+        longest = max(longest, run)
+    return longest
+
+
+def repeats_pattern(word):
+    """
+    True for a word that repeats a pattern of up to three letters ("ksksks", "asdasd")
+    """
+    return any(
+        len(word) >= 2 * period and all(word[i] == word[i - period] for i in range(period, len(word)))
+        for period in (1, 2, 3)
+    )
+
+
+def consonant_run(word):
+    longest = run = 0
+    for char in word:
+        run = 0 if char in _VOWELS else run + 1
+        longest = max(longest, run)
+    return longest
+
+
+def is_mashed(word, names=()):
+    """
+    True for a word that looks like keyboard mashing rather than an attempt at a word
+    """
+    word = word.lower().replace("'", '')
+    if len(word) < 3 or spell_index().is_word(word) or word in names:
+        return False
+    if not _VOWELS & set(word):
+        return True
+    if keyboard_run(word) >= MIN_KEYBOARD_RUN or repeats_pattern(word):
+        return True
+    if consonant_run(word) >= MIN_CONSONANT_RUN:
+        return True
+    pairs = letter_pairs()
+    return sum(pairs[word[i:i + 2]] < RARE_PAIR_WORDS for i in range(len(word) - 1)) >= MIN_RARE_PAIRS
+
+
+def screen_reason(story, user_answer):
+    """
+    Why an answer should not go to the LLM ('too_long', 'gibberish', 'off_topic'), or None
+    """
+    text = ' '.join(user_answer) if isinstance(user_answer, (list, tuple)) else str(user_answer)
+    if len(text) > getattr(settings, 'GRADING_SCREEN_MAX_CHARS', 1000):
+        return 'too_long'
+
+    heard = normalize_spoken(story, text)
+    words = [word.lower() for word in _WORD.findall(heard)]
+    names = SPELLING_VOCABULARY.get(story, set())
+    if not words:
+        return 'gibberish'
+    mashed = sum(is_mashed(word, names) for word in words)
+    if mashed / len(words) > MAX_MASHED_RATIO:
+        return 'gibberish'
+    if sum(char.isalpha() for char in heard) >= MIN_ENTROPY_LETTERS and entropy(heard) < MIN_ENTROPY:
+        return 'gibberish'
+
+    other_names = OTHER_BOOK_NAMES.union(*(names for other, names in STORY_NAMES.items() if other != story))
+    own_words = names | STORY_NAMES.get(story, set())
+    if any(word in other_names for word in words) and not any(word in own_words for word in words):
+        return 'off_topic'
+    return None
+
+
+class ScreeningStats:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._counts = {}
+        # Drafts screened while pre-grading; they would not have cost an LLM call
+        self._pregrade = dict.fromkeys(('screened', 'too_long', 'gibberish', 'off_topic'), 0)
+
+    def add(self, label, reason):
+        with self._lock:
+            if is_pregrade():
+                counts = self._pregrade
+            else:
+                counts = self._counts.setdefault(label, {'screened': 0, 'too_long': 0, 'gibberish': 0, 'off_topic': 0})
+            counts['screened'] += 1
+            counts[reason] += 1
+
+    def stats(self):
+        with self._lock:
+            questions = {label: dict(counts) for label, counts in self._counts.items()}
+            pregrade = dict(self._pregrade)
+        return {
+            'enabled': screening_enabled(),
+            'llm_calls_saved': sum(counts['screened'] for counts in questions.values()),
+            'questions': questions,
+            'pregrade': pregrade,
+        }
+
+
+screening_stats = ScreeningStats()
+
+
+def screening_enabled():
+    return getattr(settings, 'GRADING_SCREENING', True)
+
+
+def screen(story, question, user_answer):
+    """
+    The guidance JsonResponse for an answer that fails screening, or None to grade it
+    """
+    if not screening_enabled():
+        return None
+    reason = screen_reason(story, user_answer)
+    if reason is None:
+        return None
+    screening_stats.add(f"{story} Q{question}", reason)
+    logger.debug(f"Screened {story} Q{question} answer as {reason}")
+    return JsonResponse({
+        'isCorrect': False,
+        'message': MESSAGES[reason].format(book=BOOK_TITLES.get(story, 'the story')),
+        'feedback_type': 'guidance',
+        'show_answer': False,
+        'highlight_issue': reason,
+        'misspelled_words': [],
+    })
+
+
+class RequestSizeLimitMiddleware:
+    """
+    Turns away API request bodies over GRADING_MAX_BODY_BYTES with 413, before they are read
+    """
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        return self.reject(request) or self.get_response(request)
+
+    async def __acall__(self, request):
+        return self.reject(request) or await self.get_response(request)
+
+    @staticmethod
+    def reject(request):
+        limit = getattr(settings, 'GRADING_MAX_BODY_BYTES', None)
+        if not limit or not request.path.startswith('/api/'):
+            return None
+        try:
+            length = int(request.META.get('CONTENT_LENGTH') or 0)
+        except ValueError:
+            length = 0
+        if length <= limit:
+            return None
+        logger.warning(f"Rejected {length} byte request body for {request.path}")
+        return JsonResponse({'error': 'Your answer is too long. Please shorten it and try again.'}, status=413)
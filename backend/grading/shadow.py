@@ -0,0 +1,234 @@
+"""
+Shadow evaluation of the local graders against the LLM.
+
+With GRADING_SHADOW_SAMPLE above 0, that share of the answers is picked
+(sample()) before the local graders run. A picked answer is not served by the
+local graders: it goes to the LLM like any escalated answer, and its LLM
+grade is then compared with what every local grader would have said: the
+question's create_*_fallback_response function, the fast path (rules.py),
+the reference similarity grader and the answer classifier. So the graders
+are measured on all the traffic, including the answers they would have taken
+off the LLM, at the price of an LLM call for those in the sample. The
+comparison runs on a small background pool after the response has been
+built, so students never wait for it; when the pool is GRADING_SHADOW_QUEUE
+answers behind, samples are dropped instead.
+
+For each question and grader we count how often it gave a grade at all
+(coverage), how often that grade matched the LLM's feedback_type and its
+isCorrect, a confusion table (LLM feedback_type -> local feedback_type), and
+how long it took. The counters are in /api/grading/stats/; with
+GRADING_SHADOW_LOG set every comparison is also appended to that JSON-lines
+file, which `manage.py grading_shadow_report` summarises into the questions
+that are safe to take off the LLM.
+"""
+import json
+import logging
+import random
+import threading
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+
+from .classifier import answer_classifier
+from .phonetic import normalize_spoken
+from .rules import fast_path
+from .similarity import similarity_grader
+from .traffic import is_pregrade
+
+logger = logging.getLogger(__name__)
+
+GRADERS = ('fallback', 'fast_path', 'similarity', 'classifier')
+
+# Latencies kept per question and grader for the percentiles
+LATENCY_SAMPLES = 1000
+
+
+def _fallback(story, question, heard, fallback, correct_types):
+    if fallback is None:
+        return None
+    result = json.loads(fallback(heard).content)
+    return None if result.get('feedback_type') in (None, 'error') else result
+
+
+def _fast_path(story, question, heard, fallback, correct_types):
+    return fast_path.grade(story, question, heard, fallback, count=False)
+
+
+def _similarity(story, question, heard, fallback, correct_types):
+    return similarity_grader.grade(story, question, heard, correct_types, count=False)
+
+
+def _classifier(story, question, heard, fallback, correct_types):
+    return answer_classifier.grade(story, question, heard, correct_types, count=False)
+
+
+_GRADERS = dict(zip(GRADERS, (_fallback, _fast_path, _similarity, _classifier)))
+
+
+def _is_correct(result, correct_types):
+    if 'isCorrect' in result:
+        return bool(result['isCorrect'])
+    return correct_types is not None and result.get('feedback_type') in correct_types
+
+
+def local_grades(story, question, user_answer, fallback=None, correct_types=None):
+    """
+    {grader: {'feedback_type', 'correct', 'ms'}} for every local grader; feedback_type is None where it abstained
+    """
+    heard = normalize_spoken(story, user_answer)
+    grades = {}
+    for name, grader in _GRADERS.items():
+        started = time.perf_counter()
+        try:
+            result = grader(story, question, heard, fallback, correct_types)
+        except Exception as e:
+            logger.warning(f"Shadow {name} grader failed for {story} Q{question}: {e}")
+            result = None
+        grades[name] = {
+            'feedback_type': result.get('feedback_type') if result else None,
+            'correct': _is_correct(result, correct_types) if result else None,
+            'ms': round((time.perf_counter() - started) * 1000, 3),
+        }
+    return grades
+
+
+def _percentile(values, share):
+    if not values:
+        return None
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(share * len(ordered)))]
+
+
+class ShadowStats:
+    """
+    Agreement, confusion and latency per question and local grader
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._questions = {}
+        self.sampled = 0
+        self.dropped = 0
+
+    def add(self, label, llm_type, llm_correct, grades):
+        with self._lock:
+            graders = self._questions.setdefault(label, {})
+            for name, grade in grades.items():
+                counts = graders.get(name)
+                if counts is None:
+                    counts = graders[name] = {'samples': 0, 'answered': 0, 'agreed': 0, 'correct_agreed': 0,
+                                              'confusion': {}, 'latencies': deque(maxlen=LATENCY_SAMPLES)}
+                counts['samples'] += 1
+                counts['latencies'].append(grade['ms'])
+                if grade['feedback_type'] is None:
+                    continue
+                counts['answered'] += 1
+                counts['agreed'] += grade['feedback_type'] == llm_type
+                counts['correct_agreed'] += grade['correct'] == llm_correct
+                row = counts['confusion'].setdefault(llm_type, {})
+                row[grade['feedback_type']] = row.get(grade['feedback_type'], 0) + 1
+
+    def stats(self):
+        with self._lock:
+            questions = {}
+            for label, graders in self._questions.items():
+                questions[label] = {}
+                for name, counts in graders.items():
+                    answered = counts['answered']
+                    questions[label][name] = {
+                        'samples': counts['samples'],
+                        'coverage': round(answered / counts['samples'], 4),
+                        'agreement': round(counts['agreed'] / answered, 4) if answered else None,
+                        'correct_agreement': round(counts['correct_agreed'] / answered, 4) if answered else None,
+                        'confusion': {llm: dict(row) for llm, row in counts['confusion'].items()},
+                        'p50_ms': _percentile(counts['latencies'], 0.5),
+                        'p95_ms': _percentile(counts['latencies'], 0.95),
+                    }
+            return {
+                'sample': shadow_sample(),
+                'sampled': self.sampled,
+                'dropped': self.dropped,
+                'questions': questions,
+            }
+
+
+class ShadowEvaluator:
+    """
+    Runs the local graders next to sampled LLM grades, off the response path
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._executor = None
+        self._pending = 0
+        self.stats = ShadowStats()
+
+    def _submit(self, job, *args):
+        limit = getattr(settings, 'GRADING_SHADOW_QUEUE', 100)
+        with self._lock:
+            if self._pending >= limit:
+                self.stats.dropped += 1
+                return
+            self._pending += 1
+            self.stats.sampled += 1
+            if self._executor is None:
+                self._executor = ThreadPoolExecutor(max_workers=getattr(settings, 'GRADING_SHADOW_WORKERS', 1),
+                                                    thread_name_prefix='grading-shadow')
+        self._executor.submit(job, *args)
+
+    def sample(self, schema):
+        """
+        True when this answer is picked for shadow evaluation, and so must be graded by the LLM
+        """
+        sample = shadow_sample()
+        if not sample or schema is None or schema.story is None or is_pregrade():
+            return False
+        return random.random() < sample
+
+    def observe(self, schema, user_answer, fallback, correct_types, result):
+        """
+        Queue a shadow comparison for the LLM grade of a sampled answer
+        """
+        if schema is None or schema.story is None or not result.get('feedback_type'):
+            return
+        self._submit(self._compare, schema.story, schema.question, user_answer, fallback, correct_types,
+                     result['feedback_type'], _is_correct(result, correct_types))
+
+    def _compare(self, story, question, user_answer, fallback, correct_types, llm_type, llm_correct):
+        try:
+            grades = local_grades(story, question, user_answer, fallback, correct_types)
+            self.stats.add(f"{story} Q{question}", llm_type, llm_correct, grades)
+            self._log(story, question, user_answer, llm_type, llm_correct, grades)
+        except Exception as e:
+            logger.error(f"Shadow comparison failed for {story} Q{question}: {e}", exc_info=True)
+        finally:
+            with self._lock:
+                self._pending -= 1
+
+    def _log(self, story, question, user_answer, llm_type, llm_correct, grades):
+        path = getattr(settings, 'GRADING_SHADOW_LOG', None)
+        if not path:
+            return
+        entry = json.dumps({
+            'story': story,
+            'question': question,
+            'version': getattr(settings, 'GRADING_PROMPT_VERSION', '1'),
+            'answer': user_answer,
+            'llm': {'feedback_type': llm_type, 'correct': llm_correct},
+            'graders': grades,
+            'time': round(time.time()),
+        })
+        try:
+            with self._lock, open(path, 'a', encoding='utf-8') as f:
+                f.write(entry + '\n')
+        except OSError as e:
+            logger.warning(f"Could not write shadow log {path}: {e}")
+
+
+shadow = ShadowEvaluator()
+
+
+def shadow_sample():
+    return getattr(settings, 'GRADING_SHADOW_SAMPLE', 0.0)
@@ -0,0 +1,381 @@
+"""
+Reference-answer similarity grading for open-ended Peter Rabbit questions.
+
+Q9 (main problem), Q10 (solution), Q11 (lesson) and Q14 (story part) list
+the events and morals they accept in their prompts. Those reference points
+are collected below under the question's rubric item codes (templates.py)
+and turned into IDF-weighted term vectors once, on first use. A batch of
+answers is turned into term vectors the same way and multiplied against the
+reference matrix in a single sparse product (answers x terms . terms x
+references), giving the share of every reference point each answer covers.
+
+An item counts as matched when an answer covers at least MATCH_SIMILARITY of
+one of its reference points; the question's bands then turn the matched
+items into a feedback type, and the message comes from the question's
+template. Answers no band covers are left for the LLM.
+
+With GRADING_SIMILARITY on, grade_locally() tries this after the fast path.
+The classroom and worksheet endpoints match all of their answers up front
+with graded_together(), so a class's answers share one product per question.
+"""
+import contextlib
+import contextvars
+import logging
+import math
+import re
+import threading
+
+from django.conf import settings
+
+from .normalize import normalize_answer
+from .phonetic import normalize_spoken
+from .spelling import misspelled_words, spell_index
+from .templates import COMPACT_TEMPLATES
+
+logger = logging.getLogger(__name__)
+
+# Share of a reference point an answer must cover to match it
+MATCH_SIMILARITY = 0.6
+
+# Matches made ahead for the answers of one request (graded_together), by (story, question, answer text)
+_prepared = contextvars.ContextVar('similarity_prepared', default=None)
+
+# Reference points per question, keyed by rubric item code
+REFERENCE_POINTS = {
+    ('peter', 9): {
+        'disobeys_mother': [
+            'Peter disobeys his mother', "Peter doesn't listen to his mother", 'Peter ignored his mother',
+            'he did not do what his mother told him', 'his mother told him not to go but he went',
+            'Peter broke the rule', 'he was naughty and did not obey',
+        ],
+        'enters_garden': [
+            "Peter goes into Mr. McGregor's garden", 'Peter enters the forbidden garden',
+            'he went into the garden', "he sneaks into McGregor's garden", 'he went somewhere he was not allowed',
+        ],
+        'gets_in_trouble': [
+            'Peter gets chased by Mr. McGregor', 'Mr. McGregor chases Peter', 'Peter gets stuck in the garden',
+            'Peter is trapped and cannot escape', 'he nearly got caught', 'Peter gets into trouble',
+        ],
+        'secondary_detail': [
+            'Peter eats the vegetables', 'Peter steals from the garden', 'he lost his jacket and shoes',
+            'Peter was scared', 'Peter got lost', 'Peter felt sick', 'Peter was hungry',
+        ],
+    },
+    ('peter', 10): {
+        'escapes': [
+            'Peter escapes from the garden', 'Peter runs away', 'he finds a way out of the garden',
+            'he squeezed under the gate', 'he got out of the garden', 'the sparrows helped him escape',
+        ],
+        'hides': [
+            'Peter hides from Mr. McGregor', 'he hid in the watering can', 'he hid in the shed',
+        ],
+        'gets_home': [
+            'Peter gets home safely', 'Peter returns to his mother', 'he ran all the way home',
+            'he went back home to the rabbit hole', 'he went home',
+        ],
+        'mother_cares': [
+            'his mother takes care of him', 'mother helps Peter feel better', 'his mother put him to bed',
+            'his mother gave him camomile tea', 'his mother looked after him',
+        ],
+    },
+    ('peter', 11): {
+        'obey_parents': [
+            'listen to your parents', 'obey your mother', 'listen to your mother', 'do what your parents tell you',
+            'Peter should have listened to his mother',
+        ],
+        'consequences': [
+            'actions have consequences', 'disobedience has consequences', 'bad choices lead to problems',
+            'if you disobey you get in trouble', 'being naughty gets you into trouble',
+        ],
+        'rules_safety': [
+            "don't disobey rules", 'follow instructions', 'follow the rules', "don't go where you're not supposed to",
+            'stay away from dangerous places', 'obedience keeps you safe', 'rules are there to protect you',
+        ],
+        'general_lesson': [
+            'be kind', 'be kind to others', 'always tell the truth', 'be brave', 'share with your friends',
+            "don't give up", 'be nice',
+        ],
+    },
+    ('peter', 14): {
+        'story_event': [
+            "when mother warned Peter not to go to Mr. McGregor's garden", 'when Peter entered the garden',
+            'when Peter was eating the vegetables', 'when Mr. McGregor saw Peter',
+            'when Peter was being chased by Mr. McGregor', 'the part where Peter got stuck in the gooseberry net',
+            'when Peter was hiding in the watering can', 'when the sparrows helped Peter',
+            'when Peter lost his jacket and shoes', 'when Peter escaped from the garden',
+            'when Peter got home sick and tired', 'when his mother put Peter to bed with camomile tea',
+            'when his sisters had bread and milk and blackberries for supper',
+        ],
+        'feeling_link': [
+            'it made me feel scared', 'I was worried', 'I felt sad', 'I was happy', 'it made me laugh',
+            'I felt nervous', 'it was exciting', 'I was relieved',
+        ],
+        'vague': [
+            'the beginning', 'the middle part', 'the end', 'the whole story', 'I liked the story', 'all of it',
+            'the best part',
+        ],
+    },
+}
+
+# (feedback_type, items needed, items that count), tried in order
+BANDS = {
+    ('peter', 9): [
+        ('excellent', 2, ('disobeys_mother', 'enters_garden', 'gets_in_trouble')),
+        ('good', 1, ('disobeys_mother', 'enters_garden', 'gets_in_trouble')),
+        ('partial', 1, ('secondary_detail',)),
+    ],
+    ('peter', 10): [
+        ('excellent', 2, ('escapes', 'hides', 'gets_home', 'mother_cares')),
+        ('good', 1, ('escapes', 'gets_home')),
+        ('partial', 1, ('hides', 'mother_cares')),
+    ],
+    ('peter', 11): [
+        ('excellent', 2, ('obey_parents', 'consequences', 'rules_safety')),
+        ('good', 1, ('obey_parents', 'consequences', 'rules_safety')),
+        ('partial', 1, ('general_lesson',)),
+    ],
+    ('peter', 14): [
+        ('excellent', 2, ('story_event', 'feeling_link')),
+        ('good', 1, ('story_event',)),
+        ('partial', 1, ('vague',)),
+    ],
+}
+
+# Words that carry no meaning for the comparison; "not" and "don't" do
+STOP_WORDS = {
+    'a', 'an', 'the', 'and', 'or', 'but', 'so', 'to', 'of', 'in', 'on', 'at', 'by', 'for', 'from', 'with',
+    'into', 'is', 'was', 'were', 'be', 'been', 'are', 'am', 'it', 'its', 'that', 'this', 'then', 'there',
+    'he', 'him', 'his', 'she', 'her', 'i', 'me', 'my', 'you', 'your', 'we', 'they', 'them', 'their',
+    'peter', 'rabbit', 'mr', 'mrs', 'when', 'where', 'part', 'think', 'because', 'all', 'up', 'very', 'really',
+}
+
+# Irregular forms and family words folded together before stemming
+WORD_FORMS = {
+    'ran': 'run', 'hid': 'hide', 'went': 'go', 'gone': 'go', 'got': 'get', 'ate': 'eat', 'caught': 'catch',
+    'told': 'tell', 'felt': 'feel', 'made': 'make', 'saw': 'see', 'lost': 'lose', 'gave': 'give',
+    'mom': 'mother', 'mum': 'mother', 'mommy': 'mother', 'mummy': 'mother', 'mama': 'mother',
+    "mom's": 'mother', "mum's": 'mother', 'farmer': 'mcgregor', 'gardener': 'mcgregor',
+}
+
+# Negations attach to the next content word: "didn't listen" -> "not listen"
+NEGATIONS = {
+    'not', 'no', 'never', 'cannot', "don't", "didn't", "doesn't", "can't", "couldn't", "won't", "wouldn't",
+    "shouldn't", "wasn't", "isn't", 'dont', 'didnt', 'doesnt', 'cant', 'shouldnt', 'wasnt',
+}
+
+_SUFFIXES = ('ing', 'ed', 'es', 's')
+_TOKEN = re.compile(r"[a-z']+")
+
+
+def _stem(word):
+    word = WORD_FORMS.get(word, word)
+    for suffix in _SUFFIXES:
+        if word.endswith(suffix) and len(word) - len(suffix) >= 3:
+            return word[:-len(suffix)]
+    return word
+
+
+def _text(answer):
+    return ' '.join(answer) if isinstance(answer, (list, tuple)) else str(answer)
+
+
+def terms(text):
+    """
+    Content words of a text: spelling-corrected, stemmed, negated where a negation precedes them,
+    without stop words
+    """
+    index = spell_index()
+    found = set()
+    negated = False
+    for word in _TOKEN.findall(normalize_answer(text)):
+        if word in NEGATIONS:
+            negated = True
+            continue
+        if word not in index and word not in WORD_FORMS and len(word) > 3:
+            close = index.suggestions(word, 1)
+            if close:
+                word = close[0][1]
+        if word not in STOP_WORDS:
+            found.add(f"not {_stem(word)}" if negated else _stem(word))
+            negated = False
+    return found
+
+
+class ReferenceMatrix:
+    """
+    One question's reference points as IDF-weighted term vectors, each scaled
+    to sum to 1 and stored column-wise (term -> [(reference row, weight)]) for
+    the sparse product
+    """
+
+    def __init__(self, points, idf):
+        self.items = []
+        self.columns = {}
+        for item, phrases in points.items():
+            for phrase in phrases:
+                row = len(self.items)
+                self.items.append(item)
+                weights = {term: idf[term] for term in terms(phrase)}
+                total = sum(weights.values())
+                for term, weight in weights.items():
+                    self.columns.setdefault(term, []).append((row, weight / total))
+
+    def similarities(self, answers):
+        """
+        Share of each reference point's weight that each answer covers: one row per answer
+        """
+        matrix = []
+        for answer in answers:
+            row = [0.0] * len(self.items)
+            for term in terms(answer):
+                for reference, weight in self.columns.get(term, ()):
+                    row[reference] += weight
+            matrix.append(row)
+        return matrix
+
+    def item_scores(self, answers):
+        """
+        Best similarity per rubric item, for each answer
+        """
+        scores = []
+        for row in self.similarities(answers):
+            best = {}
+            for item, similarity in zip(self.items, row):
+                best[item] = max(best.get(item, 0.0), similarity)
+            scores.append(best)
+        return scores
+
+
+def _idf(documents):
+    frequency = {}
+    for document in documents:
+        for term in terms(document):
+            frequency[term] = frequency.get(term, 0) + 1
+    return {term: math.log((len(documents) + 1) / (count + 1)) + 1 for term, count in frequency.items()}
+
+
+class SimilarityGrader:
+    def __init__(self, references, bands):
+        self.references = references
+        self.bands = bands
+        self._matrices = None
+        self._lock = threading.Lock()
+        self.answered = 0
+        self.escalated = 0
+
+    def matrices(self):
+        """
+        Reference matrices per question, built on first use
+        """
+        if self._matrices is None:
+            with self._lock:
+                if self._matrices is None:
+                    idf = _idf([phrase for points in self.references.values()
+                                for phrases in points.values() for phrase in phrases])
+                    self._matrices = {key: ReferenceMatrix(points, idf) for key, points in self.references.items()}
+        return self._matrices
+
+    def feedback_type(self, matched, bands):
+        for feedback_type, needed, items in bands:
+            if len(matched & set(items)) >= needed:
+                return feedback_type
+        return None
+
+    def match_many(self, story, question, answers):
+        """
+        (feedback type, matched items) for a batch of answers (None where no band and message fit),
+        from one matrix product
+        """
+        matrix = self.matrices().get((story, question))
+        if matrix is None:
+            return [None] * len(answers)
+        template = COMPACT_TEMPLATES[(story, question)]
+        matches = []
+        for scores in matrix.item_scores([_text(answer) for answer in answers]):
+            matched = {item for item, score in scores.items() if score >= MATCH_SIMILARITY}
+            feedback_type = self.feedback_type(matched, self.bands[(story, question)])
+            if feedback_type is None or template.message(feedback_type, matched) is None:
+                matches.append(None)
+            else:
+                matches.append((feedback_type, matched))
+        return matches
+
+    def _result(self, story, question, answer, match, correct_types):
+        if match is None:
+            return None
+        feedback_type, matched = match
+        result = COMPACT_TEMPLATES[(story, question)].expand({'f': feedback_type, 'm': sorted(matched)},
+                                                             correct_types)
+        del result['matched']
+        result['misspelled_words'] = misspelled_words(answer, story)
+        return result
+
+    def _count(self, results):
+        answered = sum(result is not None for result in results)
+        with self._lock:
+            self.answered += answered
+            self.escalated += len(results) - answered
+
+    def grade_many(self, story, question, answers, correct_types=None, count=True):
+        """
+        Result dicts for a batch of answers (None where the LLM is needed), from one matrix product
+        """
+        matches = self.match_many(story, question, answers)
+        results = [self._result(story, question, answer, match, correct_types)
+                   for answer, match in zip(answers, matches)]
+        if count:
+            self._count(results)
+        return results
+
+    def grade(self, story, question, user_answer, correct_types=None, count=True):
+        """
+        Return a response dict when the answer matches the references clearly enough, or None to escalate.
+        Inside graded_together() the answer's match is looked up instead of multiplied on its own.
+        """
+        if (story, question) not in self.references:
+            return None
+        prepared = _prepared.get()
+        key = (story, question, _text(user_answer))
+        if prepared is None or key not in prepared:
+            return self.grade_many(story, question, [user_answer], correct_types, count)[0]
+        result = self._result(story, question, user_answer, prepared[key], correct_types)
+        if count:
+            self._count([result])
+        return result
+
+    def stats(self):
+        with self._lock:
+            total = self.answered + self.escalated
+            return {
+                'answered': self.answered,
+                'escalated': self.escalated,
+                'answer_rate': round(self.answered / total, 4) if total else 0.0,
+            }
+
+
+similarity_grader = SimilarityGrader(REFERENCE_POINTS, BANDS)
+
+
+@contextlib.contextmanager
+def graded_together(story, answers):
+    """
+    Match a request's answers ({question: [answer, ...]}, e.g. a whole class's) with one matrix
+    product per question up front; similarity_grader.grade() inside the block uses those matches
+    """
+    prepared = {}
+    if similarity_enabled():
+        for question, question_answers in answers.items():
+            if (story, question) not in similarity_grader.references:
+                continue
+            heard = [normalize_spoken(story, answer) for answer in question_answers]
+            for answer, match in zip(heard, similarity_grader.match_many(story, question, heard)):
+                prepared[(story, question, _text(answer))] = match
+    token = _prepared.set(prepared)
+    try:
+        yield
+    finally:
+        _prepared.reset(token)
+
+
+def similarity_enabled():
+    return getattr(settings, 'GRADING_SIMILARITY', False)
@@ -0,0 +1,277 @@
+"""
+Single-flight coalescing of identical in-flight grading calls.
+
+When a whole class submits the same answer at once, only the first request
+(the leader) calls OpenRouter; the others wait for it and get a copy of its
+response. Coalescing works across threads and async tasks in one process and,
+when GRADING_SINGLE_FLIGHT_DIR is set, across worker processes on the same
+host through file locks in that directory. Answers that share a key are only
+the same after normalization, so callers can adapt the copy each waiting
+request gets (the pipeline redoes misspelled_words for its wording).
+"""
+import asyncio
+import hashlib
+import json
+import logging
+import os
+import tempfile
+import threading
+import time
+import weakref
+
+from django.http import JsonResponse
+
+try:
+    import fcntl
+except ImportError:  # Windows: no cross-worker coalescing
+    fcntl = None
+
+logger = logging.getLogger(__name__)
+
+
+def copy_response(response):
+    """
+    Give each waiting request its own JsonResponse with the leader's content
+    """
+    copy = JsonResponse(json.loads(response.content), status=response.status_code)
+    if response.has_header('Retry-After'):
+        copy['Retry-After'] = response['Retry-After']
+    return copy
+
+
+def _adapt(response, shared):
+    return response if shared is None else shared(response)
+
+
+class _Call:
+    def __init__(self):
+        self.done = threading.Event()
+        self.response = None
+        self.error = None
+
+
+class FileLockStore:
+    """
+    Host-wide lock + result store shared by worker processes.
+
+    The leader holds an exclusive flock on <dir>/<key>.lock while it grades and
+    leaves the response in <dir>/<key>.json; workers that were waiting on the
+    lock reuse that response if it is fresh. Files nobody has used for a while
+    are swept at most once per result_ttl, so the directory doesn't grow with
+    every distinct answer.
+    """
+
+    def __init__(self, directory, result_ttl=30, wait_timeout=20):
+        self.directory = directory
+        self.result_ttl = result_ttl
+        self.wait_timeout = wait_timeout
+        self._swept_at = time.monotonic()
+        os.makedirs(directory, exist_ok=True)
+
+    def _paths(self, key):
+        name = hashlib.sha1(key.encode('utf-8')).hexdigest()
+        base = os.path.join(self.directory, name)
+        return base + '.lock', base + '.json'
+
+    def _read_result(self, result_path):
+        try:
+            if time.time() - os.path.getmtime(result_path) > self.result_ttl:
+                return None
+            with open(result_path) as f:
+                stored = json.load(f)
+            return JsonResponse(stored['content'], status=stored['status'])
+        except (OSError, ValueError, KeyError):
+            return None
+
+    def _write_result(self, result_path, response):
+        fd, tmp_path = tempfile.mkstemp(dir=self.directory, suffix='.tmp')
+        with os.fdopen(fd, 'w') as f:
+            json.dump({'status': response.status_code, 'content': json.loads(response.content)}, f)
+        os.replace(tmp_path, result_path)
+
+    def sweep(self, now=None):
+        """
+        Delete stale results and temp files, and lock files no worker has used or holds
+        """
+        now = time.time() if now is None else now
+        # A waiter can sit on a lock for up to wait_timeout before it reads the result
+        lock_age = self.result_ttl + self.wait_timeout
+        removed = 0
+        for entry in os.scandir(self.directory):
+            try:
+                age = now - entry.stat().st_mtime
+                if entry.name.endswith(('.json', '.tmp')) and age > self.result_ttl:
+                    os.unlink(entry.path)
+                    removed += 1
+                elif entry.name.endswith('.lock') and age > lock_age:
+                    with open(entry.path, 'a') as lock_file:
+                        # Leave locks that are held right now
+                        fcntl.flock(lock_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+                        os.unlink(entry.path)
+                        removed += 1
+            except (BlockingIOError, FileNotFoundError):
+                continue
+            except OSError as e:
+                logger.warning(f"Could not sweep {entry.path}: {e}")
+        return removed
+
+    def _maybe_sweep(self):
+        if time.monotonic() - self._swept_at < self.result_ttl:
+            return
+        self._swept_at = time.monotonic()
+        removed = self.sweep()
+        if removed:
+            logger.debug(f"Swept {removed} single-flight files from {self.directory}")
+
+    def run(self, key, fn):
+        """
+        Run fn() unless another worker is running (or just ran) the same key.
+        Returns (response, coalesced).
+        """
+        lock_path, result_path = self._paths(key)
+        with open(lock_path, 'a') as lock_file:
+            started = time.monotonic()
+            waited = False
+            while True:
+                try:
+                    fcntl.flock(lock_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+                    break
+                except BlockingIOError:
+                    waited = True
+                    if time.monotonic() - started > self.wait_timeout:
+                        logger.warning("Timed out waiting for another worker's grade, grading directly")
+                        return fn(), False
+                    time.sleep(0.02)
+            try:
+                # The lock file's mtime records when it was last used, for sweep()
+                os.utime(lock_path)
+                if waited:
+                    response = self._read_result(result_path)
+                    if response is not None:
+                        return response, True
+                response = fn()
+                try:
+                    self._write_result(result_path, response)
+                except (OSError, ValueError) as e:
+                    logger.warning(f"Could not store coalesced grade: {e}")
+                return response, False
+            finally:
+                fcntl.flock(lock_file, fcntl.LOCK_UN)
+                self._maybe_sweep()
+
+
+class SingleFlight:
+    """
+    Coalesces concurrent calls that share a key onto one execution
+    """
+
+    def __init__(self, lock_store=None):
+        self.lock_store = lock_store
+        self._lock = threading.Lock()
+        self._calls = {}
+        # Async calls are tracked per event loop
+        self._async_calls = weakref.WeakKeyDictionary()
+        self.leaders = 0
+        self.coalesced = 0
+
+    def _count(self, leader):
+        with self._lock:
+            if leader:
+                self.leaders += 1
+            else:
+                self.coalesced += 1
+
+    def _run_leader(self, key, fn, shared):
+        if self.lock_store is None:
+            return fn()
+        response, coalesced = self.lock_store.run(key, fn)
+        if coalesced:
+            self._count(leader=False)
+            return _adapt(response, shared)
+        return response
+
+    def do(self, key, fn, shared=None):
+        """
+        Run fn() for the first caller with this key; concurrent callers wait for its response.
+        shared(response), if given, adapts the copy a caller gets of another caller's response.
+        """
+        with self._lock:
+            call = self._calls.get(key)
+            leader = call is None
+            if leader:
+                call = self._calls[key] = _Call()
+
+        if not leader:
+            call.done.wait()
+            self._count(leader=False)
+            if call.error is not None:
+                raise call.error
+            return _adapt(copy_response(call.response), shared)
+
+        self._count(leader=True)
+        try:
+            call.response = self._run_leader(key, fn, shared)
+            return call.response
+        except BaseException as e:
+            call.error = e
+            raise
+        finally:
+            with self._lock:
+                del self._calls[key]
+            call.done.set()
+
+    async def ado(self, key, coro_fn, shared=None):
+        """
+        Async twin of do(): coro_fn() is awaited once per key on this event loop
+        """
+        loop = asyncio.get_running_loop()
+        calls = self._async_calls.setdefault(loop, {})
+        future = calls.get(key)
+        if future is not None:
+            response = await asyncio.shield(future)
+            self._count(leader=False)
+            return _adapt(copy_response(response), shared)
+
+        future = calls[key] = loop.create_future()
+        self._count(leader=True)
+        try:
+            if self.lock_store is None:
+                response = await coro_fn()
+            else:
+                response = await self._arun_with_lock_store(key, coro_fn, loop, shared)
+            future.set_result(response)
+            return response
+        except BaseException as e:
+            future.set_exception(e)
+            # Mark the exception retrieved when nobody else was waiting
+            future.exception()
+            raise
+        finally:
+            del calls[key]
+
+    async def _arun_with_lock_store(self, key, coro_fn, loop, shared):
+        # The file lock is blocking, so hold it from a worker thread while the
+        # grade itself still runs on this loop
+        def run_coro():
+            return asyncio.run_coroutine_threadsafe(coro_fn(), loop).result()
+
+        response, coalesced = await asyncio.to_thread(self.lock_store.run, key, run_coro)
+        if coalesced:
+            self._count(leader=False)
+            return _adapt(response, shared)
+        return response
+
+    def stats(self):
+        with self._lock:
+            return {
+                'leaders': self.leaders,
+                'coalesced': self.coalesced,
+                'in_flight': len(self._calls),
+                'cross_worker': self.lock_store is not None,
+            }
+
+
+def build_single_flight(directory=None):
+    if directory and fcntl is not None:
+        return SingleFlight(FileLockStore(directory))
+    return SingleFlight()
@@ -0,0 +1,271 @@
+"""
+Local spell checker that fills misspelled_words without the LLM.
+
+Known words are the base words of data/words.txt, the story vocabulary and
+the words of the English word list in data/word_counts.txt.gz (with
+inflections, about 160k words) seen at least KNOWN_MIN_COUNT times; the rare
+tail of that list also holds common misspellings ("wen", "bares"). The common
+words are also correction candidates, kept in a SymSpell-style index: every
+candidate is stored under all of its deletions up to MAX_DISTANCE, so the
+words close to a typo are found by looking up the typo's own deletions
+instead of comparing it against the whole dictionary.
+
+A word is reported when it is unknown and close to a known word: a word
+missing from the list altogether is a misspelling ("realy", "stoled"), while
+one from its rare tail must be far rarer than the words next to it ("wen").
+Capitalised words need one confident correction: story words come first
+("Goldylocks"), then the base words, then the rest of the list, and within
+one of those the correction must be the single closest word, or one far more
+common than the others at the same distance. Inside a sentence a capitalised
+word is taken for a name and only reported when its correction is a story
+name ("McGreggor"); the first word of a sentence is checked like any other.
+
+With GRADING_LOCAL_SPELLING on, the spelling task is taken out of the prompts
+(strip_spelling_task) and misspelled_words is filled in here.
+"""
+import gzip
+import os
+import re
+import threading
+from functools import lru_cache
+
+from django.conf import settings
+
+from .normalize import FILLER_WORDS
+from .rules import STORY_VOCABULARY, edit_distance
+
+WORDS_FILE = os.path.join(os.path.dirname(__file__), 'data', 'words.txt')
+WORD_COUNTS_FILE = os.path.join(os.path.dirname(__file__), 'data', 'word_counts.txt.gz')
+
+MAX_DISTANCE = 2
+
+# Only this many leading characters are indexed (SymSpell's prefix length)
+PREFIX_LENGTH = 7
+
+# Listed words at least this common are known; rarer ones may well be misspellings
+KNOWN_MIN_COUNT = 500
+
+# Listed words at least this common are offered as corrections
+CORRECTION_MIN_COUNT = 1000
+
+# Of several corrections at the same distance, the most common one is only
+# trusted when it is this many times as common as the next
+CONFIDENCE_RATIO = 10
+
+# A word from the rare tail of the list is a slip when a word next to it is this many times as common
+RARE_WORD_RATIO = 100
+
+# Story names and words beyond data/words.txt
+SPELLING_VOCABULARY = {
+    'goldilocks': STORY_VOCABULARY['goldilocks'] | {
+        'porridge', 'cottage', 'woods', 'southey', 'bowl', 'spoon', 'chair', 'upstairs',
+    },
+    'peter': STORY_VOCABULARY['peter'] | {
+        'mcgregor', 'mcgregor\'s', 'gooseberry', 'camomile', 'chamomile', 'flopsy', 'mopsy',
+        'cottontail', 'sieve', 'wheelbarrow', 'radishes', 'lettuces', 'parsley', 'toolshed', 'sandbank',
+    },
+}
+
+_WORD = re.compile(r"[A-Za-z][A-Za-z']*")
+# What comes before the first word of a sentence or of a quotation
+_SENTENCE_START = re.compile(r'(?:(?:^|[.!?])[\s"\'“‘(]*|["“])$')
+
+
+def allowed_distance(word):
+    # Short words tolerate a single slip
+    return 1 if len(word) <= 5 else MAX_DISTANCE
+
+
+def _deletes(word, distance):
+    """
+    Every string made by deleting up to distance characters from word
+    """
+    results = {word}
+    frontier = {word}
+    for _ in range(distance):
+        frontier = {candidate[:i] + candidate[i + 1:] for candidate in frontier for i in range(len(candidate))}
+        results |= frontier
+    return results
+
+
+class SpellIndex:
+    """
+    Deletion dictionary over the correction candidates, plus the set of known word forms
+    """
+
+    def __init__(self, words, counts=None):
+        counts = counts or {}
+        self.words = set(words)
+        self.known = self.words | {word for word, count in counts.items() if count >= KNOWN_MIN_COUNT}
+        # The rest of the list: rare words and misspellings common enough to be listed
+        self.rare = {word: count for word, count in counts.items() if word not in self.known}
+
+        # Base words count as common; listed words only when they are
+        self.counts = {word: count for word, count in counts.items() if count >= CORRECTION_MIN_COUNT}
+        for word in self.words:
+            self.counts[word] = max(counts.get(word, 0), CORRECTION_MIN_COUNT)
+
+        self.deletes = {}
+        for word in self.counts:
+            for deleted in _deletes(word[:PREFIX_LENGTH], MAX_DISTANCE):
+                self.deletes.setdefault(deleted, []).append(word)
+
+    def __contains__(self, word):
+        return word in self.known or (word.endswith("'s") and word[:-2] in self.known)
+
+    def suggestions(self, word, max_distance=MAX_DISTANCE):
+        """
+        Candidates within max_distance of word, closest and then most common first: [(distance, word), ...]
+        """
+        candidates = set()
+        for deleted in _deletes(word[:PREFIX_LENGTH], max_distance):
+            candidates.update(self.deletes.get(deleted, ()))
+        found = []
+        for candidate in candidates:
+            distance = edit_distance(word, candidate, max_distance)
+            if distance <= max_distance:
+                found.append((distance, candidate))
+        return sorted(found, key=lambda item: (item[0], -self.counts[item[1]], item[1]))
+
+    def is_word(self, word):
+        """
+        True for a known word or one from the rare tail of the word list
+        """
+        return word in self or word in self.rare
+
+    def correction(self, word, max_distance=MAX_DISTANCE, names=()):
+        """
+        The one confident correction of word, or None when there is none or several are as likely.
+        Story names are preferred over base words, and base words over the rest of the word list.
+        """
+        close = [(distance, name) for name in names
+                 for distance in (edit_distance(word, name, max_distance),) if distance <= max_distance]
+        if close:
+            close.sort()
+            if len(close) > 1 and close[1][0] == close[0][0]:
+                return None
+            return close[0][1]
+
+        close = self.suggestions(word, max_distance)
+        if not close:
+            return None
+        distance = close[0][0]
+        nearest = [candidate for d, candidate in close if d == distance]
+        base = [candidate for candidate in nearest if candidate in self.words]
+        nearest = base or nearest
+        best = nearest[0]
+        if len(nearest) > 1 and self.counts[best] < CONFIDENCE_RATIO * self.counts[nearest[1]]:
+            return None
+        return best
+
+    def is_misspelled(self, word, names=(), sentence_start=False):
+        """
+        True for an unknown word that is close to a known one; names are the story's words.
+        Capitalised words need one confident correction, and inside a sentence it must be a story name.
+        """
+        lower = word.lower().strip("'")
+        if len(lower) < 3 or lower in self:
+            return False
+        distance = allowed_distance(lower)
+        if word[0].isupper():
+            correction = self.correction(lower, distance, names)
+            # Inside a sentence it is probably a name; only a near miss of one of the story's names counts
+            return correction is not None and (sentence_start or correction in names)
+        if any(edit_distance(lower, name, distance) <= distance for name in names):
+            return True
+        close = self.suggestions(lower, distance)
+        if not close:
+            return False
+        if lower in self.rare:
+            # Listed, so only a slip when a word next to it is far more common
+            nearest = max(self.counts[candidate] for d, candidate in close if d == close[0][0])
+            return nearest >= RARE_WORD_RATIO * self.rare[lower]
+        return True
+
+
+def read_word_counts(path=WORD_COUNTS_FILE):
+    """
+    {word: count} from a gzipped "word count" list
+    """
+    counts = {}
+    with gzip.open(path, 'rt', encoding='utf-8') as f:
+        for line in f:
+            if line.startswith('#'):
+                continue
+            word, _, count = line.partition(' ')
+            if count:
+                counts[word] = int(count)
+    return counts
+
+
+@lru_cache(maxsize=None)
+def spell_index():
+    """
+    The process-wide SpellIndex, built on first use
+    """
+    with open(WORDS_FILE, encoding='utf-8') as f:
+        words = {
+            word.lower()
+            for line in f if not line.startswith('#')
+            for word in line.split()
+        }
+    for vocabulary in SPELLING_VOCABULARY.values():
+        words |= vocabulary
+    return SpellIndex(words | FILLER_WORDS, read_word_counts())
+
+
+_checked_lock = threading.Lock()
+_checked = {}
+
+
+def _is_misspelled(index, story, names, word, sentence_start):
+    key = (story, word, sentence_start)
+    misspelled = _checked.get(key)
+    if misspelled is None:
+        misspelled = index.is_misspelled(word, names, sentence_start)
+        with _checked_lock:
+            if len(_checked) >= 50000:
+                _checked.clear()
+            _checked[key] = misspelled
+    return misspelled
+
+
+def misspelled_words(text, story=None):
+    """
+    Misspelled words of an answer (a string, or a list of strings), in order and without repeats
+    """
+    if isinstance(text, (list, tuple)):
+        parts = [part for part in text if isinstance(part, str)]
+    elif isinstance(text, str):
+        parts = [text]
+    else:
+        return []
+    index = spell_index()
+    names = SPELLING_VOCABULARY.get(story, ())
+    found = []
+    for part in parts:
+        part = part.replace('’', "'")
+        for match in _WORD.finditer(part):
+            word = match.group()
+            sentence_start = _SENTENCE_START.search(part, 0, match.start()) is not None
+            if word not in found and _is_misspelled(index, story, names, word, sentence_start):
+                found.append(word)
+    return found
+
+
+def local_spelling_enabled():
+    return getattr(settings, 'GRADING_LOCAL_SPELLING', True)
+
+
+_TASK = re.compile(r'Your task is twofold:\n1\. (.*)\n2\. Identify any misspelled English words in their answer\.')
+_FORMAT_FIELD = re.compile(r',?[ \t]*\n[ \t]*"misspelled_words":[^\n]*')
+_NOTE = re.compile(r'\n*Note on "misspelled_words":\n(?:- .*(?:\n|$))+')
+
+
+def strip_spelling_task(prompt):
+    """
+    The system prompt without the spelling task, its misspelled_words field and the note about it
+    """
+    prompt = _TASK.sub(r'Your task: \1', prompt)
+    prompt = _FORMAT_FIELD.sub('', prompt)
+    return _NOTE.sub('', prompt)
@@ -0,0 +1,424 @@
+"""
+Server-Sent Events variants of the grading endpoints.
+
+The check view runs in collect mode exactly as for worksheet grading. When the
+answer needs the LLM, the completion is requested as a stream and relayed to
+the browser as it arrives:
+
+    event: field     {"feedback_type": "good"} / {"isCorrect": true} / ...
+    event: message   {"delta": "Great"}        (the feedback text, token by token)
+    event: result    the full grade, in the same shape as the JSON endpoint
+    event: error     {"error": "..."}
+
+Answers settled without the LLM (validation, fast path, cache, fallback) are
+sent as a single result event.
+"""
+import contextlib
+import functools
+import json
+import logging
+
+import httpx
+import requests
+from django.conf import settings
+from django.http import StreamingHttpResponse
+from django.urls import path
+
+from .cache import grade_cache
+from .classifier import grade_log
+from .limiter import UpstreamBusy, aupstream_slot, busy_payload, upstream_slot
+from .prompts import usage_stats
+from .router import router
+from .shadow import shadow
+from .pipeline import (
+    PendingGrade, _collect_mode, cache_enabled, finalize_result, handle_response, spelled_for,
+)
+
+logger = logging.getLogger(__name__)
+
+# Keys whose string value is the feedback text streamed to the browser
+MESSAGE_KEYS = ('message', 'result')
+
+# Appended to the system prompt so the verdict is generated before the feedback text
+STREAM_KEY_ORDER = """
+When writing the JSON object, output the keys in this order: "feedback_type", "isCorrect", "show_answer", then "message", then any remaining keys."""
+
+
+def sse(event, data):
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n"
+
+
+class FeedbackStreamParser:
+    """
+    Incremental parser for the top level of a JSON object arriving in pieces.
+
+    feed() returns ('field', key, value) once a value is complete, and
+    ('message', key, text) for each decoded piece of a MESSAGE_KEYS string.
+    """
+
+    _ESCAPES = {'"': '"', '\\': '\\', '/': '/', 'b': '\b', 'f': '\f', 'n': '\n', 'r': '\r', 't': '\t'}
+
+    def __init__(self):
+        self.state = 'start'
+        self.key = None
+        self._chars = []
+        self._escape = None
+        self._nesting = 0
+        self._in_string = False
+
+    def feed(self, text):
+        events = []
+        for char in text:
+            event = self._step(char)
+            if event is not None:
+                events.append(event)
+        return events
+
+    def _step(self, char):
+        state = self.state
+        if state == 'start':
+            if char == '{':
+                self.state = 'key_or_end'
+        elif state == 'key_or_end':
+            if char == '"':
+                self.state, self._chars, self._escape = 'key', [], None
+            elif char == '}':
+                self.state = 'done'
+        elif state == 'key':
+            if self._escape is not None:
+                self._chars.append(char)
+                self._escape = None
+            elif char == '\\':
+                self._escape = ''
+            elif char == '"':
+                self.key = ''.join(self._chars)
+                self.state = 'colon'
+            else:
+                self._chars.append(char)
+        elif state == 'colon':
+            if char == ':':
+                self.state = 'value'
+        elif state == 'value':
+            if char.isspace():
+                return None
+            if char == '"':
+                self.state, self._chars, self._escape = 'string', [], None
+            else:
+                self.state, self._chars = 'raw', [char]
+                self._nesting = 1 if char in '[{' else 0
+                self._in_string = False
+        elif state == 'string':
+            return self._step_string(char)
+        elif state == 'raw':
+            return self._step_raw(char)
+        return None
+
+    def _step_string(self, char):
+        if self._escape is not None:
+            self._escape += char
+            if self._escape[0] == 'u':
+                if len(self._escape) < 5:
+                    return None
+                decoded = chr(int(self._escape[1:], 16))
+            else:
+                decoded = self._ESCAPES.get(self._escape, self._escape)
+            self._escape = None
+            return self._string_char(decoded)
+        if char == '\\':
+            self._escape = ''
+            return None
+        if char == '"':
+            value = ''.join(self._chars)
+            self.state = 'key_or_end'
+            return ('field', self.key, value)
+        return self._string_char(char)
+
+    def _string_char(self, char):
+        self._chars.append(char)
+        if self.key in MESSAGE_KEYS:
+            return ('message', self.key, char)
+        return None
+
+    def _step_raw(self, char):
+        if self._in_string:
+            if char == '"' and self._chars[-1] != '\\':
+                self._in_string = False
+        elif char == '"':
+            self._in_string = True
+        elif char in '[{':
+            self._nesting += 1
+        elif char in ']}' and self._nesting:
+            self._nesting -= 1
+        elif self._nesting == 0 and char in ',}':
+            self.state = 'done' if char == '}' else 'key_or_end'
+            try:
+                return ('field', self.key, json.loads(''.join(self._chars)))
+            except json.JSONDecodeError:
+                return None
+        self._chars.append(char)
+        return None
+
+
+class FeedbackStream:
+    """
+    Turns the streamed completion for one PendingGrade into SSE frames
+    """
+
+    def __init__(self, item):
+        self.item = item
+        self.parser = FeedbackStreamParser()
+        self.content = []
+        self.is_correct = None
+
+    def feed(self, delta):
+        self.content.append(delta)
+        if self.item.schema.template is not None:
+            # A compact reply has no feedback text; its message comes with the result
+            return []
+        frames = []
+        # Merge consecutive message characters into one delta per chunk
+        message = []
+        for kind, key, value in self.parser.feed(delta):
+            if kind == 'message':
+                message.append(value)
+                continue
+            if message:
+                frames.append(sse('message', {'delta': ''.join(message)}))
+                message = []
+            if key in MESSAGE_KEYS:
+                continue
+            if key == 'isCorrect' and self.item.correct_types is not None:
+                # isCorrect is derived from feedback_type, as for the JSON endpoint
+                continue
+            if key == 'show_answer' and self.is_correct:
+                value = False
+            frames.append(sse('field', {key: value}))
+            if key == 'feedback_type' and self.item.correct_types is not None:
+                self.is_correct = value in self.item.correct_types
+                frames.append(sse('field', {'isCorrect': self.is_correct}))
+        if message:
+            frames.append(sse('message', {'delta': ''.join(message)}))
+        return frames
+
+    def finish(self):
+        """
+        Returns (frame, result); result is None when the reply was not valid JSON
+        """
+        try:
+            result = finalize_result(self.item.schema.parse(''.join(self.content)), self.item.correct_types,
+                                     self.item.schema, self.item.user_answer)
+        except ValueError as e:
+            logger.warning(f"AI JSON decode error for {self.item.label}: {e}, using fallback")
+            return sse('result', json.loads(self.item.fallback(self.item.user_answer).content)), None
+        grade_log.record(self.item.schema, self.item.user_answer, result)
+        if self.item.shadowed:
+            shadow.observe(self.item.schema, self.item.user_answer, self.item.fallback, self.item.correct_types,
+                           result)
+        return sse('result', result), result
+
+
+def _content_delta(label, line):
+    """
+    Text delta carried by one upstream SSE line, or None. The final chunk's usage is recorded.
+    """
+    if not line or line.startswith(':') or not line.startswith('data:'):
+        return None
+    data = line[len('data:'):].strip()
+    if data == '[DONE]':
+        return None
+    chunk = json.loads(data)
+    if 'error' in chunk:
+        raise ValueError(chunk['error'])
+    usage_stats.record(label, chunk)
+    choices = chunk.get('choices') or [{}]
+    return choices[0].get('delta', {}).get('content')
+
+
+def stream_payload(payload, schema):
+    if schema.template is not None:
+        return payload
+    messages = [dict(message) for message in payload['messages']]
+    messages[0]['content'] += STREAM_KEY_ORDER
+    return dict(payload, messages=messages)
+
+
+def _error_frame(response):
+    return sse('error', json.loads(response.content))
+
+
+CONNECT_ERROR = {'error': 'Unable to connect to AI service. Please try again.'}
+
+
+def stream_grade(item):
+    """
+    Generator of SSE frames grading item with a streamed OpenRouter completion.
+    The upstream slot is held until the stream ends.
+    """
+    try:
+        with upstream_slot():
+            yield from _stream_grade(item)
+    except UpstreamBusy as e:
+        logger.warning(f"Upstream queue full, turning away {item.label}")
+        yield sse('error', busy_payload(e))
+
+
+def _stream_grade(item):
+    stream = FeedbackStream(item)
+    try:
+        response = router.post_stream(item.label, stream_payload(item.payload, item.schema), title=item.title)
+    except requests.RequestException as e:
+        logger.error(f"Request exception grading {item.label}: {e}")
+        yield sse('error', CONNECT_ERROR)
+        return
+
+    with response:
+        if response.status_code != 200:
+            yield _error_frame(handle_response(item.label, response, item.user_answer,
+                                               item.fallback, item.correct_types)[0])
+            return
+        try:
+            for line in response.iter_lines(decode_unicode=True):
+                delta = _content_delta(item.label, line)
+                if delta:
+                    yield from stream.feed(delta)
+        except (requests.RequestException, ValueError) as e:
+            logger.error(f"Streaming error grading {item.label}: {e}")
+            yield sse('error', CONNECT_ERROR)
+            return
+
+    frame, result = stream.finish()
+    if cache_enabled() and result is not None:
+        grade_cache.set(item.key, result)
+    yield frame
+
+
+async def astream_grade(item):
+    """
+    Async twin of stream_grade()
+    """
+    try:
+        async with aupstream_slot():
+            async for frame in _astream_grade(item):
+                yield frame
+    except UpstreamBusy as e:
+        logger.warning(f"Upstream queue full, turning away {item.label}")
+        yield sse('error', busy_payload(e))
+
+
+async def _astream_grade(item):
+    stream = FeedbackStream(item)
+    async with contextlib.AsyncExitStack() as stack:
+        try:
+            response = await stack.enter_async_context(
+                router.apost_stream(item.label, stream_payload(item.payload, item.schema), title=item.title))
+
+            if response.status_code != 200:
+                await response.aread()
+                yield _error_frame(handle_response(item.label, response, item.user_answer,
+                                                   item.fallback, item.correct_types)[0])
+                return
+            async for line in response.aiter_lines():
+                delta = _content_delta(item.label, line)
+                if delta:
+                    for frame in stream.feed(delta):
+                        yield frame
+        except (httpx.HTTPError, ValueError) as e:
+            logger.error(f"Streaming error grading {item.label}: {e}")
+            yield sse('error', CONNECT_ERROR)
+            return
+
+    frame, result = stream.finish()
+    if cache_enabled() and result is not None:
+        await grade_cache.aset(item.key, result)
+    yield frame
+
+
+def event_stream_response(frames):
+    response = StreamingHttpResponse(frames, content_type='text/event-stream')
+    response['Cache-Control'] = 'no-cache'
+    response['X-Accel-Buffering'] = 'no'
+    return response
+
+
+def _collect(view, request, args, kwargs):
+    token = _collect_mode.set(True)
+    try:
+        return view(request, *args, **kwargs)
+    finally:
+        _collect_mode.reset(token)
+
+
+def _single_frame(frame, is_async):
+    if not is_async:
+        return event_stream_response(iter([frame]))
+
+    async def frames():
+        yield frame
+    return event_stream_response(frames())
+
+
+def _settled(result, is_async):
+    """
+    SSE response for an answer settled without streaming; errors keep their JSON response
+    """
+    if result.status_code != 200:
+        return result
+    return _single_frame(sse('result', json.loads(result.content)), is_async)
+
+
+def _answer_without_llm(item, cached):
+    """
+    Result frame for an answer settled without streaming (cache, no key, open circuit), or None
+    """
+    if cached is not None:
+        if item.shadowed:
+            shadow.observe(item.schema, item.user_answer, item.fallback, item.correct_types, cached)
+        return sse('result', spelled_for(cached, item.story, item.user_answer))
+    if router.available(item.label):
+        return None
+    logger.warning(f"No LLM backend available, using fallback for {item.label}")
+    return sse('result', json.loads(item.fallback(item.user_answer).content))
+
+
+def streaming_view(view):
+    """
+    Build the SSE variant of a grading view (async when GRADING_ASYNC_VIEWS is set)
+    """
+    if getattr(settings, 'GRADING_ASYNC_VIEWS', False):
+        @functools.wraps(view)
+        async def async_wrapper(request, *args, **kwargs):
+            result = _collect(view, request, args, kwargs)
+            if not isinstance(result, PendingGrade):
+                return _settled(result, is_async=True)
+            cached = await grade_cache.aget(result.key) if cache_enabled() else None
+            frame = _answer_without_llm(result, cached)
+            if frame is not None:
+                return _single_frame(frame, is_async=True)
+            return event_stream_response(astream_grade(result))
+        # csrf_exempt() would wrap this in a sync function, so set its flag directly
+        async_wrapper.csrf_exempt = True
+        return async_wrapper
+
+    @functools.wraps(view)
+    def wrapper(request, *args, **kwargs):
+        result = _collect(view, request, args, kwargs)
+        if not isinstance(result, PendingGrade):
+            return _settled(result, is_async=False)
+        cached = grade_cache.get(result.key) if cache_enabled() else None
+        frame = _answer_without_llm(result, cached)
+        if frame is not None:
+            return _single_frame(frame, is_async=False)
+        return event_stream_response(stream_grade(result))
+    return wrapper
+
+
+def streaming_urlpatterns(urlpatterns):
+    """
+    SSE variants of the grading routes in urlpatterns, at the same path + "stream/"
+    """
+    return [
+        path(f"{pattern.pattern}stream/", streaming_view(pattern.callback.grading_view),
+             name=f"{pattern.name}_stream")
+        for pattern in urlpatterns
+        if hasattr(pattern.callback, 'grading_view')
+    ]
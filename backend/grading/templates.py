@@ -0,0 +1,441 @@
+"""
+Compact grading output with server-side feedback messages.
+
+With GRADING_COMPACT_OUTPUT on, the model is asked for codes only:
+
+    {"f": "<feedback_type>", "m": ["<matched rubric item>", ...], "s": ["<misspelled word>", ...]}
+
+and the child-facing message is picked from the question's templates below,
+whose wording comes from the existing fallback graders. A reply is a few dozen
+tokens instead of a few hundred, so completions finish much sooner.
+"""
+from django.conf import settings
+
+# Output budget for a compact reply
+COMPACT_MAX_TOKENS = 60
+
+# Feedback types that count as correct unless the question says otherwise
+CORRECT_TYPES = ('excellent', 'good')
+
+COMPACT_INSTRUCTIONS = """
+
+COMPACT OUTPUT: Ignore the JSON format described above and do not write any feedback text.
+Respond with only this JSON object:
+{{"f": "<feedback code>", "m": [<codes of the rubric items the answer matches>]{spelling}}}
+Feedback codes: {codes}
+Rubric items:
+{items}"""
+
+
+class CompactTemplate:
+    """
+    Rubric item codes, message templates and correct answer for one question.
+
+    templates is an ordered list of (feedback_type, required items, message);
+    the first template of the reply's feedback type whose required items were
+    all matched is used. When none matches there is no message that fits, and
+    the grade is left to the LLM rather than guessed.
+    """
+
+    def __init__(self, items, templates, correct_answer=None):
+        self.items = items
+        self.templates = templates
+        self.correct_answer = correct_answer
+        self.feedback_types = list(dict.fromkeys(feedback_type for feedback_type, _, _ in templates))
+
+    def instructions(self, spelling=True):
+        return COMPACT_INSTRUCTIONS.format(
+            spelling=', "s": [<misspelled words>]' if spelling else '',
+            codes=', '.join(self.feedback_types),
+            items='\n'.join(f"- {code}: {description}" for code, description in self.items.items()),
+        )
+
+    def payload(self, payload, spelling=True):
+        """
+        The question's payload switched to compact output; the system message stays static.
+        Without spelling, the reply has no "s" list (see spelling.py).
+        """
+        instructions = self.instructions(spelling)
+        if payload['messages'][0]['content'].endswith(instructions):
+            return payload
+        messages = [dict(message) for message in payload['messages']]
+        messages[0]['content'] += instructions
+        return dict(payload, messages=messages, max_tokens=COMPACT_MAX_TOKENS)
+
+    def message(self, feedback_type, matched):
+        """
+        The first message of feedback_type whose required items are all in matched, or None
+        """
+        for kind, required, message in self.templates:
+            if kind == feedback_type and set(required) <= matched:
+                return message
+        return None
+
+    def expand(self, reply, correct_types=None):
+        """
+        Build the usual grading response from a compact reply. isCorrect follows the question's
+        correct_types, and the correct answer is shown only when the answer does not count as correct.
+        Raises ValueError for unknown codes and for a feedback code none of whose messages fits the
+        matched items.
+        """
+        feedback_type = reply.get('f', reply.get('feedback_type'))
+        if feedback_type not in self.feedback_types:
+            raise ValueError(f"Unknown feedback code {feedback_type!r}")
+        matched = {code for code in reply.get('m') or [] if code in self.items}
+        message = self.message(feedback_type, matched)
+        if message is None:
+            raise ValueError(f"No {feedback_type!r} message for items {sorted(matched)}")
+        is_correct = feedback_type in (CORRECT_TYPES if correct_types is None else correct_types)
+        result = {
+            'isCorrect': is_correct,
+            'message': message,
+            'feedback_type': feedback_type,
+            'show_answer': not is_correct,
+            'misspelled_words': [word for word in reply.get('s') or [] if isinstance(word, str)],
+            'matched': sorted(matched),
+        }
+        if self.correct_answer:
+            result['correct_answer'] = self.correct_answer
+        return result
+
+
+COMPACT_TEMPLATES = {
+    ('goldilocks', 1): CompactTemplate(
+        items={
+            'goldilocks': 'names Goldilocks',
+            'three_bears': 'says there are three bears',
+            'bears': 'mentions the bears',
+        },
+        templates=[
+            ('excellent', (), 'Excellent! You got the title right!'),
+            ('good', (), 'Good! You have the main character, but the title also mentions how many bears there are.'),
+            ('partial', ('goldilocks',), 'You got the main character! But the title also includes information about the other characters.'),
+            ('partial', ('bears',), "You identified some characters, but you're missing the main character's name."),
+            ('incorrect', (), "That's not quite right. Think about the main character and the other characters in the story."),
+        ],
+        correct_answer='Goldilocks and the Three Bears',
+    ),
+    ('goldilocks', 2): CompactTemplate(
+        items={
+            'traditional': 'says it is a traditional/folk/anonymous tale with no single author',
+            'southey': 'names Robert Southey',
+            'other_author': 'names an author who did not write it',
+        },
+        templates=[
+            ('excellent', (), 'Excellent! You understand that this is a traditional story without a single author.'),
+            ('good', (), 'Good! Robert Southey did publish an early version, though the story is much older.'),
+            ('partial', (), 'Think about how old this story is. Is it a modern story with a specific author, or something much older?'),
+            ('incorrect', (), "That author didn't write this story. Remember, this is a very old traditional tale."),
+        ],
+        correct_answer='Traditional folk tale (no single author)',
+    ),
+    ('goldilocks', 3): CompactTemplate(
+        items={
+            'fiction': 'says fiction or a kind of made-up story',
+            'nonfiction': 'says non-fiction',
+            'subgenre': 'names a sub-genre such as comedy or adventure',
+        },
+        templates=[
+            ('excellent', (), "Excellent! You're absolutely right. Goldilocks is a fiction story because it features imaginary characters and events that didn't really happen. Fiction stories are made-up tales like fairy tales, novels, and fantasy stories."),
+            ('good', (), "You're thinking about story types! But the main genre category is broader - think about whether this story is real or made-up."),
+            ('partial', (), "You're thinking about story types! But the main genre category is broader - think about whether this story is real or made-up."),
+            ('incorrect', (), "Not quite! Goldilocks is actually fiction because it's an imaginary story with made-up characters and talking animals. Non-fiction would be true stories about real people, historical events, biographies, or factual information."),
+        ],
+        correct_answer='Fiction',
+    ),
+    ('goldilocks', 4): CompactTemplate(
+        items={
+            'goldilocks': 'names Goldilocks',
+            'papa_bear': 'names Papa/Daddy Bear',
+            'mama_bear': 'names Mama/Mummy Bear',
+            'baby_bear': 'names Baby Bear',
+        },
+        templates=[
+            ('excellent', (), 'Excellent! You identified all the main characters in the story.'),
+            ('good', (), 'Good job! You got most of the main characters. You might have missed one.'),
+            ('partial', (), "You're on the right track! You identified some characters, but there are more main characters in this story."),
+            ('needs_improvement', (), "Think about all the main characters - there's a little girl and a family of bears. Can you name them all?"),
+        ],
+        correct_answer='Goldilocks, Papa Bear, Mama Bear, and Baby Bear',
+    ),
+    ('goldilocks', 5): CompactTemplate(
+        items={
+            'woods': 'names the woods/forest',
+            'house': "names the bears' house",
+        },
+        templates=[
+            ('excellent', (), "Excellent! You identified both main settings - the woods and the bears' house."),
+            ('good', ('woods',), 'Good! You identified the woods/forest setting. The story also takes place in another important location.'),
+            ('good', ('house',), 'Good! You identified the house setting. The story also takes place in another important outdoor location.'),
+            ('partial', (), 'Think about where Goldilocks goes and where the bears live. What kind of place is it?'),
+            ('needs_improvement', (), 'Think about where Goldilocks goes and where the bears live. What kind of place is it?'),
+        ],
+        correct_answer="In the woods and at the bears' house",
+    ),
+    ('goldilocks', 6): CompactTemplate(
+        items={
+            'bears_walk': 'the bears go for a walk while the porridge cools',
+            'enters_house': "Goldilocks enters the bears' house",
+            'porridge': 'she tastes the porridge',
+            'chairs': 'she tries the chairs / breaks one',
+            'bed': 'she sleeps in a bed',
+            'bears_return': 'the bears come home and find her',
+            'runs_away': 'she wakes up and runs away',
+        },
+        templates=[
+            ('excellent', (), 'Excellent! You identified many important events from the story.'),
+            ('good', (), 'Good job! You got several important story events.'),
+            ('partial', (), 'You have some story elements, but try to think of more major events that happen.'),
+            ('needs_improvement', (), 'Think about the main things that happen: What does Goldilocks do? What do the bears do?'),
+        ],
+        correct_answer="1. Goldilocks enters the bears' house\n2. She tries their porridge, chairs, and beds\n3. The bears find her and she runs away",
+    ),
+    ('goldilocks', 7): CompactTemplate(
+        items={
+            'character': 'names a character from the story',
+            'reason': 'explains why they like them',
+        },
+        templates=[
+            ('excellent', (), 'Excellent! You chose a character from the Goldilocks story and gave a great explanation of why you like them.'),
+            ('good', (), 'Good job! You chose a character from the story and explained why you like them.'),
+            ('partial', (), 'You mentioned a character from the story! Can you tell us more about why they are your favourite?'),
+            ('needs_improvement', (), 'Remember to choose one of the characters from the Goldilocks and the Three Bears story (Goldilocks, Papa Bear, Mama Bear, or Baby Bear) and explain why you like them.'),
+        ],
+    ),
+    ('peter', 1): CompactTemplate(
+        items={
+            'peter': 'names Peter',
+            'rabbit': 'says Rabbit',
+            'tale': 'includes "The Tale of"',
+        },
+        templates=[
+            ('excellent', (), 'Excellent! You got the complete title right!'),
+            ('good', (), 'Great! You have the main characters. The full title also mentions it being a "Tale".'),
+            ('partial', ('peter',), 'You got the main character! But the title also includes another important word about what kind of animal Peter is.'),
+            ('partial', ('rabbit',), "You identified the type of animal, but you are missing the main character's name."),
+            ('incorrect', (), 'Think about the main character in this story - what is his name and what kind of animal is he?'),
+        ],
+        correct_answer='The Tale of Peter Rabbit',
+    ),
+    ('peter', 2): CompactTemplate(
+        items={
+            'beatrix': 'says Beatrix',
+            'potter': 'says Potter',
+            'other_author': 'names an author who did not write it',
+            'unsure': "says they don't know",
+        },
+        templates=[
+            ('excellent', (), 'Excellent! You correctly identified Beatrix Potter as the author of Peter Rabbit stories.'),
+            ('good', (), "Good! You have part of the author's name. The full name is Beatrix Potter."),
+            ('partial', (), "That's okay! The author is a famous British writer who created many beloved animal characters."),
+            ('incorrect', ('other_author',), "That author didn't write Peter Rabbit. Think about a British author who wrote many animal stories."),
+            ('incorrect', (), 'Think about a British author known for writing charming animal stories with beautiful illustrations.'),
+        ],
+        correct_answer='Beatrix Potter',
+    ),
+    ('peter', 3): CompactTemplate(
+        items={
+            'fiction': "says fiction, children's fiction or fairy tale",
+            'nonfiction': 'says non-fiction',
+            'subgenre': 'names a sub-genre such as adventure or comedy',
+        },
+        templates=[
+            ('excellent', (), 'Excellent! Fiction is exactly right because Peter Rabbit is an imaginary story with talking animals.'),
+            ('good', (), 'Great! You understand this is fiction - a made-up story with imaginary characters and talking animals.'),
+            ('partial', (), "You're thinking about story types! But the main genre category is broader - think about whether this story is real or made-up."),
+            ('incorrect', ('nonfiction',), "Not quite! Peter Rabbit is actually fiction because it's an imaginary story with talking animals. Non-fiction would be true stories about real events."),
+            ('incorrect', (), 'Think about whether Peter Rabbit is a real story about real animals, or an imaginary story with talking animals.'),
+        ],
+        correct_answer='Fiction',
+    ),
+    ('peter', 4): CompactTemplate(
+        items={
+            'rabbit': 'says rabbit/bunny',
+            'peter': 'names Peter',
+            'other_story_animal': 'names another animal from the story',
+            'wrong_animal': 'names an animal not in the story',
+        },
+        templates=[
+            ('excellent', ('rabbit', 'peter'), 'Excellent! You correctly identified that Peter is a rabbit, and he is the main character of the story.'),
+            ('excellent', (), 'Perfect! Rabbit is exactly right. Peter Rabbit is the main character and he is a rabbit.'),
+            ('good', (), 'Good! Peter is the main character. Can you tell me what type of animal Peter is?'),
+            ('partial', (), 'There are other animals in the story, but think about the MAIN character. What type of animal is Peter?'),
+            ('incorrect', ('wrong_animal',), "That animal isn't in this story. Think about the main character, Peter. What type of animal is he?"),
+            ('incorrect', (), "Think about the main character of the story. His name is Peter, and he's a type of animal that hops and has long ears."),
+        ],
+        correct_answer='Rabbit',
+    ),
+    ('peter', 5): CompactTemplate(
+        items={
+            'curious': 'curious',
+            'mischievous': 'mischievous/naughty',
+            'adventurous': 'adventurous/brave',
+            'disobedient': "disobedient/doesn't listen",
+            'playful': 'playful',
+            'reason': 'backs it up with something Peter does',
+            'negative_trait': 'a trait that does not fit Peter (mean, lazy, ...)',
+        },
+        templates=[
+            ('excellent', (), "Excellent! You understand Peter's personality very well. He is indeed curious, mischievous, and adventurous."),
+            ('good', (), "Good job! You identified important aspects of Peter's personality. He does get into trouble because of his curious nature."),
+            ('partial', (), "You're on the right track! Peter does have that trait. Can you think of other ways to describe his personality?"),
+            ('needs_improvement', ('negative_trait',), "Peter isn't really like that. Think about how he acts in the story - he's more playful and curious than mean."),
+            ('needs_improvement', (), 'Think about what Peter does in the story. Does he follow rules? Is he curious about things? How does he act?'),
+        ],
+    ),
+    ('peter', 6): CompactTemplate(
+        items={
+            'cat': 'names the cat',
+            'birds': 'names the birds/sparrows',
+            'peter_again': 'names Peter or a rabbit again',
+            'other_story_animal': 'names another animal that could be in the story',
+            'wrong_animal': 'names an animal not in the story',
+        },
+        templates=[
+            ('excellent', ('cat',), "Excellent! The cat is indeed another important animal in Peter Rabbit's story. Mr. McGregor's cat appears in the tale."),
+            ('excellent', (), 'Great! Birds do appear in the Peter Rabbit story. The sparrows are mentioned and interact with Peter.'),
+            ('good', (), "That animal might appear in the story! Good thinking about the different creatures in Peter's world."),
+            ('partial', (), 'Peter Rabbit is the MAIN character! Think about OTHER animals that appear in the story besides Peter.'),
+            ('incorrect', ('wrong_animal',), "That animal doesn't appear in Peter Rabbit's story. Think about animals that live in gardens or around houses."),
+            ('incorrect', (), "Think about what other animals Peter encounters in the story. What animals might live in or around Mr. McGregor's garden?"),
+        ],
+        correct_answer='Cat or Birds',
+    ),
+    ('peter', 7): CompactTemplate(
+        items={
+            'cat_traits': 'traits that fit the cat (watchful, cautious, sneaky, clever)',
+            'bird_traits': 'traits that fit the birds (helpful, kind, warning, friendly)',
+            'general_trait': 'a general animal trait',
+            'negative_trait': 'a trait that does not fit the animals',
+        },
+        templates=[
+            ('excellent', ('cat_traits',), 'Excellent! Those are great personality traits for a cat character. Cats are often watchful and alert in stories.'),
+            ('excellent', (), 'Wonderful! Those traits fit well for bird characters. Birds in stories often help and warn other characters.'),
+            ('good', (), "Good thinking! That's a nice personality trait for an animal character in the story."),
+            ('partial', (), 'That could work for an animal character! Can you think of more specific traits that fit cats or birds?'),
+            ('needs_improvement', ('negative_trait',), "The animals in Peter Rabbit aren't really like that. Think about more positive traits like how cats watch carefully or birds help others."),
+            ('needs_improvement', (), 'Think about the personality of animals like cats or birds. How do they behave? Are they helpful, watchful, or careful?'),
+        ],
+    ),
+    ('peter', 8): CompactTemplate(
+        items={
+            'garden': "names Mr. McGregor's garden",
+            'woods_or_home': "names the woods/countryside or Peter's home",
+            'outside': 'only says outside',
+            'wrong_setting': 'names a place not in the story',
+        },
+        templates=[
+            ('excellent', (), 'Excellent! You identified multiple important settings in Peter Rabbit - both the garden where he gets into trouble and his home area.'),
+            ('good', ('garden',), "Great! Mr. McGregor's garden is definitely where the main action happens. The story also takes place in other outdoor areas."),
+            ('good', (), 'Good! Peter does live in the countryside/woods area. The story also takes place in a special garden where he gets into trouble.'),
+            ('partial', (), "You're right that it's outside! Can you be more specific about what kind of outdoor places Peter visits?"),
+            ('incorrect', ('wrong_setting',), 'Peter Rabbit takes place in outdoor, natural settings. Think about where a rabbit would live and what kind of places he might explore.'),
+            ('incorrect', (), 'Think about where Peter lives and where he goes to get into trouble. What outdoor places does he visit?'),
+        ],
+        correct_answer="Mr. McGregor's garden and the countryside",
+    ),
+    ('peter', 9): CompactTemplate(
+        items={
+            'disobeys_mother': "Peter disobeys his mother",
+            'enters_garden': "he goes into Mr. McGregor's garden",
+            'gets_in_trouble': 'he is chased / nearly caught',
+            'secondary_detail': 'only a side event (losing his jacket, eating vegetables)',
+            'wrong_event': 'something that does not happen in the story',
+        },
+        templates=[
+            ('excellent', (), "Excellent! You understand the main conflict - Peter's disobedience leads to big trouble in the garden."),
+            ('good', (), "Good job! You identified key parts of the main problem. Peter gets in trouble because he doesn't obey his mother."),
+            ('partial', ('secondary_detail',), 'That happens in the story, but think about the MAIN problem. What causes all the trouble to begin with?'),
+            ('partial', (), "You're on the right track! Think about WHY Peter gets into this situation. What did he do wrong?"),
+            ('incorrect', ('wrong_event',), "That's not what happens in Peter Rabbit. Think about what Peter does that gets him into trouble."),
+            ('incorrect', (), "Think about what Peter does wrong and where he goes that he shouldn't. What gets him into trouble?"),
+        ],
+        correct_answer="Peter disobeys his mother and gets into trouble in Mr. McGregor's garden",
+    ),
+    ('peter', 10): CompactTemplate(
+        items={
+            'escapes': 'Peter escapes / runs away from the garden',
+            'hides': 'he hides',
+            'gets_home': 'he gets home safely',
+            'mother_cares': 'his mother looks after him',
+            'wrong_solution': 'something that does not happen in the story',
+        },
+        templates=[
+            ('excellent', (), "Excellent! You understand how Peter's problem was resolved - he escaped the garden and got home safely where his mother could take care of him."),
+            ('good', (), 'Good job! You identified important parts of how the problem was solved. Peter did manage to resolve his dangerous situation.'),
+            ('partial', (), "You're on the right track! Think about what Peter had to do to get out of his dangerous situation and where he ended up."),
+            ('incorrect', ('wrong_solution',), "That's not how the problem was solved in Peter Rabbit. Think about realistic ways Peter could escape from the garden."),
+            ('incorrect', (), "Think about how Peter got out of the dangerous situation in Mr. McGregor's garden and where he went afterwards."),
+        ],
+        correct_answer='Peter escapes from the garden and returns home safely to his mother',
+    ),
+    ('peter', 11): CompactTemplate(
+        items={
+            'obey_parents': 'listen to / obey your parents',
+            'consequences': 'disobeying has consequences',
+            'rules_safety': 'follow rules to stay safe',
+            'general_lesson': 'a good lesson that is not specific to the story',
+            'wrong_lesson': 'a lesson that is not from the story',
+        },
+        templates=[
+            ('excellent', (), 'Excellent! You understand the main lesson - Peter learned that disobeying his mother led to serious consequences and danger.'),
+            ('good', (), 'Good job! You identified important parts of the lesson Peter learned about obedience and consequences.'),
+            ('partial', ('general_lesson',), "That's a good lesson in general, but think specifically about what Peter learned from his adventure in the garden."),
+            ('partial', (), "You're on the right track! Think about what Peter should have done differently and why his mother gave him that warning."),
+            ('incorrect', ('wrong_lesson',), "That lesson isn't from Peter Rabbit's story. Think about what happened when Peter didn't listen to his mother."),
+            ('incorrect', (), 'Think about what Peter should have learned from his dangerous experience. What did his mother warn him about?'),
+        ],
+        correct_answer='Listen to your parents and obey rules, because disobedience has consequences',
+    ),
+    ('peter', 12): CompactTemplate(
+        items={
+            'character': 'names a character from the story',
+            'reason': 'explains why they like them',
+            'wrong_character': 'names a character not in the story',
+        },
+        templates=[
+            ('excellent', (), 'Excellent! You chose a character from the story and gave thoughtful reasons for your choice. Great personal reflection!'),
+            ('good', (), 'Good choice! You picked a character from Peter Rabbit and explained why you like them. Nice thinking!'),
+            ('partial', (), 'You chose a character from the story! Can you tell us more about WHY you like this character?'),
+            ('needs_improvement', ('wrong_character',), "That character isn't in Peter Rabbit's story. Choose someone from the Peter Rabbit tale and tell us why you like them."),
+            ('needs_improvement', (), 'Please choose a character from the Peter Rabbit story and explain why they are your favourite.'),
+        ],
+    ),
+    ('peter', 13): CompactTemplate(
+        items={
+            'emotion': 'names a feeling',
+            'when_or_why': 'says when or why they felt it',
+            'not_a_feeling': 'describes the story instead of a feeling',
+        },
+        templates=[
+            ('excellent', (), "Wonderful! You shared detailed feelings about your reading experience. It's great that you connected emotionally with Peter's adventure!"),
+            ('good', (), "Great job sharing your feelings! You made a personal connection to the story and Peter's experiences."),
+            ('partial', (), 'Good! You expressed how you felt. Can you tell us more about WHEN you felt that way during the story?'),
+            ('needs_improvement', ('not_a_feeling',), "Try to think about your FEELINGS and emotions while reading. Were you excited, worried, happy, nervous? How did Peter's adventure make you feel?"),
+            ('needs_improvement', (), "Please share your emotions and feelings while reading Peter's story. For example, were you excited, worried, happy, or scared during different parts?"),
+        ],
+    ),
+    ('peter', 14): CompactTemplate(
+        items={
+            'story_event': 'names a specific part or scene of the story',
+            'feeling_link': 'links it to how they felt',
+            'vague': 'only a vague, non-specific part',
+        },
+        templates=[
+            ('excellent', (), "Excellent connection! You identified a specific part of Peter's story and linked it to your feelings. That's exactly how good readers connect with stories!"),
+            ('good', (), "Good job mentioning a part of Peter's story! You're making connections between the story and your feelings."),
+            ('partial', (), "You're thinking about Peter's story! Can you be more specific about which exact part or scene made you feel that way?"),
+            ('needs_improvement', ('vague',), "Try to think of one specific scene or moment in Peter's adventure. Was it when he entered the garden, when he was chased, or when he got home?"),
+            ('needs_improvement', (), "Please tell us about a specific part of Peter Rabbit's story that made you feel a certain way. Think about particular scenes or moments."),
+        ],
+    ),
+}
+
+
+def compact_template(story, question):
+    """
+    The question's CompactTemplate when compact output is enabled, else None
+    """
+    if not getattr(settings, 'GRADING_COMPACT_OUTPUT', False):
+        return None
+    return COMPACT_TEMPLATES.get((story, question))
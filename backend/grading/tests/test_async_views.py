@@ -0,0 +1,144 @@
+import asyncio
+import json
+from unittest import mock
+
+from django.test import RequestFactory, SimpleTestCase, override_settings
+from django.urls import path
+
+from grading import pipeline
+from grading.pipeline import async_view, grading_view
+from peter.views import check_question9_answer
+
+ANSWER = 'Peter went into the garden and Mr. McGregor chased him'
+LLM_GRADE = {'isCorrect': True, 'message': 'Well done!', 'feedback_type': 'excellent', 'show_answer': False,
+             'misspelled_words': []}
+
+# Served by the ASGI tests below, with the async twin of a grading view
+urlpatterns = [
+    path('api/check-peter-question9/', async_view(check_question9_answer)),
+]
+
+
+def reply(result=LLM_GRADE):
+    response = mock.Mock(status_code=200)
+    response.json.return_value = {'choices': [{'message': {'content': json.dumps(result)}}]}
+    return response
+
+
+def request(answer=ANSWER):
+    return RequestFactory().post('/api/check-peter-question9/', data={'answer': answer},
+                                 content_type='application/json')
+
+
+async def asgi_post(application, url, body):
+    """
+    Drive an ASGI application through one POST; returns (status, headers, body)
+    """
+    scope = {
+        'type': 'http', 'asgi': {'version': '3.0'}, 'http_version': '1.1', 'method': 'POST',
+        'scheme': 'http', 'path': url, 'raw_path': url.encode(), 'root_path': '', 'query_string': b'',
+        'headers': [(b'host', b'testserver'), (b'content-type', b'application/json')],
+        'client': ('127.0.0.1', 50000), 'server': ('testserver', 80),
+    }
+    incoming = [{'type': 'http.request', 'body': body, 'more_body': False}]
+
+    async def receive():
+        if incoming:
+            return incoming.pop(0)
+        await asyncio.Event().wait()
+
+    messages = []
+
+    async def send(message):
+        messages.append(message)
+
+    await application(scope, receive, send)
+    start = next(message for message in messages if message['type'] == 'http.response.start')
+    content = b''.join(message.get('body', b'') for message in messages if message['type'] == 'http.response.body')
+    return start['status'], dict(start['headers']), content
+
+
+@override_settings(GRADING_CACHE_ENABLED=False, GRADING_SINGLE_FLIGHT=False, GRADING_SIMILARITY=False,
+                   GRADING_IDEMPOTENCY=False, GRADING_SHADOW_SAMPLE=0.0, GRADING_COMPACT_OUTPUT=False)
+class AsyncViewTests(SimpleTestCase):
+    def setUp(self):
+        self.apost = mock.AsyncMock(return_value=reply())
+        self.post = mock.Mock(return_value=reply())
+        patches = [
+            mock.patch.object(pipeline.hedging, 'apost', self.apost),
+            mock.patch.object(pipeline.hedging, 'post', self.post),
+            mock.patch.object(pipeline.router, 'available', return_value=True),
+        ]
+        for patch in patches:
+            patch.start()
+            self.addCleanup(patch.stop)
+
+    async def test_async_view_awaits_the_upstream_call(self):
+        response = await async_view(check_question9_answer)(request())
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(json.loads(response.content)['message'], 'Well done!')
+        self.apost.assert_awaited_once()
+        self.post.assert_not_called()
+
+    async def test_validation_is_answered_without_upstream(self):
+        response = await async_view(check_question9_answer)(request(''))
+        self.assertEqual(response.status_code, 400)
+        self.apost.assert_not_awaited()
+
+    async def test_async_mode_does_not_leak_out_of_the_view(self):
+        await async_view(check_question9_answer)(request())
+        self.assertFalse(pipeline._async_mode.get())
+
+    def test_grading_view_follows_the_setting(self):
+        self.assertFalse(asyncio.iscoroutinefunction(grading_view(check_question9_answer)))
+        with override_settings(GRADING_ASYNC_VIEWS=True):
+            view = grading_view(check_question9_answer)
+        self.assertTrue(asyncio.iscoroutinefunction(view))
+        self.assertTrue(view.csrf_exempt)
+        self.assertIs(view.grading_view, check_question9_answer)
+
+    @override_settings(GRADING_IDEMPOTENCY=True)
+    async def test_grading_view_repeats_share_one_upstream_call(self):
+        with override_settings(GRADING_ASYNC_VIEWS=True):
+            view = grading_view(check_question9_answer)
+        body = {'answer': 'Peter squeezed under the gate into the garden of Mr. McGregor'}
+        responses = await asyncio.gather(*[
+            view(RequestFactory().post('/api/check-peter-question9/', data=body, content_type='application/json'))
+            for _ in range(3)
+        ])
+        self.assertEqual([response.status_code for response in responses], [200] * 3)
+        self.apost.assert_awaited_once()
+
+
+@override_settings(GRADING_CACHE_ENABLED=False, GRADING_SINGLE_FLIGHT=False, GRADING_SIMILARITY=False,
+                   GRADING_IDEMPOTENCY=False, GRADING_SHADOW_SAMPLE=0.0, GRADING_COMPACT_OUTPUT=False)
+class AsgiApplicationTests(SimpleTestCase):
+    def setUp(self):
+        from backend.asgi import application
+
+        self.application = application
+        self.apost = mock.AsyncMock(return_value=reply())
+        self.post = mock.Mock(return_value=reply())
+        patches = [
+            mock.patch.object(pipeline.hedging, 'apost', self.apost),
+            mock.patch.object(pipeline.hedging, 'post', self.post),
+            mock.patch.object(pipeline.router, 'available', return_value=True),
+        ]
+        for patch in patches:
+            patch.start()
+            self.addCleanup(patch.stop)
+
+    @override_settings(ROOT_URLCONF=__name__)
+    async def test_async_view_is_awaited_on_the_event_loop(self):
+        status, headers, content = await asgi_post(self.application, '/api/check-peter-question9/',
+                                                   json.dumps({'answer': ANSWER}).encode())
+        self.assertEqual(status, 200)
+        self.assertEqual(json.loads(content)['message'], 'Well done!')
+        self.apost.assert_awaited_once()
+        self.post.assert_not_called()
+
+    async def test_project_urls_are_served(self):
+        status, headers, content = await asgi_post(self.application, '/api/check-peter-question9/',
+                                                   json.dumps({'answer': ''}).encode())
+        self.assertEqual(status, 400)
+        self.assertEqual(json.loads(content), {'error': 'Please enter an answer.'})
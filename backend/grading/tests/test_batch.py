@@ -0,0 +1,152 @@
+import asyncio
+import json
+from unittest import mock
+
+from django.http import JsonResponse
+from django.test import RequestFactory, SimpleTestCase, override_settings
+
+from grading import batch, pipeline
+from grading.batch import (
+    BatchStats, agrade_chunk, build_batch_payload, collect_worksheet, grade_chunk, parse_batch_reply, split_chunks,
+)
+
+ANSWERS = {
+    '9': 'Peter went into the garden and Mr. McGregor chased him',
+    '10': 'Peter lost his jacket and shoes in the garden',
+    '11': 'He hid in a watering can in the tool shed',
+}
+
+
+def grade(message):
+    return {'isCorrect': True, 'message': message, 'feedback_type': 'excellent', 'show_answer': False,
+            'misspelled_words': []}
+
+
+def reply(content, status_code=200):
+    response = mock.Mock(status_code=status_code)
+    response.json.return_value = {'choices': [{'message': {'content': content}}]}
+    return response
+
+
+def results_reply(*question_ids):
+    return reply(json.dumps({'results': {question_id: grade(f"Q{question_id}") for question_id in question_ids}}))
+
+
+@override_settings(GRADING_CACHE_ENABLED=False, GRADING_SIMILARITY=False, GRADING_SHADOW_SAMPLE=0.0,
+                   GRADING_COMPACT_OUTPUT=False, GRADING_STRUCTURED_OUTPUT=False)
+class WorksheetTestCase(SimpleTestCase):
+    def setUp(self):
+        self.stats = BatchStats()
+        patches = [
+            mock.patch.object(pipeline.router, 'available', return_value=True),
+            mock.patch.object(batch, 'batch_stats', self.stats),
+        ]
+        for patch in patches:
+            patch.start()
+            self.addCleanup(patch.stop)
+
+    def collect(self, answers=ANSWERS):
+        return collect_worksheet(RequestFactory().post('/api/check-worksheet/'), 'peter', answers)
+
+
+class CollectWorksheetTests(WorksheetTestCase):
+    def test_answers_needing_the_llm_are_pending(self):
+        responses, pending = self.collect(dict(ANSWERS, **{'3': '', '99': 'Peter'}))
+        self.assertEqual(sorted(pending), ['10', '11', '9'])
+        self.assertEqual(pending['9'].label, 'peter Q9')
+        self.assertEqual(responses['3'].status_code, 400)
+        self.assertEqual(json.loads(responses['99'].content), {'error': 'Unknown question.'})
+
+    def test_collect_mode_does_not_leak(self):
+        self.collect()
+        self.assertFalse(pipeline._collect_mode.get())
+
+
+class ChunkTests(WorksheetTestCase):
+    @override_settings(GRADING_BATCH_CHUNK_SIZE=2)
+    def test_split_by_model_and_size(self):
+        _, pending = self.collect()
+        pending['11'].payload = dict(pending['11'].payload, model='other-model')
+        chunks = split_chunks(pending)
+        self.assertEqual([sorted(chunk) for chunk in chunks], [['10', '9'], ['11']])
+        with override_settings(GRADING_BATCH_CHUNK_SIZE=1):
+            self.assertEqual(len(split_chunks(pending)), 3)
+
+    def test_payload_holds_every_question_once(self):
+        _, pending = self.collect()
+        payload = build_batch_payload(pending)
+        prompt = payload['messages'][1]['content']
+        for question_id, answer in ANSWERS.items():
+            self.assertIn(f"### Question {question_id}\n", prompt)
+            self.assertIn(answer, prompt)
+        self.assertNotIn('Note on "misspelled_words"', prompt)
+        self.assertEqual(payload['max_tokens'], sum(item.payload.get('max_tokens', 300) for item in pending.values()))
+        self.assertNotIn('response_format', payload)
+        with override_settings(GRADING_STRUCTURED_OUTPUT=True):
+            schema = build_batch_payload(pending)['response_format']['json_schema']['schema']
+        self.assertEqual(schema['properties']['results']['required'], list(pending))
+
+
+class ParseBatchReplyTests(WorksheetTestCase):
+    def test_results_per_question(self):
+        _, pending = self.collect()
+        parsed = parse_batch_reply('peter worksheet', results_reply('9', '10', '11'), pending)
+        self.assertEqual({question_id: result['message'] for question_id, result in parsed.items()},
+                         {'9': 'Q9', '10': 'Q10', '11': 'Q11'})
+
+    def test_missing_and_unusable_results_are_left_out(self):
+        _, pending = self.collect()
+        content = json.dumps({'results': {'9': grade('Q9'), '10': 'not an object', '11': {'message': 3}}})
+        with self.assertLogs('grading.batch', 'WARNING'):
+            parsed = parse_batch_reply('peter worksheet', reply(content), pending)
+        self.assertEqual(list(parsed), ['9'])
+
+    def test_unparseable_reply(self):
+        _, pending = self.collect()
+        with self.assertLogs('grading.batch', 'WARNING'):
+            self.assertEqual(parse_batch_reply('peter worksheet', reply('Sorry, I cannot'), pending), {})
+        self.assertEqual(parse_batch_reply('peter worksheet', reply('{"results": []}'), pending), {})
+
+
+class GradeChunkTests(WorksheetTestCase):
+    def test_one_call_per_chunk(self):
+        _, pending = self.collect()
+        with mock.patch.object(batch.hedging, 'post', return_value=results_reply('9', '10', '11')) as post:
+            responses = grade_chunk(pending)
+        post.assert_called_once()
+        self.assertEqual({question_id: json.loads(response.content)['message']
+                          for question_id, response in responses.items()},
+                         {'9': 'Q9', '10': 'Q10', '11': 'Q11'})
+        stats = self.stats.stats()
+        self.assertEqual((stats['llm_calls'], stats['batched'], stats['regraded']), (1, 3, 0))
+
+    def test_missing_question_is_regraded_on_its_own(self):
+        _, pending = self.collect()
+        regraded = JsonResponse(grade('Regraded'))
+        with mock.patch.object(batch.hedging, 'post', return_value=results_reply('9', '10')), \
+                mock.patch.object(batch, 'grade', return_value=regraded) as regrade:
+            responses = grade_chunk(pending)
+        regrade.assert_called_once()
+        self.assertEqual(regrade.call_args.args[:3], ('peter', 11, ANSWERS['11']))
+        self.assertIs(responses['11'], regraded)
+        self.assertEqual(self.stats.stats()['regraded'], 1)
+
+    def test_async_missing_question_is_regraded_on_its_own(self):
+        _, pending = self.collect()
+        regraded = JsonResponse(grade('Regraded'))
+        with mock.patch.object(batch.hedging, 'apost', mock.AsyncMock(return_value=results_reply('10', '11'))), \
+                mock.patch.object(batch, 'agrade', mock.AsyncMock(return_value=regraded)) as regrade:
+            responses = asyncio.run(agrade_chunk(pending))
+        regrade.assert_awaited_once()
+        self.assertIs(responses['9'], regraded)
+        self.assertEqual(json.loads(responses['10'].content)['message'], 'Q10')
+
+    def test_unavailable_route_uses_fallbacks(self):
+        _, pending = self.collect()
+        with mock.patch.object(batch.router, 'available', return_value=False), \
+                mock.patch.object(batch.hedging, 'post') as post, \
+                self.assertLogs('grading.batch', 'WARNING'):
+            responses = grade_chunk(pending)
+        post.assert_not_called()
+        self.assertEqual(sorted(responses), ['10', '11', '9'])
+        self.assertEqual(self.stats.stats()['llm_calls'], 0)
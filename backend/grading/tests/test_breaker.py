@@ -0,0 +1,150 @@
+import time
+from unittest import mock
+
+from django.test import RequestFactory, SimpleTestCase, override_settings
+
+from grading import pipeline
+from grading.breaker import CLOSED, HALF_OPEN, OPEN, CircuitBreaker
+from grading.limiter import UpstreamBusy
+from grading.pipeline import PendingGrade, async_view
+from grading.router import Backend, router
+from grading.streaming import stream_grade
+from peter.views import check_question9_answer
+
+ANSWER = 'Peter went into the garden and Mr. McGregor chased him'
+
+
+def half_open_breaker():
+    breaker = CircuitBreaker(min_calls=2, open_seconds=0)
+    for _ in range(2):
+        breaker.record('q', False, 0.1)
+    breaker._opened_at = time.monotonic() - 1
+    return breaker
+
+
+class CircuitBreakerTests(SimpleTestCase):
+    def test_trips_on_error_rate(self):
+        breaker = CircuitBreaker(min_calls=4, error_rate=0.5, open_seconds=30)
+        breaker.record('q', True, 0.1)
+        breaker.record('q', True, 0.1)
+        breaker.record('q', False, 0.1)
+        self.assertEqual(breaker.state, CLOSED)
+        breaker.record('q', False, 0.1)
+        self.assertEqual(breaker.state, OPEN)
+        self.assertFalse(breaker.allow())
+        self.assertEqual(breaker.stats()['short_circuited'], 1)
+
+    def test_slow_calls_count_as_failures(self):
+        breaker = CircuitBreaker(min_calls=2, slow_call=1.0)
+        breaker.record('q', True, 5.0)
+        breaker.record('q', True, 5.0)
+        self.assertEqual(breaker.state, OPEN)
+
+    def test_half_open_allows_one_probe(self):
+        breaker = half_open_breaker()
+        self.assertTrue(breaker.allow())
+        self.assertEqual(breaker.state, HALF_OPEN)
+        self.assertFalse(breaker.allow())
+
+    def test_successful_probe_closes(self):
+        breaker = half_open_breaker()
+        breaker.allow()
+        breaker.record('q', True, 0.1)
+        self.assertEqual(breaker.state, CLOSED)
+        self.assertTrue(breaker.allow())
+
+    def test_failed_probe_reopens(self):
+        breaker = half_open_breaker()
+        breaker.allow()
+        breaker.record('q', False, 0.1)
+        self.assertEqual(breaker.state, OPEN)
+
+    def test_ready_does_not_take_the_probe(self):
+        breaker = half_open_breaker()
+        self.assertTrue(breaker.ready())
+        self.assertTrue(breaker.ready())
+        breaker.allow()
+        self.assertFalse(breaker.ready())
+
+    def test_release_frees_the_probe(self):
+        breaker = half_open_breaker()
+        breaker.allow()
+        breaker.release()
+        self.assertTrue(breaker.allow())
+
+    def test_call_records_server_errors(self):
+        breaker = CircuitBreaker(min_calls=1)
+        with breaker.call('q') as call:
+            call.status_code = 502
+        self.assertEqual(breaker.state, OPEN)
+
+    @override_settings(GRADING_ADAPTIVE_TIMEOUTS=True, GRADING_TIMEOUT_MIN=1)
+    def test_timeout_adapts_to_latency(self):
+        breaker = CircuitBreaker()
+        for _ in range(50):
+            breaker.record('q', True, 0.5)
+        self.assertLess(breaker.timeout_for('q'), 5)
+
+
+@override_settings(GRADING_CACHE_ENABLED=False, GRADING_SIMILARITY=False, GRADING_IDEMPOTENCY=False)
+class ProbeFreeWhenUpstreamBusyTests(SimpleTestCase):
+    """
+    A call turned away by the upstream limiter must not use up a half-open backend's probe
+    """
+
+    def setUp(self):
+        backend = Backend('local', url='http://llm.test')
+        backend.breaker = self.breaker = half_open_breaker()
+        busy = mock.Mock(side_effect=UpstreamBusy(1))
+        patches = [
+            mock.patch.object(router, 'backends', {'local': backend}),
+            mock.patch.object(router, 'routes', {}),
+            mock.patch.object(router, 'default_route', ['local']),
+        ]
+        for target in ('grading.hedging.upstream_slot', 'grading.hedging.aupstream_slot',
+                       'grading.streaming.upstream_slot'):
+            patches.append(mock.patch(target, busy))
+        for patcher in patches:
+            patcher.start()
+            self.addCleanup(patcher.stop)
+
+    def request(self):
+        return RequestFactory().post('/api/check-peter-question9/', data={'answer': ANSWER},
+                                     content_type='application/json')
+
+    def assert_probe_free(self):
+        self.assertTrue(self.breaker.allow())
+        self.assertEqual(self.breaker.state, HALF_OPEN)
+
+    def test_sync_grade(self):
+        response = check_question9_answer(self.request())
+        self.assertEqual(response.status_code, 503)
+        self.assert_probe_free()
+
+    async def test_async_grade(self):
+        response = await async_view(check_question9_answer)(self.request())
+        self.assertEqual(response.status_code, 503)
+        self.assert_probe_free()
+
+    def test_stream(self):
+        token = pipeline._collect_mode.set(True)
+        try:
+            item = check_question9_answer(self.request())
+        finally:
+            pipeline._collect_mode.reset(token)
+        self.assertIsInstance(item, PendingGrade)
+        frames = list(stream_grade(item))
+        self.assertIn('event: error', frames[0])
+        self.assert_probe_free()
+
+    def test_worksheet_chunk(self):
+        from grading.batch import grade_chunk
+
+        token = pipeline._collect_mode.set(True)
+        try:
+            item = check_question9_answer(self.request())
+        finally:
+            pipeline._collect_mode.reset(token)
+        responses = grade_chunk({'9': item})
+        self.assertEqual(responses['9'].status_code, 503)
+        self.assert_probe_free()
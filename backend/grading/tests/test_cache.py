@@ -0,0 +1,90 @@
+from unittest import mock
+
+from django.test import SimpleTestCase, override_settings
+
+from grading import cache
+from grading.cache import GradeCache, make_key
+from grading.traffic import pregrading
+
+GRADE = {'isCorrect': True, 'message': 'Yes', 'feedback_type': 'excellent', 'misspelled_words': []}
+
+
+class MakeKeyTests(SimpleTestCase):
+    def test_equivalent_answers_share_a_key(self):
+        key = make_key('goldilocks', 1, 'Goldilocks and the 3 Bears!')
+        self.assertEqual(make_key('goldilocks', 1, 'um goldilocks  and the three bears'), key)
+        self.assertEqual(make_key('goldilocks', 1, 'Goldie Locks and the three bears'), key)
+
+    def test_key_parts(self):
+        key = make_key('goldilocks', 1, 'Goldilocks', version='7')
+        self.assertTrue(key.startswith('grade:goldilocks:1:7:'))
+        self.assertNotEqual(make_key('goldilocks', 2, 'Goldilocks', version='7'), key)
+        self.assertNotEqual(make_key('goldilocks', 1, 'The three bears', version='7'), key)
+
+    @override_settings(GRADING_PROMPT_VERSION='9')
+    def test_prompt_version_from_settings(self):
+        self.assertEqual(make_key('peter', 1, 'Peter Rabbit'), make_key('peter', 1, 'Peter Rabbit', version='9'))
+
+
+class GradeCacheTests(SimpleTestCase):
+    def test_hit_and_miss(self):
+        grades = GradeCache()
+        self.assertIsNone(grades.get('a'))
+        grades.set('a', GRADE)
+        self.assertEqual(grades.get('a'), GRADE)
+        stats = grades.stats()
+        self.assertEqual((stats['hits'], stats['misses'], stats['hit_ratio']), (1, 1, 0.5))
+
+    def test_values_are_copies(self):
+        grades = GradeCache()
+        grades.set('a', GRADE)
+        grades.get('a')['message'] = 'Changed'
+        self.assertEqual(grades.get('a')['message'], 'Yes')
+
+    def test_least_recently_used_entry_is_evicted(self):
+        grades = GradeCache(max_entries=2)
+        grades.set('a', GRADE)
+        grades.set('b', GRADE)
+        grades.get('a')
+        grades.set('c', GRADE)
+        self.assertIsNone(grades.get('b'))
+        self.assertIsNotNone(grades.get('a'))
+        self.assertEqual(grades.stats()['evictions'], 1)
+
+    def test_entries_expire_after_ttl(self):
+        grades = GradeCache(ttl=60)
+        with mock.patch.object(cache.time, 'monotonic', return_value=1000.0):
+            grades.set('a', GRADE)
+        with mock.patch.object(cache.time, 'monotonic', return_value=1059.0):
+            self.assertIsNotNone(grades.get('a'))
+        with mock.patch.object(cache.time, 'monotonic', return_value=1061.0):
+            self.assertIsNone(grades.get('a'))
+        stats = grades.stats()
+        self.assertEqual((stats['expirations'], stats['size']), (1, 0))
+
+    def test_shared_tier(self):
+        first = GradeCache(shared_alias='default')
+        second = GradeCache(shared_alias='default')
+        self.addCleanup(first.shared.clear)
+        first.set('shared-key', GRADE)
+        self.assertEqual(second.get('shared-key'), GRADE)
+        self.assertEqual(second.get('shared-key'), GRADE)
+        stats = second.stats()
+        self.assertEqual((stats['shared_hits'], stats['hits']), (1, 1))
+
+    def test_shared_tier_failure_is_a_miss(self):
+        grades = GradeCache(shared_alias='default')
+        with mock.patch.object(grades.shared, 'get', side_effect=ConnectionError), \
+                self.assertLogs('grading.cache', 'WARNING'):
+            self.assertIsNone(grades.get('a'))
+        self.assertEqual(grades.stats()['misses'], 1)
+
+    def test_pregrade_lookups_are_counted_apart(self):
+        grades = GradeCache()
+        grades.set('a', GRADE)
+        with pregrading():
+            grades.get('a')
+            grades.get('b')
+        stats = grades.stats()
+        self.assertEqual((stats['hits'], stats['misses']), (0, 0))
+        self.assertEqual(stats['pregrade'], {'hits': 1, 'shared_hits': 0, 'misses': 1})
@@ -0,0 +1,120 @@
+import json
+from unittest import mock
+
+from django.test import RequestFactory, SimpleTestCase, override_settings
+
+from grading import classroom, pipeline, views
+from grading.classroom import ClassroomStats, cluster_answers, group_answers, student_body
+from grading.pipeline import grading_view
+
+CHASED = 'Peter went into the garden and Mr. McGregor chased him'
+LOST = 'Peter lost his jacket and his shoes'
+LLM_GRADE = {'isCorrect': True, 'message': 'Well done!', 'feedback_type': 'excellent', 'show_answer': False,
+             'misspelled_words': []}
+
+
+def reply(result=LLM_GRADE):
+    response = mock.Mock(status_code=200)
+    response.json.return_value = {'choices': [{'message': {'content': json.dumps(result)}}]}
+    return response
+
+
+class GroupingTests(SimpleTestCase):
+    def test_student_body(self):
+        self.assertEqual(student_body('An answer'), {'answer': 'An answer'})
+        self.assertEqual(student_body(['one', 'two']), {'answers': ['one', 'two']})
+        self.assertEqual(student_body({'answer': 'x'}), {'answer': 'x'})
+        self.assertIsNone(student_body(3))
+
+    def test_rewordings_are_grouped_in_order(self):
+        bodies = {
+            'ann': {'answer': CHASED},
+            'bob': {'answer': LOST},
+            'cat': {'answer': 'peter went into the garden and mr mcgregor chased him!'},
+            'dan': {'answer': 'Um, Peter went into the garden and Mr. McGreggor chased him'},
+        }
+        groups = group_answers('peter', 9, bodies)
+        self.assertEqual(list(groups.values()), [['ann', 'cat', 'dan'], ['bob']])
+
+    def test_clusters_share_content_words_largest_first(self):
+        bodies = {
+            'ann': {'answer': LOST},
+            'bob': {'answer': CHASED},
+            'cat': {'answer': 'Mr. McGregor chased Peter in the garden'},
+            'dan': {'answer': 'Peter went into the garden and Mr. McGregor chased him!'},
+        }
+        clusters = cluster_answers(group_answers('peter', 9, bodies), bodies)
+        self.assertEqual(clusters, [('bob', ['bob', 'dan', 'cat']), ('ann', ['ann'])])
+
+
+@override_settings(GRADING_CACHE_ENABLED=False, GRADING_SIMILARITY=False, GRADING_SINGLE_FLIGHT=False,
+                   GRADING_IDEMPOTENCY=False, GRADING_SHADOW_SAMPLE=0.0, GRADING_COMPACT_OUTPUT=False)
+class ClassroomViewTests(SimpleTestCase):
+    def setUp(self):
+        self.stats = ClassroomStats()
+        self.upstream = mock.Mock(return_value=reply())
+        patches = [
+            mock.patch.object(classroom, 'classroom_stats', self.stats),
+            mock.patch.object(pipeline.router, 'available', return_value=True),
+            mock.patch.object(pipeline.hedging, 'post', self.upstream),
+        ]
+        for patch in patches:
+            patch.start()
+            self.addCleanup(patch.stop)
+
+    def post(self, body):
+        return self.client.post('/api/grading/classroom/', data=json.dumps(body), content_type='application/json')
+
+    def test_each_unique_answer_is_graded_once(self):
+        answers = {
+            'ann': CHASED,
+            'bob': 'peter went into the garden and mr mcgregor chased him!',
+            'cat': 'Peter went into the garden and Mr. McGreggor chased him',
+            'dan': LOST,
+        }
+        response = self.post({'story': 'peter', 'question': '9', 'answers': answers})
+        self.assertEqual(response.status_code, 200)
+        body = response.json()
+        self.assertEqual(self.upstream.call_count, 2)
+        self.assertEqual(body['unique_answers'], 2)
+        self.assertEqual(body['status'], {'ann': 200, 'bob': 200, 'cat': 200, 'dan': 200})
+        self.assertEqual(body['results']['bob']['message'], 'Well done!')
+        # The shared grade reports each student's own spelling
+        self.assertEqual(body['results']['ann']['misspelled_words'], [])
+        self.assertEqual(body['results']['cat']['misspelled_words'], ['McGreggor'])
+        self.assertEqual(body['clusters'][0]['size'], 3)
+        self.assertEqual(body['clusters'][0]['feedback_types'], {'excellent': 3})
+        self.assertEqual(self.stats.stats(), {'requests': 1, 'answers': 4, 'graded': 2, 'duplicates_saved': 2})
+
+    async def test_async_view_awaits_each_unique_answer(self):
+        apost = mock.AsyncMock(return_value=reply())
+        with override_settings(GRADING_ASYNC_VIEWS=True):
+            view = grading_view(views.check_classroom)
+        body = {'story': 'peter', 'question': 9,
+                'answers': {'ann': CHASED, 'bob': CHASED.lower(), 'cat': LOST, 'dan': ''}}
+        request = RequestFactory().post('/api/grading/classroom/', data=body, content_type='application/json')
+        with mock.patch.object(pipeline.hedging, 'apost', apost):
+            response = await view(request)
+        result = json.loads(response.content)
+        self.assertEqual(apost.await_count, 2)
+        self.upstream.assert_not_called()
+        self.assertEqual(result['status'], {'ann': 200, 'bob': 200, 'cat': 200, 'dan': 400})
+        self.assertEqual(result['results']['bob']['message'], 'Well done!')
+        self.assertFalse(pipeline._async_mode.get())
+
+    def test_validation_errors_are_per_student(self):
+        response = self.post({'story': 'peter', 'question': 9, 'answers': {'ann': CHASED, 'bob': ''}})
+        body = response.json()
+        self.assertEqual(body['status'], {'ann': 200, 'bob': 400})
+        self.assertEqual(body['results']['bob'], {'error': 'Please enter an answer.'})
+        self.assertEqual(body['clusters'][-1]['feedback_types'], {'error': 1})
+
+    def test_bad_requests(self):
+        for body in ({'story': 'peter', 'question': 99, 'answers': {'a': CHASED}},
+                     {'story': 'peter', 'question': 9, 'answers': {}},
+                     {'story': 'peter', 'question': 9, 'answers': {'a': 3}}):
+            self.assertEqual(self.post(body).status_code, 400)
+        with override_settings(GRADING_CLASSROOM_MAX_ANSWERS=1):
+            self.assertEqual(self.post({'story': 'peter', 'question': 9,
+                                        'answers': {'a': CHASED, 'b': LOST}}).status_code, 400)
+        self.upstream.assert_not_called()
@@ -0,0 +1,141 @@
+import asyncio
+import json
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from unittest import mock
+
+from django.test import SimpleTestCase, override_settings
+
+from grading import hedging
+from grading.hedging import HedgeStats, hedge_delay, is_valid_reply
+from grading.limiter import LocalSlots, UpstreamLimiter
+from grading.router import Backend
+
+GRADE = json.dumps({'isCorrect': True, 'message': 'Yes', 'feedback_type': 'excellent'})
+
+
+def reply(content=GRADE, status_code=200):
+    response = mock.Mock(status_code=status_code)
+    response.json.return_value = {'choices': [{'message': {'content': content}}]}
+    return response
+
+
+class ValidReplyTests(SimpleTestCase):
+    def test_valid_reply(self):
+        self.assertTrue(is_valid_reply(reply()))
+        self.assertTrue(is_valid_reply(reply(f"Here it is: {GRADE}")))
+
+    def test_invalid_replies(self):
+        self.assertFalse(is_valid_reply(reply(status_code=500)))
+        self.assertFalse(is_valid_reply(reply('I cannot grade this')))
+        broken = reply()
+        broken.json.return_value = {'choices': []}
+        self.assertFalse(is_valid_reply(broken))
+
+
+@override_settings(GRADING_HEDGING=True, GRADING_HEDGE_MODEL='hedge-model')
+class HedgingTests(SimpleTestCase):
+    def setUp(self):
+        self.backend = Backend('primary', url='http://llm.test')
+        self.breaker = self.backend.breaker
+        self.stats = HedgeStats()
+        self.release = threading.Event()
+        patches = [
+            mock.patch.object(hedging.router, 'primary', return_value=self.backend),
+            mock.patch.object(hedging, 'hedge_stats', self.stats),
+            mock.patch.object(self.breaker, 'latency_percentile', return_value=0.05),
+        ]
+        for patch in patches:
+            patch.start()
+            self.addCleanup(patch.stop)
+        self.addCleanup(self.release.set)
+
+    def post(self, label, payload, title=None, timeout=None):
+        # The primary hangs until released; the hedge answers at once
+        if payload.get('model') != 'hedge-model':
+            self.release.wait(5)
+            return reply(GRADE.replace('Yes', 'Primary'))
+        return reply()
+
+    async def apost(self, label, payload, title=None, timeout=None):
+        if payload.get('model') != 'hedge-model':
+            await asyncio.sleep(5)
+            return reply(GRADE.replace('Yes', 'Primary'))
+        return reply()
+
+    def test_hedge_delay(self):
+        self.assertEqual(hedge_delay('q'), 0.05)
+        with override_settings(GRADING_HEDGING=False):
+            self.assertIsNone(hedge_delay('q'))
+        with self.assertLogs('grading.breaker', 'WARNING'):
+            for _ in range(self.breaker.min_calls):
+                self.breaker.record('q', False, 0.1)
+        self.assertIsNone(hedge_delay('q'))
+
+    def test_no_hedge_without_a_backend(self):
+        with mock.patch.object(hedging.router, 'primary', return_value=None):
+            self.assertIsNone(hedge_delay('q'))
+
+    def test_slow_primary_is_hedged(self):
+        with mock.patch.object(hedging.router, 'post', side_effect=self.post):
+            response = hedging.post('q', {'messages': []})
+        self.assertEqual(response.json()['choices'][0]['message']['content'], GRADE)
+        stats = self.stats.stats()
+        self.assertEqual((stats['requests'], stats['hedged'], stats['hedge_wins']), (1, 1, 1))
+
+    def test_sync_loser_gives_its_slot_back_when_the_hedge_wins(self):
+        limiter = UpstreamLimiter(LocalSlots(2), max_queue=0, queue_timeout=1)
+        executor = ThreadPoolExecutor(max_workers=2)
+        with mock.patch.object(hedging, 'upstream_slot', limiter.slot), \
+                mock.patch.object(hedging, '_executor', executor), \
+                mock.patch.object(hedging.router, 'post', side_effect=self.post):
+            hedging.post('q', {'messages': []})
+            # The primary is still waiting on its reply, without a slot
+            self.assertEqual(limiter.in_flight, 0)
+            self.release.set()
+            executor.shutdown(wait=True)
+        self.assertEqual(limiter.in_flight, 0)
+        self.assertEqual(limiter.stats()['admitted'], 2)
+
+    def test_loser_still_waiting_for_a_slot_does_not_go_upstream(self):
+        race = hedging._Race()
+        race.settle()
+        with mock.patch.object(hedging.router, 'post') as post:
+            self.assertIsNone(hedging._attempt('q', {'messages': []}, None, race))
+        post.assert_not_called()
+
+    def test_fast_primary_is_not_hedged(self):
+        self.release.set()
+        with mock.patch.object(hedging.router, 'post', side_effect=self.post) as post:
+            hedging.post('q', {'messages': []})
+        post.assert_called_once()
+        self.assertEqual(self.stats.stats()['hedged'], 0)
+
+    def test_invalid_hedge_falls_back_to_the_primary(self):
+        def post(label, payload, title=None, timeout=None):
+            if payload.get('model') == 'hedge-model':
+                return reply('not json')
+            time.sleep(0.2)
+            return reply(GRADE.replace('Yes', 'Primary'))
+
+        with mock.patch.object(hedging.router, 'post', side_effect=post):
+            response = hedging.post('q', {'messages': []})
+        self.assertIn('Primary', response.json()['choices'][0]['message']['content'])
+        self.assertEqual(self.stats.stats()['primary_wins'], 1)
+
+    def test_async_hedge_wins_and_primary_is_cancelled(self):
+        with mock.patch.object(hedging.router, 'apost', side_effect=self.apost):
+            started = time.monotonic()
+            response = asyncio.run(hedging.apost('q', {'messages': []}))
+        self.assertLess(time.monotonic() - started, 2)
+        self.assertEqual(response.json()['choices'][0]['message']['content'], GRADE)
+        self.assertEqual(self.stats.stats()['hedge_win_rate'], 1.0)
+
+    @override_settings(GRADING_HEDGING=False)
+    def test_disabled(self):
+        self.release.set()
+        with mock.patch.object(hedging.router, 'post', side_effect=self.post) as post:
+            hedging.post('q', {'messages': []})
+        post.assert_called_once()
+        self.assertEqual(self.stats.stats()['enabled'], False)
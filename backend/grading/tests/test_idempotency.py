@@ -0,0 +1,141 @@
+import asyncio
+import json
+import threading
+from unittest import mock
+
+from django.http import JsonResponse
+from django.test import RequestFactory, SimpleTestCase, override_settings
+
+from grading import idempotency
+from grading.idempotency import IdempotencyStore, idempotent, request_key
+
+
+@override_settings(GRADING_IDEMPOTENCY=True)
+class IdempotentViewTests(SimpleTestCase):
+    def setUp(self):
+        patch = mock.patch.object(idempotency, 'idempotency_store', IdempotencyStore())
+        self.store = patch.start()
+        self.addCleanup(patch.stop)
+        self.calls = 0
+        self.status = 200
+        self.view = idempotent(self.grade)
+        self.factory = RequestFactory()
+
+    def grade(self, request):
+        self.calls += 1
+        return JsonResponse({'call': self.calls}, status=self.status)
+
+    def post(self, answer, **headers):
+        request = self.factory.post('/api/check-question1/', data=json.dumps({'answer': answer}),
+                                    content_type='application/json', **headers)
+        return self.view(request)
+
+    def test_repeat_is_replayed(self):
+        first = self.post('Goldilocks')
+        second = self.post('Goldilocks')
+        self.assertEqual(self.calls, 1)
+        self.assertEqual(json.loads(second.content), json.loads(first.content))
+        self.assertEqual(second['Idempotent-Replayed'], 'true')
+        self.assertFalse(first.has_header('Idempotent-Replayed'))
+        self.assertEqual(self.store.stats()['replayed'], 1)
+
+    def test_different_answers_are_graded(self):
+        self.post('Goldilocks')
+        self.post('The three bears')
+        self.assertEqual(self.calls, 2)
+
+    def test_header_key_reused_for_another_answer(self):
+        self.post('Goldilocks', HTTP_IDEMPOTENCY_KEY='submit-1')
+        response = self.post('The three bears', HTTP_IDEMPOTENCY_KEY='submit-1')
+        self.assertEqual(response.status_code, 422)
+        self.assertEqual(self.calls, 1)
+        self.assertEqual(self.store.stats()['conflicts'], 1)
+
+    def test_server_errors_are_not_stored(self):
+        self.status = 503
+        self.post('Goldilocks')
+        self.status = 200
+        response = self.post('Goldilocks')
+        self.assertEqual(self.calls, 2)
+        self.assertEqual(response.status_code, 200)
+        self.assertFalse(response.has_header('Idempotent-Replayed'))
+
+    def test_stored_response_expires(self):
+        with mock.patch.object(idempotency.time, 'monotonic', return_value=1000.0):
+            self.post('Goldilocks')
+        with mock.patch.object(idempotency.time, 'monotonic', return_value=1010.0):
+            self.post('Goldilocks')
+        self.assertEqual(self.calls, 2)
+
+    async def test_async_repeats_wait_on_the_event_loop(self):
+        released = asyncio.Event()
+
+        async def grade(request):
+            self.calls += 1
+            await released.wait()
+            return JsonResponse({'call': self.calls})
+
+        view = idempotent(grade)
+        requests = [self.factory.post('/api/check-question1/', data=json.dumps({'answer': 'Goldilocks'}),
+                                      content_type='application/json') for _ in range(50)]
+        with mock.patch.object(idempotency.asyncio, 'to_thread', side_effect=AssertionError):
+            tasks = [asyncio.create_task(view(request)) for request in requests]
+            await asyncio.sleep(0)
+            self.assertEqual(self.store.stats()['attached'], 49)
+            released.set()
+            responses = await asyncio.gather(*tasks)
+        self.assertEqual(self.calls, 1)
+        self.assertEqual({json.loads(response.content)['call'] for response in responses}, {1})
+        self.assertEqual(sum(response.has_header('Idempotent-Replayed') for response in responses), 49)
+
+    @override_settings(GRADING_IDEMPOTENCY=False)
+    def test_disabled(self):
+        self.post('Goldilocks')
+        self.post('Goldilocks')
+        self.assertEqual(self.calls, 2)
+
+
+class IdempotencyStoreTests(SimpleTestCase):
+    def test_repeat_in_flight_waits_for_the_leader(self):
+        store = IdempotencyStore()
+        state, entry = store.begin('k', 'body')
+        self.assertEqual(state, 'lead')
+        self.assertEqual(store.begin('k', 'body'), ('wait', entry))
+        store.finish('k', entry, JsonResponse({}), ttl=5)
+        self.assertTrue(entry.done.is_set())
+        self.assertEqual(store.begin('k', 'body'), ('replay', entry))
+        self.assertEqual(store.stats()['suppressed'], 2)
+
+    async def test_async_repeat_is_woken_from_another_thread(self):
+        store = IdempotencyStore()
+        _, entry = store.begin('k', 'body')
+        finisher = threading.Timer(0.05, store.finish, ('k', entry, JsonResponse({}), 5))
+        finisher.start()
+        await entry.await_done(5)
+        finisher.join()
+        self.assertTrue(entry.done.is_set())
+        self.assertEqual(entry._waiters, [])
+        await entry.await_done(5)
+
+    async def test_async_repeat_gives_up_after_the_timeout(self):
+        _, entry = IdempotencyStore().begin('k', 'body')
+        await entry.await_done(0.01)
+        self.assertFalse(entry.done.is_set())
+        self.assertEqual(entry._waiters, [])
+
+    def test_failed_leader_is_forgotten(self):
+        store = IdempotencyStore()
+        _, entry = store.begin('k', 'body')
+        store.finish('k', entry, None, ttl=5)
+        self.assertEqual(store.begin('k', 'body')[0], 'lead')
+
+    def test_request_keys(self):
+        factory = RequestFactory()
+        request = factory.post('/api/check-question1/', data='{}', content_type='application/json')
+        self.assertTrue(request_key(request)[0].startswith('hash:'))
+        request = factory.post('/api/check-question1/', data='{}', content_type='application/json',
+                               HTTP_IDEMPOTENCY_KEY='submit-1')
+        self.assertTrue(request_key(request)[0].startswith('key:'))
+        request = factory.post('/api/check-question1/', data='{}', content_type='application/json',
+                               HTTP_IDEMPOTENCY_KEY='x' * 300)
+        self.assertIsNone(request_key(request))
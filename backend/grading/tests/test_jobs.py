@@ -0,0 +1,89 @@
+import json
+from datetime import timedelta
+from unittest import mock
+
+from django.http import JsonResponse
+from django.test import TestCase, override_settings
+from django.utils import timezone
+
+from grading import jobs
+from grading.models import GradingJob
+
+
+class SubmitValidationTests(TestCase):
+    def post(self, body):
+        return self.client.post('/api/grading/jobs/', data=json.dumps(body), content_type='application/json')
+
+    def test_non_object_bodies_are_rejected(self):
+        for body in (['peter', 11], 'peter', 11, None):
+            with self.subTest(body=body):
+                response = self.post(body)
+                self.assertEqual(response.status_code, 400)
+                self.assertEqual(response.json(), {'error': 'Invalid data format.'})
+
+    def test_question_outside_job_questions_is_rejected(self):
+        for question in (12, 0, -1, '12', 'eleven', 11.0, True, None, [11]):
+            with self.subTest(question=question):
+                response = self.post({'story': 'peter', 'question': question, 'answer': 'Be good'})
+                self.assertEqual(response.status_code, 400)
+                self.assertIn('peter Q11', response.json()['error'])
+
+    def test_unknown_story_is_rejected(self):
+        response = self.post({'story': ['peter'], 'question': 11, 'answer': 'Be good'})
+        self.assertEqual(response.status_code, 400)
+
+    def test_question_given_as_string_is_accepted(self):
+        # An empty answer is settled at once by the check view, without a job
+        response = self.post({'story': 'peter', 'question': '11', 'answer': ''})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()['status'], 'done')
+        self.assertEqual(response.json()['status_code'], 400)
+
+
+def reply_view(status):
+    return lambda request: JsonResponse({'error': 'busy'} if status >= 500 else {'isCorrect': True}, status=status)
+
+
+@override_settings(GRADING_JOB_MAX_ATTEMPTS=3, GRADING_JOB_RETRY_BASE=5, GRADING_JOB_RETRY_MAX=12)
+class RetryBackoffTests(TestCase):
+    def setUp(self):
+        self.job = GradingJob.objects.create(story='peter', question=11, body={'answer': 'Be good'})
+
+    def run_claimed(self, status):
+        job = jobs.claim('test')
+        self.assertIsNotNone(job)
+        with mock.patch.object(jobs, 'import_string', return_value=reply_view(status)):
+            return jobs.run(job)
+
+    def test_retry_delay_doubles_up_to_the_cap(self):
+        self.assertEqual([jobs.retry_delay(attempts) for attempts in (1, 2, 3, 4)], [5, 10, 12, 12])
+
+    def test_failed_attempt_waits_before_the_next_claim(self):
+        before = timezone.now()
+        job = self.run_claimed(503)
+        self.assertEqual(job.status, GradingJob.QUEUED)
+        self.assertGreaterEqual(job.run_after, before + timedelta(seconds=5))
+        self.assertIsNone(jobs.claim('test'))
+
+        GradingJob.objects.filter(pk=job.pk).update(run_after=timezone.now() - timedelta(seconds=1))
+        job = self.run_claimed(503)
+        self.assertEqual(job.attempts, 2)
+        self.assertGreaterEqual(job.run_after, timezone.now() + timedelta(seconds=9))
+
+    def test_exception_is_retried_with_backoff(self):
+        job = jobs.claim('test')
+        with mock.patch.object(jobs, 'import_string', return_value=mock.Mock(side_effect=RuntimeError)):
+            job = jobs.run(job)
+        self.assertEqual(job.status, GradingJob.QUEUED)
+        self.assertIsNotNone(job.run_after)
+
+    def test_last_attempt_fails_the_job(self):
+        GradingJob.objects.filter(pk=self.job.pk).update(attempts=2)
+        job = self.run_claimed(503)
+        self.assertEqual(job.status, GradingJob.FAILED)
+        self.assertEqual(job.status_code, 503)
+
+    def test_success_finishes_the_job(self):
+        job = self.run_claimed(200)
+        self.assertEqual(job.status, GradingJob.DONE)
+        self.assertEqual(job.result, {'isCorrect': True})
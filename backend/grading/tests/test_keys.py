@@ -0,0 +1,101 @@
+import os
+from unittest import mock
+
+from django.test import SimpleTestCase
+
+from grading.keys import DEFAULT_BENCH_SECONDS, KeyPool, configured_keys, key_pool, reset_seconds
+
+
+class ResetSecondsTests(SimpleTestCase):
+    def test_formats(self):
+        now = 1_700_000_000.0
+        self.assertEqual(reset_seconds('30', now), 30)
+        self.assertEqual(reset_seconds(str(now + 12), now), 12)
+        self.assertEqual(reset_seconds(str(int((now + 5) * 1000)), now), 5)
+        self.assertEqual(reset_seconds(str(now - 10), now), 0)
+        self.assertEqual(reset_seconds('1m30s', now), 90)
+        self.assertEqual(reset_seconds('250ms', now), 0.25)
+        self.assertEqual(reset_seconds('1h', now), 3600)
+
+    def test_missing_or_unreadable(self):
+        self.assertIsNone(reset_seconds(None))
+        self.assertIsNone(reset_seconds('soon'))
+
+
+class ConfiguredKeysTests(SimpleTestCase):
+    def test_pool_keys_then_the_original_key_without_repeats(self):
+        env = {'OPENROUTER_API_KEYS': ' k1, k2,,k1 ', 'OPENROUTER_API_KEY2': 'k3'}
+        with mock.patch.dict(os.environ, env):
+            self.assertEqual(configured_keys(), ('k1', 'k2', 'k3'))
+            self.assertIs(key_pool(), key_pool())
+            self.assertEqual(key_pool().keys, ('k1', 'k2', 'k3'))
+        with mock.patch.dict(os.environ, {'OPENROUTER_API_KEYS': '', 'OPENROUTER_API_KEY2': ''}):
+            self.assertFalse(key_pool())
+            self.assertIsNone(key_pool().acquire())
+
+
+class KeyPoolTests(SimpleTestCase):
+    def test_calls_spread_over_idle_keys(self):
+        pool = KeyPool(['key-aaaa', 'key-bbbb'])
+        first, second = pool.acquire(), pool.acquire()
+        self.assertNotEqual(first.key, second.key)
+        self.assertEqual((first.in_flight, second.in_flight), (1, 1))
+        pool.release(first)
+        pool.release(second)
+        self.assertEqual([key['in_flight'] for key in pool.stats()['keys']], [0, 0])
+
+    def test_key_with_most_budget_left_is_picked(self):
+        pool = KeyPool(['key-aaaa', 'key-bbbb'])
+        state = pool.acquire()
+        pool.release(state, 200, {'X-RateLimit-Limit': '100', 'X-RateLimit-Remaining': '3'})
+        other = pool.acquire()
+        self.assertNotEqual(other.key, state.key)
+        pool.release(other, 200, {'x-ratelimit-limit-requests': '100', 'x-ratelimit-remaining-requests': '80'})
+        self.assertEqual(pool.acquire().key, other.key)
+        stats = {key['key']: key for key in pool.stats()['keys']}
+        self.assertEqual(stats[state.name]['utilization'], 0.97)
+        self.assertEqual(stats[other.name]['remaining'], 80)
+
+    def test_budget_refills_after_reset(self):
+        pool = KeyPool(['key-aaaa'])
+        state = pool.acquire()
+        pool.release(state, 200, {'X-RateLimit-Limit': '100', 'X-RateLimit-Remaining': '0',
+                                  'X-RateLimit-Reset': '60'})
+        self.assertEqual(pool.stats()['keys'][0]['remaining'], 0)
+        state.reset_at -= 61
+        self.assertEqual(pool.stats()['keys'][0]['remaining'], 100)
+
+    def test_throttled_key_is_benched(self):
+        pool = KeyPool(['key-aaaa', 'key-bbbb'])
+        state = pool.acquire()
+        with self.assertLogs('grading.keys', 'WARNING'):
+            pool.release(state, 429, {'Retry-After': '30'})
+        for _ in range(3):
+            other = pool.acquire()
+            self.assertNotEqual(other.key, state.key)
+            pool.release(other)
+        stats = {key['key']: key for key in pool.stats()['keys']}
+        self.assertEqual(stats[state.name]['throttled'], 1)
+        self.assertGreater(stats[state.name]['benched_for'], 29)
+
+    def test_bench_falls_back_to_reset_then_default(self):
+        pool = KeyPool(['key-aaaa'])
+        state = pool.acquire()
+        with self.assertLogs('grading.keys', 'WARNING'):
+            pool.release(state, 429, {'X-RateLimit-Reset': '5'})
+        self.assertAlmostEqual(pool.stats()['keys'][0]['benched_for'], 5, delta=0.5)
+        state = pool.acquire()
+        with self.assertLogs('grading.keys', 'WARNING'):
+            pool.release(state, 429)
+        self.assertAlmostEqual(pool.stats()['keys'][0]['benched_for'], DEFAULT_BENCH_SECONDS, delta=0.5)
+
+    def test_all_benched_uses_the_key_back_first(self):
+        pool = KeyPool(['key-aaaa', 'key-bbbb'])
+        first, second = pool.acquire(), pool.acquire()
+        with self.assertLogs('grading.keys', 'WARNING'):
+            pool.release(first, 429, {'Retry-After': '60'})
+            pool.release(second, 429, {'Retry-After': '5'})
+        self.assertEqual(pool.acquire().key, second.key)
+
+    def test_release_without_a_key(self):
+        KeyPool([]).release(None, 200, {})
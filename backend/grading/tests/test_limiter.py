@@ -0,0 +1,145 @@
+import asyncio
+import json
+import shutil
+import tempfile
+import threading
+from unittest import skipIf
+
+from django.test import SimpleTestCase
+
+from grading.limiter import (
+    HostSlots, LocalSlots, TokenBucket, UpstreamBusy, UpstreamLimiter, busy_response, fcntl,
+)
+
+
+class TokenBucketTests(SimpleTestCase):
+    def test_takes_tokens_until_empty(self):
+        bucket = TokenBucket(rate=2, burst=2)
+        delay, state = bucket.take((2, 0.0), 0.0)
+        self.assertEqual(delay, 0)
+        delay, state = bucket.take(state, 0.0)
+        self.assertEqual(delay, 0)
+        delay, state = bucket.take(state, 0.0)
+        self.assertEqual(delay, 0.5)
+
+    def test_refills_up_to_burst(self):
+        bucket = TokenBucket(rate=1, burst=3)
+        delay, state = bucket.take((0, 0.0), 100.0)
+        self.assertEqual(delay, 0)
+        self.assertEqual(state, (2, 100.0))
+
+
+class UpstreamLimiterTests(SimpleTestCase):
+    def test_admits_up_to_concurrency(self):
+        limiter = UpstreamLimiter(LocalSlots(2), max_queue=0, queue_timeout=1)
+        grants = [limiter.acquire(), limiter.acquire()]
+        self.assertEqual(limiter.in_flight, 2)
+        with self.assertRaises(UpstreamBusy):
+            limiter.acquire()
+        self.assertEqual(limiter.stats()['rejected'], 1)
+        for grant in grants:
+            limiter.release(grant)
+        self.assertEqual(limiter.stats()['in_flight'], 0)
+
+    def test_waiter_gets_the_released_slot(self):
+        limiter = UpstreamLimiter(LocalSlots(1), max_queue=5, queue_timeout=5)
+        grant = limiter.acquire()
+        got = threading.Event()
+
+        def wait():
+            limiter.release(limiter.acquire())
+            got.set()
+
+        waiter = threading.Thread(target=wait)
+        waiter.start()
+        self.assertFalse(got.wait(0.1))
+        self.assertEqual(limiter.queue_depth, 1)
+        limiter.release(grant)
+        self.assertTrue(got.wait(5))
+        waiter.join(5)
+        stats = limiter.stats()
+        self.assertEqual((stats['admitted'], stats['queued'], stats['queue_depth']), (2, 1, 0))
+        self.assertEqual(stats['peak_queue_depth'], 1)
+
+    def test_slot_can_be_given_back_early_once(self):
+        limiter = UpstreamLimiter(LocalSlots(1), max_queue=0, queue_timeout=1)
+        with limiter.slot() as slot:
+            slot.release()
+            self.assertEqual(limiter.in_flight, 0)
+            with limiter.slot():
+                self.assertEqual(limiter.in_flight, 1)
+            slot.release()
+        self.assertEqual(limiter.in_flight, 0)
+        self.assertEqual(limiter.stats()['admitted'], 2)
+
+    def test_queue_timeout(self):
+        limiter = UpstreamLimiter(LocalSlots(1), max_queue=5, queue_timeout=0.05)
+        limiter.acquire()
+        with self.assertRaises(UpstreamBusy) as caught:
+            limiter.acquire()
+        self.assertGreaterEqual(caught.exception.retry_after, 1)
+        self.assertEqual(limiter.stats()['timed_out'], 1)
+        self.assertEqual(limiter.queue_depth, 0)
+
+    def test_rate_limited_call_waits_for_a_token(self):
+        limiter = UpstreamLimiter(LocalSlots(5, TokenBucket(rate=20, burst=1)), max_queue=5, queue_timeout=2)
+        limiter.release(limiter.acquire())
+        limiter.release(limiter.acquire())
+        self.assertEqual(limiter.stats()['queued'], 1)
+
+    def test_async_waiter_gets_the_released_slot(self):
+        limiter = UpstreamLimiter(LocalSlots(1), max_queue=5, queue_timeout=5)
+
+        async def scenario():
+            grant = await limiter.aacquire()
+            waiter = asyncio.ensure_future(limiter.aacquire())
+            await asyncio.sleep(0.05)
+            self.assertFalse(waiter.done())
+            limiter.release(grant)
+            limiter.release(await asyncio.wait_for(waiter, 5))
+
+        asyncio.run(scenario())
+        self.assertEqual(limiter.stats()['admitted'], 2)
+
+    def test_async_queue_full(self):
+        limiter = UpstreamLimiter(LocalSlots(1), max_queue=0, queue_timeout=1)
+
+        async def scenario():
+            await limiter.aacquire()
+            await limiter.aacquire()
+
+        with self.assertRaises(UpstreamBusy):
+            asyncio.run(scenario())
+
+    def test_busy_response(self):
+        response = busy_response(UpstreamBusy(7))
+        self.assertEqual(response.status_code, 503)
+        self.assertEqual(response['Retry-After'], '7')
+        self.assertEqual(json.loads(response.content)['retry_after'], 7)
+
+
+@skipIf(fcntl is None, 'host-wide slots need fcntl')
+class HostSlotsTests(SimpleTestCase):
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.directory)
+
+    def test_slots_are_shared_through_the_directory(self):
+        first = HostSlots(self.directory, 1)
+        second = HostSlots(self.directory, 1)
+        grant, _ = first.try_acquire()
+        self.assertIsNotNone(grant)
+        self.assertIsNone(second.try_acquire()[0])
+        first.release(grant)
+        grant, _ = second.try_acquire()
+        self.assertIsNotNone(grant)
+        second.release(grant)
+
+    def test_tokens_are_shared_through_the_directory(self):
+        bucket = TokenBucket(rate=0.01, burst=1)
+        first = HostSlots(self.directory, 2, bucket)
+        grant, _ = first.try_acquire()
+        first.release(grant)
+        grant, delay = HostSlots(self.directory, 2, bucket).try_acquire()
+        self.assertIsNone(grant)
+        self.assertGreater(delay, 0)
@@ -0,0 +1,42 @@
+from django.test import SimpleTestCase, override_settings
+
+from grading.phonetic import lexicon, metaphone, normalize_spoken, respelled_words
+
+
+class MetaphoneTests(SimpleTestCase):
+    def test_codes(self):
+        self.assertEqual(metaphone('Goldilocks'), metaphone('goldielocks'))
+        self.assertEqual(metaphone('porridge'), metaphone('porage'))
+        self.assertEqual(metaphone('knight'), metaphone('night'))
+        self.assertNotEqual(metaphone('bear'), metaphone('porridge'))
+        self.assertEqual(metaphone(''), '')
+
+    def test_lexicon_holds_story_words(self):
+        self.assertEqual(lexicon('goldilocks')[metaphone('porridge')], 'porridge')
+
+
+class NormalizeSpokenTests(SimpleTestCase):
+    def test_sound_alike_names(self):
+        self.assertEqual(normalize_spoken('goldilocks', 'Goldie Locks ate the porage'),
+                         'Goldilocks ate the porridge')
+        self.assertEqual(normalize_spoken('peter', 'Mister Mac Gregor chased Peter'), 'Mr Mcgregor chased Peter')
+
+    def test_dictionary_words_are_kept(self):
+        self.assertEqual(normalize_spoken('goldilocks', 'the bears came home'), 'the bears came home')
+
+    def test_lists_and_other_values(self):
+        self.assertEqual(normalize_spoken('goldilocks', ['porage', 'bears']), ['porridge', 'bears'])
+        self.assertEqual(normalize_spoken('goldilocks', 7), 7)
+        self.assertEqual(normalize_spoken('cinderella', 'porage'), 'porage')
+
+    @override_settings(GRADING_PHONETIC=False)
+    def test_disabled(self):
+        self.assertEqual(normalize_spoken('goldilocks', 'Goldie Locks'), 'Goldie Locks')
+        self.assertEqual(respelled_words('goldilocks', 'porage'), [])
+
+
+class RespelledWordsTests(SimpleTestCase):
+    def test_only_non_dictionary_words_are_reported(self):
+        self.assertEqual(respelled_words('goldilocks', 'Goldie Locks ate the porage'), ['porage'])
+        self.assertEqual(respelled_words('peter', 'Mister Mac Gregor chased Peter'), [])
+        self.assertEqual(respelled_words('goldilocks', ['porage', 'the porage']), ['porage', 'porage'])
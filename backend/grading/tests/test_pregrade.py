@@ -0,0 +1,113 @@
+import json
+import queue
+from unittest import mock
+
+from django.test import RequestFactory, SimpleTestCase, override_settings
+
+from grading import pipeline, pregrade
+from grading.cache import GradeCache
+from grading.pregrade import Pregrader
+from grading.screening import screening_stats
+from grading.traffic import is_pregrade, pregrading
+
+DRAFT = 'Goldilocks went into the cottage and ate the porridge'
+
+
+@override_settings(GRADING_PREGRADE=True, GRADING_CACHE_ENABLED=True, GRADING_SCREENING=True,
+                   GRADING_PREGRADE_MIN_WORDS=3)
+class PregradeTrafficTests(SimpleTestCase):
+    def setUp(self):
+        self.cache = GradeCache()
+        self.pregrader = Pregrader()
+        self.queue = queue.Queue()
+        patches = [
+            mock.patch.object(pipeline, 'grade_cache', self.cache),
+            mock.patch.object(pregrade, 'grade_cache', self.cache),
+            mock.patch.object(pipeline.answer_classifier, 'grade', return_value=None),
+            mock.patch.object(self.pregrader, '_start', return_value=self.queue),
+        ]
+        for patch in patches:
+            patch.start()
+            self.addCleanup(patch.stop)
+        self.request = RequestFactory().post('/api/grading/pregrade/')
+
+    def test_pregrading_context(self):
+        self.assertFalse(is_pregrade())
+        with pregrading():
+            self.assertTrue(is_pregrade())
+        self.assertFalse(is_pregrade())
+
+    def test_draft_lookups_are_counted_as_pregrade(self):
+        status = self.pregrader.submit(self.request, 'goldilocks', 6, {'answer': DRAFT}, 'box-1')
+        self.assertEqual(status, 'queued')
+        stats = self.cache.stats()
+        self.assertEqual((stats['hits'], stats['misses']), (0, 0))
+        self.assertEqual(stats['pregrade']['misses'], 1)
+
+        self.cache.get('grade:other')
+        self.assertEqual(self.cache.stats()['misses'], 1)
+
+    def test_screened_drafts_are_counted_as_pregrade(self):
+        before = screening_stats.stats()
+        status = self.pregrader.submit(self.request, 'goldilocks', 6, {'answer': 'asdf jkl qwer'}, 'box-1')
+        self.assertEqual(status, 'local')
+        after = screening_stats.stats()
+        self.assertEqual(after['llm_calls_saved'], before['llm_calls_saved'])
+        self.assertEqual(after['pregrade']['gibberish'], before['pregrade']['gibberish'] + 1)
+
+    def test_worker_runs_as_pregrade_and_skips_superseded_drafts(self):
+        self.pregrader.submit(self.request, 'goldilocks', 6, {'answer': DRAFT}, 'box-1')
+        self.pregrader.submit(self.request, 'goldilocks', 6, {'answer': DRAFT + ' and slept'}, 'box-1')
+        seen = []
+
+        def view(request):
+            seen.append(is_pregrade())
+            return mock.Mock(status_code=200)
+
+        first, second = self.queue.get_nowait(), self.queue.get_nowait()
+        with mock.patch.object(pregrade, 'upstream_idle', return_value=True):
+            self.assertEqual(self.pregrader._pregrade(*first[:2], view, *first[3:]), 'aborted')
+            self.assertEqual(self.pregrader._pregrade(*second[:2], view, *second[3:]), 'warmed')
+        self.assertEqual(seen, [True])
+        self.assertFalse(is_pregrade())
+
+    def test_students_get_their_own_slots(self):
+        self.pregrader.submit(self.request, 'goldilocks', 6, {'answer': DRAFT}, 'box-1')
+        self.pregrader.submit(self.request, 'goldilocks', 6, {'answer': DRAFT + ' and slept'}, 'box-2')
+        first = self.queue.get_nowait()
+        with mock.patch.object(pregrade, 'upstream_idle', return_value=False):
+            self.assertEqual(self.pregrader._pregrade(*first[:2], None, *first[3:]), 'busy')
+
+    def test_short_drafts_are_not_graded(self):
+        self.assertEqual(self.pregrader.submit(self.request, 'goldilocks', 6, {'answer': 'She ate'}, 'box-1'),
+                         'too_short')
+
+
+@override_settings(GRADING_PREGRADE=False)
+class PregradeViewTests(SimpleTestCase):
+    def post(self, body):
+        return self.client.post('/api/grading/pregrade/', data=json.dumps(body), content_type='application/json')
+
+    def test_draft_id_is_required(self):
+        for draft_id in (None, '', '   ', 7, 'x' * 200):
+            with self.subTest(draft_id=draft_id):
+                response = self.post({'story': 'goldilocks', 'question': 6, 'answer': DRAFT, 'draft_id': draft_id})
+                self.assertEqual(response.status_code, 400)
+
+    def test_address_is_not_a_draft_id(self):
+        response = self.client.post('/api/grading/pregrade/',
+                                    data=json.dumps({'story': 'goldilocks', 'question': 6, 'answer': DRAFT}),
+                                    content_type='application/json', REMOTE_ADDR='10.0.0.1')
+        self.assertEqual(response.status_code, 400)
+
+    def test_valid_draft(self):
+        response = self.post({'story': 'goldilocks', 'question': '6', 'answer': DRAFT, 'draft_id': 'box-1'})
+        self.assertEqual(response.status_code, 202)
+        self.assertEqual(response.json(), {'status': 'disabled'})
+
+    def test_bad_bodies(self):
+        for body in (['goldilocks', 6], {'story': ['goldilocks'], 'question': 6, 'answer': DRAFT, 'draft_id': 'b'},
+                     {'story': 'goldilocks', 'question': 99, 'answer': DRAFT, 'draft_id': 'b'},
+                     {'story': 'goldilocks', 'question': 6, 'answer': 6, 'draft_id': 'b'}):
+            with self.subTest(body=body):
+                self.assertEqual(self.post(body).status_code, 400)
@@ -0,0 +1,69 @@
+from unittest import mock
+
+from django.test import RequestFactory, SimpleTestCase, override_settings
+
+from grading import pipeline
+from grading.prompts import DEFAULT_MODEL, UsageStats, build_payload
+from peter.views import check_question9_answer
+
+
+def usage(prompt_tokens, cached_tokens=None, completion_tokens=20):
+    body = {'usage': {'prompt_tokens': prompt_tokens, 'completion_tokens': completion_tokens}}
+    if cached_tokens is not None:
+        body['usage']['prompt_tokens_details'] = {'cached_tokens': cached_tokens}
+    return body
+
+
+class BuildPayloadTests(SimpleTestCase):
+    def test_system_prompt_first_and_answer_last(self):
+        payload = build_payload('Grade it.', 'Student answer: x', 150, response_format={'type': 'json_object'})
+        self.assertEqual(payload['model'], DEFAULT_MODEL)
+        self.assertEqual(payload['messages'], [{'role': 'system', 'content': 'Grade it.'},
+                                               {'role': 'user', 'content': 'Student answer: x'}])
+        self.assertEqual(payload['max_tokens'], 150)
+        self.assertEqual(payload['response_format'], {'type': 'json_object'})
+
+    @override_settings(GRADING_CACHE_ENABLED=False, GRADING_SIMILARITY=False, GRADING_SHADOW_SAMPLE=0.0)
+    def test_system_prompt_is_the_same_for_every_answer(self):
+        payloads = []
+        with mock.patch.object(pipeline.router, 'available', return_value=True):
+            for answer in ('Peter went into the garden and Mr. McGregor chased him',
+                           'Peter disobeyed his mother and got lost in the garden'):
+                request = RequestFactory().post('/api/check-peter-question9/', data={'answer': answer},
+                                                content_type='application/json')
+                token = pipeline._collect_mode.set(True)
+                try:
+                    payloads.append(check_question9_answer(request).payload)
+                finally:
+                    pipeline._collect_mode.reset(token)
+                self.assertIn(answer, payloads[-1]['messages'][-1]['content'])
+        self.assertEqual(payloads[0]['messages'][0], payloads[1]['messages'][0])
+        self.assertNotIn('Peter went', payloads[0]['messages'][0]['content'])
+
+
+class UsageStatsTests(SimpleTestCase):
+    def test_totals_per_question(self):
+        stats = UsageStats()
+        with self.assertLogs('grading.prompts', 'INFO'):
+            stats.record('peter Q9', usage(1000, 0))
+            stats.record('peter Q9', usage(1000, 768, completion_tokens=30))
+            stats.record('peter Q1', usage(500))
+        self.assertEqual(stats.stats(), {
+            'peter Q9': {'calls': 2, 'prompt_tokens': 2000, 'cached_tokens': 768, 'completion_tokens': 50,
+                         'cached_ratio': 0.384},
+            'peter Q1': {'calls': 1, 'prompt_tokens': 500, 'cached_tokens': 0, 'completion_tokens': 20,
+                         'cached_ratio': 0.0},
+        })
+
+    def test_replies_without_usage_are_ignored(self):
+        stats = UsageStats()
+        for body in (None, {}, {'usage': None}, {'choices': []}):
+            stats.record('peter Q9', body)
+        self.assertEqual(stats.stats(), {})
+
+    def test_missing_counts_are_zero(self):
+        stats = UsageStats()
+        with self.assertLogs('grading.prompts', 'INFO'):
+            stats.record('peter Q9', {'usage': {'prompt_tokens': None, 'prompt_tokens_details': None}})
+        self.assertEqual(stats.stats()['peter Q9']['cached_ratio'], 0.0)
+        self.assertEqual(stats.stats()['peter Q9']['calls'], 1)
@@ -0,0 +1,129 @@
+import asyncio
+from unittest import mock
+
+import httpx
+import requests
+from django.test import SimpleTestCase, override_settings
+
+from grading.breaker import CLOSED, OPEN
+from grading.router import Backend, ModelRouter, parse_routes
+
+
+class FakeBackend(Backend):
+    def __init__(self, name, statuses=(200,)):
+        super().__init__(name, url=f"http://{name}.test")
+        self.statuses = list(statuses)
+        self.timeouts = []
+
+    def _reply(self, timeout, error):
+        self.timeouts.append(timeout)
+        status = self.statuses.pop(0) if len(self.statuses) > 1 else self.statuses[0]
+        if status is None:
+            raise error(f"{self.name} is down")
+        return mock.Mock(status_code=status)
+
+    def post(self, payload, title=None, timeout=None):
+        return self._reply(timeout, requests.ConnectionError)
+
+    async def apost(self, payload, title=None, timeout=None):
+        return self._reply(timeout, httpx.ConnectError)
+
+
+def make_router(*backends, routes=None):
+    return ModelRouter({backend.name: backend for backend in backends}, routes or {},
+                       [backend.name for backend in backends], cooldown=0)
+
+
+def trip(backend):
+    for _ in range(backend.breaker.min_calls):
+        backend.breaker.record('q', False, 0.1)
+
+
+class ParseRoutesTests(SimpleTestCase):
+    def test_parses_routes(self):
+        self.assertEqual(parse_routes('goldilocks Q3=local, openrouter; peter Q1=local'),
+                         {'goldilocks Q3': ['local', 'openrouter'], 'peter Q1': ['local']})
+        self.assertEqual(parse_routes(None), {})
+
+
+class RouterTests(SimpleTestCase):
+    def setUp(self):
+        # Failovers and breaker trips are expected here; keep them out of the test output
+        for target in ('grading.router.logger', 'grading.breaker.logger'):
+            patcher = mock.patch(target)
+            patcher.start()
+            self.addCleanup(patcher.stop)
+
+    def test_fails_over_on_error_status(self):
+        local, remote = FakeBackend('local', [503]), FakeBackend('remote')
+        router = make_router(local, remote)
+        self.assertEqual(router.post('q', {}).status_code, 200)
+        self.assertEqual(router.stats()['failovers'], 1)
+
+    def test_last_backend_error_status_is_returned(self):
+        router = make_router(FakeBackend('local', [400]), FakeBackend('remote'))
+        self.assertEqual(router.post('q', {}).status_code, 400)
+
+    def test_each_backend_records_on_its_own_breaker(self):
+        local, remote = FakeBackend('local', [None]), FakeBackend('remote')
+        router = make_router(local, remote)
+        for _ in range(local.breaker.min_calls):
+            router.post('q', {})
+        self.assertEqual(local.breaker.state, OPEN)
+        self.assertEqual(remote.breaker.state, CLOSED)
+        self.assertEqual(remote.breaker.stats()['calls_in_window'], local.breaker.min_calls)
+        self.assertEqual(remote.breaker.stats()['error_rate'], 0.0)
+
+    def test_open_backend_is_skipped(self):
+        local, remote = FakeBackend('local'), FakeBackend('remote')
+        router = make_router(local, remote)
+        trip(local)
+        self.assertEqual(router.candidates('q'), [remote])
+        self.assertIs(router.primary('q'), remote)
+        router.post('q', {})
+        self.assertEqual(local.timeouts, [])
+        self.assertEqual(len(remote.timeouts), 1)
+
+    def test_route_with_every_breaker_open_is_unavailable(self):
+        local = FakeBackend('local')
+        router = make_router(local)
+        trip(local)
+        self.assertFalse(router.available('q'))
+        self.assertIsNone(router.primary('q'))
+        with self.assertRaises(requests.ConnectionError):
+            router.post('q', {})
+        with override_settings(GRADING_BREAKER_ENABLED=False):
+            self.assertTrue(router.available('q'))
+
+    def test_half_open_backend_gets_one_probe(self):
+        local = FakeBackend('local')
+        router = make_router(local)
+        trip(local)
+        local.breaker._opened_at -= local.breaker.open_seconds
+        self.assertTrue(router.available('q'))
+        router.post('q', {})
+        self.assertEqual(local.breaker.state, CLOSED)
+
+    @override_settings(GRADING_ADAPTIVE_TIMEOUTS=True, GRADING_TIMEOUT_MIN=1)
+    def test_timeouts_follow_each_backends_latency(self):
+        fast, slow = FakeBackend('fast'), FakeBackend('slow')
+        for _ in range(50):
+            fast.breaker.record('q', True, 0.5)
+            slow.breaker.record('q', True, 8.0)
+        make_router(fast).post('q', {})
+        make_router(slow).post('q', {})
+        self.assertLess(fast.timeouts[0], slow.timeouts[0])
+        make_router(fast).post('q', {}, timeout=7)
+        self.assertEqual(fast.timeouts[-1], 7)
+
+    def test_async_failover_records_per_backend(self):
+        local, remote = FakeBackend('local', [None]), FakeBackend('remote')
+        router = make_router(local, remote)
+        response = asyncio.run(router.apost('q', {}))
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(local.breaker.stats()['error_rate'], 1.0)
+        self.assertEqual(remote.breaker.stats()['error_rate'], 0.0)
+
+    def test_breaker_stats_per_backend(self):
+        router = make_router(FakeBackend('local'), FakeBackend('remote'))
+        self.assertEqual(set(router.breaker_stats()), {'local', 'remote'})
@@ -0,0 +1,69 @@
+import json
+
+from django.http import JsonResponse
+from django.test import SimpleTestCase
+
+from grading.normalize import normalize_answer
+from grading.rules import CLOSED_ANSWERS, STORY_VOCABULARY, FastPathGrader, correct_word, edit_distance
+
+
+def fallback(answer):
+    return JsonResponse({'isCorrect': answer != 'Disney', 'message': answer, 'feedback_type': 'excellent'})
+
+
+class NormalizeAnswerTests(SimpleTestCase):
+    def test_normalization(self):
+        self.assertEqual(normalize_answer('Um, Goldilocks & the 3 Bears!'), 'goldilocks the three bears')
+        self.assertEqual(normalize_answer('Peter’s  garden'), "peter's garden")
+        self.assertEqual(normalize_answer(['Papa Bear', 'Mama  Bear.']), 'papa bear | mama bear')
+
+
+class EditDistanceTests(SimpleTestCase):
+    def test_distance(self):
+        self.assertEqual(edit_distance('potter', 'poter', 2), 1)
+        self.assertEqual(edit_distance('potter', 'pottre', 2), 1)
+        self.assertEqual(edit_distance('potter', 'rabbit', 2), 3)
+
+    def test_correction(self):
+        vocabulary = {'potter', 'peter', 'beatrix'}
+        self.assertEqual(correct_word('beatrixx', vocabulary), 'beatrix')
+        self.assertEqual(correct_word('peter', vocabulary), 'peter')
+        self.assertIsNone(correct_word('bob', vocabulary))
+
+
+class FastPathGraderTests(SimpleTestCase):
+    def setUp(self):
+        self.grader = FastPathGrader(CLOSED_ANSWERS, STORY_VOCABULARY)
+
+    def test_known_forms_are_graded_locally(self):
+        result = self.grader.grade('goldilocks', 1, 'goldilox and the 3 bears', fallback)
+        self.assertEqual(result['message'], 'Goldilocks and the Three Bears')
+        self.assertEqual(result['misspelled_words'], ['goldilox'])
+        result = self.grader.grade('peter', 2, 'It was written by Beatrix Poter', fallback)
+        self.assertEqual(result['message'], 'Beatrix Potter')
+
+    def test_story_words_are_not_corrected(self):
+        self.assertEqual(self.grader.grade('peter', 1, 'Peter', fallback)['message'], 'Peter')
+
+    def test_unknown_answers_escalate(self):
+        self.assertIsNone(self.grader.grade('goldilocks', 1, 'A girl visits some bears', fallback))
+        self.assertIsNone(self.grader.grade('goldilocks', 6, 'Goldilocks', fallback))
+        self.assertIsNone(self.grader.grade('goldilocks', 1, ['Goldilocks'], fallback))
+        self.assertEqual(self.grader.stats()['escalated'], 1)
+
+    def test_error_grades_escalate(self):
+        def failing(answer):
+            return JsonResponse({'feedback_type': 'error', 'message': 'Oops'})
+        self.assertIsNone(self.grader.grade('goldilocks', 1, 'Goldilocks', failing))
+
+    def test_counts(self):
+        self.grader.grade('goldilocks', 3, 'Fiction', fallback)
+        self.grader.grade('goldilocks', 3, 'Fiction', fallback, count=False)
+        self.grader.grade('goldilocks', 3, 'A poem', fallback)
+        self.assertEqual(self.grader.stats(), {'answered': 1, 'escalated': 1, 'coverage': 0.5})
+
+    def test_fallback_result_is_not_shared(self):
+        first = self.grader.grade('goldilocks', 2, 'Disney', fallback)
+        first['message'] = 'Changed'
+        self.assertEqual(self.grader.grade('goldilocks', 2, 'disney', fallback)['message'], 'Disney')
+        self.assertFalse(json.loads(fallback('Disney').content)['isCorrect'])
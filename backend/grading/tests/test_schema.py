@@ -0,0 +1,82 @@
+from django.test import SimpleTestCase
+
+from grading.schema import IMPROVEMENT_SCALE, INCORRECT_SCALE, ReplySchema, extract_json, parse_stats
+from grading.templates import COMPACT_TEMPLATES
+
+FULL_REPLY = ('{"feedback_type": "excellent", "isCorrect": true, "show_answer": false, '
+              '"message": "Well done!", "misspelled_words": []}')
+
+
+class ExtractJsonTests(SimpleTestCase):
+    def test_text_around_the_object(self):
+        self.assertEqual(extract_json('Here you go: {"a": 1} Hope it helps'), {'a': 1})
+        self.assertEqual(extract_json('```json\n{"a": 1}\n```'), {'a': 1})
+
+    def test_no_object(self):
+        for text in ('no json here', '[1, 2]', '{"a": '):
+            with self.subTest(text=text), self.assertRaises(ValueError):
+                extract_json(text)
+
+
+class ReplySchemaTests(SimpleTestCase):
+    def setUp(self):
+        self.schema = ReplySchema('schema test', INCORRECT_SCALE)
+
+    def counts(self):
+        return parse_stats.stats()['questions'].get('schema test', {'replies': 0, 'repaired': 0, 'failed': 0})
+
+    def test_clean_reply(self):
+        before = self.counts()
+        reply = self.schema.parse(FULL_REPLY)
+        self.assertEqual(reply['message'], 'Well done!')
+        after = self.counts()
+        self.assertEqual(after['replies'], before['replies'] + 1)
+        self.assertEqual(after['repaired'], before['repaired'])
+
+    def test_near_misses_are_repaired(self):
+        before = self.counts()
+        reply = self.schema.parse('Sure! {"feedback_type": "Partially Correct", "result": "Nearly", '
+                                  '"isCorrect": "no", "misspelled_words": "beres, cotage"}')
+        self.assertEqual(reply['feedback_type'], 'partial')
+        self.assertEqual(reply['message'], 'Nearly')
+        self.assertIs(reply['isCorrect'], False)
+        self.assertIs(reply['show_answer'], True)
+        self.assertEqual(reply['misspelled_words'], ['beres', 'cotage'])
+        self.assertEqual(self.counts()['repaired'], before['repaired'] + 1)
+
+    def test_text_around_a_valid_object_counts_as_repaired(self):
+        before = self.counts()
+        self.schema.parse(f"```json\n{FULL_REPLY}\n```")
+        self.assertEqual(self.counts()['repaired'], before['repaired'] + 1)
+
+    def test_correctness_follows_feedback_type_when_missing(self):
+        reply = self.schema.parse('{"feedback_type": "good", "message": "Good"}')
+        self.assertIs(reply['isCorrect'], True)
+        self.assertIs(reply['show_answer'], False)
+
+    def test_unusable_replies(self):
+        before = self.counts()
+        for text in ('not json', '{"feedback_type": "excellent"}', '{"feedback_type": "amazing", "message": "Hi"}',
+                     '{"feedback_type": "needs_improvement", "message": "Hi"}'):
+            with self.subTest(text=text), self.assertRaises(ValueError):
+                self.schema.parse(text)
+        self.assertEqual(self.counts()['failed'], before['failed'] + 4)
+        self.assertIn('parse_failure_rate', self.counts())
+
+    def test_json_schema(self):
+        schema = ReplySchema('schema test', IMPROVEMENT_SCALE).json_schema()
+        self.assertEqual(schema['properties']['feedback_type']['enum'], list(IMPROVEMENT_SCALE))
+        self.assertIn('misspelled_words', schema['required'])
+        local = ReplySchema('schema test', IMPROVEMENT_SCALE, local_spelling=True).json_schema()
+        self.assertNotIn('misspelled_words', local['properties'])
+
+
+class CompactReplySchemaTests(SimpleTestCase):
+    def setUp(self):
+        self.template = COMPACT_TEMPLATES[('goldilocks', 1)]
+        self.schema = ReplySchema('compact schema test', IMPROVEMENT_SCALE, self.template)
+
+    def test_long_names_are_repaired_to_codes(self):
+        feedback_type = self.template.feedback_types[0]
+        reply = self.schema.parse(f'{{"feedback_type": "{feedback_type}", "misspelled_words": ["beres"]}}')
+        self.assertEqual(reply, {'f': feedback_type, 'm': [], 's': ['beres']})
@@ -0,0 +1,119 @@
+import json
+from unittest import mock
+
+from django.test import RequestFactory, SimpleTestCase, override_settings
+
+from grading import pipeline
+from grading.screening import (
+    RequestSizeLimitMiddleware, entropy, is_mashed, keyboard_run, repeats_pattern, screen, screen_reason,
+    screening_stats,
+)
+
+
+class MashedWordTests(SimpleTestCase):
+    def test_real_words_are_never_mashed(self):
+        for word in ('Folklore', 'Fairytale', 'Reckless', 'Disrespectful', 'Trespassing', 'strengths', 'rhythm',
+                     'liberty', 'hmm', 'beleive', 'cottege', 'Goldylocks'):
+            with self.subTest(word=word):
+                self.assertFalse(is_mashed(word))
+
+    def test_mashing_patterns(self):
+        for word in ('asdf', 'lkjh', 'xcvb', 'sdfsdf', 'ksksks', 'kdkdk', 'poiuy', 'dfkjdkf', 'aslkdj', 'ajsdkl'):
+            with self.subTest(word=word):
+                self.assertTrue(is_mashed(word))
+
+    def test_story_names_are_not_mashed(self):
+        self.assertFalse(is_mashed('mcgregor', names={'mcgregor'}))
+
+    def test_keyboard_run(self):
+        self.assertEqual(keyboard_run('asdfx'), 4)
+        self.assertEqual(keyboard_run('fdsa'), 4)
+        self.assertEqual(keyboard_run('bear'), 1)
+
+    def test_repeats_pattern(self):
+        self.assertTrue(repeats_pattern('asdasd'))
+        self.assertTrue(repeats_pattern('zzzz'))
+        self.assertFalse(repeats_pattern('bears'))
+
+    def test_entropy(self):
+        self.assertEqual(entropy('aaaa'), 0.0)
+        self.assertEqual(entropy('abab'), 1.0)
+        self.assertEqual(entropy('123'), 0.0)
+
+
+class ScreenReasonTests(SimpleTestCase):
+    def test_real_answers_pass(self):
+        for answer in ('Folklore', 'Fairytale', 'Reckless', 'Disrespectful', 'Trespassing',
+                       'Goldilocks went into the cottage and ate the porage', ['Goldilocks', 'Papa Bear']):
+            with self.subTest(answer=answer):
+                self.assertIsNone(screen_reason('goldilocks', answer))
+
+    def test_gibberish(self):
+        for answer in ('asdf jkl', 'sdfsdf kdkdk the', 'aaaaaaaaaaaaaaa', 'lololololololol', '1234 !!!'):
+            with self.subTest(answer=answer):
+                self.assertEqual(screen_reason('goldilocks', answer), 'gibberish')
+
+    def test_one_mashed_word_in_an_answer_is_tolerated(self):
+        self.assertIsNone(screen_reason('goldilocks', 'Fiction asdf'))
+
+    @override_settings(GRADING_SCREEN_MAX_CHARS=20)
+    def test_too_long(self):
+        self.assertEqual(screen_reason('goldilocks', 'Goldilocks and the three bears'), 'too_long')
+
+    def test_off_topic(self):
+        self.assertEqual(screen_reason('goldilocks', 'Cinderella lost her shoe'), 'off_topic')
+        self.assertEqual(screen_reason('goldilocks', 'Peter Rabbit'), 'off_topic')
+        self.assertIsNone(screen_reason('goldilocks', 'Goldilocks is nicer than Cinderella'))
+
+    @override_settings(GRADING_SCREENING=True)
+    def test_screen_response_and_stats(self):
+        before = screening_stats.stats()['questions'].get('peter Q7', {}).get('gibberish', 0)
+        response = screen('peter', 7, 'asdf qwer')
+        body = json.loads(response.content)
+        self.assertEqual(body['highlight_issue'], 'gibberish')
+        self.assertEqual(body['feedback_type'], 'guidance')
+        self.assertEqual(screening_stats.stats()['questions']['peter Q7']['gibberish'], before + 1)
+
+    @override_settings(GRADING_SCREENING=False)
+    def test_disabled(self):
+        self.assertIsNone(screen('peter', 7, 'asdf qwer'))
+
+
+@override_settings(GRADING_SCREENING=True, GRADING_FAST_PATH=True, GRADING_CACHE_ENABLED=False)
+class ScreeningOrderTests(SimpleTestCase):
+    def post(self, path, answer):
+        return self.client.post(path, data=json.dumps({'answer': answer}), content_type='application/json')
+
+    def test_rare_correct_answers_reach_the_grader(self):
+        for path, answer in (('/api/check-question2/', 'Folklore'), ('/api/check-question3/', 'Fairytale')):
+            with self.subTest(answer=answer), \
+                    mock.patch.object(pipeline.router, 'available', return_value=False) as available:
+                body = self.post(path, answer).json()
+                self.assertNotEqual(body.get('highlight_issue'), 'gibberish')
+                available.assert_called_once()
+
+    def test_local_grade_comes_before_screening(self):
+        local = {'isCorrect': True, 'message': 'Yes', 'feedback_type': 'excellent', 'misspelled_words': []}
+        with mock.patch.object(pipeline.fast_path, 'grade', return_value=local), \
+                mock.patch.object(pipeline, 'screen') as screened:
+            body = self.post('/api/check-question2/', 'Asdf').json()
+        self.assertEqual(body['feedback_type'], 'excellent')
+        screened.assert_not_called()
+
+    def test_escalated_gibberish_is_screened(self):
+        with mock.patch.object(pipeline.router, 'available') as available:
+            body = self.post('/api/check-question6/', 'Asdf jkl qwer').json()
+        self.assertEqual(body['highlight_issue'], 'gibberish')
+        available.assert_not_called()
+
+
+@override_settings(GRADING_MAX_BODY_BYTES=100)
+class RequestSizeLimitTests(SimpleTestCase):
+    def test_large_api_bodies_are_rejected(self):
+        middleware = RequestSizeLimitMiddleware(lambda request: 'passed')
+        request = RequestFactory().post('/api/check-question1/', data='x' * 200, content_type='text/plain')
+        self.assertEqual(middleware(request).status_code, 413)
+        request = RequestFactory().post('/api/check-question1/', data='x' * 50, content_type='text/plain')
+        self.assertEqual(middleware(request), 'passed')
+        request = RequestFactory().post('/admin/', data='x' * 200, content_type='text/plain')
+        self.assertEqual(middleware(request), 'passed')
@@ -0,0 +1,66 @@
+import json
+from unittest import mock
+
+from django.test import SimpleTestCase, override_settings
+
+from grading import pipeline
+from grading.shadow import ShadowEvaluator
+from grading.traffic import pregrading
+
+LLM_GRADE = {'isCorrect': True, 'message': 'Great!', 'feedback_type': 'excellent', 'show_answer': False,
+             'misspelled_words': []}
+
+
+def reply(result=LLM_GRADE):
+    response = mock.Mock(status_code=200)
+    response.json.return_value = {'choices': [{'message': {'content': json.dumps(result)}}]}
+    return response
+
+
+@override_settings(GRADING_CACHE_ENABLED=False, GRADING_SINGLE_FLIGHT=False, GRADING_COMPACT_OUTPUT=False,
+                   GRADING_FAST_PATH=True, GRADING_SHADOW_LOG=None)
+class ShadowSamplingTests(SimpleTestCase):
+    def setUp(self):
+        self.shadow = ShadowEvaluator()
+        patches = [
+            mock.patch.object(pipeline, 'shadow', self.shadow),
+            # Compare on the calling thread
+            mock.patch.object(self.shadow, '_submit', side_effect=lambda job, *args: job(*args)),
+            mock.patch.object(pipeline.router, 'available', return_value=True),
+        ]
+        for patch in patches:
+            patch.start()
+            self.addCleanup(patch.stop)
+
+    def post(self, answer):
+        with mock.patch.object(pipeline.hedging, 'post', return_value=reply()) as post:
+            response = self.client.post('/api/check-question1/', data=json.dumps({'answer': answer}),
+                                        content_type='application/json')
+        return response, post
+
+    @override_settings(GRADING_SHADOW_SAMPLE=1.0)
+    def test_sampled_answers_skip_the_local_graders(self):
+        response, post = self.post('Goldilocks and the Three Bears')
+        self.assertEqual(response.json()['message'], 'Great!')
+        post.assert_called_once()
+        fast_path = self.shadow.stats.stats()['questions']['goldilocks Q1']['fast_path']
+        self.assertEqual((fast_path['samples'], fast_path['coverage'], fast_path['agreement']), (1, 1.0, 1.0))
+
+    @override_settings(GRADING_SHADOW_SAMPLE=0.0)
+    def test_unsampled_answers_are_served_locally(self):
+        response, post = self.post('Goldilocks and the three bears')
+        post.assert_not_called()
+        self.assertEqual(self.shadow.stats.stats()['questions'], {})
+
+    @override_settings(GRADING_SHADOW_SAMPLE=1.0)
+    def test_escalated_answers_are_compared_too(self):
+        self.post('A girl who visits some bears')
+        fast_path = self.shadow.stats.stats()['questions']['goldilocks Q1']['fast_path']
+        self.assertEqual((fast_path['samples'], fast_path['coverage']), (1, 0.0))
+
+    @override_settings(GRADING_SHADOW_SAMPLE=1.0)
+    def test_pregrade_drafts_are_not_sampled(self):
+        schema = pipeline.reply_schema('goldilocks', 1)
+        self.assertTrue(self.shadow.sample(schema))
+        with pregrading():
+            self.assertFalse(self.shadow.sample(schema))
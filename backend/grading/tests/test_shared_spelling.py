@@ -0,0 +1,142 @@
+import asyncio
+import json
+import threading
+import time
+from unittest import mock
+
+from django.http import JsonResponse
+from django.test import SimpleTestCase, override_settings
+
+from grading import pipeline
+from grading.batch import _resolve_without_llm
+from grading.cache import GradeCache, make_key
+from grading.pipeline import PendingGrade, grade
+from grading.singleflight import SingleFlight
+from grading.streaming import _answer_without_llm
+
+LEADER = 'Goldilocks ate the porridge'
+FOLLOWER = 'Goldilocks ate the porage'
+
+GRADED = {
+    'isCorrect': True,
+    'message': 'Well done!',
+    'feedback_type': 'excellent',
+    'show_answer': False,
+    'misspelled_words': [],
+}
+
+PAYLOAD = {'model': 'm', 'messages': [{'role': 'system', 'content': 'Grade it.'}, {'role': 'user', 'content': 'x'}]}
+
+
+def fallback(user_answer):
+    raise AssertionError('fallback used')
+
+
+def upstream_reply():
+    return mock.Mock(status_code=200, json=lambda: {'choices': [{'message': {'content': json.dumps(GRADED)}}]})
+
+
+@override_settings(GRADING_SCREENING=False, GRADING_FAST_PATH=False, GRADING_SIMILARITY=False,
+                   GRADING_BREAKER_ENABLED=False, GRADING_LOCAL_SPELLING=True)
+class SharedGradeSpellingTests(SimpleTestCase):
+    def setUp(self):
+        self.cache = GradeCache()
+        patches = [
+            mock.patch.object(pipeline, 'grade_cache', self.cache),
+            mock.patch.object(pipeline, 'single_flight', SingleFlight()),
+            mock.patch.object(pipeline.router, 'available', return_value=True),
+            mock.patch.object(pipeline.answer_classifier, 'grade', return_value=None),
+        ]
+        for patch in patches:
+            patch.start()
+            self.addCleanup(patch.stop)
+
+    def test_keys_are_shared(self):
+        self.assertEqual(make_key('goldilocks', 6, LEADER), make_key('goldilocks', 6, FOLLOWER))
+
+    @override_settings(GRADING_CACHE_ENABLED=True)
+    def test_cache_hit_reports_its_own_misspellings(self):
+        self.cache.set(make_key('goldilocks', 6, LEADER), GRADED)
+        response = grade('goldilocks', 6, FOLLOWER, PAYLOAD, fallback=fallback)
+        self.assertEqual(json.loads(response.content)['misspelled_words'], ['porage'])
+        self.assertEqual(self.cache.get(make_key('goldilocks', 6, LEADER))['misspelled_words'], [])
+
+    @override_settings(GRADING_CACHE_ENABLED=True)
+    def test_async_cache_hit_reports_its_own_misspellings(self):
+        self.cache.set(make_key('goldilocks', 6, LEADER), GRADED)
+        response = self.async_grade(FOLLOWER)
+        self.assertEqual(json.loads(response.content)['misspelled_words'], ['porage'])
+
+    def async_grade(self, answer):
+        return asyncio.run(pipeline.agrade('goldilocks', 6, answer, PAYLOAD, fallback=fallback))
+
+    @override_settings(GRADING_CACHE_ENABLED=False, GRADING_SINGLE_FLIGHT=True)
+    def test_coalesced_follower_reports_its_own_misspellings(self):
+        entered = threading.Event()
+        release = threading.Event()
+
+        def post(label, payload, title=None):
+            entered.set()
+            release.wait(5)
+            return upstream_reply()
+
+        responses = {}
+
+        def run(answer):
+            responses[answer] = grade('goldilocks', 6, answer, PAYLOAD, fallback=fallback)
+
+        with mock.patch.object(pipeline.hedging, 'post', side_effect=post) as upstream:
+            leader = threading.Thread(target=run, args=(LEADER,))
+            leader.start()
+            entered.wait(5)
+            follower = threading.Thread(target=run, args=(FOLLOWER,))
+            follower.start()
+            time.sleep(0.1)
+            release.set()
+            leader.join(5)
+            follower.join(5)
+
+        self.assertEqual(upstream.call_count, 1)
+        self.assertEqual(json.loads(responses[LEADER].content)['misspelled_words'], [])
+        self.assertEqual(json.loads(responses[FOLLOWER].content)['misspelled_words'], ['porage'])
+
+    def test_worksheet_cache_hit_reports_its_own_misspellings(self):
+        item = PendingGrade('goldilocks', 6, FOLLOWER, PAYLOAD, fallback=fallback)
+        responses = _resolve_without_llm({6: item}, {6: GRADED})
+        self.assertEqual(json.loads(responses[6].content)['misspelled_words'], ['porage'])
+
+    def test_streamed_cache_hit_reports_its_own_misspellings(self):
+        item = PendingGrade('goldilocks', 6, FOLLOWER, PAYLOAD, fallback=fallback)
+        frame = _answer_without_llm(item, GRADED)
+        self.assertIn('"misspelled_words": ["porage"]', frame)
+
+
+class SingleFlightSharedTests(SimpleTestCase):
+    def test_only_waiting_callers_get_the_adapted_copy(self):
+        flight = SingleFlight()
+        entered = threading.Event()
+        release = threading.Event()
+        results = {}
+
+        def leader_fn():
+            entered.set()
+            release.wait(5)
+            return JsonResponse({'who': 'leader'})
+
+        def shared(response):
+            return JsonResponse(dict(json.loads(response.content), adapted=True))
+
+        leader = threading.Thread(target=lambda: results.setdefault('leader', flight.do('k', leader_fn, shared)))
+        leader.start()
+        entered.wait(5)
+        follower = threading.Thread(
+            target=lambda: results.setdefault('follower', flight.do('k', leader_fn, shared)))
+        follower.start()
+        time.sleep(0.1)
+        release.set()
+        leader.join(5)
+        follower.join(5)
+
+        self.assertEqual(json.loads(results['leader'].content), {'who': 'leader'})
+        self.assertEqual(json.loads(results['follower'].content), {'who': 'leader', 'adapted': True})
+        self.assertEqual(flight.stats()['coalesced'], 1)
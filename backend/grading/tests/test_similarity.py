@@ -0,0 +1,70 @@
+import json
+from unittest import mock
+
+from django.test import SimpleTestCase, override_settings
+
+from grading import pipeline
+from grading.similarity import BANDS, REFERENCE_POINTS, SimilarityGrader, graded_together, similarity_grader
+
+ANSWERS = [
+    'Peter disobeyed his mother and went into the garden',
+    'Peter ate the vegetables',
+    'Peter lost his jacket and his shoes',
+    'I do not know',
+]
+
+
+class GradeManyTests(SimpleTestCase):
+    def test_batch_matches_single_answers(self):
+        grader = SimilarityGrader(REFERENCE_POINTS, BANDS)
+        batch = grader.grade_many('peter', 9, ANSWERS, ('excellent', 'good'))
+        single = [SimilarityGrader(REFERENCE_POINTS, BANDS).grade('peter', 9, answer, ('excellent', 'good'))
+                  for answer in ANSWERS]
+        self.assertEqual(batch, single)
+        self.assertEqual(grader.stats()['answered'] + grader.stats()['escalated'], len(ANSWERS))
+
+    def test_unknown_question(self):
+        self.assertEqual(SimilarityGrader(REFERENCE_POINTS, BANDS).grade_many('peter', 1, ['Peter']), [None])
+
+
+@override_settings(GRADING_SIMILARITY=True)
+class GradedTogetherTests(SimpleTestCase):
+    def test_answers_are_matched_in_one_product(self):
+        expected = [similarity_grader.grade('peter', 9, answer, ('excellent', 'good'), count=False)
+                    for answer in ANSWERS]
+        with mock.patch.object(similarity_grader, 'match_many', wraps=similarity_grader.match_many) as match_many:
+            with graded_together('peter', {9: ANSWERS}):
+                results = [similarity_grader.grade('peter', 9, answer, ('excellent', 'good'), count=False)
+                           for answer in ANSWERS]
+        match_many.assert_called_once()
+        self.assertEqual(results, expected)
+
+    @override_settings(GRADING_SIMILARITY=False)
+    def test_nothing_is_prepared_when_disabled(self):
+        with mock.patch.object(similarity_grader, 'match_many') as match_many, graded_together('peter', {9: ANSWERS}):
+            pass
+        match_many.assert_not_called()
+
+
+@override_settings(GRADING_SIMILARITY=True, GRADING_CACHE_ENABLED=False, GRADING_SCREENING=False)
+class ClassroomSimilarityTests(SimpleTestCase):
+    def test_class_answers_are_matched_together(self):
+        body = {'story': 'peter', 'question': 9, 'answers': {f"s{i}": answer for i, answer in enumerate(ANSWERS)}}
+        with mock.patch.object(similarity_grader, 'match_many', wraps=similarity_grader.match_many) as match_many, \
+                mock.patch.object(pipeline.router, 'available', return_value=False):
+            response = self.client.post('/api/grading/classroom/', data=json.dumps(body),
+                                        content_type='application/json')
+        self.assertEqual(response.status_code, 200)
+        match_many.assert_called_once()
+        self.assertEqual(len(match_many.call_args.args[2]), len(ANSWERS))
+        self.assertEqual(response.json()['results']['s1']['feedback_type'], 'partial')
+
+    def test_worksheet_answers_are_matched_up_front(self):
+        body = {'story': 'peter', 'answers': {'9': ANSWERS[1], '10': 'He got out of the garden'}}
+        with mock.patch.object(similarity_grader, 'match_many', wraps=similarity_grader.match_many) as match_many, \
+                mock.patch.object(pipeline.router, 'available', return_value=False):
+            response = self.client.post('/api/check-worksheet/', data=json.dumps(body),
+                                        content_type='application/json')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(match_many.call_count, 2)
+        self.assertEqual(response.json()['results']['9']['feedback_type'], 'partial')
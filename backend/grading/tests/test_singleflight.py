@@ -0,0 +1,94 @@
+import os
+import shutil
+import tempfile
+import threading
+import time
+from unittest import skipIf
+
+from django.http import JsonResponse
+from django.test import SimpleTestCase
+
+from grading.singleflight import FileLockStore, SingleFlight, fcntl
+
+
+class SingleFlightTests(SimpleTestCase):
+    def test_concurrent_callers_share_one_call(self):
+        single_flight = SingleFlight()
+        calls = []
+        started = threading.Event()
+
+        def grade():
+            calls.append(1)
+            started.set()
+            time.sleep(0.1)
+            return JsonResponse({'feedback_type': 'excellent'})
+
+        responses = []
+        leader = threading.Thread(target=lambda: responses.append(single_flight.do('k', grade)))
+        leader.start()
+        started.wait()
+        follower = threading.Thread(target=lambda: responses.append(single_flight.do('k', grade)))
+        follower.start()
+        leader.join()
+        follower.join()
+
+        self.assertEqual(len(calls), 1)
+        self.assertEqual([response.status_code for response in responses], [200, 200])
+        self.assertEqual(single_flight.stats()['coalesced'], 1)
+
+    def test_leader_error_reaches_followers_and_key_is_released(self):
+        single_flight = SingleFlight()
+        with self.assertRaises(ValueError):
+            single_flight.do('k', lambda: (_ for _ in ()).throw(ValueError('boom')))
+        response = single_flight.do('k', lambda: JsonResponse({'ok': True}))
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(single_flight.stats()['in_flight'], 0)
+
+
+@skipIf(fcntl is None, 'file locks need fcntl')
+class FileLockStoreTests(SimpleTestCase):
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.directory, True)
+        self.store = FileLockStore(self.directory, result_ttl=30, wait_timeout=20)
+
+    def _grade(self, key):
+        return self.store.run(key, lambda: JsonResponse({'answer': key}))
+
+    def test_run_stores_result(self):
+        response, coalesced = self._grade('a')
+        self.assertFalse(coalesced)
+        self.assertEqual(sorted(name.rsplit('.', 1)[1] for name in os.listdir(self.directory)), ['json', 'lock'])
+
+    def test_sweep_removes_old_files_only(self):
+        self._grade('old')
+        self._grade('new')
+        old_lock, old_result = self.store._paths('old')
+        past = time.time() - 3600
+        os.utime(old_lock, (past, past))
+        os.utime(old_result, (past, past))
+
+        self.assertEqual(self.store.sweep(), 2)
+        remaining = set(os.listdir(self.directory))
+        self.assertNotIn(os.path.basename(old_lock), remaining)
+        self.assertNotIn(os.path.basename(old_result), remaining)
+        self.assertEqual(len(remaining), 2)
+
+    def test_sweep_keeps_held_locks(self):
+        self._grade('held')
+        lock_path, result_path = self.store._paths('held')
+        past = time.time() - 3600
+        os.utime(lock_path, (past, past))
+        with open(lock_path, 'a') as lock_file:
+            fcntl.flock(lock_file, fcntl.LOCK_EX)
+            self.store.sweep()
+            self.assertTrue(os.path.exists(lock_path))
+
+    def test_directory_stays_bounded(self):
+        self.store.result_ttl = 0
+        self.store.wait_timeout = 0
+        for i in range(20):
+            self._grade(f"answer {i}")
+            time.sleep(0.001)
+        self.store.sweep(now=time.time() + 1)
+        self.assertEqual(os.listdir(self.directory), [])
@@ -0,0 +1,109 @@
+from django.test import SimpleTestCase
+
+from grading.spelling import SpellIndex, misspelled_words, strip_spelling_task
+
+
+class SpellIndexTests(SimpleTestCase):
+    def test_common_listed_words_are_known(self):
+        index = SpellIndex({'hop'}, {'tangled': 5000, 'hopping': 900, 'wen': 300})
+        self.assertIn('tangled', index)
+        self.assertIn("tangled's", index)
+        self.assertIn('hopping', index)
+        self.assertNotIn('hopped', index)
+        self.assertNotIn('wen', index)
+        self.assertTrue(index.is_word('wen'))
+
+    def test_rare_listed_words_are_only_slips_next_to_far_commoner_words(self):
+        index = SpellIndex({'when'}, {'when': 5000000, 'disobey': 5000, 'wen': 300, 'disobeys': 460})
+        self.assertTrue(index.is_misspelled('wen'))
+        self.assertFalse(index.is_misspelled('disobeys'))
+
+    def test_rare_listed_words_are_not_offered_as_corrections(self):
+        index = SpellIndex(set(), {'aardwolf': 50})
+        self.assertIsNone(index.correction('aardwolv'))
+
+    def test_one_close_word_is_a_confident_correction(self):
+        index = SpellIndex({'believe'})
+        self.assertEqual(index.correction('beleive'), 'believe')
+        self.assertTrue(index.is_misspelled('beleive'))
+
+    def test_equally_likely_corrections_are_not_confident(self):
+        index = SpellIndex(set(), {'cat': 5000, 'cot': 4000})
+        self.assertIsNone(index.correction('cit'))
+        self.assertTrue(index.is_misspelled('cit'))
+        self.assertFalse(index.is_misspelled('Cit', sentence_start=True))
+
+    def test_a_far_more_common_correction_wins(self):
+        index = SpellIndex(set(), {'the': 1000000, 'ten': 20000})
+        self.assertEqual(index.correction('teh'), 'the')
+
+    def test_capitalised_words_only_count_near_story_names(self):
+        index = SpellIndex({'goldilocks', 'tale'})
+        self.assertTrue(index.is_misspelled('Goldylocks', names={'goldilocks'}))
+        self.assertFalse(index.is_misspelled('Tule', names={'goldilocks'}))
+        self.assertTrue(index.is_misspelled('Tule', names={'goldilocks'}, sentence_start=True))
+
+    def test_story_words_win_ties(self):
+        index = SpellIndex({'police', 'porridge'}, {'police': 375000, 'price': 76000})
+        self.assertEqual(index.correction('porige'), 'police')
+        self.assertEqual(index.correction('porige', names={'porridge'}), 'porridge')
+
+    def test_base_words_win_ties_with_listed_words(self):
+        index = SpellIndex({'naughty'}, {'naught': 2000})
+        self.assertEqual(index.correction('naughy'), 'naughty')
+
+
+class MisspelledWordsTests(SimpleTestCase):
+    def test_correct_words_are_not_flagged(self):
+        answer = ('She tucked herself in and fell asleep, out of breath, on the tangled hay by the mat. '
+                  'Folklore, a Fairytale about a Reckless, Disrespectful girl Trespassing. Show respect.')
+        self.assertEqual(misspelled_words(answer, 'goldilocks'), [])
+
+    def test_british_spellings_are_known(self):
+        self.assertEqual(misspelled_words('Her favourite colour', 'goldilocks'), [])
+
+    def test_typos_are_reported_in_order_without_repeats(self):
+        self.assertEqual(
+            misspelled_words('I beleive my freind beleive it was a beautifull cottege', 'goldilocks'),
+            ['beleive', 'freind', 'beautifull', 'cottege'],
+        )
+
+    def test_first_word_of_a_sentence_is_checked(self):
+        self.assertEqual(misspelled_words('Becuase he was naughy'), ['Becuase', 'naughy'])
+        self.assertEqual(misspelled_words('He ran. Becuase he was scared'), ['Becuase'])
+        self.assertEqual(misspelled_words('She said "Becuase I was hungry"'), ['Becuase'])
+
+    def test_story_words(self):
+        self.assertEqual(misspelled_words('The porige was hot', 'goldilocks'), ['porige'])
+        self.assertEqual(misspelled_words('Porige was too hot', 'goldilocks'), ['Porige'])
+        self.assertEqual(misspelled_words('Peter was naughy', 'peter'), ['naughy'])
+
+    def test_common_child_misspellings(self):
+        answer = 'It was realy bad. He runned and stoled it, she was scaried wen the bares came'
+        self.assertEqual(misspelled_words(answer, 'goldilocks'),
+                         ['realy', 'runned', 'stoled', 'scaried', 'wen', 'bares'])
+
+    def test_rare_real_words_and_fillers(self):
+        self.assertEqual(misspelled_words('Hmm. Peter disobeys his mother and thoughtfully eats', 'peter'), [])
+
+    def test_story_names(self):
+        self.assertEqual(misspelled_words('Goldylocks met the bears', 'goldilocks'), ['Goldylocks'])
+        self.assertEqual(misspelled_words("McGreggor chased Peter into Mr. McGregor's garden", 'peter'),
+                         ['McGreggor'])
+        self.assertEqual(misspelled_words('Tom and Jenny read it', 'peter'), [])
+
+    def test_lists_and_non_strings(self):
+        self.assertEqual(misspelled_words(['a beautifull day', None, 'verry nice']), ['beautifull', 'verry'])
+        self.assertEqual(misspelled_words(None), [])
+
+
+class StripSpellingTaskTests(SimpleTestCase):
+    def test_removes_task_field_and_note(self):
+        prompt = (
+            'Your task is twofold:\n1. Grade the answer.\n2. Identify any misspelled English words in their answer.\n'
+            'Reply with:\n{\n  "isCorrect": true,\n  "misspelled_words": ["word"]\n}\n\n'
+            'Note on "misspelled_words":\n- Only English words.\n'
+        )
+        stripped = strip_spelling_task(prompt)
+        self.assertIn('Your task: Grade the answer.', stripped)
+        self.assertNotIn('misspelled', stripped)
@@ -0,0 +1,145 @@
+import json
+from unittest import mock
+
+from django.test import RequestFactory, SimpleTestCase, override_settings
+
+from grading import pipeline, streaming
+from grading.pipeline import PendingGrade
+from grading.streaming import FeedbackStream, FeedbackStreamParser, _content_delta, sse, stream_grade
+from peter.views import check_question9_answer
+
+REPLY = '{"feedback_type": "partial", "isCorrect": false, "show_answer": true, "message": "Nearly"}'
+
+
+def feed_in_pieces(text, size):
+    parser = FeedbackStreamParser()
+    events = []
+    for start in range(0, len(text), size):
+        events.extend(parser.feed(text[start:start + size]))
+    return parser, events
+
+
+def fields(events):
+    return {key: value for kind, key, value in events if kind == 'field'}
+
+
+def message(events):
+    return ''.join(value for kind, _, value in events if kind == 'message')
+
+
+class FeedbackStreamParserTests(SimpleTestCase):
+    def test_same_events_whatever_the_split(self):
+        text = ('{"feedback_type": "good", "isCorrect": true, "score": 0.5, "message": "Well done, Peter!", '
+                '"misspelled_words": ["gardn", "rabit"], "extra": {"a": [1, {"b": "}"}]}}')
+        expected = json.loads(text)
+        for size in (1, 2, 3, 7, len(text)):
+            parser, events = feed_in_pieces(text, size)
+            self.assertEqual(fields(events), expected, size)
+            self.assertEqual(message(events), 'Well done, Peter!', size)
+            self.assertEqual(parser.state, 'done')
+
+    def test_message_is_streamed_piece_by_piece(self):
+        parser = FeedbackStreamParser()
+        self.assertEqual(parser.feed('{"feedback_type": "go'), [])
+        self.assertEqual(parser.feed('od", "message": "Gr'),
+                         [('field', 'feedback_type', 'good'), ('message', 'message', 'G'),
+                          ('message', 'message', 'r')])
+        self.assertEqual(parser.feed('eat"}'), [('message', 'message', 'e'), ('message', 'message', 'a'),
+                                                ('message', 'message', 't'), ('field', 'message', 'Great')])
+
+    def test_escapes_split_across_pieces(self):
+        text = json.dumps({'message': 'He said "hi"\n\u00e9t\u00e9 \u2014 done\tok', 'k\"ey': 'v'})
+        _, events = feed_in_pieces(text, 1)
+        self.assertEqual(message(events), json.loads(text)['message'])
+        self.assertEqual(fields(events), json.loads(text))
+
+    def test_result_key_is_streamed_too(self):
+        _, events = feed_in_pieces('{"result": "Nice"}', 2)
+        self.assertEqual(message(events), 'Nice')
+
+    def test_leading_text_is_skipped_and_bad_raw_values_dropped(self):
+        _, events = feed_in_pieces('Sure! {"isCorrect": tru, "feedback_type": "good"}', 4)
+        self.assertEqual(fields(events), {'feedback_type': 'good'})
+
+
+class ContentDeltaTests(SimpleTestCase):
+    def test_deltas_and_control_lines(self):
+        chunk = {'choices': [{'delta': {'content': '{"feed'}}]}
+        with mock.patch.object(streaming.usage_stats, 'record') as record:
+            self.assertEqual(_content_delta('q', f"data: {json.dumps(chunk)}"), '{"feed')
+            record.assert_called_once_with('q', chunk)
+            for line in ('', ': keep-alive', 'event: ping', 'data: [DONE]'):
+                self.assertIsNone(_content_delta('q', line))
+            self.assertIsNone(_content_delta('q', 'data: {"choices": []}'))
+
+    def test_upstream_error_chunk_raises(self):
+        with self.assertRaises(ValueError):
+            _content_delta('q', 'data: {"error": {"message": "overloaded"}}')
+
+
+def pending(correct_types=None):
+    return mock.Mock(schema=mock.Mock(template=None), correct_types=correct_types)
+
+
+class FeedbackStreamTests(SimpleTestCase):
+    def test_fields_follow_correct_types(self):
+        frames = FeedbackStream(pending(['excellent', 'good', 'partial'])).feed(REPLY)
+        self.assertIn(sse('field', {'isCorrect': True}), frames)
+        self.assertIn(sse('field', {'show_answer': False}), frames)
+        self.assertNotIn(sse('field', {'isCorrect': False}), frames)
+
+    def test_fields_pass_through_without_correct_types(self):
+        frames = FeedbackStream(pending()).feed(REPLY)
+        self.assertIn(sse('field', {'isCorrect': False}), frames)
+        self.assertIn(sse('field', {'show_answer': True}), frames)
+
+
+def streamed(content, pieces=4):
+    lines = [': OPENROUTER PROCESSING']
+    for start in range(0, len(content), pieces):
+        lines.append(f"data: {json.dumps({'choices': [{'delta': {'content': content[start:start + pieces]}}]})}")
+    lines.append('data: [DONE]')
+    response = mock.MagicMock(status_code=200)
+    response.__enter__.return_value = response
+    response.iter_lines.return_value = iter(lines)
+    return response
+
+
+@override_settings(GRADING_CACHE_ENABLED=False, GRADING_SIMILARITY=False, GRADING_IDEMPOTENCY=False,
+                   GRADING_SHADOW_SAMPLE=0.0, GRADING_COMPACT_OUTPUT=False)
+class StreamGradeTests(SimpleTestCase):
+    def setUp(self):
+        patcher = mock.patch.object(pipeline.router, 'available', return_value=True)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        request = RequestFactory().post('/api/check-peter-question9/',
+                                        data={'answer': 'Peter went into the garden and Mr. McGregor chased him'},
+                                        content_type='application/json')
+        token = pipeline._collect_mode.set(True)
+        try:
+            self.item = check_question9_answer(request)
+        finally:
+            pipeline._collect_mode.reset(token)
+        self.assertIsInstance(self.item, PendingGrade)
+
+    def test_frames_follow_the_completion(self):
+        grade = {'feedback_type': 'excellent', 'isCorrect': True, 'show_answer': False, 'message': 'Well done!',
+                 'misspelled_words': []}
+        with mock.patch.object(streaming.router, 'post_stream', return_value=streamed(json.dumps(grade))):
+            frames = list(stream_grade(self.item))
+        self.assertEqual(frames[0], sse('field', {'feedback_type': 'excellent'}))
+        self.assertEqual(frames[1], sse('field', {'isCorrect': True}))
+        deltas = [json.loads(frame.split('data: ', 1)[1])['delta'] for frame in frames if 'event: message' in frame]
+        self.assertEqual(''.join(deltas), 'Well done!')
+        self.assertGreater(len(deltas), 1)
+        self.assertTrue(frames[-1].startswith('event: result'))
+        self.assertEqual(json.loads(frames[-1].split('data: ', 1)[1])['message'], 'Well done!')
+
+    def test_broken_completion_ends_with_the_fallback(self):
+        with mock.patch.object(streaming.router, 'post_stream', return_value=streamed('I cannot grade this')), \
+                self.assertLogs('grading.streaming', 'WARNING'):
+            frames = list(stream_grade(self.item))
+        self.assertEqual(len(frames), 1)
+        self.assertTrue(frames[0].startswith('event: result'))
+        self.assertEqual(json.loads(frames[0].split('data: ', 1)[1]),
+                         json.loads(self.item.fallback(self.item.user_answer).content))
@@ -0,0 +1,128 @@
+from unittest import mock
+
+from django.test import SimpleTestCase, override_settings
+
+from grading.classifier import AnswerClassifier
+from grading.pipeline import finalize_result
+from grading.similarity import BANDS, REFERENCE_POINTS, SimilarityGrader
+from grading.templates import COMPACT_TEMPLATES, CompactTemplate
+
+TITLE = COMPACT_TEMPLATES[('goldilocks', 1)]
+
+
+class CompactTemplateTests(SimpleTestCase):
+    def test_first_template_with_all_required_items(self):
+        self.assertEqual(TITLE.message('partial', {'goldilocks', 'bears'}),
+                         'You got the main character! But the title also includes information about the other characters.')
+        self.assertEqual(TITLE.message('partial', {'bears'}),
+                         "You identified some characters, but you're missing the main character's name.")
+
+    def test_no_message_when_nothing_matches(self):
+        self.assertIsNone(TITLE.message('partial', set()))
+
+    def test_expand(self):
+        result = TITLE.expand({'f': 'partial', 'm': ['bears', 'unknown'], 's': ['Goldylocks', 3]})
+        self.assertEqual(result['feedback_type'], 'partial')
+        self.assertFalse(result['isCorrect'])
+        self.assertTrue(result['show_answer'])
+        self.assertEqual(result['matched'], ['bears'])
+        self.assertEqual(result['misspelled_words'], ['Goldylocks'])
+        self.assertEqual(result['correct_answer'], 'Goldilocks and the Three Bears')
+
+    def test_show_answer_follows_correct_types(self):
+        result = TITLE.expand({'f': 'partial', 'm': ['goldilocks']}, ('excellent', 'good', 'partial'))
+        self.assertTrue(result['isCorrect'])
+        self.assertFalse(result['show_answer'])
+        result = TITLE.expand({'f': 'good', 'm': []}, ('excellent',))
+        self.assertFalse(result['isCorrect'])
+        self.assertTrue(result['show_answer'])
+
+    def test_finalized_compact_reply_does_not_show_the_answer_when_correct(self):
+        schema = mock.Mock(template=TITLE, local_spelling=False)
+        result = finalize_result({'f': 'partial', 'm': ['bears']}, ['excellent', 'good', 'partial'], schema)
+        self.assertEqual((result['isCorrect'], result['show_answer']), (True, False))
+
+    def test_finalized_llm_reply_does_not_show_the_answer_when_correct(self):
+        reply = {'isCorrect': False, 'feedback_type': 'partial', 'show_answer': True, 'message': 'Nearly'}
+        result = finalize_result(dict(reply), ['excellent', 'good', 'partial'])
+        self.assertEqual((result['isCorrect'], result['show_answer']), (True, False))
+        result = finalize_result(dict(reply), ['excellent', 'good'])
+        self.assertEqual((result['isCorrect'], result['show_answer']), (False, True))
+
+    def test_expand_rejects_unknown_codes_and_unmatched_types(self):
+        with self.assertRaises(ValueError):
+            TITLE.expand({'f': 'brilliant', 'm': []})
+        with self.assertRaises(ValueError):
+            TITLE.expand({'f': 'partial', 'm': []})
+
+    def test_payload_is_switched_once(self):
+        payload = {'model': 'm', 'messages': [{'role': 'system', 'content': 'Grade it.'}, {'role': 'user', 'content': 'x'}]}
+        compact = TITLE.payload(payload)
+        self.assertIn('COMPACT OUTPUT', compact['messages'][0]['content'])
+        self.assertEqual(compact['max_tokens'], 60)
+        self.assertIs(TITLE.payload(compact), compact)
+        self.assertEqual(payload['messages'][0]['content'], 'Grade it.')
+
+
+class ConfidentModel:
+    def __init__(self, feedback_type, confidence=0.99):
+        self.prediction = (feedback_type, confidence)
+
+    def predict(self, answer):
+        return self.prediction
+
+
+@override_settings(GRADING_CLASSIFIER_THRESHOLD=0.9)
+class ClassifierTemplateTests(SimpleTestCase):
+    def grade(self, feedback_type, confidence=0.99, question=1):
+        classifier = AnswerClassifier()
+        models = {('goldilocks', question): ConfidentModel(feedback_type, confidence)}
+        with mock.patch.object(classifier, '_current_models', return_value=models):
+            return classifier, classifier.grade('goldilocks', question, 'Goldilocks and the bears', ('excellent',))
+
+    def test_confident_prediction_is_answered(self):
+        classifier, result = self.grade('incorrect')
+        self.assertEqual(result['feedback_type'], 'incorrect')
+        self.assertFalse(result['isCorrect'])
+        self.assertNotIn('matched', result)
+        self.assertEqual(classifier.stats()['questions']['goldilocks Q1'], {'answered': 1, 'escalated': 0})
+
+    def test_answer_is_shown_when_the_type_does_not_count_as_correct(self):
+        _, result = self.grade('good')
+        self.assertEqual((result['isCorrect'], result['show_answer']), (False, True))
+
+    def test_below_threshold_escalates(self):
+        classifier, result = self.grade('incorrect', confidence=0.6)
+        self.assertIsNone(result)
+        self.assertEqual(classifier.stats()['questions']['goldilocks Q1'], {'answered': 0, 'escalated': 1})
+
+    def test_type_without_an_unconditional_message_escalates(self):
+        # Goldilocks Q1 "partial" messages depend on which characters were named
+        classifier, result = self.grade('partial')
+        self.assertIsNone(result)
+        self.assertEqual(classifier.stats()['questions']['goldilocks Q1'], {'answered': 0, 'escalated': 1})
+
+
+class SimilarityTemplateTests(SimpleTestCase):
+    ANSWER = 'Peter ate the vegetables'
+
+    def test_band_is_answered_with_its_message(self):
+        result = SimilarityGrader(REFERENCE_POINTS, BANDS).grade('peter', 9, self.ANSWER, ('excellent', 'good'))
+        self.assertEqual(result['feedback_type'], 'partial')
+        self.assertFalse(result['isCorrect'])
+
+    def test_band_without_a_fitting_message_escalates(self):
+        template = COMPACT_TEMPLATES[('peter', 9)]
+        strict = CompactTemplate(
+            template.items,
+            [entry for entry in template.templates if entry[0] != 'partial']
+            + [('partial', ('disobeys_mother',), 'You have part of it.')],
+            template.correct_answer,
+        )
+        grader = SimilarityGrader(REFERENCE_POINTS, BANDS)
+        with mock.patch.dict(COMPACT_TEMPLATES, {('peter', 9): strict}):
+            self.assertIsNone(grader.grade('peter', 9, self.ANSWER))
+        self.assertEqual(grader.stats()['escalated'], 1)
+
+    def test_no_band_escalates(self):
+        self.assertIsNone(SimilarityGrader(REFERENCE_POINTS, BANDS).grade('peter', 9, 'I do not know'))
@@ -0,0 +1,28 @@
+"""
+Which kind of traffic a grading call belongs to, for the stats.
+
+Drafts pre-graded while the student types (pregrade.py) go through the same
+check views, screening and grade cache as real submits, but run inside
+pregrading(), so the screening, cache and local grader counters keep them
+apart instead of counting every pause in the typing as a lookup.
+"""
+import contextlib
+import contextvars
+
+_pregrade = contextvars.ContextVar('grading_pregrade', default=False)
+
+
+def is_pregrade():
+    return _pregrade.get()
+
+
+@contextlib.contextmanager
+def pregrading():
+    """
+    Count everything graded inside the block (or decorated function) as pregrade traffic
+    """
+    token = _pregrade.set(True)
+    try:
+        yield
+    finally:
+        _pregrade.reset(token)
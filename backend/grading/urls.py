@@ -0,0 +1,12 @@
+from django.urls import path
+from .pipeline import grading_view
+from . import views
+
+urlpatterns = [
+    path('api/grading/stats/', views.grading_stats, name='grading_stats'),
+    path('api/check-worksheet/', grading_view(views.check_worksheet), name='check_worksheet'),
+    path('api/grading/classroom/', grading_view(views.check_classroom), name='check_classroom'),
+    path('api/grading/pregrade/', views.pregrade_draft, name='pregrade_draft'),
+    path('api/grading/jobs/', views.submit_grading_job, name='submit_grading_job'),
+    path('api/grading/jobs/<uuid:job_id>/', views.grading_job_view(), name='grading_job'),
+]
@@ -0,0 +1,232 @@
+import json
+
+from django.conf import settings
+from django.http import HttpResponseNotAllowed, JsonResponse
+from django.views.decorators.csrf import csrf_exempt
+from django.views.decorators.http import require_http_methods
+
+from . import jobs
+from .batch import WORKSHEETS, batch_stats, collect_worksheet, grade_worksheet
+from .classroom import classroom_stats, grade_classroom, max_answers, student_body
+from .cache import grade_cache
+from .classifier import answer_classifier
+from .hedging import hedge_stats
+from .idempotency import idempotency_store
+from .keys import key_pool
+from .limiter import limiter
+from .pipeline import cache_enabled, single_flight
+from .router import router
+from .pregrade import MAX_DRAFT_ID_LENGTH, pregrade_enabled, pregrader
+from .prompts import usage_stats
+from .schema import parse_stats
+from .screening import screening_stats
+from .shadow import shadow
+from .similarity import similarity_grader
+from .rules import fast_path
+
+
+@require_http_methods(["GET"])
+def grading_stats(request):
+    """
+    Counters for the grading pipeline (cache hit ratio, evictions, ...)
+    """
+    return JsonResponse({
+        'cache': grade_cache.stats(),
+        'fast_path': fast_path.stats(),
+        'screening': screening_stats.stats(),
+        'similarity': similarity_grader.stats(),
+        'classifier': answer_classifier.stats(),
+        'shadow': shadow.stats.stats(),
+        'single_flight': single_flight.stats(),
+        'idempotency': idempotency_store.stats(),
+        'batch': batch_stats.stats(),
+        'classroom': classroom_stats.stats(),
+        'pregrade': pregrader.stats(),
+        'breaker': router.breaker_stats(),
+        'hedging': hedge_stats.stats(),
+        'upstream_limiter': limiter.stats(),
+        'api_keys': key_pool().stats(),
+        'router': router.stats(),
+        'prompt_cache': usage_stats.stats(),
+        'replies': parse_stats.stats(),
+        'jobs': jobs.stats(),
+    })
+
+
+@csrf_exempt
+@require_http_methods(["POST"])
+def check_worksheet(request):
+    """
+    API endpoint to grade every answer of a story's worksheet in one request.
+
+    Body: {"story": "peter", "answers": {"1": {"answer": "..."}, "6": {"answers": [...]}}}
+    where each value is the body the single-question endpoint takes (a plain
+    string or list is accepted as shorthand). Returns per-question results in
+    the single-question response shape, plus their HTTP status codes.
+    """
+    try:
+        data = json.loads(request.body)
+        story = data.get('story')
+        answers = data.get('answers')
+
+        if story not in WORKSHEETS:
+            return JsonResponse({
+                'error': f"Unknown story. Expected one of: {', '.join(WORKSHEETS)}."
+            }, status=400)
+
+        if not isinstance(answers, dict) or not answers:
+            return JsonResponse({'error': 'Please provide the worksheet answers.'}, status=400)
+
+        responses, pending = collect_worksheet(request, story, answers)
+        return grade_worksheet(story, responses, pending)
+
+    except json.JSONDecodeError:
+        return JsonResponse({'error': 'Invalid data format.'}, status=400)
+    except Exception as e:
+        return JsonResponse({'error': str(e)}, status=500)
+
+
+@csrf_exempt
+@require_http_methods(["POST"])
+def check_classroom(request):
+    """
+    API endpoint to grade a whole class's answers to one question.
+
+    Body: {"story": "peter", "question": 5, "answers": {"<student>": "..."}}
+    where each value is the body the question endpoint takes (a plain string or
+    list is accepted as shorthand). Repeated answers are graded once. Returns
+    per-student results and status codes, plus clusters of similar answers.
+    """
+    try:
+        data = json.loads(request.body)
+        story = data.get('story')
+        question = data.get('question')
+        answers = data.get('answers')
+        if isinstance(question, str) and question.isdigit():
+            question = int(question)
+
+        if question not in WORKSHEETS.get(story, {}):
+            return JsonResponse({'error': 'Unknown story or question.'}, status=400)
+
+        if not isinstance(answers, dict) or not answers:
+            return JsonResponse({'error': "Please provide the students' answers."}, status=400)
+
+        if len(answers) > max_answers():
+            return JsonResponse({'error': f"Please send at most {max_answers()} answers at once."}, status=400)
+
+        bodies = {str(student): student_body(answer) for student, answer in answers.items()}
+        if any(body is None for body in bodies.values()):
+            return JsonResponse({'error': 'Each answer must be a string, a list or an answer body.'}, status=400)
+
+        return grade_classroom(request, story, question, bodies)
+
+    except json.JSONDecodeError:
+        return JsonResponse({'error': 'Invalid data format.'}, status=400)
+    except Exception as e:
+        return JsonResponse({'error': str(e)}, status=500)
+
+
+@csrf_exempt
+@require_http_methods(["POST"])
+def pregrade_draft(request):
+    """
+    API endpoint the frontend calls with a debounced draft while the student types.
+
+    Body: {"story": "peter", "question": 9, "answer": "...", "draft_id": "..."}
+    where draft_id identifies the student's input box (required; a session
+    cookie stands in for it when present). Returns 202 at once;
+    the draft is graded in the background so a matching submit hits the cache.
+    """
+    try:
+        data = json.loads(request.body)
+        if not isinstance(data, dict):
+            return JsonResponse({'error': 'Invalid data format.'}, status=400)
+        story = data.get('story')
+        question = jobs.parse_question(data.get('question'))
+        answer = data.get('answer')
+
+        if not isinstance(story, str) or question not in WORKSHEETS.get(story, {}):
+            return JsonResponse({'error': 'Unknown story or question.'}, status=400)
+
+        if not isinstance(answer, str):
+            return JsonResponse({'error': 'Please provide the draft answer.'}, status=400)
+
+        draft_id = data.get('draft_id') or request.session.session_key
+        if not isinstance(draft_id, str) or not draft_id.strip() or len(draft_id) > MAX_DRAFT_ID_LENGTH:
+            return JsonResponse({'error': 'Please provide the draft_id of the answer box.'}, status=400)
+
+        if not pregrade_enabled() or not cache_enabled():
+            return JsonResponse({'status': 'disabled'}, status=202)
+
+        status = pregrader.submit(request, story, question, {'answer': answer.strip()}, draft_id)
+        return JsonResponse({'status': status}, status=202)
+
+    except json.JSONDecodeError:
+        return JsonResponse({'error': 'Invalid data format.'}, status=400)
+    except Exception as e:
+        return JsonResponse({'error': str(e)}, status=500)
+
+
+@csrf_exempt
+@require_http_methods(["POST"])
+def submit_grading_job(request):
+    """
+    API endpoint to grade a slow, open-ended answer in the background.
+
+    Body: {"story": "peter", "question": 11, ...} plus the question endpoint's
+    usual fields. Answers that need the LLM get 202 with a job id to poll at
+    /api/grading/jobs/<id>/; anything settled at once comes back as a finished job.
+    """
+    try:
+        data = json.loads(request.body)
+        if not isinstance(data, dict):
+            return JsonResponse({'error': 'Invalid data format.'}, status=400)
+        story = data.pop('story', None)
+        question = jobs.parse_question(data.pop('question', None))
+
+        if not isinstance(story, str) or question not in jobs.JOB_QUESTIONS.get(story, ()):
+            allowed = ', '.join(f"{name} Q{number}" for name, numbers in jobs.JOB_QUESTIONS.items()
+                                for number in numbers)
+            return JsonResponse({'error': f"Background grading is available for: {allowed}."}, status=400)
+
+        job, response = jobs.submit(request, story, question, data)
+        if job is None:
+            result, status_code = jobs.response_data(response)
+            return JsonResponse({'job_id': None, 'status': 'done', 'result': result, 'status_code': status_code})
+        payload = jobs.job_payload(job)
+        payload['poll_url'] = f"/api/grading/jobs/{job.id}/"
+        response = JsonResponse(payload, status=202)
+        response['Location'] = payload['poll_url']
+        return response
+
+    except json.JSONDecodeError:
+        return JsonResponse({'error': 'Invalid data format.'}, status=400)
+    except Exception as e:
+        return JsonResponse({'error': str(e)}, status=500)
+
+
+@require_http_methods(["GET"])
+def grading_job(request, job_id):
+    """
+    API endpoint to poll a grading job; ?wait=<seconds> holds the request until it finishes
+    """
+    job = jobs.wait_job(job_id, jobs.long_poll_timeout(request))
+    if job is None:
+        return JsonResponse({'error': 'Unknown job.'}, status=404)
+    return JsonResponse(jobs.job_payload(job))
+
+
+async def agrading_job(request, job_id):
+    """
+    Async twin of grading_job(), so long polls don't tie up a thread
+    """
+    if request.method != 'GET':
+        return HttpResponseNotAllowed(['GET'])
+    job = await jobs.await_job(job_id, jobs.long_poll_timeout(request))
+    if job is None:
+        return JsonResponse({'error': 'Unknown job.'}, status=404)
+    return JsonResponse(jobs.job_payload(job))
+
+
+def grading_job_view():
+    return agrading_job if getattr(settings, 'GRADING_ASYNC_VIEWS', False) else grading_job
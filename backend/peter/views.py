@@ -2,9 +2,9 @@ from django.http import JsonResponse
 from django.views.decorators.csrf import csrf_exempt
 from django.views.decorators.http import require_http_methods
 import json
-import os
-import requests
 from dotenv import load_dotenv
+from grading.pipeline import grade
+from grading.prompts import build_payload
 import logging
 
 load_dotenv()
@@ -62,30 +62,7 @@ def check_question1_answer(request):
         logger.error(f"Error in check_peter_question1_answer: {e}")
         return JsonResponse({'error': str(e)}, status=500)
 
-def analyze_peter_title_answer(user_answer):
-    """
-    Use AI to analyze the Peter Rabbit title answer specifically
-    """
-    logger.debug(f"Starting AI analysis for answer: '{user_answer}'")
-    
-    api_key = os.getenv('OPENROUTER_API_KEY2')
-    logger.debug(f"API key exists: {bool(api_key)}")
-    
-    if not api_key:
-        logger.error("OpenRouter API key not found in environment variables")
-        return JsonResponse({
-            'error': 'API configuration error. Please contact support.'
-        }, status=500)
-
-    url = "https://openrouter.ai/api/v1/chat/completions"
-    headers = {
-        "Authorization": f"Bearer {api_key}",
-        "Content-Type": "application/json",
-        "HTTP-Referer": "https://your-app-domain.com",
-        "X-Title": "Peter Rabbit Title Checker"
-    }
-
-    prompt = f"""You are a helpful reading teacher checking if a student correctly identified the story title. Your task is twofold:
+PETER_TITLE_PROMPT = """You are a helpful reading teacher checking if a student correctly identified the story title. Your task is twofold:
 1. Evaluate the correctness of the student's answer about the story "The Tale of Peter Rabbit".
 2. Identify any misspelled English words in their answer.
 
@@ -94,14 +71,14 @@ The correct story title is: "The Tale of Peter Rabbit"
 IMPORTANT: Your entire response MUST be a single, valid JSON object and nothing else.
 
 The required JSON format is:
-{{
+{
     "isCorrect": true/false,
     "message": "Your feedback message here",
     "feedback_type": "excellent", "good", "partial", or "incorrect",
     "show_answer": true/false,
     "correct_answer": "The Tale of Peter Rabbit",
     "misspelled_words": ["list", "of", "misspelled", "words"]
-}}
+}
 
 Note on "misspelled_words":
 - This must be a list of strings.
@@ -116,149 +93,22 @@ Guidelines for the TITLE question:
 - If completely wrong, mark as incorrect
 - Always be encouraging and specific in your feedback
 - If isCorrect is false, set show_answer to true
-- If isCorrect is true, set show_answer to false
-
-Student's answer: "{user_answer}\""""
-
-    payload = {
-        "model": "openai/gpt-4o-mini",
-        "messages": [
-            {"role": "system", "content": prompt},
-            {"role": "user", "content": f'Please analyze this title answer: "{user_answer}"'}
-        ],
-        "temperature": 0.3,
-        "max_tokens": 200
-    }
-
-    try:
-        logger.debug(f"Making request to OpenRouter API...")
-        response = requests.post(url, headers=headers, json=payload, timeout=15)
-        logger.debug(f"OpenRouter response status: {response.status_code}")
-        
-        if response.status_code == 200:
-            result_raw = response.json()['choices'][0]['message']['content'].strip()
-            logger.debug(f"OpenRouter raw response: {result_raw}")
-            
-            try:
-                parsed_result = json.loads(result_raw)
-                if 'result' in parsed_result and 'message' not in parsed_result:
-                    parsed_result['message'] = parsed_result['result']
-                logger.debug(f"Successfully parsed AI response")
-                return JsonResponse(parsed_result)
-            except json.JSONDecodeError as e:
-                logger.error(f"AI returned invalid JSON: {e}, Raw response: {result_raw}")
-                return JsonResponse({
-                    'error': 'AI service returned invalid response. Please try again.'
-                }, status=500)
-        elif response.status_code == 401:
-            logger.error(f"OpenRouter API authentication failed: {response.text}")
-            return JsonResponse({
-                'error': 'API authentication failed. Please check your API key configuration.'
-            }, status=500)
-        else:
-            logger.error(f"OpenRouter API error: {response.status_code} - {response.text}")
-            return JsonResponse({
-                'error': f'AI service error ({response.status_code}). Please try again.'
-            }, status=500)
+- If isCorrect is true, set show_answer to false"""
 
-    except requests.RequestException as e:
-        logger.error(f"Request exception in analyze_peter_title_answer: {e}")
-        return JsonResponse({
-            'error': 'Unable to connect to AI service. Please try again.'
-        }, status=500)
-    except Exception as e:
-        logger.error(f"Unexpected error in analyze_peter_title_answer: {e}", exc_info=True)
-        return JsonResponse({
-            'error': 'Unexpected error occurred. Please try again.'
-        }, status=500)
-
-    url = "https://openrouter.ai/api/v1/chat/completions"
-    headers = {
-        "Authorization": f"Bearer {api_key}",
-        "Content-Type": "application/json",
-        "HTTP-Referer": "https://your-app-domain.com",
-        "X-Title": "Peter Rabbit Title Checker"
-    }
-
-    prompt = f"""You are a helpful reading teacher checking if a student correctly identified the story title. Your task is twofold:
-1. Evaluate the correctness of the student's answer about the story "The Tale of Peter Rabbit".
-2. Identify any misspelled English words in their answer.
 
-The correct story title is: "The Tale of Peter Rabbit"
-
-IMPORTANT: Your entire response MUST be a single, valid JSON object and nothing else.
-
-The required JSON format is:
-{{
-    "isCorrect": true/false,
-    "message": "Your feedback message here",
-    "feedback_type": "excellent", "good", "partial", or "incorrect",
-    "show_answer": true/false,
-    "correct_answer": "The Tale of Peter Rabbit",
-    "misspelled_words": ["list", "of", "misspelled", "words"]
-}}
-
-Note on "misspelled_words":
-- This must be a list of strings.
-- Only include words that are clearly misspelled. Do not include proper nouns.
-- If there are no spelling mistakes, return an empty list: [].
-
-Guidelines for the TITLE question:
-- If the answer is exactly correct or very close (like "the tale of peter rabbit", "Tale of Peter Rabbit"), mark as correct
-- If they have "Peter Rabbit" but missing "The Tale of", mark as good but explain the full title
-- If they just say "Peter Rabbit" without "Tale", it's still partially correct
-- If they have some right elements but significant errors, give guidance
-- If completely wrong, mark as incorrect
-- Always be encouraging and specific in your feedback
-- If isCorrect is false, set show_answer to true
-- If isCorrect is true, set show_answer to false
-
-Student's answer: "{user_answer}\""""
-
-    payload = {
-        "model": "openai/gpt-4o-mini",
-        "messages": [
-            {"role": "system", "content": prompt},
-            {"role": "user", "content": f'Please analyze this title answer: "{user_answer}"'}
-        ],
-        "temperature": 0.3,
-        "max_tokens": 200
-    }
+def analyze_peter_title_answer(user_answer):
+    """
+    Use AI to analyze the Peter Rabbit title answer specifically
+    """
+    logger.debug(f"Starting AI analysis for answer: '{user_answer}'")
 
-    try:
-        logger.debug(f"Making request to OpenRouter API...")
-        response = requests.post(url, headers=headers, json=payload, timeout=15)
-        logger.debug(f"OpenRouter response status: {response.status_code}")
-        
-        if response.status_code == 200:
-            result_raw = response.json()['choices'][0]['message']['content'].strip()
-            logger.debug(f"OpenRouter raw response: {result_raw}")
-            
-            try:
-                parsed_result = json.loads(result_raw)
-                if 'result' in parsed_result and 'message' not in parsed_result:
-                    parsed_result['message'] = parsed_result['result']
-                logger.debug(f"Successfully parsed AI response")
-                return JsonResponse(parsed_result)
-            except json.JSONDecodeError as e:
-                logger.warning(f"AI JSON decode error: {e}, using fallback")
-                return create_peter_title_fallback_response(user_answer)
-        else:
-            logger.error(f"OpenRouter API error: {response.status_code} - {response.text}")
-            return JsonResponse({
-                'error': f'AI service temporarily unavailable. Please try again.'
-            }, status=500)
+    payload = build_payload(PETER_TITLE_PROMPT,
+                            f'Please analyze this title answer: "{user_answer}"',
+                            max_tokens=200)
 
-    except requests.RequestException as e:
-        logger.error(f"Request exception in analyze_peter_title_answer: {e}")
-        return JsonResponse({
-            'error': 'Unable to check answer right now. Please try again.'
-        }, status=500)
-    except Exception as e:
-        logger.error(f"Unexpected error in analyze_peter_title_answer: {e}", exc_info=True)
-        return JsonResponse({
-            'error': 'Unable to check answer right now. Please try again.'
-        }, status=500)
+    return grade('peter', 1, user_answer, payload,
+                 title="Peter Rabbit Title Checker",
+                 fallback=create_peter_title_fallback_response)
 
 def create_peter_title_fallback_response(user_answer):
     """
@@ -375,30 +225,7 @@ def check_question2_answer(request):
         logger.error(f"Unexpected error in check_peter_question2_answer: {e}", exc_info=True)
         return JsonResponse({'error': f'Internal server error: {str(e)}'}, status=500)
 
-def analyze_peter_author_answer(user_answer):
-    """
-    Use AI to analyze the Peter Rabbit author answer specifically
-    """
-    logger.debug(f"Starting AI analysis for author answer: '{user_answer}'")
-    
-    api_key = os.getenv('OPENROUTER_API_KEY2')
-    logger.debug(f"API key exists: {bool(api_key)}")
-    
-    if not api_key:
-        logger.error("OpenRouter API key not found in environment variables")
-        return JsonResponse({
-            'error': 'API configuration error. Please contact support.'
-        }, status=500)
-
-    url = "https://openrouter.ai/api/v1/chat/completions"
-    headers = {
-        "Authorization": f"Bearer {api_key}",
-        "Content-Type": "application/json",
-        "HTTP-Referer": "https://your-app-domain.com",
-        "X-Title": "Peter Rabbit Author Checker"
-    }
-
-    prompt = f"""You are a helpful reading teacher checking if a student correctly identified the author of "The Tale of Peter Rabbit". Your task is twofold:
+PETER_AUTHOR_PROMPT = """You are a helpful reading teacher checking if a student correctly identified the author of "The Tale of Peter Rabbit". Your task is twofold:
 1. Evaluate the correctness of the student's answer about the story "The Tale of Peter Rabbit".
 2. Identify any misspelled English words in their answer.
 
@@ -410,14 +237,14 @@ CORRECT ANSWERS include:
 - Close spellings like "Beatrice Potter" or "Beatrix Pottor" (should be marked as good but with spelling correction)
 
 IMPORTANT: Always respond with valid JSON in this exact format:
-{{
+{
     "isCorrect": true/false,
     "message": "Your feedback message here",
     "feedback_type": "excellent", "good", "partial", or "incorrect",
     "show_answer": true/false,
     "correct_answer": "Beatrix Potter",
     "misspelled_words": ["list", "of", "misspelled", "words"]
-}}
+}
 
 Note on "misspelled_words":
 - This must be a list of strings.
@@ -432,59 +259,22 @@ Guidelines for the AUTHOR question:
 - If they say "I don't know" or similar, mark as "partial" and encourage them
 - Always be encouraging and educational
 - If isCorrect is false, set show_answer to true
-- If isCorrect is true, set show_answer to false
+- If isCorrect is true, set show_answer to false"""
 
-Student's answer: "{user_answer}\""""
 
-    payload = {
-        "model": "openai/gpt-4o-mini",
-        "messages": [
-            {"role": "system", "content": prompt},
-            {"role": "user", "content": f'Please analyze this author answer: "{user_answer}"'}
-        ],
-        "temperature": 0.3,
-        "max_tokens": 250
-    }
+def analyze_peter_author_answer(user_answer):
+    """
+    Use AI to analyze the Peter Rabbit author answer specifically
+    """
+    logger.debug(f"Starting AI analysis for author answer: '{user_answer}'")
 
-    try:
-        logger.debug(f"Making request to OpenRouter API...")
-        response = requests.post(url, headers=headers, json=payload, timeout=15)
-        logger.debug(f"OpenRouter response status: {response.status_code}")
-        
-        if response.status_code == 200:
-            result_raw = response.json()['choices'][0]['message']['content'].strip()
-            logger.debug(f"OpenRouter raw response: {result_raw}")
-            
-            try:
-                parsed_result = json.loads(result_raw)
-                if 'result' in parsed_result and 'message' not in parsed_result:
-                    parsed_result['message'] = parsed_result['result']
-                logger.debug(f"Successfully parsed AI response")
-                return JsonResponse(parsed_result)
-            except json.JSONDecodeError as e:
-                logger.error(f"AI returned invalid JSON: {e}, Raw response: {result_raw}")
-                return create_peter_author_fallback_response(user_answer)
-        elif response.status_code == 401:
-            logger.error(f"OpenRouter API authentication failed: {response.text}")
-            return JsonResponse({
-                'error': 'API authentication failed. Please check your API key configuration.'
-            }, status=500)
-        else:
-            logger.error(f"OpenRouter API error: {response.status_code} - {response.text}")
-            return JsonResponse({
-                'error': f'AI service error ({response.status_code}). Please try again.'
-            }, status=500)
+    payload = build_payload(PETER_AUTHOR_PROMPT,
+                            f'Please analyze this author answer: "{user_answer}"',
+                            max_tokens=250)
 
-    except requests.RequestException as e:
-        logger.error(f"Request exception in analyze_peter_author_answer: {e}")
-        return JsonResponse({
-            'error': 'Unable to connect to AI service. Please try again.'
-        }, status=500)
-    except Exception as e:
-        logger.error(f"Unexpected error in analyze_peter_author_answer: {e}", exc_info=True)
-        return JsonResponse({
-            'error': 'Unexpected error occurred. Please try again.'
-        }, status=500)
+    return grade('peter', 2, user_answer, payload,
+                 title="Peter Rabbit Author Checker",
+                 fallback=create_peter_author_fallback_response)
 
 def create_peter_author_fallback_response(user_answer):
     """
@@ -607,44 +397,21 @@ def check_question3_answer(request):
         logger.error(f"Unexpected error in check_peter_question3_answer: {e}", exc_info=True)
         return JsonResponse({'error': f'Internal server error: {str(e)}'}, status=500)
 
-def analyze_peter_genre_answer(user_answer):
-    """
-    Use AI to analyze the Peter Rabbit genre answer specifically
-    """
-    logger.debug(f"Starting AI analysis for genre answer: '{user_answer}'")
-    
-    api_key = os.getenv('OPENROUTER_API_KEY2')
-    logger.debug(f"API key exists: {bool(api_key)}")
-    
-    if not api_key:
-        logger.error("OpenRouter API key not found in environment variables")
-        return JsonResponse({
-            'error': 'API configuration error. Please contact support.'
-        }, status=500)
-
-    url = "https://openrouter.ai/api/v1/chat/completions"
-    headers = {
-        "Authorization": f"Bearer {api_key}",
-        "Content-Type": "application/json",
-        "HTTP-Referer": "https://your-app-domain.com",
-        "X-Title": "Peter Rabbit Genre Checker"
-    }
-
-    prompt = f"""You are a helpful reading teacher checking if a student correctly identified the genre of "The Tale of Peter Rabbit". Your task is twofold:
+PETER_GENRE_PROMPT = """You are a helpful reading teacher checking if a student correctly identified the genre of "The Tale of Peter Rabbit". Your task is twofold:
 1. Evaluate the correctness of the student's answer about the story "The Tale of Peter Rabbit".
 2. Identify any misspelled English words in their answer.
 
 The correct broad genre is "Fiction". Other related correct answers include "children's fiction", "fairy tale", "animal story", "picture book", or "fantasy".
 
 IMPORTANT: Always respond with valid JSON in this exact format:
-{{
+{
     "isCorrect": true/false,
     "message": "Your feedback message here",
     "feedback_type": "excellent", "good", "partial", or "incorrect",
     "show_answer": true/false,
     "correct_answer": "Fiction",
     "misspelled_words": ["list", "of", "misspelled", "words"]
-}}
+}
 
 Note on "misspelled_words":
 - This must be a list of strings.
@@ -656,59 +423,22 @@ Guidelines for the GENRE question:
 - If the answer is "Non-Fiction", mark as incorrect and explain the difference.
 - If the answer is a sub-genre like "Adventure", "Comedy", or "Drama", acknowledge their thinking but explain that the broader category is "Fiction". Mark as "good" but suggest the main genre.
 - Always be encouraging and educational. If isCorrect is false, set show_answer to true.
-- If isCorrect is true, set show_answer to false.
+- If isCorrect is true, set show_answer to false."""
 
-Student's answer: "{user_answer}\""""
 
-    payload = {
-        "model": "openai/gpt-4o-mini",
-        "messages": [
-            {"role": "system", "content": prompt},
-            {"role": "user", "content": f'Please analyze this genre answer: "{user_answer}"'}
-        ],
-        "temperature": 0.3,
-        "max_tokens": 300
-    }
+def analyze_peter_genre_answer(user_answer):
+    """
+    Use AI to analyze the Peter Rabbit genre answer specifically
+    """
+    logger.debug(f"Starting AI analysis for genre answer: '{user_answer}'")
 
-    try:
-        logger.debug(f"Making request to OpenRouter API...")
-        response = requests.post(url, headers=headers, json=payload, timeout=15)
-        logger.debug(f"OpenRouter response status: {response.status_code}")
-        
-        if response.status_code == 200:
-            result_raw = response.json()['choices'][0]['message']['content'].strip()
-            logger.debug(f"OpenRouter raw response: {result_raw}")
-            
-            try:
-                parsed_result = json.loads(result_raw)
-                if 'result' in parsed_result and 'message' not in parsed_result:
-                    parsed_result['message'] = parsed_result['result']
-                logger.debug(f"Successfully parsed AI response")
-                return JsonResponse(parsed_result)
-            except json.JSONDecodeError as e:
-                logger.error(f"AI returned invalid JSON: {e}, Raw response: {result_raw}")
-                return create_peter_genre_fallback_response(user_answer)
-        elif response.status_code == 401:
-            logger.error(f"OpenRouter API authentication failed: {response.text}")
-            return JsonResponse({
-                'error': 'API authentication failed. Please check your API key configuration.'
-            }, status=500)
-        else:
-            logger.error(f"OpenRouter API error: {response.status_code} - {response.text}")
-            return JsonResponse({
-                'error': f'AI service error ({response.status_code}). Please try again.'
-            }, status=500)
+    payload = build_payload(PETER_GENRE_PROMPT,
+                            f'Please analyze this genre answer: "{user_answer}"',
+                            max_tokens=300)
 
-    except requests.RequestException as e:
-        logger.error(f"Request exception in analyze_peter_genre_answer: {e}")
-        return JsonResponse({
-            'error': 'Unable to connect to AI service. Please try again.'
-        }, status=500)
-    except Exception as e:
-        logger.error(f"Unexpected error in analyze_peter_genre_answer: {e}", exc_info=True)
-        return JsonResponse({
-            'error': 'Unexpected error occurred. Please try again.'
-        }, status=500)
+    return grade('peter', 3, user_answer, payload,
+                 title="Peter Rabbit Genre Checker",
+                 fallback=create_peter_genre_fallback_response)
 
 def create_peter_genre_fallback_response(user_answer):
     """
@@ -723,8 +453,9 @@ def create_peter_genre_fallback_response(user_answer):
         nonfiction_keywords = ['non-fiction', 'nonfiction', 'biography', 'history', 'factual', 'real', 'true']
         subgenre_keywords = ['adventure', 'comedy', 'drama', 'mystery', 'romance']
         
-        has_fiction = any(keyword in user_lower for keyword in fiction_keywords)
         has_nonfiction = any(keyword in user_lower for keyword in nonfiction_keywords)
+        # "non-fiction" contains "fiction", so it must not count as a fiction answer
+        has_fiction = any(keyword in user_lower for keyword in fiction_keywords) and not has_nonfiction
         has_subgenre = any(keyword in user_lower for keyword in subgenre_keywords)
         
         if user_lower == 'fiction' or 'children\'s fiction' in user_lower or 'fairy tale' in user_lower:
@@ -830,44 +561,21 @@ def check_question4_answer(request):
         logger.error(f"Unexpected error in check_peter_question4_answer: {e}", exc_info=True)
         return JsonResponse({'error': f'Internal server error: {str(e)}'}, status=500)
 
-def analyze_peter_main_animal_answer(user_answer):
-    """
-    Use AI to analyze the Peter Rabbit main animal answer specifically
-    """
-    logger.debug(f"Starting AI analysis for main animal answer: '{user_answer}'")
-    
-    api_key = os.getenv('OPENROUTER_API_KEY2')
-    logger.debug(f"API key exists: {bool(api_key)}")
-    
-    if not api_key:
-        logger.error("OpenRouter API key not found in environment variables")
-        return JsonResponse({
-            'error': 'API configuration error. Please contact support.'
-        }, status=500)
-
-    url = "https://openrouter.ai/api/v1/chat/completions"
-    headers = {
-        "Authorization": f"Bearer {api_key}",
-        "Content-Type": "application/json",
-        "HTTP-Referer": "https://your-app-domain.com",
-        "X-Title": "Peter Rabbit Main Animal Checker"
-    }
-
-    prompt = f"""You are a helpful reading teacher checking if a student correctly identified the main animal in "The Tale of Peter Rabbit". Your task is twofold:
+PETER_MAIN_ANIMAL_PROMPT = """You are a helpful reading teacher checking if a student correctly identified the main animal in "The Tale of Peter Rabbit". Your task is twofold:
 1. Evaluate the correctness of the student's answer about the story "The Tale of Peter Rabbit".
 2. Identify any misspelled English words in their answer.
 
 The correct answer is "Rabbit" - Peter Rabbit is the main character and he is a rabbit.
 
 IMPORTANT: Always respond with valid JSON in this exact format:
-{{
+{
     "isCorrect": true/false,
     "message": "Your feedback message here",
     "feedback_type": "excellent", "good", "partial", or "incorrect",
     "show_answer": true/false,
     "correct_answer": "Rabbit",
     "misspelled_words": ["list", "of", "misspelled", "words"]
-}}
+}
 
 Note on "misspelled_words":
 - This must be a list of strings.
@@ -882,59 +590,22 @@ Guidelines for the MAIN ANIMAL question:
 - If they give completely wrong animals (like "dog", "mouse", "bear"), mark as "incorrect"
 - Always be encouraging and educational
 - If isCorrect is false, set show_answer to true
-- If isCorrect is true, set show_answer to false
+- If isCorrect is true, set show_answer to false"""
 
-Student's answer: "{user_answer}\""""
 
-    payload = {
-        "model": "openai/gpt-4o-mini",
-        "messages": [
-            {"role": "system", "content": prompt},
-            {"role": "user", "content": f'Please analyze this main animal answer: "{user_answer}"'}
-        ],
-        "temperature": 0.3,
-        "max_tokens": 250
-    }
+def analyze_peter_main_animal_answer(user_answer):
+    """
+    Use AI to analyze the Peter Rabbit main animal answer specifically
+    """
+    logger.debug(f"Starting AI analysis for main animal answer: '{user_answer}'")
 
-    try:
-        logger.debug(f"Making request to OpenRouter API...")
-        response = requests.post(url, headers=headers, json=payload, timeout=15)
-        logger.debug(f"OpenRouter response status: {response.status_code}")
-        
-        if response.status_code == 200:
-            result_raw = response.json()['choices'][0]['message']['content'].strip()
-            logger.debug(f"OpenRouter raw response: {result_raw}")
-            
-            try:
-                parsed_result = json.loads(result_raw)
-                if 'result' in parsed_result and 'message' not in parsed_result:
-                    parsed_result['message'] = parsed_result['result']
-                logger.debug(f"Successfully parsed AI response")
-                return JsonResponse(parsed_result)
-            except json.JSONDecodeError as e:
-                logger.error(f"AI returned invalid JSON: {e}, Raw response: {result_raw}")
-                return create_peter_main_animal_fallback_response(user_answer)
-        elif response.status_code == 401:
-            logger.error(f"OpenRouter API authentication failed: {response.text}")
-            return JsonResponse({
-                'error': 'API authentication failed. Please check your API key configuration.'
-            }, status=500)
-        else:
-            logger.error(f"OpenRouter API error: {response.status_code} - {response.text}")
-            return JsonResponse({
-                'error': f'AI service error ({response.status_code}). Please try again.'
-            }, status=500)
+    payload = build_payload(PETER_MAIN_ANIMAL_PROMPT,
+                            f'Please analyze this main animal answer: "{user_answer}"',
+                            max_tokens=250)
 
-    except requests.RequestException as e:
-        logger.error(f"Request exception in analyze_peter_main_animal_answer: {e}")
-        return JsonResponse({
-            'error': 'Unable to connect to AI service. Please try again.'
-        }, status=500)
-    except Exception as e:
-        logger.error(f"Unexpected error in analyze_peter_main_animal_answer: {e}", exc_info=True)
-        return JsonResponse({
-            'error': 'Unexpected error occurred. Please try again.'
-        }, status=500)
+    return grade('peter', 4, user_answer, payload,
+                 title="Peter Rabbit Main Animal Checker",
+                 fallback=create_peter_main_animal_fallback_response)
 
 def create_peter_main_animal_fallback_response(user_answer):
     """
@@ -1068,30 +739,7 @@ def check_question5_answer(request):
         logger.error(f"Unexpected error in check_peter_question5_answer: {e}", exc_info=True)
         return JsonResponse({'error': f'Internal server error: {str(e)}'}, status=500)
 
-def analyze_peter_personality_answer(user_answer):
-    """
-    Use AI to analyze the Peter Rabbit personality answer specifically
-    """
-    logger.debug(f"Starting AI analysis for personality answer: '{user_answer}'")
-    
-    api_key = os.getenv('OPENROUTER_API_KEY2')
-    logger.debug(f"API key exists: {bool(api_key)}")
-    
-    if not api_key:
-        logger.error("OpenRouter API key not found in environment variables")
-        return JsonResponse({
-            'error': 'API configuration error. Please contact support.'
-        }, status=500)
-
-    url = "https://openrouter.ai/api/v1/chat/completions"
-    headers = {
-        "Authorization": f"Bearer {api_key}",
-        "Content-Type": "application/json",
-        "HTTP-Referer": "https://your-app-domain.com",
-        "X-Title": "Peter Rabbit Personality Checker"
-    }
-
-    prompt = f"""You are a helpful reading teacher checking if a student correctly identified Peter Rabbit's personality from "The Tale of Peter Rabbit". Your task is twofold:
+PETER_PERSONALITY_PROMPT = """You are a helpful reading teacher checking if a student correctly identified Peter Rabbit's personality from "The Tale of Peter Rabbit". Your task is twofold:
 1. Evaluate the correctness of the student's answer about Peter Rabbit's personality.
 2. Identify any misspelled English words in their answer.
 
@@ -1104,13 +752,13 @@ Peter Rabbit's main personality traits include:
 - Gets into trouble easily
 
 IMPORTANT: Always respond with valid JSON in this exact format:
-{{
+{
     "isCorrect": true/false,
     "message": "Your feedback message here",
     "feedback_type": "excellent", "good", "partial", or "needs_improvement",
     "show_answer": false,
     "misspelled_words": ["list", "of", "misspelled", "words"]
-}}
+}
 
 Note on "misspelled_words":
 - This must be a list of strings.
@@ -1126,64 +774,23 @@ Guidelines for the PERSONALITY question:
 - Always be encouraging and help them understand Peter's character
 - For personality questions, never show a "correct answer" since there can be multiple valid ways to describe personality
 - Always set show_answer to false
-- Focus on whether they understood that Peter gets into trouble and doesn't always follow rules
+- Focus on whether they understood that Peter gets into trouble and doesn't always follow rules"""
 
-Student's answer: "{user_answer}\""""
 
-    payload = {
-        "model": "openai/gpt-4o-mini",
-        "messages": [
-            {"role": "system", "content": prompt},
-            {"role": "user", "content": f'Please analyze this personality answer: "{user_answer}"'}
-        ],
-        "temperature": 0.3,
-        "max_tokens": 300
-    }
+def analyze_peter_personality_answer(user_answer):
+    """
+    Use AI to analyze the Peter Rabbit personality answer specifically
+    """
+    logger.debug(f"Starting AI analysis for personality answer: '{user_answer}'")
 
-    try:
-        logger.debug(f"Making request to OpenRouter API...")
-        response = requests.post(url, headers=headers, json=payload, timeout=15)
-        logger.debug(f"OpenRouter response status: {response.status_code}")
-        
-        if response.status_code == 200:
-            result_raw = response.json()['choices'][0]['message']['content'].strip()
-            logger.debug(f"OpenRouter raw response: {result_raw}")
-            
-            try:
-                parsed_result = json.loads(result_raw)
-                if 'result' in parsed_result and 'message' not in parsed_result:
-                    parsed_result['message'] = parsed_result['result']
-                
-                # Set isCorrect based on feedback_type for personality questions
-                feedback_type = parsed_result.get('feedback_type', 'needs_improvement')
-                parsed_result['isCorrect'] = feedback_type in ['excellent', 'good', 'partial']
-                
-                logger.debug(f"Successfully parsed AI response")
-                return JsonResponse(parsed_result)
-            except json.JSONDecodeError as e:
-                logger.error(f"AI returned invalid JSON: {e}, Raw response: {result_raw}")
-                return create_peter_personality_fallback_response(user_answer)
-        elif response.status_code == 401:
-            logger.error(f"OpenRouter API authentication failed: {response.text}")
-            return JsonResponse({
-                'error': 'API authentication failed. Please check your API key configuration.'
-            }, status=500)
-        else:
-            logger.error(f"OpenRouter API error: {response.status_code} - {response.text}")
-            return JsonResponse({
-                'error': f'AI service error ({response.status_code}). Please try again.'
-            }, status=500)
+    payload = build_payload(PETER_PERSONALITY_PROMPT,
+                            f'Please analyze this personality answer: "{user_answer}"',
+                            max_tokens=300)
 
-    except requests.RequestException as e:
-        logger.error(f"Request exception in analyze_peter_personality_answer: {e}")
-        return JsonResponse({
-            'error': 'Unable to connect to AI service. Please try again.'
-        }, status=500)
-    except Exception as e:
-        logger.error(f"Unexpected error in analyze_peter_personality_answer: {e}", exc_info=True)
-        return JsonResponse({
-            'error': 'Unexpected error occurred. Please try again.'
-        }, status=500)
+    return grade('peter', 5, user_answer, payload,
+                 title="Peter Rabbit Personality Checker",
+                 fallback=create_peter_personality_fallback_response,
+                 correct_types=['excellent', 'good', 'partial'])
 
 def create_peter_personality_fallback_response(user_answer):
     """
@@ -1311,30 +918,7 @@ def check_question6_answer(request):
         logger.error(f"Unexpected error in check_peter_question6_answer: {e}", exc_info=True)
         return JsonResponse({'error': f'Internal server error: {str(e)}'}, status=500)
 
-def analyze_peter_second_animal_answer(user_answer):
-    """
-    Use AI to analyze the Peter Rabbit second main animal answer specifically
-    """
-    logger.debug(f"Starting AI analysis for second animal answer: '{user_answer}'")
-    
-    api_key = os.getenv('OPENROUTER_API_KEY2')
-    logger.debug(f"API key exists: {bool(api_key)}")
-    
-    if not api_key:
-        logger.error("OpenRouter API key not found in environment variables")
-        return JsonResponse({
-            'error': 'API configuration error. Please contact support.'
-        }, status=500)
-
-    url = "https://openrouter.ai/api/v1/chat/completions"
-    headers = {
-        "Authorization": f"Bearer {api_key}",
-        "Content-Type": "application/json",
-        "HTTP-Referer": "https://your-app-domain.com",
-        "X-Title": "Peter Rabbit Second Animal Checker"
-    }
-
-    prompt = f"""You are a helpful reading teacher checking if a student correctly identified the second main animal in "The Tale of Peter Rabbit". Your task is twofold:
+PETER_SECOND_ANIMAL_PROMPT = """You are a helpful reading teacher checking if a student correctly identified the second main animal in "The Tale of Peter Rabbit". Your task is twofold:
 1. Evaluate the correctness of the student's answer about the story "The Tale of Peter Rabbit".
 2. Identify any misspelled English words in their answer.
 
@@ -1349,14 +933,14 @@ CORRECT ANSWERS include:
 - Other animals that actually appear in the story
 
 IMPORTANT: Always respond with valid JSON in this exact format:
-{{
+{
     "isCorrect": true/false,
     "message": "Your feedback message here",
     "feedback_type": "excellent", "good", "partial", or "incorrect",
     "show_answer": true/false,
     "correct_answer": "Cat or Birds",
     "misspelled_words": ["list", "of", "misspelled", "words"]
-}}
+}
 
 Note on "misspelled_words":
 - This must be a list of strings.
@@ -1371,59 +955,22 @@ Guidelines for the SECOND MAIN ANIMAL question:
 - If they give completely wrong animals, mark as "incorrect"
 - Always be encouraging and help them think about the story details
 - If isCorrect is false, set show_answer to true
-- If isCorrect is true, set show_answer to false
+- If isCorrect is true, set show_answer to false"""
 
-Student's answer: "{user_answer}\""""
 
-    payload = {
-        "model": "openai/gpt-4o-mini",
-        "messages": [
-            {"role": "system", "content": prompt},
-            {"role": "user", "content": f'Please analyze this second animal answer: "{user_answer}"'}
-        ],
-        "temperature": 0.3,
-        "max_tokens": 250
-    }
+def analyze_peter_second_animal_answer(user_answer):
+    """
+    Use AI to analyze the Peter Rabbit second main animal answer specifically
+    """
+    logger.debug(f"Starting AI analysis for second animal answer: '{user_answer}'")
 
-    try:
-        logger.debug(f"Making request to OpenRouter API...")
-        response = requests.post(url, headers=headers, json=payload, timeout=15)
-        logger.debug(f"OpenRouter response status: {response.status_code}")
-        
-        if response.status_code == 200:
-            result_raw = response.json()['choices'][0]['message']['content'].strip()
-            logger.debug(f"OpenRouter raw response: {result_raw}")
-            
-            try:
-                parsed_result = json.loads(result_raw)
-                if 'result' in parsed_result and 'message' not in parsed_result:
-                    parsed_result['message'] = parsed_result['result']
-                logger.debug(f"Successfully parsed AI response")
-                return JsonResponse(parsed_result)
-            except json.JSONDecodeError as e:
-                logger.error(f"AI returned invalid JSON: {e}, Raw response: {result_raw}")
-                return create_peter_second_animal_fallback_response(user_answer)
-        elif response.status_code == 401:
-            logger.error(f"OpenRouter API authentication failed: {response.text}")
-            return JsonResponse({
-                'error': 'API authentication failed. Please check your API key configuration.'
-            }, status=500)
-        else:
-            logger.error(f"OpenRouter API error: {response.status_code} - {response.text}")
-            return JsonResponse({
-                'error': f'AI service error ({response.status_code}). Please try again.'
-            }, status=500)
+    payload = build_payload(PETER_SECOND_ANIMAL_PROMPT,
+                            f'Please analyze this second animal answer: "{user_answer}"',
+                            max_tokens=250)
 
-    except requests.RequestException as e:
-        logger.error(f"Request exception in analyze_peter_second_animal_answer: {e}")
-        return JsonResponse({
-            'error': 'Unable to connect to AI service. Please try again.'
-        }, status=500)
-    except Exception as e:
-        logger.error(f"Unexpected error in analyze_peter_second_animal_answer: {e}", exc_info=True)
-        return JsonResponse({
-            'error': 'Unexpected error occurred. Please try again.'
-        }, status=500)
+    return grade('peter', 6, user_answer, payload,
+                 title="Peter Rabbit Second Animal Checker",
+                 fallback=create_peter_second_animal_fallback_response)
 
 def create_peter_second_animal_fallback_response(user_answer):
     """
@@ -1558,30 +1105,7 @@ def check_question7_answer(request):
         logger.error(f"Unexpected error in check_peter_question7_answer: {e}", exc_info=True)
         return JsonResponse({'error': f'Internal server error: {str(e)}'}, status=500)
 
-def analyze_peter_second_animal_personality_answer(user_answer):
-    """
-    Use AI to analyze the second animal personality answer specifically
-    """
-    logger.debug(f"Starting AI analysis for second animal personality answer: '{user_answer}'")
-    
-    api_key = os.getenv('OPENROUTER_API_KEY2')
-    logger.debug(f"API key exists: {bool(api_key)}")
-    
-    if not api_key:
-        logger.error("OpenRouter API key not found in environment variables")
-        return JsonResponse({
-            'error': 'API configuration error. Please contact support.'
-        }, status=500)
-
-    url = "https://openrouter.ai/api/v1/chat/completions"
-    headers = {
-        "Authorization": f"Bearer {api_key}",
-        "Content-Type": "application/json",
-        "HTTP-Referer": "https://your-app-domain.com",
-        "X-Title": "Peter Rabbit Second Animal Personality Checker"
-    }
-
-    prompt = f"""You are a helpful reading teacher checking if a student correctly identified the personality of the second main animal in "The Tale of Peter Rabbit". Your task is twofold:
+PETER_SECOND_ANIMAL_PERSONALITY_PROMPT = """You are a helpful reading teacher checking if a student correctly identified the personality of the second main animal in "The Tale of Peter Rabbit". Your task is twofold:
 1. Evaluate the correctness of the student's answer about the personality of secondary characters in the story.
 2. Identify any misspelled English words in their answer.
 
@@ -1592,13 +1116,13 @@ In "The Tale of Peter Rabbit", the main secondary animals include:
 Since this is about personality traits of secondary characters, accept descriptions that fit common characteristics of these animals in the story context.
 
 IMPORTANT: Always respond with valid JSON in this exact format:
-{{
+{
     "isCorrect": true/false,
     "message": "Your feedback message here",
     "feedback_type": "excellent", "good", "partial", or "needs_improvement",
     "show_answer": false,
     "misspelled_words": ["list", "of", "misspelled", "words"]
-}}
+}
 
 Note on "misspelled_words":
 - This must be a list of strings.
@@ -1615,64 +1139,23 @@ Guidelines for the SECOND ANIMAL PERSONALITY question:
 - Always be encouraging and help them think about how secondary characters behave in stories
 - For personality questions, never show a "correct answer" since there can be multiple valid descriptions
 - Always set show_answer to false
-- If they seem confused about which animal, gently guide them to think about cats or birds
+- If they seem confused about which animal, gently guide them to think about cats or birds"""
 
-Student's answer: "{user_answer}\""""
 
-    payload = {
-        "model": "openai/gpt-4o-mini",
-        "messages": [
-            {"role": "system", "content": prompt},
-            {"role": "user", "content": f'Please analyze this second animal personality answer: "{user_answer}"'}
-        ],
-        "temperature": 0.3,
-        "max_tokens": 300
-    }
+def analyze_peter_second_animal_personality_answer(user_answer):
+    """
+    Use AI to analyze the second animal personality answer specifically
+    """
+    logger.debug(f"Starting AI analysis for second animal personality answer: '{user_answer}'")
 
-    try:
-        logger.debug(f"Making request to OpenRouter API...")
-        response = requests.post(url, headers=headers, json=payload, timeout=15)
-        logger.debug(f"OpenRouter response status: {response.status_code}")
-        
-        if response.status_code == 200:
-            result_raw = response.json()['choices'][0]['message']['content'].strip()
-            logger.debug(f"OpenRouter raw response: {result_raw}")
-            
-            try:
-                parsed_result = json.loads(result_raw)
-                if 'result' in parsed_result and 'message' not in parsed_result:
-                    parsed_result['message'] = parsed_result['result']
-                
-                # Set isCorrect based on feedback_type for personality questions
-                feedback_type = parsed_result.get('feedback_type', 'needs_improvement')
-                parsed_result['isCorrect'] = feedback_type in ['excellent', 'good', 'partial']
-                
-                logger.debug(f"Successfully parsed AI response")
-                return JsonResponse(parsed_result)
-            except json.JSONDecodeError as e:
-                logger.error(f"AI returned invalid JSON: {e}, Raw response: {result_raw}")
-                return create_peter_second_animal_personality_fallback_response(user_answer)
-        elif response.status_code == 401:
-            logger.error(f"OpenRouter API authentication failed: {response.text}")
-            return JsonResponse({
-                'error': 'API authentication failed. Please check your API key configuration.'
-            }, status=500)
-        else:
-            logger.error(f"OpenRouter API error: {response.status_code} - {response.text}")
-            return JsonResponse({
-                'error': f'AI service error ({response.status_code}). Please try again.'
-            }, status=500)
+    payload = build_payload(PETER_SECOND_ANIMAL_PERSONALITY_PROMPT,
+                            f'Please analyze this second animal personality answer: "{user_answer}"',
+                            max_tokens=300)
 
-    except requests.RequestException as e:
-        logger.error(f"Request exception in analyze_peter_second_animal_personality_answer: {e}")
-        return JsonResponse({
-            'error': 'Unable to connect to AI service. Please try again.'
-        }, status=500)
-    except Exception as e:
-        logger.error(f"Unexpected error in analyze_peter_second_animal_personality_answer: {e}", exc_info=True)
-        return JsonResponse({
-            'error': 'Unexpected error occurred. Please try again.'
-        }, status=500)
+    return grade('peter', 7, user_answer, payload,
+                 title="Peter Rabbit Second Animal Personality Checker",
+                 fallback=create_peter_second_animal_personality_fallback_response,
+                 correct_types=['excellent', 'good', 'partial'])
 
 def create_peter_second_animal_personality_fallback_response(user_answer):
     """
@@ -1815,30 +1298,7 @@ def check_question8_answer(request):
         logger.error(f"Unexpected error in check_peter_question8_answer: {e}", exc_info=True)
         return JsonResponse({'error': f'Internal server error: {str(e)}'}, status=500)
 
-def analyze_peter_setting_answer(user_answer):
-    """
-    Use AI to analyze the Peter Rabbit setting answer specifically
-    """
-    logger.debug(f"Starting AI analysis for setting answer: '{user_answer}'")
-    
-    api_key = os.getenv('OPENROUTER_API_KEY2')
-    logger.debug(f"API key exists: {bool(api_key)}")
-    
-    if not api_key:
-        logger.error("OpenRouter API key not found in environment variables")
-        return JsonResponse({
-            'error': 'API configuration error. Please contact support.'
-        }, status=500)
-
-    url = "https://openrouter.ai/api/v1/chat/completions"
-    headers = {
-        "Authorization": f"Bearer {api_key}",
-        "Content-Type": "application/json",
-        "HTTP-Referer": "https://your-app-domain.com",
-        "X-Title": "Peter Rabbit Setting Checker"
-    }
-
-    prompt = f"""You are a helpful reading teacher checking if a student correctly identified where "The Tale of Peter Rabbit" takes place. Your task is twofold:
+PETER_SETTING_PROMPT = """You are a helpful reading teacher checking if a student correctly identified where "The Tale of Peter Rabbit" takes place. Your task is twofold:
 1. Evaluate the correctness of the student's answer about the story setting.
 2. Identify any misspelled English words in their answer.
 
@@ -1856,14 +1316,14 @@ CORRECT ANSWERS include any combination of:
 - Any combination of these locations
 
 IMPORTANT: Always respond with valid JSON in this exact format:
-{{
+{
     "isCorrect": true/false,
     "message": "Your feedback message here",
     "feedback_type": "excellent", "good", "partial", or "incorrect",
     "show_answer": true/false,
     "correct_answer": "Mr. McGregor's garden and the countryside",
     "misspelled_words": ["list", "of", "misspelled", "words"]
-}}
+}
 
 Note on "misspelled_words":
 - This must be a list of strings.
@@ -1877,59 +1337,22 @@ Guidelines for the SETTING question:
 - If they give completely wrong locations (city, school, castle), mark as "incorrect"
 - Be encouraging and explain the different places where the story happens
 - If isCorrect is false, set show_answer to true
-- If isCorrect is true, set show_answer to false
+- If isCorrect is true, set show_answer to false"""
 
-Student's answer: "{user_answer}\""""
 
-    payload = {
-        "model": "openai/gpt-4o-mini",
-        "messages": [
-            {"role": "system", "content": prompt},
-            {"role": "user", "content": f'Please analyze this setting answer: "{user_answer}"'}
-        ],
-        "temperature": 0.3,
-        "max_tokens": 300
-    }
+def analyze_peter_setting_answer(user_answer):
+    """
+    Use AI to analyze the Peter Rabbit setting answer specifically
+    """
+    logger.debug(f"Starting AI analysis for setting answer: '{user_answer}'")
 
-    try:
-        logger.debug(f"Making request to OpenRouter API...")
-        response = requests.post(url, headers=headers, json=payload, timeout=15)
-        logger.debug(f"OpenRouter response status: {response.status_code}")
-        
-        if response.status_code == 200:
-            result_raw = response.json()['choices'][0]['message']['content'].strip()
-            logger.debug(f"OpenRouter raw response: {result_raw}")
-            
-            try:
-                parsed_result = json.loads(result_raw)
-                if 'result' in parsed_result and 'message' not in parsed_result:
-                    parsed_result['message'] = parsed_result['result']
-                logger.debug(f"Successfully parsed AI response")
-                return JsonResponse(parsed_result)
-            except json.JSONDecodeError as e:
-                logger.error(f"AI returned invalid JSON: {e}, Raw response: {result_raw}")
-                return create_peter_setting_fallback_response(user_answer)
-        elif response.status_code == 401:
-            logger.error(f"OpenRouter API authentication failed: {response.text}")
-            return JsonResponse({
-                'error': 'API authentication failed. Please check your API key configuration.'
-            }, status=500)
-        else:
-            logger.error(f"OpenRouter API error: {response.status_code} - {response.text}")
-            return JsonResponse({
-                'error': f'AI service error ({response.status_code}). Please try again.'
-            }, status=500)
+    payload = build_payload(PETER_SETTING_PROMPT,
+                            f'Please analyze this setting answer: "{user_answer}"',
+                            max_tokens=300)
 
-    except requests.RequestException as e:
-        logger.error(f"Request exception in analyze_peter_setting_answer: {e}")
-        return JsonResponse({
-            'error': 'Unable to connect to AI service. Please try again.'
-        }, status=500)
-    except Exception as e:
-        logger.error(f"Unexpected error in analyze_peter_setting_answer: {e}", exc_info=True)
-        return JsonResponse({
-            'error': 'Unexpected error occurred. Please try again.'
-        }, status=500)
+    return grade('peter', 8, user_answer, payload,
+                 title="Peter Rabbit Setting Checker",
+                 fallback=create_peter_setting_fallback_response)
 
 def create_peter_setting_fallback_response(user_answer):
     """
@@ -2061,30 +1484,7 @@ def check_question9_answer(request):
         logger.error(f"Unexpected error in check_peter_question9_answer: {e}", exc_info=True)
         return JsonResponse({'error': f'Internal server error: {str(e)}'}, status=500)
 
-def analyze_peter_main_problem_answer(user_answer):
-    """
-    Use AI to analyze the Peter Rabbit main problem answer specifically
-    """
-    logger.debug(f"Starting AI analysis for main problem answer: '{user_answer}'")
-    
-    api_key = os.getenv('OPENROUTER_API_KEY2')
-    logger.debug(f"API key exists: {bool(api_key)}")
-    
-    if not api_key:
-        logger.error("OpenRouter API key not found in environment variables")
-        return JsonResponse({
-            'error': 'API configuration error. Please contact support.'
-        }, status=500)
-
-    url = "https://openrouter.ai/api/v1/chat/completions"
-    headers = {
-        "Authorization": f"Bearer {api_key}",
-        "Content-Type": "application/json",
-        "HTTP-Referer": "https://your-app-domain.com",
-        "X-Title": "Peter Rabbit Main Problem Checker"
-    }
-
-    prompt = f"""You are a helpful reading teacher checking if a student correctly identified the main problem in "The Tale of Peter Rabbit". Your task is twofold:
+PETER_MAIN_PROBLEM_PROMPT = """You are a helpful reading teacher checking if a student correctly identified the main problem in "The Tale of Peter Rabbit". Your task is twofold:
 1. Evaluate the correctness of the student's answer about the story's main conflict/problem.
 2. Identify any misspelled English words in their answer.
 
@@ -2100,14 +1500,14 @@ CORRECT ANSWERS include variations of:
 - Any combination that shows understanding of the conflict
 
 IMPORTANT: Always respond with valid JSON in this exact format:
-{{
+{
     "isCorrect": true/false,
     "message": "Your feedback message here",
     "feedback_type": "excellent", "good", "partial", or "incorrect",
     "show_answer": true/false,
     "correct_answer": "Peter disobeys his mother and gets into trouble in Mr. McGregor's garden",
     "misspelled_words": ["list", "of", "misspelled", "words"]
-}}
+}
 
 Note on "misspelled_words":
 - This must be a list of strings.
@@ -2121,59 +1521,22 @@ Guidelines for the MAIN PROBLEM question:
 - If they give unrelated problems or miss the point entirely, mark as "incorrect"
 - Always connect the problem to the story's lesson about obedience and consequences
 - If isCorrect is false, set show_answer to true
-- If isCorrect is true, set show_answer to false
+- If isCorrect is true, set show_answer to false"""
 
-Student's answer: "{user_answer}\""""
 
-    payload = {
-        "model": "openai/gpt-4o-mini",
-        "messages": [
-            {"role": "system", "content": prompt},
-            {"role": "user", "content": f'Please analyze this main problem answer: "{user_answer}"'}
-        ],
-        "temperature": 0.3,
-        "max_tokens": 300
-    }
+def analyze_peter_main_problem_answer(user_answer):
+    """
+    Use AI to analyze the Peter Rabbit main problem answer specifically
+    """
+    logger.debug(f"Starting AI analysis for main problem answer: '{user_answer}'")
 
-    try:
-        logger.debug(f"Making request to OpenRouter API...")
-        response = requests.post(url, headers=headers, json=payload, timeout=15)
-        logger.debug(f"OpenRouter response status: {response.status_code}")
-        
-        if response.status_code == 200:
-            result_raw = response.json()['choices'][0]['message']['content'].strip()
-            logger.debug(f"OpenRouter raw response: {result_raw}")
-            
-            try:
-                parsed_result = json.loads(result_raw)
-                if 'result' in parsed_result and 'message' not in parsed_result:
-                    parsed_result['message'] = parsed_result['result']
-                logger.debug(f"Successfully parsed AI response")
-                return JsonResponse(parsed_result)
-            except json.JSONDecodeError as e:
-                logger.error(f"AI returned invalid JSON: {e}, Raw response: {result_raw}")
-                return create_peter_main_problem_fallback_response(user_answer)
-        elif response.status_code == 401:
-            logger.error(f"OpenRouter API authentication failed: {response.text}")
-            return JsonResponse({
-                'error': 'API authentication failed. Please check your API key configuration.'
-            }, status=500)
-        else:
-            logger.error(f"OpenRouter API error: {response.status_code} - {response.text}")
-            return JsonResponse({
-                'error': f'AI service error ({response.status_code}). Please try again.'
-            }, status=500)
+    payload = build_payload(PETER_MAIN_PROBLEM_PROMPT,
+                            f'Please analyze this main problem answer: "{user_answer}"',
+                            max_tokens=300)
 
-    except requests.RequestException as e:
-        logger.error(f"Request exception in analyze_peter_main_problem_answer: {e}")
-        return JsonResponse({
-            'error': 'Unable to connect to AI service. Please try again.'
-        }, status=500)
-    except Exception as e:
-        logger.error(f"Unexpected error in analyze_peter_main_problem_answer: {e}", exc_info=True)
-        return JsonResponse({
-            'error': 'Unexpected error occurred. Please try again.'
-        }, status=500)
+    return grade('peter', 9, user_answer, payload,
+                 title="Peter Rabbit Main Problem Checker",
+                 fallback=create_peter_main_problem_fallback_response)
 
 def create_peter_main_problem_fallback_response(user_answer):
     """
@@ -2315,30 +1678,7 @@ def check_question10_answer(request):
         logger.error(f"Unexpected error in check_peter_question10_answer: {e}", exc_info=True)
         return JsonResponse({'error': f'Internal server error: {str(e)}'}, status=500)
 
-def analyze_peter_solution_answer(user_answer):
-    """
-    Use AI to analyze the Peter Rabbit solution answer specifically
-    """
-    logger.debug(f"Starting AI analysis for solution answer: '{user_answer}'")
-    
-    api_key = os.getenv('OPENROUTER_API_KEY2')
-    logger.debug(f"API key exists: {bool(api_key)}")
-    
-    if not api_key:
-        logger.error("OpenRouter API key not found in environment variables")
-        return JsonResponse({
-            'error': 'API configuration error. Please contact support.'
-        }, status=500)
-
-    url = "https://openrouter.ai/api/v1/chat/completions"
-    headers = {
-        "Authorization": f"Bearer {api_key}",
-        "Content-Type": "application/json",
-        "HTTP-Referer": "https://your-app-domain.com",
-        "X-Title": "Peter Rabbit Solution Checker"
-    }
-
-    prompt = f"""You are a helpful reading teacher checking if a student correctly identified how the problem was solved in "The Tale of Peter Rabbit". Your task is twofold:
+PETER_SOLUTION_PROMPT = """You are a helpful reading teacher checking if a student correctly identified how the problem was solved in "The Tale of Peter Rabbit". Your task is twofold:
 1. Evaluate the correctness of the student's answer about how Peter's problem was resolved.
 2. Identify any misspelled English words in their answer.
 
@@ -2359,14 +1699,14 @@ CORRECT ANSWERS include variations of:
 - Any combination that shows understanding of how the conflict was resolved
 
 IMPORTANT: Always respond with valid JSON in this exact format:
-{{
+{
     "isCorrect": true/false,
     "message": "Your feedback message here",
     "feedback_type": "excellent", "good", "partial", or "incorrect",
     "show_answer": true/false,
     "correct_answer": "Peter escapes from the garden and returns home safely to his mother",
     "misspelled_words": ["list", "of", "misspelled", "words"]
-}}
+}
 
 Note on "misspelled_words":
 - This must be a list of strings.
@@ -2380,59 +1720,22 @@ Guidelines for the SOLUTION question:
 - If they give unrelated or incorrect solutions, mark as "incorrect"
 - Always connect the solution to how it resolves the main problem (Peter's disobedience and getting trapped)
 - If isCorrect is false, set show_answer to true
-- If isCorrect is true, set show_answer to false
+- If isCorrect is true, set show_answer to false"""
 
-Student's answer: "{user_answer}\""""
 
-    payload = {
-        "model": "openai/gpt-4o-mini",
-        "messages": [
-            {"role": "system", "content": prompt},
-            {"role": "user", "content": f'Please analyze this solution answer: "{user_answer}"'}
-        ],
-        "temperature": 0.3,
-        "max_tokens": 300
-    }
+def analyze_peter_solution_answer(user_answer):
+    """
+    Use AI to analyze the Peter Rabbit solution answer specifically
+    """
+    logger.debug(f"Starting AI analysis for solution answer: '{user_answer}'")
 
-    try:
-        logger.debug(f"Making request to OpenRouter API...")
-        response = requests.post(url, headers=headers, json=payload, timeout=15)
-        logger.debug(f"OpenRouter response status: {response.status_code}")
-        
-        if response.status_code == 200:
-            result_raw = response.json()['choices'][0]['message']['content'].strip()
-            logger.debug(f"OpenRouter raw response: {result_raw}")
-            
-            try:
-                parsed_result = json.loads(result_raw)
-                if 'result' in parsed_result and 'message' not in parsed_result:
-                    parsed_result['message'] = parsed_result['result']
-                logger.debug(f"Successfully parsed AI response")
-                return JsonResponse(parsed_result)
-            except json.JSONDecodeError as e:
-                logger.error(f"AI returned invalid JSON: {e}, Raw response: {result_raw}")
-                return create_peter_solution_fallback_response(user_answer)
-        elif response.status_code == 401:
-            logger.error(f"OpenRouter API authentication failed: {response.text}")
-            return JsonResponse({
-                'error': 'API authentication failed. Please check your API key configuration.'
-            }, status=500)
-        else:
-            logger.error(f"OpenRouter API error: {response.status_code} - {response.text}")
-            return JsonResponse({
-                'error': f'AI service error ({response.status_code}). Please try again.'
-            }, status=500)
+    payload = build_payload(PETER_SOLUTION_PROMPT,
+                            f'Please analyze this solution answer: "{user_answer}"',
+                            max_tokens=300)
 
-    except requests.RequestException as e:
-        logger.error(f"Request exception in analyze_peter_solution_answer: {e}")
-        return JsonResponse({
-            'error': 'Unable to connect to AI service. Please try again.'
-        }, status=500)
-    except Exception as e:
-        logger.error(f"Unexpected error in analyze_peter_solution_answer: {e}", exc_info=True)
-        return JsonResponse({
-            'error': 'Unexpected error occurred. Please try again.'
-        }, status=500)
+    return grade('peter', 10, user_answer, payload,
+                 title="Peter Rabbit Solution Checker",
+                 fallback=create_peter_solution_fallback_response)
 
 def create_peter_solution_fallback_response(user_answer):
     """
@@ -2563,30 +1866,7 @@ def check_question11_answer(request):
         logger.error(f"Unexpected error in check_peter_question11_answer: {e}", exc_info=True)
         return JsonResponse({'error': f'Internal server error: {str(e)}'}, status=500)
 
-def analyze_peter_lesson_answer(user_answer):
-    """
-    Use AI to analyze the Peter Rabbit lesson learned answer specifically
-    """
-    logger.debug(f"Starting AI analysis for lesson answer: '{user_answer}'")
-    
-    api_key = os.getenv('OPENROUTER_API_KEY2')
-    logger.debug(f"API key exists: {bool(api_key)}")
-    
-    if not api_key:
-        logger.error("OpenRouter API key not found in environment variables")
-        return JsonResponse({
-            'error': 'API configuration error. Please contact support.'
-        }, status=500)
-
-    url = "https://openrouter.ai/api/v1/chat/completions"
-    headers = {
-        "Authorization": f"Bearer {api_key}",
-        "Content-Type": "application/json",
-        "HTTP-Referer": "https://your-app-domain.com",
-        "X-Title": "Peter Rabbit Lesson Checker"
-    }
-
-    prompt = f"""You are a helpful reading teacher checking if a student correctly identified the lesson learned in "The Tale of Peter Rabbit". Your task is twofold:
+PETER_LESSON_PROMPT = """You are a helpful reading teacher checking if a student correctly identified the lesson learned in "The Tale of Peter Rabbit". Your task is twofold:
 1. Evaluate the correctness of the student's answer about what lesson Peter (or readers) learned from the story.
 2. Identify any misspelled English words in their answer.
 
@@ -2607,14 +1887,14 @@ CORRECT ANSWERS include variations of:
 - Any combination that shows understanding of the moral about obedience and consequences
 
 IMPORTANT: Always respond with valid JSON in this exact format:
-{{
+{
     "isCorrect": true/false,
     "message": "Your feedback message here",
     "feedback_type": "excellent", "good", "partial", or "incorrect",
     "show_answer": true/false,
     "correct_answer": "Listen to your parents and obey rules, because disobedience has consequences",
     "misspelled_words": ["list", "of", "misspelled", "words"]
-}}
+}
 
 Note on "misspelled_words":
 - This must be a list of strings.
@@ -2629,59 +1909,22 @@ Guidelines for the LESSON LEARNED question:
 - Always connect the lesson to Peter's specific experience in the story
 - Be encouraging and help them understand the moral value of the story
 - If isCorrect is false, set show_answer to true
-- If isCorrect is true, set show_answer to false
+- If isCorrect is true, set show_answer to false"""
 
-Student's answer: "{user_answer}\""""
 
-    payload = {
-        "model": "openai/gpt-4o-mini",
-        "messages": [
-            {"role": "system", "content": prompt},
-            {"role": "user", "content": f'Please analyze this lesson answer: "{user_answer}"'}
-        ],
-        "temperature": 0.3,
-        "max_tokens": 300
-    }
+def analyze_peter_lesson_answer(user_answer):
+    """
+    Use AI to analyze the Peter Rabbit lesson learned answer specifically
+    """
+    logger.debug(f"Starting AI analysis for lesson answer: '{user_answer}'")
 
-    try:
-        logger.debug(f"Making request to OpenRouter API...")
-        response = requests.post(url, headers=headers, json=payload, timeout=15)
-        logger.debug(f"OpenRouter response status: {response.status_code}")
-        
-        if response.status_code == 200:
-            result_raw = response.json()['choices'][0]['message']['content'].strip()
-            logger.debug(f"OpenRouter raw response: {result_raw}")
-            
-            try:
-                parsed_result = json.loads(result_raw)
-                if 'result' in parsed_result and 'message' not in parsed_result:
-                    parsed_result['message'] = parsed_result['result']
-                logger.debug(f"Successfully parsed AI response")
-                return JsonResponse(parsed_result)
-            except json.JSONDecodeError as e:
-                logger.error(f"AI returned invalid JSON: {e}, Raw response: {result_raw}")
-                return create_peter_lesson_fallback_response(user_answer)
-        elif response.status_code == 401:
-            logger.error(f"OpenRouter API authentication failed: {response.text}")
-            return JsonResponse({
-                'error': 'API authentication failed. Please check your API key configuration.'
-            }, status=500)
-        else:
-            logger.error(f"OpenRouter API error: {response.status_code} - {response.text}")
-            return JsonResponse({
-                'error': f'AI service error ({response.status_code}). Please try again.'
-            }, status=500)
+    payload = build_payload(PETER_LESSON_PROMPT,
+                            f'Please analyze this lesson answer: "{user_answer}"',
+                            max_tokens=300)
 
-    except requests.RequestException as e:
-        logger.error(f"Request exception in analyze_peter_lesson_answer: {e}")
-        return JsonResponse({
-            'error': 'Unable to connect to AI service. Please try again.'
-        }, status=500)
-    except Exception as e:
-        logger.error(f"Unexpected error in analyze_peter_lesson_answer: {e}", exc_info=True)
-        return JsonResponse({
-            'error': 'Unexpected error occurred. Please try again.'
-        }, status=500)
+    return grade('peter', 11, user_answer, payload,
+                 title="Peter Rabbit Lesson Checker",
+                 fallback=create_peter_lesson_fallback_response)
 
 def create_peter_lesson_fallback_response(user_answer):
     """
@@ -2825,30 +2068,7 @@ def check_question12_answer(request):
         logger.error(f"Unexpected error in check_peter_question12_answer: {e}", exc_info=True)
         return JsonResponse({'error': f'Internal server error: {str(e)}'}, status=500)
 
-def analyze_peter_favourite_character_answer(user_answer):
-    """
-    Use AI to analyze the Peter Rabbit favourite character answer specifically
-    """
-    logger.debug(f"Starting AI analysis for favourite character answer: '{user_answer}'")
-    
-    api_key = os.getenv('OPENROUTER_API_KEY2')
-    logger.debug(f"API key exists: {bool(api_key)}")
-    
-    if not api_key:
-        logger.error("OpenRouter API key not found in environment variables")
-        return JsonResponse({
-            'error': 'API configuration error. Please contact support.'
-        }, status=500)
-
-    url = "https://openrouter.ai/api/v1/chat/completions"
-    headers = {
-        "Authorization": f"Bearer {api_key}",
-        "Content-Type": "application/json",
-        "HTTP-Referer": "https://your-app-domain.com",
-        "X-Title": "Peter Rabbit Favourite Character Checker"
-    }
-
-    prompt = f"""You are a helpful reading teacher checking if a student provided a thoughtful answer about their favourite character in "The Tale of Peter Rabbit". Your task is twofold:
+PETER_FAVOURITE_CHARACTER_PROMPT = """You are a helpful reading teacher checking if a student provided a thoughtful answer about their favourite character in "The Tale of Peter Rabbit". Your task is twofold:
 1. Evaluate whether the student identified a character from the story and provided reasoning for their choice.
 2. Identify any misspelled English words in their answer.
 
@@ -2866,13 +2086,13 @@ This is a PERSONAL OPINION question - there is no "wrong" character choice. The
 3. Show understanding of the character's role or personality
 
 IMPORTANT: Always respond with valid JSON in this exact format:
-{{
+{
     "isCorrect": true/false,
     "message": "Your feedback message here",
     "feedback_type": "excellent", "good", "partial", or "needs_improvement",
     "show_answer": false,
     "misspelled_words": ["list", "of", "misspelled", "words"]
-}}
+}
 
 Note on "misspelled_words":
 - This must be a list of strings.
@@ -2893,64 +2113,23 @@ Examples of good reasoning:
 - Character traits (brave, curious, caring, etc.)
 - Actions in the story (helps others, learns lessons, etc.)
 - Relatability (reminds them of themselves, etc.)
-- Story role (main character, protector, etc.)
+- Story role (main character, protector, etc.)"""
 
-Student's answer: "{user_answer}\""""
 
-    payload = {
-        "model": "openai/gpt-4o-mini",
-        "messages": [
-            {"role": "system", "content": prompt},
-            {"role": "user", "content": f'Please analyze this favourite character answer: "{user_answer}"'}
-        ],
-        "temperature": 0.3,
-        "max_tokens": 300
-    }
+def analyze_peter_favourite_character_answer(user_answer):
+    """
+    Use AI to analyze the Peter Rabbit favourite character answer specifically
+    """
+    logger.debug(f"Starting AI analysis for favourite character answer: '{user_answer}'")
 
-    try:
-        logger.debug(f"Making request to OpenRouter API...")
-        response = requests.post(url, headers=headers, json=payload, timeout=15)
-        logger.debug(f"OpenRouter response status: {response.status_code}")
-        
-        if response.status_code == 200:
-            result_raw = response.json()['choices'][0]['message']['content'].strip()
-            logger.debug(f"OpenRouter raw response: {result_raw}")
-            
-            try:
-                parsed_result = json.loads(result_raw)
-                if 'result' in parsed_result and 'message' not in parsed_result:
-                    parsed_result['message'] = parsed_result['result']
-                
-                # Set isCorrect based on feedback_type for opinion questions
-                feedback_type = parsed_result.get('feedback_type', 'needs_improvement')
-                parsed_result['isCorrect'] = feedback_type in ['excellent', 'good', 'partial']
-                
-                logger.debug(f"Successfully parsed AI response")
-                return JsonResponse(parsed_result)
-            except json.JSONDecodeError as e:
-                logger.error(f"AI returned invalid JSON: {e}, Raw response: {result_raw}")
-                return create_peter_favourite_character_fallback_response(user_answer)
-        elif response.status_code == 401:
-            logger.error(f"OpenRouter API authentication failed: {response.text}")
-            return JsonResponse({
-                'error': 'API authentication failed. Please check your API key configuration.'
-            }, status=500)
-        else:
-            logger.error(f"OpenRouter API error: {response.status_code} - {response.text}")
-            return JsonResponse({
-                'error': f'AI service error ({response.status_code}). Please try again.'
-            }, status=500)
+    payload = build_payload(PETER_FAVOURITE_CHARACTER_PROMPT,
+                            f'Please analyze this favourite character answer: "{user_answer}"',
+                            max_tokens=300)
 
-    except requests.RequestException as e:
-        logger.error(f"Request exception in analyze_peter_favourite_character_answer: {e}")
-        return JsonResponse({
-            'error': 'Unable to connect to AI service. Please try again.'
-        }, status=500)
-    except Exception as e:
-        logger.error(f"Unexpected error in analyze_peter_favourite_character_answer: {e}", exc_info=True)
-        return JsonResponse({
-            'error': 'Unexpected error occurred. Please try again.'
-        }, status=500)
+    return grade('peter', 12, user_answer, payload,
+                 title="Peter Rabbit Favourite Character Checker",
+                 fallback=create_peter_favourite_character_fallback_response,
+                 correct_types=['excellent', 'good', 'partial'])
 
 def create_peter_favourite_character_fallback_response(user_answer):
     """
@@ -3083,30 +2262,7 @@ def check_question13_answer(request):
         logger.error(f"Unexpected error in check_peter_question13_answer: {e}", exc_info=True)
         return JsonResponse({'error': f'Internal server error: {str(e)}'}, status=500)
 
-def analyze_peter_reading_feelings_answer(user_answer):
-    """
-    Use AI to analyze the Peter Rabbit reading feelings answer specifically
-    """
-    logger.debug(f"Starting AI analysis for reading feelings answer: '{user_answer}'")
-    
-    api_key = os.getenv('OPENROUTER_API_KEY2')
-    logger.debug(f"API key exists: {bool(api_key)}")
-    
-    if not api_key:
-        logger.error("OpenRouter API key not found in environment variables")
-        return JsonResponse({
-            'error': 'API configuration error. Please contact support.'
-        }, status=500)
-
-    url = "https://openrouter.ai/api/v1/chat/completions"
-    headers = {
-        "Authorization": f"Bearer {api_key}",
-        "Content-Type": "application/json",
-        "HTTP-Referer": "https://your-app-domain.com",
-        "X-Title": "Peter Rabbit Reading Feelings Checker"
-    }
-
-    prompt = f"""You are a helpful reading teacher checking if a student shared their feelings about reading "The Tale of Peter Rabbit". Your task is twofold:
+PETER_READING_FEELINGS_PROMPT = """You are a helpful reading teacher checking if a student shared their feelings about reading "The Tale of Peter Rabbit". Your task is twofold:
 1. Evaluate whether the student expressed genuine feelings/emotions about their reading experience.
 2. Identify any misspelled English words in their answer.
 
@@ -3133,13 +2289,13 @@ MIXED/COMPLEX FEELINGS:
 There are NO wrong emotional responses - this is about personal reflection and emotional literacy.
 
 IMPORTANT: Always respond with valid JSON in this exact format:
-{{
+{
     "isCorrect": true/false,
     "message": "Your feedback message here",
     "feedback_type": "excellent", "good", "partial", or "needs_improvement",
     "show_answer": false,
     "misspelled_words": ["list", "of", "misspelled", "words"]
-}}
+}
 
 Note on "misspelled_words":
 - This must be a list of strings.
@@ -3160,64 +2316,23 @@ Examples of good responses:
 - "I felt excited when Peter was exploring"
 - "I was worried he would get caught"
 - "Happy and scared at the same time"
-- "Nervous but couldn't stop reading"
+- "Nervous but couldn't stop reading\""""
 
-Student's answer: "{user_answer}\""""
 
-    payload = {
-        "model": "openai/gpt-4o-mini",
-        "messages": [
-            {"role": "system", "content": prompt},
-            {"role": "user", "content": f'Please analyze this reading feelings answer: "{user_answer}"'}
-        ],
-        "temperature": 0.3,
-        "max_tokens": 300
-    }
+def analyze_peter_reading_feelings_answer(user_answer):
+    """
+    Use AI to analyze the Peter Rabbit reading feelings answer specifically
+    """
+    logger.debug(f"Starting AI analysis for reading feelings answer: '{user_answer}'")
 
-    try:
-        logger.debug(f"Making request to OpenRouter API...")
-        response = requests.post(url, headers=headers, json=payload, timeout=15)
-        logger.debug(f"OpenRouter response status: {response.status_code}")
-        
-        if response.status_code == 200:
-            result_raw = response.json()['choices'][0]['message']['content'].strip()
-            logger.debug(f"OpenRouter raw response: {result_raw}")
-            
-            try:
-                parsed_result = json.loads(result_raw)
-                if 'result' in parsed_result and 'message' not in parsed_result:
-                    parsed_result['message'] = parsed_result['result']
-                
-                # Set isCorrect based on feedback_type for feelings questions
-                feedback_type = parsed_result.get('feedback_type', 'needs_improvement')
-                parsed_result['isCorrect'] = feedback_type in ['excellent', 'good', 'partial']
-                
-                logger.debug(f"Successfully parsed AI response")
-                return JsonResponse(parsed_result)
-            except json.JSONDecodeError as e:
-                logger.error(f"AI returned invalid JSON: {e}, Raw response: {result_raw}")
-                return create_peter_reading_feelings_fallback_response(user_answer)
-        elif response.status_code == 401:
-            logger.error(f"OpenRouter API authentication failed: {response.text}")
-            return JsonResponse({
-                'error': 'API authentication failed. Please check your API key configuration.'
-            }, status=500)
-        else:
-            logger.error(f"OpenRouter API error: {response.status_code} - {response.text}")
-            return JsonResponse({
-                'error': f'AI service error ({response.status_code}). Please try again.'
-            }, status=500)
+    payload = build_payload(PETER_READING_FEELINGS_PROMPT,
+                            f'Please analyze this reading feelings answer: "{user_answer}"',
+                            max_tokens=300)
 
-    except requests.RequestException as e:
-        logger.error(f"Request exception in analyze_peter_reading_feelings_answer: {e}")
-        return JsonResponse({
-            'error': 'Unable to connect to AI service. Please try again.'
-        }, status=500)
-    except Exception as e:
-        logger.error(f"Unexpected error in analyze_peter_reading_feelings_answer: {e}", exc_info=True)
-        return JsonResponse({
-            'error': 'Unexpected error occurred. Please try again.'
-        }, status=500)
+    return grade('peter', 13, user_answer, payload,
+                 title="Peter Rabbit Reading Feelings Checker",
+                 fallback=create_peter_reading_feelings_fallback_response,
+                 correct_types=['excellent', 'good', 'partial'])
 
 def create_peter_reading_feelings_fallback_response(user_answer):
     """
@@ -3363,30 +2478,7 @@ def check_question14_answer(request):
         logger.error(f"Unexpected error in check_peter_question14_answer: {e}", exc_info=True)
         return JsonResponse({'error': f'Internal server error: {str(e)}'}, status=500)
 
-def analyze_peter_story_part_answer(user_answer):
-    """
-    Use AI to analyze the Peter Rabbit story part answer specifically
-    """
-    logger.debug(f"Starting AI analysis for story part answer: '{user_answer}'")
-    
-    api_key = os.getenv('OPENROUTER_API_KEY2')
-    logger.debug(f"API key exists: {bool(api_key)}")
-    
-    if not api_key:
-        logger.error("OpenRouter API key not found in environment variables")
-        return JsonResponse({
-            'error': 'API configuration error. Please contact support.'
-        }, status=500)
-
-    url = "https://openrouter.ai/api/v1/chat/completions"
-    headers = {
-        "Authorization": f"Bearer {api_key}",
-        "Content-Type": "application/json",
-        "HTTP-Referer": "https://your-app-domain.com",
-        "X-Title": "Peter Rabbit Story Part Checker"
-    }
-
-    prompt = f"""You are a helpful reading teacher checking if a student identified a specific part of "The Tale of Peter Rabbit" that made them feel a certain way. Your task is twofold:
+PETER_STORY_PART_PROMPT = """You are a helpful reading teacher checking if a student identified a specific part of "The Tale of Peter Rabbit" that made them feel a certain way. Your task is twofold:
 1. Evaluate whether the student referenced a specific story event, scene, or moment from Peter Rabbit.
 2. Identify any misspelled English words in their answer.
 
@@ -3408,13 +2500,13 @@ Key story events/parts in "The Tale of Peter Rabbit":
 - The contrast with his good sisters getting treats
 
 IMPORTANT: Always respond with valid JSON in this exact format:
-{{
+{
     "isCorrect": true/false,
     "message": "Your feedback message here",
     "feedback_type": "excellent", "good", "partial", or "needs_improvement",
     "show_answer": false,
     "misspelled_words": ["list", "of", "misspelled", "words"]
-}}
+}
 
 Note on "misspelled_words":
 - This must be a list of strings.
@@ -3435,64 +2527,23 @@ Examples of good responses:
 - "When Peter was being chased by Mr. McGregor"
 - "The part where Peter got stuck in the net"
 - "When Peter first entered the garden"
-- "When Peter made it home safely to his mother"
+- "When Peter made it home safely to his mother\""""
 
-Student's answer: "{user_answer}\""""
 
-    payload = {
-        "model": "openai/gpt-4o-mini",
-        "messages": [
-            {"role": "system", "content": prompt},
-            {"role": "user", "content": f'Please analyze this story part answer: "{user_answer}"'}
-        ],
-        "temperature": 0.3,
-        "max_tokens": 300
-    }
+def analyze_peter_story_part_answer(user_answer):
+    """
+    Use AI to analyze the Peter Rabbit story part answer specifically
+    """
+    logger.debug(f"Starting AI analysis for story part answer: '{user_answer}'")
 
-    try:
-        logger.debug(f"Making request to OpenRouter API...")
-        response = requests.post(url, headers=headers, json=payload, timeout=15)
-        logger.debug(f"OpenRouter response status: {response.status_code}")
-        
-        if response.status_code == 200:
-            result_raw = response.json()['choices'][0]['message']['content'].strip()
-            logger.debug(f"OpenRouter raw response: {result_raw}")
-            
-            try:
-                parsed_result = json.loads(result_raw)
-                if 'result' in parsed_result and 'message' not in parsed_result:
-                    parsed_result['message'] = parsed_result['result']
-                
-                # Set isCorrect based on feedback_type for story analysis questions
-                feedback_type = parsed_result.get('feedback_type', 'needs_improvement')
-                parsed_result['isCorrect'] = feedback_type in ['excellent', 'good', 'partial']
-                
-                logger.debug(f"Successfully parsed AI response")
-                return JsonResponse(parsed_result)
-            except json.JSONDecodeError as e:
-                logger.error(f"AI returned invalid JSON: {e}, Raw response: {result_raw}")
-                return create_peter_story_part_fallback_response(user_answer)
-        elif response.status_code == 401:
-            logger.error(f"OpenRouter API authentication failed: {response.text}")
-            return JsonResponse({
-                'error': 'API authentication failed. Please check your API key configuration.'
-            }, status=500)
-        else:
-            logger.error(f"OpenRouter API error: {response.status_code} - {response.text}")
-            return JsonResponse({
-                'error': f'AI service error ({response.status_code}). Please try again.'
-            }, status=500)
+    payload = build_payload(PETER_STORY_PART_PROMPT,
+                            f'Please analyze this story part answer: "{user_answer}"',
+                            max_tokens=300)
 
-    except requests.RequestException as e:
-        logger.error(f"Request exception in analyze_peter_story_part_answer: {e}")
-        return JsonResponse({
-            'error': 'Unable to connect to AI service. Please try again.'
-        }, status=500)
-    except Exception as e:
-        logger.error(f"Unexpected error in analyze_peter_story_part_answer: {e}", exc_info=True)
-        return JsonResponse({
-            'error': 'Unexpected error occurred. Please try again.'
-        }, status=500)
+    return grade('peter', 14, user_answer, payload,
+                 title="Peter Rabbit Story Part Checker",
+                 fallback=create_peter_story_part_fallback_response,
+                 correct_types=['excellent', 'good', 'partial'])
 
 def create_peter_story_part_fallback_response(user_answer):
     """
@@ -3,6 +3,7 @@ import { useNavigate } from "react-router-dom";
 import SpeechRecognition, { useSpeechRecognition } from 'react-speech-recognition';
 import { FaPlay, FaMicrophone, FaMicrophoneSlash, FaRocket } from "react-icons/fa";
 import Header from "./Header";
+import usePregrade from "./usePregrade";
 
 export default function GodAct1() {
   const navigate = useNavigate();
@@ -11,6 +12,7 @@ export default function GodAct1() {
   const [activityStarted, setActivityStarted] = useState(false);
   const [interactionStage, setInteractionStage] = useState('voice');
   const [typedAnswer, setTypedAnswer] = useState('');
+  usePregrade('goldilocks', 1, typedAnswer);
   const [feedback, setFeedback] = useState(null);
   const [isLoading, setIsLoading] = useState(false);
   const [showAnswer, setShowAnswer] = useState(false);
@@ -3,12 +3,14 @@ import { useNavigate } from "react-router-dom";
 import SpeechRecognition, { useSpeechRecognition } from 'react-speech-recognition';
 import { FaPlay, FaMicrophone, FaMicrophoneSlash, FaRocket, FaRedo } from "react-icons/fa";
 import Header from "./Header";
+import usePregrade from "./usePregrade";
 
 export default function GodAct2() {
   const navigate = useNavigate();
 
   // --- STATE MANAGEMENT ---
   const [typedAnswer, setTypedAnswer] = useState('');
+  usePregrade('goldilocks', 2, typedAnswer);
   const [feedback, setFeedback] = useState(null);
   const [isLoading, setIsLoading] = useState(false);
   const [showAnswer, setShowAnswer] = useState(false);
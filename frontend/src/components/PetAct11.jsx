@@ -3,6 +3,7 @@ import { useNavigate } from "react-router-dom";
 import SpeechRecognition, { useSpeechRecognition } from 'react-speech-recognition';
 import { FaPlay, FaMicrophone, FaMicrophoneSlash, FaRocket } from "react-icons/fa";
 import Header from "./Header";
+import usePregrade from "./usePregrade";
 
 export default function PetAct11() {
   const navigate = useNavigate();
@@ -11,6 +12,7 @@ export default function PetAct11() {
 
   // --- STATE MANAGEMENT ---
   const [typedAnswer, setTypedAnswer] = useState('');
+  usePregrade('peter', 11, typedAnswer);
   const [feedback, setFeedback] = useState(null);
   const [isLoading, setIsLoading] = useState(false);
   const [showAnswer, setShowAnswer] = useState(false);
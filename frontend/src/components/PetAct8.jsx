@@ -3,6 +3,7 @@ import { useNavigate } from "react-router-dom";
 import SpeechRecognition, { useSpeechRecognition } from 'react-speech-recognition';
 import { FaPlay, FaMicrophone, FaMicrophoneSlash } from "react-icons/fa";
 import Header from "./Header";
+import usePregrade from "./usePregrade";
 
 export default function PetAct8() {
   const navigate = useNavigate();
@@ -10,6 +11,7 @@ export default function PetAct8() {
   // --- STATE MANAGEMENT ---
   // State from your original PetAct8 file
   const [settingAnswer, setSettingAnswer] = useState('');
+  usePregrade('peter', 8, settingAnswer);
   const [feedback, setFeedback] = useState(null);
   const [isLoading, setIsLoading] = useState(false);
   const [showAnswer, setShowAnswer] = useState(false);
@@ -0,0 +1,28 @@
+import { useEffect, useRef } from "react";
+
+// Sends the typed draft to the backend once the child pauses, so the grade is
+// usually cached by the time they press submit. Only the latest draft counts:
+// a newer one cancels the pending request and the backend skips older ones.
+export default function usePregrade(story, question, draft, delay = 800) {
+  const draftId = useRef(`${Date.now().toString(36)}-${Math.random().toString(36).slice(2)}`);
+
+  useEffect(() => {
+    const answer = draft.trim();
+    if (answer.split(/\s+/).length < 3) return;
+
+    const controller = new AbortController();
+    const timer = setTimeout(() => {
+      fetch('http://localhost:8000/api/grading/pregrade/', {
+        method: 'POST',
+        headers: { 'Content-Type': 'application/json' },
+        body: JSON.stringify({ story, question, answer, draft_id: draftId.current }),
+        signal: controller.signal
+      }).catch(() => {});
+    }, delay);
+
+    return () => {
+      clearTimeout(timer);
+      controller.abort();
+    };
+  }, [story, question, draft, delay]);
+}